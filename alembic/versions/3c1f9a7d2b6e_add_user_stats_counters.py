@@ -0,0 +1,62 @@
+"""add_user_stats_counters
+
+Revision ID: 3c1f9a7d2b6e
+Revises: fec5893a0bdd
+Create Date: 2025-08-20 10:12:03.114502
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3c1f9a7d2b6e"
+down_revision: Union[str, Sequence[str], None] = "fec5893a0bdd"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - додає таблицю лічильників user_stats."""
+    op.create_table(
+        "user_stats",
+        sa.Column(
+            "user_id",
+            sa.String(36),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("swagger_specs_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("embeddings_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("messages_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("jwt_tokens_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime, nullable=True),
+    )
+
+    # Початкове заповнення лічильників для існуючих користувачів
+    op.execute(
+        """
+        INSERT INTO user_stats
+            (user_id, swagger_specs_count, embeddings_count, messages_count,
+             jwt_tokens_count, updated_at)
+        SELECT
+            u.id,
+            (SELECT COUNT(*) FROM swagger_specs s
+              WHERE s.user_id = u.id AND s.is_active = TRUE),
+            (SELECT COUNT(*) FROM api_embeddings e WHERE e.user_id = u.id),
+            (SELECT COUNT(*) FROM chat_messages m
+               JOIN chat_sessions cs ON cs.id = m.chat_session_id
+              WHERE cs.user_id = u.id),
+            (SELECT COUNT(*) FROM swagger_specs s
+              WHERE s.user_id = u.id AND s.is_active = TRUE AND s.jwt_token IS NOT NULL),
+            CURRENT_TIMESTAMP
+        FROM users u
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema - видаляє таблицю user_stats."""
+    op.drop_table("user_stats")
@@ -0,0 +1,32 @@
+"""add_chat_message_keyset_index
+
+Revision ID: 8e4b2c6a1f3d
+Revises: 3c1f9a7d2b6e
+Create Date: 2025-08-21 09:40:17.582931
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8e4b2c6a1f3d"
+down_revision: Union[str, Sequence[str], None] = "3c1f9a7d2b6e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - складений індекс для keyset пагінації історії чату."""
+    op.create_index(
+        "idx_message_session_created_id",
+        "chat_messages",
+        ["chat_session_id", "created_at", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("idx_message_session_created_id", table_name="chat_messages")
@@ -0,0 +1,33 @@
+"""llm_cache_embedding_vector
+
+Revision ID: a3d7e9b2c5f8
+Revises: f2c8d4a6b1e7
+Create Date: 2025-08-28 10:02:17.441936
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a3d7e9b2c5f8"
+down_revision: Union[str, Sequence[str], None] = "f2c8d4a6b1e7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - ембедінги кешу LLM у колонці pgvector для пошуку оператором <=>."""
+    op.execute(
+        "ALTER TABLE llm_response_cache ALTER COLUMN embedding TYPE vector "
+        "USING embedding::text::vector"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        "ALTER TABLE llm_response_cache ALTER COLUMN embedding TYPE json "
+        "USING embedding::text::json"
+    )
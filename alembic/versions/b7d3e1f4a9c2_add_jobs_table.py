@@ -0,0 +1,56 @@
+"""add_jobs_table
+
+Revision ID: b7d3e1f4a9c2
+Revises: 8e4b2c6a1f3d
+Create Date: 2025-08-22 11:05:44.218307
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7d3e1f4a9c2"
+down_revision: Union[str, Sequence[str], None] = "8e4b2c6a1f3d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - таблиця jobs для черги фонових завдань."""
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.String(36), primary_key=True),
+        sa.Column("kind", sa.String(50), nullable=False),
+        sa.Column(
+            "user_id",
+            sa.String(36),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("swagger_spec_id", sa.String(36), nullable=True),
+        sa.Column("payload", sa.JSON, nullable=True),
+        sa.Column("status", sa.String(20), nullable=False, server_default="pending"),
+        sa.Column("progress", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("attempts", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("max_attempts", sa.Integer, nullable=False, server_default="5"),
+        sa.Column("run_at", sa.DateTime, nullable=False, server_default=sa.func.now()),
+        sa.Column("locked_by", sa.String(100), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime, nullable=True),
+        sa.Column("heartbeat_at", sa.DateTime, nullable=True),
+        sa.Column("error_message", sa.Text, nullable=True),
+        sa.Column("created_at", sa.DateTime, nullable=True),
+        sa.Column("started_at", sa.DateTime, nullable=True),
+        sa.Column("completed_at", sa.DateTime, nullable=True),
+    )
+    op.create_index("idx_job_status_run_at", "jobs", ["status", "run_at"], unique=False)
+    op.create_index("idx_job_user_created", "jobs", ["user_id", "created_at"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema - видаляє таблицю jobs."""
+    op.drop_index("idx_job_user_created", table_name="jobs")
+    op.drop_index("idx_job_status_run_at", table_name="jobs")
+    op.drop_table("jobs")
@@ -0,0 +1,28 @@
+"""add_job_report
+
+Revision ID: c4a8f2d6e1b3
+Revises: b7d3e1f4a9c2
+Create Date: 2025-08-24 09:42:17.503921
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c4a8f2d6e1b3"
+down_revision: Union[str, Sequence[str], None] = "b7d3e1f4a9c2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - звіт обробника завдання (етапи індексації)."""
+    op.add_column("jobs", sa.Column("report", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("jobs", "report")
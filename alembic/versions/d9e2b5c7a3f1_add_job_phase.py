@@ -0,0 +1,28 @@
+"""add_job_phase
+
+Revision ID: d9e2b5c7a3f1
+Revises: c4a8f2d6e1b3
+Create Date: 2025-08-25 14:18:36.772104
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d9e2b5c7a3f1"
+down_revision: Union[str, Sequence[str], None] = "c4a8f2d6e1b3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - фаза прогресивної індексації (base, enhancing, done)."""
+    op.add_column("jobs", sa.Column("phase", sa.String(20), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("jobs", "phase")
@@ -0,0 +1,38 @@
+"""add_gpt_prompt_cache
+
+Revision ID: e5f1a7c3b9d2
+Revises: d9e2b5c7a3f1
+Create Date: 2025-08-26 10:31:09.418265
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e5f1a7c3b9d2"
+down_revision: Union[str, Sequence[str], None] = "d9e2b5c7a3f1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - спільний кеш відповідей GPT для генерації промптів."""
+    op.create_table(
+        "gpt_prompt_cache",
+        sa.Column("fingerprint", sa.String(64), primary_key=True),
+        sa.Column("kind", sa.String(20), nullable=False),
+        sa.Column("model", sa.String(50), nullable=False),
+        sa.Column("prompt_version", sa.String(20), nullable=False),
+        sa.Column("response", sa.JSON(), nullable=False),
+        sa.Column("hit_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("last_used_at", sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("gpt_prompt_cache")
@@ -0,0 +1,50 @@
+"""add_llm_response_cache
+
+Revision ID: f2c8d4a6b1e7
+Revises: e5f1a7c3b9d2
+Create Date: 2025-08-27 09:14:52.603187
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f2c8d4a6b1e7"
+down_revision: Union[str, Sequence[str], None] = "e5f1a7c3b9d2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - кеш відповідей LLM аналізу наміру з терміном дії."""
+    op.create_table(
+        "llm_response_cache",
+        sa.Column("key", sa.String(64), primary_key=True),
+        sa.Column("kind", sa.String(20), nullable=False),
+        sa.Column("scope", sa.String(100), nullable=False),
+        sa.Column("model", sa.String(50), nullable=False),
+        sa.Column("prompt_version", sa.String(20), nullable=False),
+        sa.Column("query_text", sa.Text(), nullable=False),
+        sa.Column("context_hash", sa.String(64), nullable=False),
+        sa.Column("embedding", sa.JSON(), nullable=True),
+        sa.Column("response", sa.JSON(), nullable=False),
+        sa.Column("hit_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        "idx_llm_cache_lookup",
+        "llm_response_cache",
+        ["scope", "kind", "context_hash", "expires_at"],
+    )
+    op.create_index("idx_llm_cache_expires", "llm_response_cache", ["expires_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("idx_llm_cache_expires", table_name="llm_response_cache")
+    op.drop_index("idx_llm_cache_lookup", table_name="llm_response_cache")
+    op.drop_table("llm_response_cache")
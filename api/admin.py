@@ -5,10 +5,13 @@
 from datetime import datetime
 from typing import Any
 
-from sqladmin import Admin, ModelView
+from fastapi.responses import ORJSONResponse
+from sqladmin import Admin, BaseView, ModelView, expose
 from sqlalchemy.orm import Session
 
-from .database import engine
+from src.tracing import trace_buffer, tracer
+
+from .database import SessionLocal, engine
 from .models import (
     ApiCall,
     ApiEmbedding,
@@ -20,6 +23,22 @@ from .models import (
 )
 
 
+def reset_stats_for_user(user_id: str = None, chat_session_id: str = None) -> None:
+    """Скидає лічильники статистики після змін через адмін панель."""
+    from .user_stats import reset_user_stats
+
+    db = SessionLocal()
+    try:
+        if user_id is None and chat_session_id is not None:
+            chat_session = db.get(ChatSession, chat_session_id)
+            user_id = chat_session.user_id if chat_session else None
+        if user_id is not None:
+            reset_user_stats(db, user_id)
+            db.commit()
+    finally:
+        db.close()
+
+
 class UserAdmin(ModelView, model=User):
     """Адмін панель для користувачів"""
 
@@ -47,6 +66,18 @@ class UserAdmin(ModelView, model=User):
             if hasattr(model, "password") and model.password:
                 model.hashed_password = get_password_hash(model.password)
 
+    async def after_model_change(self, data: dict, model: Any, is_created: bool, request) -> None:
+        """Інвалідуємо кеш авторизації після редагування користувача"""
+        from .principal_cache import principal_cache
+
+        principal_cache.invalidate(model.id)
+
+    async def after_model_delete(self, model: Any, request) -> None:
+        """Інвалідуємо кеш авторизації після видалення користувача"""
+        from .principal_cache import principal_cache
+
+        principal_cache.invalidate(model.id)
+
 
 class SwaggerSpecAdmin(ModelView, model=SwaggerSpec):
     """Адмін панель для Swagger специфікацій"""
@@ -85,6 +116,14 @@ class SwaggerSpecAdmin(ModelView, model=SwaggerSpec):
         )
     }
 
+    async def after_model_change(self, data: dict, model: Any, is_created: bool, request) -> None:
+        """Перераховуємо статистику користувача після змін"""
+        reset_stats_for_user(user_id=model.user_id)
+
+    async def after_model_delete(self, model: Any, request) -> None:
+        """Перераховуємо статистику користувача після видалення"""
+        reset_stats_for_user(user_id=model.user_id)
+
 
 class ChatSessionAdmin(ModelView, model=ChatSession):
     """Адмін панель для сесій чату"""
@@ -142,6 +181,14 @@ class ChatMessageAdmin(ModelView, model=ChatMessage):
         )
     }
 
+    async def after_model_change(self, data: dict, model: Any, is_created: bool, request) -> None:
+        """Перераховуємо статистику власника сесії після змін"""
+        reset_stats_for_user(chat_session_id=model.chat_session_id)
+
+    async def after_model_delete(self, model: Any, request) -> None:
+        """Перераховуємо статистику власника сесії після видалення"""
+        reset_stats_for_user(chat_session_id=model.chat_session_id)
+
 
 class PromptTemplateAdmin(ModelView, model=PromptTemplate):
     """Адмін панель для промпт шаблонів"""
@@ -222,6 +269,14 @@ class ApiEmbeddingAdmin(ModelView, model=ApiEmbedding):
         )
     }
 
+    async def after_model_change(self, data: dict, model: Any, is_created: bool, request) -> None:
+        """Перераховуємо статистику користувача після змін"""
+        reset_stats_for_user(user_id=model.user_id)
+
+    async def after_model_delete(self, model: Any, request) -> None:
+        """Перераховуємо статистику користувача після видалення"""
+        reset_stats_for_user(user_id=model.user_id)
+
 
 class APICallAdmin(ModelView, model=ApiCall):
     """Адмін панель для API викликів"""
@@ -250,6 +305,28 @@ class APICallAdmin(ModelView, model=ApiCall):
     can_view_details = True
 
 
+class TraceAdmin(BaseView):
+    """Перегляд останніх трейсів з кільцевого буфера"""
+
+    name = "Трейси"
+    icon = "fa-solid fa-timeline"
+
+    @expose("/traces", methods=["GET"])
+    async def traces(self, request):
+        limit = min(int(request.query_params.get("limit", 50)), 500)
+        return ORJSONResponse(
+            {"tracer": tracer.stats(), "traces": trace_buffer.list_traces(limit=limit)}
+        )
+
+    @expose("/traces/{trace_id}", methods=["GET"], identity="trace_detail")
+    async def trace_detail(self, request):
+        trace_id = request.path_params["trace_id"]
+        spans = trace_buffer.get_trace(trace_id)
+        if not spans:
+            return ORJSONResponse({"detail": "Трейс не знайдено"}, status_code=404)
+        return ORJSONResponse({"trace_id": trace_id, "spans": spans})
+
+
 def setup_admin(app):
     """Налаштування адмін панелі"""
     admin = Admin(app, engine)
@@ -262,5 +339,6 @@ def setup_admin(app):
     admin.add_view(PromptTemplateAdmin)
     admin.add_view(ApiEmbeddingAdmin)
     admin.add_view(APICallAdmin)
+    admin.add_base_view(TraceAdmin)
 
     return admin
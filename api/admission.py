@@ -0,0 +1,223 @@
+"""
+Admission control для ресурсоємних запитів (/chat)
+
+Кожен користувач може виконувати не більше max_per_user запитів одночасно,
+а всі разом - не більше max_concurrent. Запити понад ліміт чекають у
+обмеженій черзі до queue_timeout секунд, при переповненні черги клієнт
+одразу отримує 429 з Retry-After.
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Tuple
+
+from src.config import Config
+from src.metrics import in_flight, queue_depth
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Запит відхилено admission контролером."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Per-user та глобальні ліміти паралельності з FIFO чергою очікування."""
+
+    def __init__(
+        self,
+        max_concurrent: int = 16,
+        max_per_user: int = 2,
+        max_queue: int = 64,
+        max_queue_per_user: int = 4,
+        queue_timeout: float = 10.0,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.queue_timeout = queue_timeout
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._active_by_user: Dict[str, int] = defaultdict(int)
+        self._waiters: Deque[Tuple[str, asyncio.Future]] = deque()
+        self._waiting_by_user: Dict[str, int] = defaultdict(int)
+
+        # Ковзне середнє часу обробки для оцінки Retry-After
+        self._avg_service_seconds = 1.0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    def _can_start(self, user_id: str) -> bool:
+        return (
+            self._active < self.max_concurrent
+            and self._active_by_user.get(user_id, 0) < self.max_per_user
+        )
+
+    def _start(self, user_id: str):
+        self._active += 1
+        self._active_by_user[user_id] += 1
+        self.admitted += 1
+
+    def _retry_after(self) -> int:
+        """Оцінка часу, через який варто повторити запит."""
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(self._avg_service_seconds * backlog / self.max_concurrent))
+
+    def _remove_waiter(self, user_id: str, future: asyncio.Future):
+        try:
+            self._waiters.remove((user_id, future))
+        except ValueError:
+            return
+        self._decrement_waiting(user_id)
+
+    def _decrement_waiting(self, user_id: str):
+        self._waiting_by_user[user_id] -= 1
+        if self._waiting_by_user[user_id] <= 0:
+            del self._waiting_by_user[user_id]
+
+    def _dispatch(self):
+        """Передає звільнені слоти першим у черзі користувачам, що не досягли ліміту."""
+        for entry in list(self._waiters):
+            if self._active >= self.max_concurrent:
+                break
+            user_id, future = entry
+            if future.done():
+                self._waiters.remove(entry)
+                self._decrement_waiting(user_id)
+                continue
+            if self._active_by_user.get(user_id, 0) >= self.max_per_user:
+                continue
+
+            self._waiters.remove(entry)
+            self._decrement_waiting(user_id)
+            self._start(user_id)
+            self._grant(user_id, future)
+
+    def _grant(self, user_id: str, future: asyncio.Future):
+        """Будить очікувача; з іншого потоку - через його event loop."""
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is future.get_loop():
+            future.set_result(True)
+        else:
+            future.get_loop().call_soon_threadsafe(self._resolve_threadsafe, user_id, future)
+
+    def _resolve_threadsafe(self, user_id: str, future: asyncio.Future):
+        if future.done():
+            # Очікувач встиг скасуватися - слот не використано
+            self.release(user_id)
+        else:
+            future.set_result(True)
+
+    async def acquire(self, user_id: str):
+        """
+        Чекає на вільний слот для користувача.
+
+        Raises:
+            AdmissionRejected: Черга переповнена або час очікування вичерпано
+        """
+        with self._lock:
+            if self._can_start(user_id) and not self._waiting_by_user.get(user_id):
+                self._start(user_id)
+                return
+
+            if (
+                len(self._waiters) >= self.max_queue
+                or self._waiting_by_user.get(user_id, 0) >= self.max_queue_per_user
+            ):
+                self.rejected_queue_full += 1
+                raise AdmissionRejected("Забагато одночасних запитів", self._retry_after())
+
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append((user_id, future))
+            self._waiting_by_user[user_id] += 1
+
+        try:
+            await asyncio.wait_for(future, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if future.done() and not future.cancelled():
+                    # Слот передано саме в момент дедлайну
+                    return
+                self._remove_waiter(user_id, future)
+                self.rejected_timeout += 1
+                retry_after = self._retry_after()
+            raise AdmissionRejected("Час очікування в черзі вичерпано", retry_after)
+        except asyncio.CancelledError:
+            with self._lock:
+                if future.done() and not future.cancelled():
+                    # Слот вже передано - повертаємо його
+                    self._release_locked(user_id)
+                else:
+                    self._remove_waiter(user_id, future)
+            raise
+
+    def _release_locked(self, user_id: str):
+        self._active -= 1
+        self._active_by_user[user_id] -= 1
+        if self._active_by_user[user_id] <= 0:
+            del self._active_by_user[user_id]
+        self._dispatch()
+
+    def release(self, user_id: str, service_seconds: float = None):
+        """Звільняє слот користувача."""
+        with self._lock:
+            if service_seconds is not None:
+                self._avg_service_seconds = 0.8 * self._avg_service_seconds + 0.2 * service_seconds
+            self._release_locked(user_id)
+
+    @asynccontextmanager
+    async def admit(self, user_id: str):
+        """Контекст-менеджер: слот утримується на час виконання блоку."""
+        await self.acquire(user_id)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(user_id, time.perf_counter() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        """Поточний стан контролера."""
+        with self._lock:
+            return {
+                "active": self._active,
+                "waiting": len(self._waiters),
+                "active_users": len(self._active_by_user),
+                "max_concurrent": self.max_concurrent,
+                "max_per_user": self.max_per_user,
+                "max_queue": self.max_queue,
+                "max_queue_per_user": self.max_queue_per_user,
+                "queue_timeout": self.queue_timeout,
+                "avg_service_seconds": round(self._avg_service_seconds, 3),
+                "admitted": self.admitted,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_timeout": self.rejected_timeout,
+            }
+
+
+# Глобальний екземпляр контролера
+admission_controller = AdmissionController(
+    max_concurrent=Config.ADMISSION_MAX_CONCURRENT,
+    max_per_user=Config.ADMISSION_MAX_PER_USER,
+    max_queue=Config.ADMISSION_MAX_QUEUE,
+    max_queue_per_user=Config.ADMISSION_MAX_QUEUE_PER_USER,
+    queue_timeout=Config.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+)
+in_flight.labels("chat").set_function(lambda: admission_controller.stats()["active"])
+queue_depth.labels("chat_admission").set_function(lambda: admission_controller.stats()["waiting"])
@@ -9,13 +9,13 @@ from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
 from src.config import Config
 
 from .database import get_db
 from .models import PromptTemplate, User, UserCreate
+from .principal_cache import PRINCIPAL_CLAIM, principal_cache
 
 
 def load_base_prompts_for_user(db: Session, user_id: str) -> bool:
@@ -85,20 +85,32 @@ def load_base_prompts_for_user(db: Session, user_id: str) -> bool:
 # Налаштування
 config = Config()
 security = HTTPBearer()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_pwd_context = None
+
+
+def get_pwd_context():
+    """Контекст хешування паролів; passlib/bcrypt імпортуються при першому використанні"""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Перевіряє пароль"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Хешує пароль"""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
 
 
-def create_user_token(user_id: str, user_name: str = None, user_email: str = None) -> str:
+def create_user_token(
+    user_id: str, user_name: str = None, user_email: str = None, user: Optional[User] = None
+) -> str:
     """Створює JWT токен для користувача"""
     payload = {
         "sub": user_id,
@@ -107,28 +119,59 @@ def create_user_token(user_id: str, user_name: str = None, user_email: str = Non
         "iat": datetime.utcnow(),
         "exp": datetime.utcnow() + timedelta(hours=24),
     }
+    if user is not None:
+        # Дані для авторизації без звернення до БД (AUTH_TRUST_TOKEN_CLAIMS)
+        payload[PRINCIPAL_CLAIM] = {
+            "username": user.username,
+            "is_active": bool(user.is_active),
+            "created_at": (user.created_at or datetime.utcnow()).isoformat(),
+        }
     return jwt.encode(payload, config.JWT_SECRET_KEY, algorithm="HS256")
 
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
-    """Перевірка JWT токена"""
+def get_token_payload(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    """Декодує та перевіряє JWT токен"""
     try:
         payload = jwt.decode(credentials.credentials, config.JWT_SECRET_KEY, algorithms=["HS256"])
-        user_id = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
-        return user_id
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
+    if payload.get("sub") is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return payload
+
+
+def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+    """Перевірка JWT токена"""
+    return get_token_payload(credentials)["sub"]
+
+
+def get_current_user(
+    payload: dict = Depends(get_token_payload), db: Session = Depends(get_db)
+) -> User:
+    """Отримує поточного користувача (спочатку з кешу, потім з БД)"""
+    user_id = payload["sub"]
 
+    if config.AUTH_TRUST_TOKEN_CLAIMS:
+        user = principal_cache.from_claims(
+            payload,
+            lambda user_id: db.query(User.is_active, User.updated_at)
+            .filter(User.id == user_id)
+            .first(),
+        )
+        if user:
+            return user
+
+    user = principal_cache.get(user_id)
+    if user:
+        return user
 
-def get_current_user(user_id: str = Depends(verify_token), db: Session = Depends(get_db)) -> User:
-    """Отримує поточного користувача"""
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Користувача не знайдено")
     if not user.is_active:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Користувач неактивний")
+
+    principal_cache.put(user)
     return user
 
 
@@ -207,7 +250,9 @@ def create_demo_user(db: Session) -> dict:
     db.commit()
 
     # Створюємо токен
-    token = create_user_token(user_id=user_id, user_name="Demo User", user_email=user.email)
+    token = create_user_token(
+        user_id=user_id, user_name="Demo User", user_email=user.email, user=user
+    )
 
     return {
         "user_id": user_id,
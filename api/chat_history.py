@@ -0,0 +1,176 @@
+"""
+Keyset пагінація та потокове вивантаження історії чату
+"""
+
+import base64
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from src.serialization import dumps
+
+from .models import ChatMessage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Розмір порції при потоковому експорті
+EXPORT_BATCH_SIZE = 200
+
+
+def encode_cursor(created_at: datetime, message_id: str) -> str:
+    """Кодує позицію (created_at, id) в непрозорий курсор."""
+    raw = f"{created_at.isoformat()}|{message_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Декодує курсор у (created_at, id).
+
+    Raises:
+        ValueError: Якщо курсор пошкоджений
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, message_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), message_id
+    except Exception as e:
+        raise ValueError(f"Некоректний курсор: {cursor}") from e
+
+
+def serialize_message(message: ChatMessage) -> Dict[str, Any]:
+    """Перетворює повідомлення у словник для відповіді API."""
+    return {
+        "id": message.id,
+        "role": message.role,
+        "content": message.content,
+        "created_at": message.created_at,
+    }
+
+
+def _history_query(
+    db: Session,
+    chat_session_id: str,
+    after: Optional[Tuple[datetime, str]] = None,
+    since: Optional[datetime] = None,
+    descending: bool = False,
+):
+    """Запит сторінки історії, що використовує індекс (chat_session_id, created_at, id)."""
+    query = db.query(ChatMessage).filter(ChatMessage.chat_session_id == chat_session_id)
+
+    if since is not None:
+        query = query.filter(ChatMessage.created_at > since)
+
+    if after is not None:
+        created_at, message_id = after
+        if descending:
+            query = query.filter(
+                or_(
+                    ChatMessage.created_at < created_at,
+                    and_(ChatMessage.created_at == created_at, ChatMessage.id < message_id),
+                )
+            )
+        else:
+            query = query.filter(
+                or_(
+                    ChatMessage.created_at > created_at,
+                    and_(ChatMessage.created_at == created_at, ChatMessage.id > message_id),
+                )
+            )
+
+    if descending:
+        return query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+    return query.order_by(ChatMessage.created_at.asc(), ChatMessage.id.asc())
+
+
+def fetch_history(db: Session, chat_session_id: str) -> List[Dict[str, Any]]:
+    """Вся історія чату списком від найстаріших (формат /chat-history без пагінації)."""
+    return [serialize_message(message) for message in _history_query(db, chat_session_id)]
+
+
+def fetch_history_page(
+    db: Session,
+    chat_session_id: str,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    descending: bool = False,
+) -> Dict[str, Any]:
+    """
+    Повертає одну сторінку історії чату.
+
+    Args:
+        db: Сесія бази даних
+        chat_session_id: ID сесії чату
+        limit: Розмір сторінки
+        cursor: Курсор з попередньої сторінки
+        since: Повертати тільки повідомлення, створені після цього часу
+        descending: Спочатку найновіші повідомлення
+
+    Returns:
+        Словник з повідомленнями, next_cursor та has_more
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    after = decode_cursor(cursor) if cursor else None
+
+    # Беремо на один рядок більше, щоб дізнатися, чи є наступна сторінка
+    rows: List[ChatMessage] = (
+        _history_query(db, chat_session_id, after=after, since=since, descending=descending)
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+
+    return {
+        "messages": [serialize_message(message) for message in rows],
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+    }
+
+
+def iter_history_ndjson(
+    session_factory: Callable[[], Session],
+    chat_session_id: str,
+    since: Optional[datetime] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[bytes]:
+    """
+    Потоково віддає історію чату у форматі NDJSON порціями по batch_size.
+
+    Використовує власну сесію БД, оскільки генератор працює вже після
+    завершення обробника запиту.
+    """
+    db = session_factory()
+    try:
+        after = None
+        while True:
+            rows = (
+                _history_query(db, chat_session_id, after=after, since=since)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                break
+
+            for message in rows:
+                yield dumps(serialize_message(message)) + b"\n"
+
+            after = (rows[-1].created_at, rows[-1].id)
+            # Звільняємо identity map, щоб пам'ять не росла разом з історією
+            db.expunge_all()
+
+            if len(rows) < batch_size:
+                break
+    except Exception as e:
+        logger.error(f"❌ Помилка потокового експорту історії: {e}")
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,560 @@
+"""
+Черга фонових завдань у базі даних (таблиця jobs)
+
+Workers на будь-якому вузлі забирають завдання через
+SELECT ... FOR UPDATE SKIP LOCKED: рядок отримує лише один worker, інші
+пропускають заблоковані рядки без очікування. Захоплене завдання має lease,
+який worker продовжує heartbeat'ами; якщо worker зник, після закінчення
+lease завдання знову стає доступним. Невдалі спроби повторюються з
+експоненційною затримкою, після max_attempts завдання переходить у стан dead.
+"""
+
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+from uuid import uuid4
+
+from sqlalchemy import and_, delete, func, or_, select, update
+
+from src.config import Config
+
+from .database import SessionLocal
+from .models import Job, SwaggerSpec
+
+logger = logging.getLogger(__name__)
+
+# progress(відсоток, phase=None): відсоток None - змінюється лише фаза
+ProgressCallback = Callable[..., None]
+# Обробник може повернути звіт виконання, що зберігається в jobs.report
+JobHandler = Callable[[Dict[str, Any], ProgressCallback], Optional[Dict[str, Any]]]
+
+
+class PermanentJobError(Exception):
+    """Помилка, яку немає сенсу повторювати - завдання одразу переходить у dead"""
+
+
+class LeaseLostError(Exception):
+    """Lease завдання перейшов до іншого worker'а"""
+
+
+class JobProgress:
+    """
+    Callback прогресу завдання: progress(відсоток, phase=None).
+
+    Викликається з потоків конвеєра індексації, тому не піднімає винятків:
+    втрата lease лише встановлює подію lease_lost, яку обробник та конвеєр
+    перевіряють, щоб кооперативно зупинитися.
+    """
+
+    def __init__(self, queue: "JobQueue", job_id: str, worker_id: str):
+        self._queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_lost = threading.Event()
+
+    def __call__(self, value: Optional[int], phase: Optional[str] = None):
+        if self.lease_lost.is_set():
+            return
+        try:
+            owned = self._queue.heartbeat(self.job_id, self.worker_id, progress=value, phase=phase)
+        except Exception as e:
+            logger.warning(f"⚠️ Не вдалося оновити прогрес завдання {self.job_id}: {e}")
+            return
+        if not owned:
+            self.lease_lost.set()
+
+
+def retry_delay(attempt: int, base_seconds: float, max_seconds: float) -> float:
+    """Експоненційна затримка перед спробою attempt + 1 (з jitter 50-100%)"""
+    delay = min(max_seconds, base_seconds * 2 ** max(0, attempt - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+class JobQueue:
+    """Черга завдань embeddings у таблиці jobs з інтерфейсом QueueManager"""
+
+    def __init__(
+        self,
+        session_factory: Callable = SessionLocal,
+        num_workers: Optional[int] = None,
+        lease_seconds: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        retry_base_seconds: Optional[float] = None,
+        retry_max_seconds: Optional[float] = None,
+        poll_interval: Optional[float] = None,
+    ):
+        self.session_factory = session_factory
+        self.num_workers = Config.JOB_WORKERS if num_workers is None else num_workers
+        self.lease_seconds = lease_seconds or Config.JOB_LEASE_SECONDS
+        self.max_attempts = max_attempts or Config.JOB_MAX_ATTEMPTS
+        self.retry_base_seconds = (
+            Config.JOB_RETRY_BASE_SECONDS if retry_base_seconds is None else retry_base_seconds
+        )
+        self.retry_max_seconds = retry_max_seconds or Config.JOB_RETRY_MAX_SECONDS
+        self.poll_interval = poll_interval or Config.JOB_POLL_INTERVAL_SECONDS
+
+        self.handlers: Dict[str, JobHandler] = {"embeddings": self._run_embeddings}
+        self.node_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self.workers: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Condition()
+        self._lock = threading.Lock()
+
+    # --- Постановка та статус завдань ---
+
+    def enqueue(
+        self,
+        kind: str,
+        user_id: str,
+        swagger_spec_id: Optional[str] = None,
+        payload: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Створює завдання і будить локальних workers"""
+        job_id = str(uuid4())
+        now = datetime.utcnow()
+
+        db = self.session_factory()
+        try:
+            db.add(
+                Job(
+                    id=job_id,
+                    kind=kind,
+                    user_id=user_id,
+                    swagger_spec_id=swagger_spec_id,
+                    payload=payload or {},
+                    status="pending",
+                    progress=0,
+                    attempts=0,
+                    max_attempts=self.max_attempts,
+                    run_at=now,
+                    created_at=now,
+                )
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        logger.info(f"📋 Додано завдання {job_id} ({kind}) для користувача {user_id}")
+
+        if self.num_workers > 0 and not self.workers:
+            self.start_workers()
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def add_task(
+        self,
+        user_id: str,
+        swagger_spec_id: str,
+        swagger_data: Optional[dict] = None,
+        enable_gpt_enhancement: bool = True,
+    ) -> str:
+        """Додає завдання створення embeddings (специфікація читається з БД за ID)"""
+        return self.enqueue(
+            "embeddings",
+            user_id,
+            swagger_spec_id,
+            {"enable_gpt_enhancement": enable_gpt_enhancement},
+        )
+
+    @staticmethod
+    def _job_to_dict(job: Job) -> Dict[str, Any]:
+        return {
+            "task_id": job.id,
+            "swagger_spec_id": job.swagger_spec_id,
+            "status": job.status,
+            "progress": job.progress,
+            "phase": job.phase,
+            "attempts": job.attempts,
+            "created_at": job.created_at.isoformat(),
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "completed_at": job.completed_at.isoformat() if job.completed_at else None,
+            "error_message": job.error_message,
+            "report": job.report,
+        }
+
+    def get_task_status(self, task_id: str) -> Optional[Dict]:
+        """Отримує статус завдання (з будь-якого вузла)"""
+        db = self.session_factory()
+        try:
+            job = db.get(Job, task_id)
+            if not job:
+                return None
+            status = self._job_to_dict(job)
+            del status["swagger_spec_id"]
+            return status
+        finally:
+            db.close()
+
+    def get_user_tasks(self, user_id: str, limit: int = 100) -> List[Dict]:
+        """Отримує останні завдання користувача"""
+        db = self.session_factory()
+        try:
+            jobs = (
+                db.query(Job)
+                .filter(Job.user_id == user_id)
+                .order_by(Job.created_at.desc())
+                .limit(limit)
+                .all()
+            )
+            return [self._job_to_dict(job) for job in reversed(jobs)]
+        finally:
+            db.close()
+
+    def pending_count(self) -> int:
+        """Кількість завдань, що очікують обробки"""
+        db = self.session_factory()
+        try:
+            return db.execute(
+                select(func.count()).select_from(Job).where(Job.status == "pending")
+            ).scalar_one()
+        finally:
+            db.close()
+
+    def cleanup_old_tasks(self, max_age_hours: int = 24):
+        """Видаляє старі завершені та dead завдання"""
+        cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+        db = self.session_factory()
+        try:
+            result = db.execute(
+                delete(Job).where(
+                    Job.status.in_(["completed", "dead"]),
+                    Job.completed_at < cutoff,
+                )
+            )
+            db.commit()
+            if result.rowcount:
+                logger.info(f"🗑️ Видалено {result.rowcount} старих завдань")
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def requeue(self, task_id: str) -> bool:
+        """Повертає dead завдання в чергу з новим лічильником спроб"""
+        db = self.session_factory()
+        try:
+            result = db.execute(
+                update(Job)
+                .where(Job.id == task_id, Job.status == "dead")
+                .values(
+                    status="pending",
+                    attempts=0,
+                    progress=0,
+                    phase=None,
+                    run_at=datetime.utcnow(),
+                    completed_at=None,
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+
+        if result.rowcount:
+            with self._wakeup:
+                self._wakeup.notify()
+        return bool(result.rowcount)
+
+    # --- Захоплення та завершення завдань ---
+
+    @staticmethod
+    def _claim_statement(now: datetime):
+        """Наступне доступне завдання: pending з настанням run_at або з простроченим lease"""
+        return (
+            select(Job)
+            .where(
+                or_(
+                    and_(Job.status == "pending", Job.run_at <= now),
+                    and_(Job.status == "processing", Job.lease_expires_at < now),
+                )
+            )
+            .order_by(Job.run_at)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Захоплює наступне завдання для worker_id, повертає його дані або None"""
+        db = self.session_factory()
+        try:
+            while True:
+                now = datetime.utcnow()
+                job = db.execute(self._claim_statement(now)).scalar_one_or_none()
+                if job is None:
+                    db.commit()
+                    return None
+
+                if job.status == "processing":
+                    logger.warning(
+                        f"⚠️ Lease завдання {job.id} від {job.locked_by} прострочено, "
+                        f"спроба {job.attempts}/{job.max_attempts}"
+                    )
+                    if job.attempts >= job.max_attempts:
+                        self._mark_dead(job, "Worker не завершив завдання до закінчення lease", now)
+                        db.commit()
+                        continue
+
+                job.status = "processing"
+                job.attempts += 1
+                job.locked_by = worker_id
+                job.lease_expires_at = now + timedelta(seconds=self.lease_seconds)
+                job.heartbeat_at = now
+                job.started_at = job.started_at or now
+                claimed = {
+                    "id": job.id,
+                    "kind": job.kind,
+                    "user_id": job.user_id,
+                    "swagger_spec_id": job.swagger_spec_id,
+                    "payload": dict(job.payload or {}),
+                    "attempts": job.attempts,
+                }
+                db.commit()
+                return claimed
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _owned(self, job_id: str, worker_id: str):
+        return and_(Job.id == job_id, Job.locked_by == worker_id, Job.status == "processing")
+
+    def heartbeat(
+        self,
+        job_id: str,
+        worker_id: str,
+        progress: Optional[int] = None,
+        phase: Optional[str] = None,
+    ) -> bool:
+        """Продовжує lease; False - завдання вже належить іншому worker'у"""
+        now = datetime.utcnow()
+        values: Dict[str, Any] = {
+            "heartbeat_at": now,
+            "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+        }
+        if progress is not None:
+            values["progress"] = progress
+        if phase is not None:
+            values["phase"] = phase
+
+        db = self.session_factory()
+        try:
+            result = db.execute(update(Job).where(self._owned(job_id, worker_id)).values(**values))
+            db.commit()
+            return result.rowcount > 0
+        finally:
+            db.close()
+
+    def complete(
+        self, job_id: str, worker_id: str, report: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Позначає завдання виконаним і зберігає звіт обробника"""
+        db = self.session_factory()
+        try:
+            result = db.execute(
+                update(Job)
+                .where(self._owned(job_id, worker_id))
+                .values(
+                    status="completed",
+                    progress=100,
+                    phase="done",
+                    completed_at=datetime.utcnow(),
+                    locked_by=None,
+                    lease_expires_at=None,
+                    error_message=None,
+                    report=report,
+                )
+            )
+            db.commit()
+            return result.rowcount > 0
+        finally:
+            db.close()
+
+    @staticmethod
+    def _mark_dead(job: Job, error: str, now: datetime):
+        job.status = "dead"
+        job.error_message = error
+        job.completed_at = now
+        job.locked_by = None
+        job.lease_expires_at = None
+        logger.error(f"💀 Завдання {job.id} переміщено в dead після {job.attempts} спроб: {error}")
+
+    def fail(self, job_id: str, worker_id: str, error: str, permanent: bool = False) -> bool:
+        """Планує повторну спробу з backoff або переводить завдання в dead"""
+        db = self.session_factory()
+        try:
+            job = db.execute(
+                select(Job).where(self._owned(job_id, worker_id)).with_for_update()
+            ).scalar_one_or_none()
+            if job is None:
+                db.commit()
+                return False
+
+            now = datetime.utcnow()
+            if permanent or job.attempts >= job.max_attempts:
+                self._mark_dead(job, error, now)
+            else:
+                delay = retry_delay(job.attempts, self.retry_base_seconds, self.retry_max_seconds)
+                job.status = "pending"
+                job.run_at = now + timedelta(seconds=delay)
+                job.error_message = error
+                job.locked_by = None
+                job.lease_expires_at = None
+                logger.warning(
+                    f"🔄 Завдання {job_id}: спроба {job.attempts}/{job.max_attempts} невдала, "
+                    f"повтор через {delay:.0f}с: {error}"
+                )
+            db.commit()
+            return True
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    # --- Виконання ---
+
+    def process_one(self, worker_id: str) -> bool:
+        """Захоплює та виконує одне завдання; False - черга порожня"""
+        job = self.claim(worker_id)
+        if job is None:
+            return False
+
+        logger.info(f"🔄 {worker_id} обробляє завдання {job['id']} (спроба {job['attempts']})")
+        done = threading.Event()
+        progress = JobProgress(self, job["id"], worker_id)
+
+        def keep_alive():
+            while not done.wait(self.lease_seconds / 3):
+                try:
+                    if not self.heartbeat(job["id"], worker_id):
+                        progress.lease_lost.set()
+                        return
+                except Exception as e:
+                    logger.warning(f"⚠️ Heartbeat завдання {job['id']} не вдався: {e}")
+
+        heartbeat_thread = threading.Thread(target=keep_alive, daemon=True)
+        heartbeat_thread.start()
+        try:
+            handler = self.handlers.get(job["kind"])
+            if handler is None:
+                raise PermanentJobError(f"Невідомий тип завдання: {job['kind']}")
+            report = handler(job, progress)
+            if progress.lease_lost.is_set():
+                raise LeaseLostError(job["id"])
+        except LeaseLostError:
+            logger.warning(f"⚠️ Завдання {job['id']} перехоплено іншим worker'ом")
+        except PermanentJobError as e:
+            self.fail(job["id"], worker_id, str(e), permanent=True)
+        except Exception as e:
+            if progress.lease_lost.is_set():
+                logger.warning(f"⚠️ Завдання {job['id']} перехоплено іншим worker'ом: {e}")
+            else:
+                logger.error(f"❌ Помилка обробки завдання {job['id']}: {e}")
+                self.fail(job["id"], worker_id, str(e))
+        else:
+            if self.complete(job["id"], worker_id, report):
+                logger.info(f"✅ Завдання {job['id']} завершено успішно")
+        finally:
+            done.set()
+            heartbeat_thread.join()
+        return True
+
+    def _run_embeddings(
+        self, job: Dict[str, Any], progress: JobProgress
+    ) -> Optional[Dict[str, Any]]:
+        """Обробник завдання створення embeddings; повертає звіт етапів індексації"""
+        db = self.session_factory()
+        try:
+            row = (
+                db.query(SwaggerSpec.original_data)
+                .filter(SwaggerSpec.id == job["swagger_spec_id"])
+                .first()
+            )
+        finally:
+            db.close()
+        if row is None:
+            raise PermanentJobError(f"Swagger специфікація {job['swagger_spec_id']} не знайдена")
+
+        from src.rag_engine import PostgresRAGEngine
+
+        progress(25)
+        rag_engine = PostgresRAGEngine(
+            user_id=job["user_id"], swagger_spec_id=job["swagger_spec_id"]
+        )
+        success = rag_engine.create_vectorstore_from_swagger_data(
+            row[0],
+            enable_gpt_enhancement=job["payload"].get("enable_gpt_enhancement", True),
+            progress_callback=progress,
+            phase_callback=lambda phase: progress(None, phase),
+            cancel_event=progress.lease_lost,
+        )
+        if progress.lease_lost.is_set():
+            raise LeaseLostError(job["id"])
+        if not success:
+            raise RuntimeError("Не вдалося створити embeddings")
+        return rag_engine.last_ingestion_report
+
+    # --- Workers ---
+
+    def _worker_loop(self, worker_id: str):
+        while not self._stop.is_set():
+            try:
+                if self.process_one(worker_id):
+                    continue
+            except Exception as e:
+                logger.error(f"❌ Помилка в worker loop {worker_id}: {e}")
+
+            # Черга порожня (або БД недоступна) - чекаємо сигналу або наступного опитування
+            with self._wakeup:
+                if not self._stop.is_set():
+                    self._wakeup.wait(self.poll_interval)
+
+    def start_workers(self, num_workers: Optional[int] = None):
+        """Запускає worker потоки на цьому вузлі"""
+        with self._lock:
+            self.workers = [worker for worker in self.workers if worker.is_alive()]
+            target = self.num_workers if num_workers is None else num_workers
+            self._stop.clear()
+            for _ in range(target - len(self.workers)):
+                worker_id = f"{self.node_id}:{len(self.workers)}"
+                worker = threading.Thread(
+                    target=self._worker_loop, args=(worker_id,), name=worker_id, daemon=True
+                )
+                worker.start()
+                self.workers.append(worker)
+        logger.info(f"🚀 Запущено {len(self.workers)} job workers на {self.node_id}")
+
+    def shutdown(self, timeout: Optional[float] = None) -> bool:
+        """Зупиняє workers після завершення поточних завдань"""
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker in self.workers:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            worker.join(remaining)
+
+        stopped = not any(worker.is_alive() for worker in self.workers)
+        if stopped:
+            self.workers = []
+            logger.info("🛑 Job workers зупинено")
+        else:
+            # Незавершені завдання підхопить інший worker після закінчення lease
+            logger.warning("⚠️ Не всі job workers завершились до таймауту")
+        return stopped
+
+
+# Глобальний екземпляр черги у БД
+job_queue = JobQueue()
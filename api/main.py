@@ -2,30 +2,58 @@
 FastAPI сервіс для AI Swagger Bot
 """
 
-import json
 import logging
 import os
 import uuid
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
 
 import yaml
-from fastapi import Depends, FastAPI, File, Form, HTTPException, UploadFile
+from fastapi import Depends, FastAPI, File, Form, HTTPException, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, defer
 
 from src.config import Config
 from src.enhanced_swagger_parser import EnhancedSwaggerParser
-from src.interactive_api_agent import InteractiveSwaggerAgent
-from src.rag_engine import PostgresRAGEngine
+from src.llm_budget import llm_token_bucket
+from src.llm_cache import intent_cache
+from src.metrics import (
+    CONTENT_TYPE_LATEST,
+    InFlightRequestsMiddleware,
+    metrics_enabled,
+    queue_depth,
+    render_metrics,
+    stage_timer,
+)
+from src.model_router import model_router
+from src.serialization import loads
+from src.swagger_stream import (
+    SpecFormatError,
+    detect_format,
+    is_supported_filename,
+    load_spec,
+)
+from src.token_budget import token_budget
+from src.warm_cache import cache_version, warm_cache
 
-from .admin import setup_admin
+from .admission import AdmissionRejected, admission_controller
 from .auth import create_demo_user, get_current_user, verify_token
-from .database import get_db
+from .chat_history import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    fetch_history,
+    fetch_history_page,
+    iter_history_ndjson,
+)
+from .database import SessionLocal, check_database_ready, create_tables, get_db, get_pool_stats
+from .job_queue import job_queue
 from .models import (
     ApiEmbedding,
     ChatMessage,
@@ -34,8 +62,10 @@ from .models import (
     SwaggerSpec,
     User,
 )
+from .principal_cache import principal_cache
 from .prompts import router as prompts_router
-from .queue_manager import queue_manager
+from .queue_manager import queue_manager as memory_queue
+from .user_stats import apply_user_stats_delta, get_user_stats
 from .users import router as users_router
 
 # Налаштування логування
@@ -46,6 +76,7 @@ app = FastAPI(
     title="AI Swagger Bot API",
     description="API для роботи зі Swagger специфікаціями та виконання API запитів",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 # CORS middleware
@@ -57,8 +88,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Налаштування адмін панелі
-admin = setup_admin(app)
+# Стискаємо великі відповіді (історія чату, списки промптів, embeddings)
+app.add_middleware(GZipMiddleware, minimum_size=Config.GZIP_MINIMUM_SIZE)
+
+# Лічильник запитів в обробці для /metrics
+app.add_middleware(InFlightRequestsMiddleware)
+
+# Налаштування адмін панелі (sqladmin імпортується лише коли панель увімкнена)
+admin = None
+if Config.ENABLE_ADMIN_PANEL:
+    from .admin import setup_admin
+
+    admin = setup_admin(app)
+
+# Черга завдань embeddings: у пам'яті процесу або в таблиці jobs (спільна для всіх вузлів)
+queue_manager = job_queue if Config.TASK_QUEUE_BACKEND == "database" else memory_queue
+queue_depth.labels("embeddings").set_function(queue_manager.pending_count)
 
 # Підключаємо роутери
 app.include_router(prompts_router)
@@ -114,10 +159,15 @@ class TaskStatusResponse(BaseModel):
     task_id: str
     status: str
     progress: int
+    # base - записуються базові embeddings; enhancing - специфікація вже доступна
+    # для пошуку, триває GPT покращення; done - індексацію завершено
+    phase: Optional[str] = None
     created_at: str
     started_at: Optional[str] = None
     completed_at: Optional[str] = None
     error_message: Optional[str] = None
+    attempts: Optional[int] = None
+    report: Optional[Dict[str, Any]] = None
 
 
 class UserTasksResponse(BaseModel):
@@ -248,6 +298,8 @@ def create_auth_tokens_for_swagger(
             )
 
             if swagger_spec:
+                if not swagger_spec.jwt_token:
+                    apply_user_stats_delta(db, user_id, jwt_tokens_count=1)
                 swagger_spec.jwt_token = auth_data.jwt_token
                 swagger_spec.updated_at = datetime.now()
                 created_tokens.append("jwt_auth")
@@ -286,13 +338,17 @@ def cleanup_old_sessions(db: Session, user_id: str, keep_last: int = 5):
                 f"🗑️ Видаляємо {len(sessions_to_delete)} старих сесій для користувача {user_id}"
             )
 
+            deleted_messages = 0
             for session in sessions_to_delete:
                 # Спочатку видаляємо повідомлення
-                db.query(ChatMessage).filter(ChatMessage.chat_session_id == session.id).delete()
+                deleted_messages += (
+                    db.query(ChatMessage).filter(ChatMessage.chat_session_id == session.id).delete()
+                )
 
                 # Потім видаляємо сесію
                 db.delete(session)
 
+            apply_user_stats_delta(db, user_id, messages_count=-deleted_messages)
             db.commit()
             logger.info(f"✅ Видалено {len(sessions_to_delete)} старих сесій")
 
@@ -403,27 +459,131 @@ def create_user_with_base_prompts(user_data: Dict[str, Any], db: Session) -> Use
         raise
 
 
+@app.on_event("startup")
+def create_tables_on_startup():
+    """Локальна розробка: створює відсутні таблиці (AUTO_CREATE_TABLES=true)."""
+    if Config.AUTO_CREATE_TABLES:
+        create_tables()
+
+
+@app.on_event("shutdown")
+def drain_embedding_queue():
+    """Дочікується обробки завдань embeddings перед зупинкою сервера."""
+    queue_manager.shutdown(timeout=Config.EMBEDDING_SHUTDOWN_TIMEOUT_SECONDS)
+
+
 @app.get("/health")
 async def health_check():
-    """Перевірка стану сервісу."""
-    try:
-        from api.database import get_db
+    """Liveness probe - процес живий, без звернень до бази даних."""
+    return {"status": "healthy", "timestamp": datetime.now()}
+
+
+@app.get("/health/ready")
+def readiness_check():
+    """Readiness probe - перевіряє з'єднання з базою даних (результат кешується)."""
+    database = check_database_ready()
+    status_code = 200 if database["ready"] else 503
+    if not database["ready"]:
+        logger.error(f"❌ Readiness check failed: {database['error']}")
+
+    return ORJSONResponse(
+        status_code=status_code,
+        content={
+            "status": "ready" if database["ready"] else "unavailable",
+            "timestamp": datetime.now(),
+            "database": database,
+            "pool": get_pool_stats(),
+        },
+    )
 
-        db = next(get_db())
 
-        # Отримуємо статистику
-        users_count = db.query(User).filter(User.is_active == True).count()
-        swagger_specs_count = db.query(SwaggerSpec).filter(SwaggerSpec.is_active == True).count()
+@app.get("/health/pool")
+async def pool_health():
+    """Метрики пулу з'єднань з базою даних."""
+    return {"timestamp": datetime.now(), "database": get_pool_stats()}
+
+
+@app.get("/health/auth-cache")
+async def auth_cache_health():
+    """Статистика кешу авторизованих користувачів."""
+    return {"timestamp": datetime.now(), "principal_cache": principal_cache.stats()}
+
+
+@app.get("/health/warm-cache")
+async def warm_cache_health():
+    """Статистика кешу контейнера (специфікації, промпти, ембедінги, знімки векторів)."""
+    return {"timestamp": datetime.now(), "warm_cache": warm_cache.stats()}
+
+
+@app.get("/health/llm-cache")
+async def llm_cache_health():
+    """Статистика кешу відповідей LLM аналізу наміру (пам'ять, БД, семантичні влучення)."""
+    return {"timestamp": datetime.now(), "intent_cache": intent_cache.stats()}
+
+
+@app.get("/health/llm-models")
+async def llm_models_health():
+    """Моделі етапів з ланцюжками fallback, середня латентність та вартість викликів."""
+    return {"timestamp": datetime.now(), "model_router": model_router.stats()}
+
+
+@app.get("/health/admission")
+async def admission_health():
+    """Стан admission control, бюджету LLM викликів та бюджетів токенів payload."""
+    return {
+        "timestamp": datetime.now(),
+        "admission": admission_controller.stats(),
+        "llm_budget": llm_token_bucket.stats(),
+        "token_budget": token_budget.stats(),
+    }
 
-        return {
-            "status": "healthy",
-            "timestamp": datetime.now(),
-            "active_users": users_count,
-            "swagger_specs_count": swagger_specs_count,
-        }
-    except Exception as e:
-        logger.error(f"Health check error: {e}")
-        return {"status": "error", "timestamp": datetime.now(), "error": str(e)}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Метрики у форматі Prometheus (ENABLE_METRICS=true)."""
+    if not metrics_enabled():
+        raise HTTPException(status_code=404, detail="Метрики вимкнено")
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
+def get_upload_spool(file: UploadFile, max_bytes: int) -> BinaryIO:
+    """
+    Повертає файл-спул завантаження, перевіривши його розмір.
+
+    Starlette вже записує multipart файл частинами у SpooledTemporaryFile,
+    тому вміст не копіюється в пам'ять процесу.
+    """
+    spool = file.file
+    spool.seek(0, os.SEEK_END)
+    size = spool.tell()
+    spool.seek(0)
+
+    if size > max_bytes:
+        raise HTTPException(
+            status_code=413, detail=f"Файл завеликий: максимум {max_bytes // (1024 * 1024)} МБ"
+        )
+    return spool
+
+
+def parse_uploaded_spec(
+    filename: str, spool: BinaryIO
+) -> Tuple[Dict[str, Any], Dict[str, Any], Optional[str]]:
+    """
+    Розбирає специфікацію зі спулу (JSON або YAML, опціонально gzip).
+
+    Спул розбирається один раз: словник зберігається як original_data,
+    а endpoints будуються з нього ж.
+
+    Returns:
+        (swagger_data, parsed_data, base_url)
+    """
+    fmt = detect_format(filename, spool)
+    swagger_data = load_spec(spool, fmt, max_bytes=Config.MAX_SPEC_SIZE_BYTES)
+
+    parser = EnhancedSwaggerParser()
+    parsed_data = parser.parse_swagger_spec(swagger_data)
+
+    return swagger_data, parsed_data, parser.get_base_url()
 
 
 @app.post("/upload-swagger", response_model=SwaggerUploadResponse)
@@ -437,20 +597,17 @@ async def upload_swagger(
     """Завантаження Swagger специфікації."""
     try:
         # Перевіряємо тип файлу
-        if not file.filename.endswith(".json"):
-            raise HTTPException(status_code=400, detail="Підтримуються тільки JSON файли")
-
-        # Читаємо файл
-        content = await file.read()
-        swagger_data = json.loads(content.decode("utf-8"))
-
-        # Парсимо Swagger
-        parser = EnhancedSwaggerParser()
-        parsed_data = parser.parse_swagger_spec(swagger_data)
+        if not is_supported_filename(file.filename):
+            raise HTTPException(
+                status_code=400,
+                detail="Підтримуються JSON та YAML файли (опціонально стиснуті .gz)",
+            )
 
-        # Витягуємо base_url зі Swagger файлу
-        parser.swagger_data = swagger_data  # Встановлюємо дані для отримання base_url
-        base_url = parser.get_base_url()
+        # Файл вже збережено у спул (диск понад 1 МБ) - читаємо його потоково
+        spool = get_upload_spool(file, Config.MAX_UPLOAD_SIZE_BYTES)
+        swagger_data, parsed_data, base_url = await run_in_threadpool(
+            parse_uploaded_spec, file.filename, spool
+        )
 
         # Перевіряємо вимоги токенів
         requires_tokens, token_requirements = check_swagger_token_requirements(swagger_data)
@@ -476,6 +633,7 @@ async def upload_swagger(
         # Оновлюємо сесію користувача
         session = get_user_session(db, current_user.id)
         session.swagger_spec_id = swagger_id
+        apply_user_stats_delta(db, current_user.id, swagger_specs_count=1)
         db.commit()
 
         # Обробляємо токени авторизації від користувача
@@ -485,7 +643,7 @@ async def upload_swagger(
                 # Парсимо додаткові API токени
                 api_tokens_list = []
                 if api_tokens:
-                    api_tokens_data = json.loads(api_tokens)
+                    api_tokens_data = loads(api_tokens)
                     api_tokens_list = [SwaggerTokenData(**token) for token in api_tokens_data]
 
                 # Створюємо об'єкт з даними авторизації
@@ -498,14 +656,15 @@ async def upload_swagger(
                 logger.error(f"Помилка обробки токенів авторизації: {e}")
                 # Продовжуємо без токенів
 
-        # Додаємо завдання створення embeddings в чергу з автоматичним GPT enhancement
-        task_id = queue_manager.add_task(
-            current_user.id, swagger_id, swagger_data, enable_gpt_enhancement=True
-        )
+        # Завдання посилається на специфікацію за ID і перечитує її з БД при обробці
+        task_id = queue_manager.add_task(current_user.id, swagger_id, enable_gpt_enhancement=True)
         logger.info(f"📋 Додано завдання створення embeddings з GPT покращенням: {task_id}")
 
         # Формуємо повідомлення
-        message = "Swagger специфікація успішно завантажена. ✨ Embeddings створюються з GPT покращенням в фоні."
+        message = (
+            "Swagger специфікація успішно завантажена. 🔎 Пошук доступний після запису базових "
+            "embeddings, ✨ GPT покращення триває в фоні."
+        )
         if created_tokens:
             message += f" Створено {len(created_tokens)} токенів."
 
@@ -519,11 +678,63 @@ async def upload_swagger(
             task_id=task_id,
         )
 
+    except SpecFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading swagger: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+def get_spec_parser(swagger_spec: SwaggerSpec) -> EnhancedSwaggerParser:
+    """
+    Розібрана специфікація з warm кешу контейнера.
+
+    Версія запису - SwaggerSpec.updated_at, тому змінена специфікація
+    перечитується. original_data (відкладена колонка) завантажується з бази
+    лише при промаху кешу. Кешується сама специфікація (JSON дані), а не
+    об'єкт парсера, тому запис може зберігатися й у файлі кешу.
+    """
+    parser = EnhancedSwaggerParser()
+    parser.swagger_data = warm_cache.get_or_create(
+        "spec",
+        swagger_spec.id,
+        lambda: swagger_spec.original_data,
+        version=cache_version(swagger_spec.updated_at),
+    )
+    return parser
+
+
+def run_chat_agent(
+    message: str,
+    user_id: str,
+    swagger_spec_id: str,
+    parser: EnhancedSwaggerParser,
+    base_url: Optional[str],
+    jwt_token: Optional[str],
+) -> Any:
+    """
+    Створює агента для специфікації та обробляє повідомлення (блокуючий виклик).
+
+    Релевантні endpoints агент шукає сам: пошук іде паралельно з аналізом наміру,
+    тому окремий пошук перед викликом агента лише подовжував би запит.
+    """
+    # LangChain/OpenAI імпортуються при першому запиті до чату, а не при старті
+    from src.interactive_api_agent import InteractiveSwaggerAgent
+
+    # Створюємо API агента з уже розібраною специфікацією
+    agent = InteractiveSwaggerAgent(
+        parser=parser,
+        enable_api_calls=True,  # Увімкнути API виклики
+        user_id=user_id,
+        swagger_spec_id=swagger_spec_id,
+        base_url_override=base_url,  # Використовуємо base_url з бази даних
+        jwt_token=jwt_token,  # Передаємо JWT токен зі специфікації
+    )
+    return agent.process_interactive_query(message)
+
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat(
     request: UserRequest,
@@ -537,9 +748,11 @@ async def chat(
         if not session.swagger_spec_id:
             raise HTTPException(status_code=400, detail="Спочатку завантажте Swagger специфікацію")
 
-        # Отримуємо Swagger специфікацію з бази даних (тільки для поточного користувача)
+        # Отримуємо Swagger специфікацію з бази даних (тільки для поточного користувача).
+        # Сам JSON специфікації береться з warm кешу, тому його колонка відкладена.
         swagger_spec = (
             db.query(SwaggerSpec)
+            .options(defer(SwaggerSpec.original_data))
             .filter(
                 SwaggerSpec.id == session.swagger_spec_id, SwaggerSpec.user_id == current_user.id
             )
@@ -547,59 +760,26 @@ async def chat(
         )
         if not swagger_spec:
             raise HTTPException(status_code=404, detail="Swagger специфікація не знайдена")
+        parser = await run_in_threadpool(get_spec_parser, swagger_spec)
 
         # Перевіряємо чи є JWT токен для цієї специфікації
         if not swagger_spec.jwt_token:
             logger.warning("JWT токен не знайдено для Swagger специфікації")
             # Продовжуємо роботу без JWT токена
 
-        # Створюємо RAG engine для конкретного користувача
-        rag_engine = PostgresRAGEngine(
-            user_id=current_user.id, swagger_spec_id=session.swagger_spec_id
-        )
-
-        # Створюємо API агента з тимчасовим файлом
-        import os
-        import tempfile
-
-        # Створюємо тимчасовий файл з даними Swagger
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".json", delete=False) as temp_file:
-            temp_file.write(json.dumps(swagger_spec.original_data))
-            temp_file_path = temp_file.name
-
-        try:
-            # Створюємо API агента з тимчасовим файлом
-            agent = InteractiveSwaggerAgent(
-                temp_file_path,
-                enable_api_calls=True,  # Увімкнути API виклики
-                user_id=current_user.id,
-                swagger_spec_id=session.swagger_spec_id,
-                base_url_override=swagger_spec.base_url,  # Використовуємо base_url з бази даних
-                jwt_token=swagger_spec.jwt_token,  # Передаємо JWT токен зі специфікації
+        # Обмежуємо паралельність: надлишкові запити чекають у черзі або отримують 429.
+        # Сам агент блокуючий, тому виконується в пулі потоків.
+        async with admission_controller.admit(current_user.id):
+            response = await run_in_threadpool(
+                run_chat_agent,
+                request.message,
+                current_user.id,
+                session.swagger_spec_id,
+                parser,
+                swagger_spec.base_url,
+                swagger_spec.jwt_token,
             )
 
-            # Отримуємо контекст з RAG для конкретного користувача
-            similar_endpoints = rag_engine.search_similar_endpoints(request.message, limit=3)
-
-            # Додаємо контекст до запиту
-            context = ""
-            if similar_endpoints:
-                context = "Релевантні endpoints:\n"
-                for endpoint in similar_endpoints:
-                    context += f"- {endpoint['method']} {endpoint['endpoint_path']}: {endpoint['description']}\n"
-
-            # Виконуємо запит з контекстом
-            if context:
-                enhanced_message = f"{request.message}\n\nКонтекст:\n{context}"
-            else:
-                enhanced_message = request.message
-
-            response = agent.process_interactive_query(enhanced_message)
-
-        finally:
-            # Видаляємо тимчасовий файл
-            os.unlink(temp_file_path)
-
         # Зберігаємо повідомлення в чат
         chat_message = ChatMessage(
             id=str(uuid.uuid4()),
@@ -622,7 +802,9 @@ async def chat(
             created_at=datetime.now(),
         )
         db.add(assistant_message)
-        db.commit()
+        with stage_timer("db_write"):
+            apply_user_stats_delta(db, current_user.id, messages_count=2)
+            db.commit()
 
         # Витягаємо текст відповіді з результату агента
         response_text = (
@@ -636,6 +818,13 @@ async def chat(
             swagger_id=session.swagger_spec_id,
         )
 
+    except AdmissionRejected as e:
+        logger.warning(f"⏳ Запит користувача {current_user.id} відхилено: {e.reason}")
+        raise HTTPException(
+            status_code=429, detail=e.reason, headers={"Retry-After": str(e.retry_after)}
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in chat: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -645,21 +834,56 @@ async def chat(
 async def get_chat_history(
     current_user: User = Depends(get_current_user), db: Session = Depends(get_db)
 ):
-    """Отримання історії чату користувача."""
+    """
+    Отримання історії чату користувача: список усіх повідомлень від найстаріших.
+
+    Для великих історій використовуйте `/v2/chat-history` (пагінація та NDJSON експорт).
+    """
     try:
         session = get_user_session(db, current_user.id)
+        return fetch_history(db, session.id)
+    except Exception as e:
+        logger.error(f"Error getting chat history: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
 
-        messages = (
-            db.query(ChatMessage)
-            .filter(ChatMessage.chat_session_id == session.id)
-            .order_by(ChatMessage.created_at.asc())
-            .all()
-        )
 
-        return [
-            {"id": msg.id, "role": msg.role, "content": msg.content, "created_at": msg.created_at}
-            for msg in messages
-        ]
+@app.get("/v2/chat-history")
+async def get_chat_history_page(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Сторінка історії чату користувача.
+
+    Keyset пагінація по (created_at, id): `next_cursor` з відповіді передається
+    як `cursor` для наступної сторінки, `since` повертає тільки нові повідомлення.
+    `format=ndjson` потоково віддає всю історію для експорту.
+    """
+    try:
+        session = get_user_session(db, current_user.id)
+
+        if format == "ndjson":
+            return StreamingResponse(
+                iter_history_ndjson(SessionLocal, session.id, since=since),
+                media_type="application/x-ndjson",
+            )
+
+        page = fetch_history_page(
+            db,
+            session.id,
+            limit=limit,
+            cursor=cursor,
+            since=since,
+            descending=order == "desc",
+        )
+        return {"session_id": session.id, **page}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting chat history: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -774,6 +998,8 @@ async def delete_embeddings(
             raise HTTPException(status_code=404, detail="Swagger специфікація не знайдена")
 
         # Видаляємо embeddings через RAG engine
+        from src.rag_engine import PostgresRAGEngine
+
         rag_engine = PostgresRAGEngine(user_id=current_user.id, swagger_spec_id=swagger_spec_id)
 
         success = rag_engine.delete_user_embeddings()
@@ -794,44 +1020,10 @@ async def get_statistics(
 ):
     """Отримання статистики для користувача."""
     try:
-        # Статистика Swagger специфікацій
-        swagger_specs_count = (
-            db.query(SwaggerSpec)
-            .filter(SwaggerSpec.user_id == current_user.id, SwaggerSpec.is_active == True)
-            .count()
-        )
-
-        # Статистика embeddings
-        embeddings_count = (
-            db.query(ApiEmbedding).filter(ApiEmbedding.user_id == current_user.id).count()
-        )
-
-        # Статистика повідомлень
-        messages_count = (
-            db.query(ChatMessage)
-            .join(ChatSession)
-            .filter(ChatSession.user_id == current_user.id)
-            .count()
-        )
-
-        # Підраховуємо Swagger specs з JWT токенами
-        jwt_tokens_count = (
-            db.query(SwaggerSpec)
-            .filter(
-                SwaggerSpec.user_id == current_user.id,
-                SwaggerSpec.jwt_token.isnot(None),
-                SwaggerSpec.is_active == True,
-            )
-            .count()
-        )
+        # Лічильники підтримуються інкрементально, тому це одне читання по ключу
+        stats = get_user_stats(db, current_user.id)
 
-        return {
-            "user_id": current_user.id,
-            "swagger_specs_count": swagger_specs_count,
-            "embeddings_count": embeddings_count,
-            "messages_count": messages_count,
-            "jwt_tokens_count": jwt_tokens_count,
-        }
+        return {"user_id": current_user.id, **stats}
 
     except Exception as e:
         logger.error(f"Error getting statistics: {e}")
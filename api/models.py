@@ -140,6 +140,8 @@ class ChatMessage(Base):
         Index("idx_message_session", "chat_session_id"),
         Index("idx_message_created", "created_at"),
         Index("idx_message_role", "role"),
+        # Keyset пагінація історії: (chat_session_id, created_at, id)
+        Index("idx_message_session_created_id", "chat_session_id", "created_at", "id"),
     )
 
 
@@ -215,6 +217,93 @@ class ApiCall(Base):
     )
 
 
+class UserStats(Base):
+    """Лічильники користувача, що оновлюються разом зі змінами даних"""
+
+    __tablename__ = "user_stats"
+
+    user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    swagger_specs_count = Column(Integer, nullable=False, default=0)
+    embeddings_count = Column(Integer, nullable=False, default=0)
+    messages_count = Column(Integer, nullable=False, default=0)
+    jwt_tokens_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Job(Base):
+    """Фонове завдання (створення embeddings), яке забирають workers з будь-якого вузла"""
+
+    __tablename__ = "jobs"
+
+    id = Column(String(36), primary_key=True)  # UUID
+    kind = Column(String(50), nullable=False)  # тип обробника, наприклад "embeddings"
+    user_id = Column(String(36), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    swagger_spec_id = Column(String(36), nullable=True)
+    payload = Column(JSON, nullable=True)
+    # pending, processing, completed, dead (вичерпано спроби)
+    status = Column(String(20), nullable=False, default="pending")
+    progress = Column(Integer, nullable=False, default=0)
+    phase = Column(String(20), nullable=True)  # base, enhancing, done
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # час наступної спроби
+    locked_by = Column(String(100), nullable=True)  # worker, що тримає lease
+    lease_expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    error_message = Column(Text, nullable=True)
+    report = Column(JSON, nullable=True)  # звіт обробника (етапи індексації)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Вибірка наступного завдання та завдань з простроченим lease
+        Index("idx_job_status_run_at", "status", "run_at"),
+        Index("idx_job_user_created", "user_id", "created_at"),
+    )
+
+
+class GPTPromptCacheEntry(Base):
+    """Відповідь GPT для операції API, спільна для всіх користувачів (без user_id)"""
+
+    __tablename__ = "gpt_prompt_cache"
+
+    # sha256 нормалізованої операції з розгорнутими схемами, моделі та версії промпту
+    fingerprint = Column(String(64), primary_key=True)
+    kind = Column(String(20), nullable=False)  # endpoint або resource
+    model = Column(String(50), nullable=False)
+    prompt_version = Column(String(20), nullable=False)
+    response = Column(JSON, nullable=False)  # поля GPTGeneratedPrompt без прив'язки до endpoint
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow)
+
+
+class LLMResponseCacheEntry(Base):
+    """Кешована відповідь LLM (аналіз наміру) в межах специфікації, з терміном дії"""
+
+    __tablename__ = "llm_response_cache"
+
+    # sha256 області, типу, нормалізованого запиту, хешу контексту, моделі та версії промпту
+    key = Column(String(64), primary_key=True)
+    kind = Column(String(20), nullable=False)  # intent
+    scope = Column(String(100), nullable=False)  # swagger_spec_id
+    model = Column(String(50), nullable=False)
+    prompt_version = Column(String(20), nullable=False)
+    query_text = Column(Text, nullable=False)  # нормалізований запит
+    context_hash = Column(String(64), nullable=False)
+    embedding = Column(Text)  # ембедінг запиту; у PostgreSQL - колонка vector (pgvector)
+    response = Column(JSON, nullable=False)
+    hit_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("idx_llm_cache_lookup", "scope", "kind", "context_hash", "expires_at"),
+        Index("idx_llm_cache_expires", "expires_at"),
+    )
+
+
 # Pydantic моделі для API
 class UserResponse(BaseModel):
     id: str
@@ -0,0 +1,156 @@
+"""
+Кеш авторизованих користувачів (principal) для JWT запитів
+"""
+
+import calendar
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from src.config import Config
+from src.ttl_cache import TTLCache
+
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+# Claim з даними користувача, який додається до токена при видачі
+PRINCIPAL_CLAIM = "usr"
+
+
+class PrincipalCache:
+    """Короткоживучий LRU кеш активних користувачів, ключ - `sub` з JWT."""
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 30.0):
+        self._cache = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds, name="principal")
+        # (is_active, updated_at) з БД: спільне джерело відкликання для всіх workers
+        self._states = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds, name="principal_state")
+        self._lock = threading.Lock()
+        self.claims_hits = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _snapshot(user: User) -> Dict[str, Any]:
+        """Копіює поля користувача, не прив'язані до сесії."""
+        return {
+            "id": user.id,
+            "email": user.email,
+            "username": user.username,
+            "is_active": user.is_active,
+            "created_at": user.created_at,
+            "updated_at": user.updated_at,
+        }
+
+    @staticmethod
+    def _to_user(data: Dict[str, Any]) -> User:
+        """Створює transient User з кешованих даних."""
+        return User(**data)
+
+    def get(self, user_id: str) -> Optional[User]:
+        """Повертає користувача з кешу."""
+        data = self._cache.get(user_id)
+        return self._to_user(data) if data else None
+
+    def put(self, user: User):
+        """Кешує активного користувача."""
+        if not user.is_active:
+            self._cache.pop(user.id)
+            return
+        self._cache.set(user.id, self._snapshot(user))
+
+    def from_claims(
+        self, payload: Dict[str, Any], load_state: Callable[[str], Optional[Any]]
+    ) -> Optional[User]:
+        """
+        Створює користувача з claims токена, якщо вони повні та не відкликані.
+
+        Args:
+            payload: Декодований JWT
+            load_state: Читає з БД рядок з is_active та updated_at користувача
+        """
+        claims = payload.get(PRINCIPAL_CLAIM)
+        user_id = payload.get("sub")
+        if not isinstance(claims, dict) or not user_id:
+            return None
+
+        if not claims.get("is_active") or not claims.get("username"):
+            return None
+
+        if not self._claims_current(user_id, payload.get("iat"), load_state):
+            return None
+
+        try:
+            created_at = datetime.fromisoformat(claims["created_at"])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+        with self._lock:
+            self.claims_hits += 1
+
+        return self._to_user(
+            {
+                "id": user_id,
+                "email": payload.get("email"),
+                "username": claims["username"],
+                "is_active": True,
+                "created_at": created_at,
+                "updated_at": None,
+            }
+        )
+
+    def _claims_current(
+        self, user_id: str, issued_at: Any, load_state: Callable[[str], Optional[Any]]
+    ) -> bool:
+        """
+        Claims актуальні, якщо користувач активний і не змінювався після видачі токена.
+
+        Стан читається з БД не частіше ніж раз на TTL кешу, тому деактивація на
+        іншому worker чи після перезапуску діє на claims не пізніше ніж за TTL.
+        """
+        if not isinstance(issued_at, (int, float)):
+            return False
+
+        state = self._states.get(user_id)
+        if state is None:
+            row = load_state(user_id)
+            if row is None:
+                return False
+            state = {"is_active": bool(row.is_active), "updated_at": row.updated_at}
+            self._states.set(user_id, state)
+
+        if not state["is_active"]:
+            return False
+        updated_at = state["updated_at"]
+        return updated_at is None or calendar.timegm(updated_at.utctimetuple()) <= issued_at
+
+    def invalidate(self, user_id: str):
+        """Видаляє користувача з кешу після оновлення чи деактивації."""
+        self._cache.pop(user_id)
+        self._states.pop(user_id)
+        with self._lock:
+            self.invalidations += 1
+        logger.info(f"🔄 Кеш користувача {user_id} інвалідовано")
+
+    def clear(self):
+        """Очищає кеш."""
+        self._cache.clear()
+        self._states.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика кешу, включно з hit ratio."""
+        stats = self._cache.stats()
+        with self._lock:
+            stats["claims_hits"] = self.claims_hits
+            stats["invalidations"] = self.invalidations
+        lookups = stats["hits"] + stats["misses"]
+        served = stats["hits"] + stats["claims_hits"]
+        total = lookups + stats["claims_hits"]
+        stats["zero_query_ratio"] = round(served / total, 4) if total else 0.0
+        return stats
+
+
+# Глобальний екземпляр кешу
+principal_cache = PrincipalCache(
+    max_size=Config.PRINCIPAL_CACHE_MAX_SIZE, ttl_seconds=Config.PRINCIPAL_CACHE_TTL_SECONDS
+)
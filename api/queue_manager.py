@@ -2,20 +2,19 @@
 Менеджер черги для асинхронного створення embeddings
 """
 
-import asyncio
-import json
 import logging
-import os
-import tempfile
+import queue
 import threading
 import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 from uuid import uuid4
 
 from sqlalchemy.orm import Session
 
-from src.rag_engine import PostgresRAGEngine
+from src.config import Config
+from src.metrics import queue_depth
 
 logger = logging.getLogger(__name__)
 
@@ -28,12 +27,13 @@ class EmbeddingTask:
         task_id: str,
         user_id: str,
         swagger_spec_id: str,
-        swagger_data: dict,
+        swagger_data: Optional[dict] = None,
         enable_gpt_enhancement: bool = True,
     ):
         self.task_id = task_id
         self.user_id = user_id
         self.swagger_spec_id = swagger_spec_id
+        # Зазвичай None - специфікація перечитується з БД за swagger_spec_id під час обробки
         self.swagger_data = swagger_data
         self.enable_gpt_enhancement = enable_gpt_enhancement  # Нове поле для GPT
         self.status = "pending"  # pending, processing, completed, failed
@@ -42,107 +42,196 @@ class EmbeddingTask:
         self.completed_at: Optional[datetime] = None
         self.error_message: Optional[str] = None
         self.progress = 0  # 0-100
+        # Фаза індексації: base (базові chunks), enhancing (вже доступна для пошуку,
+        # триває GPT покращення), done
+        self.phase: Optional[str] = None
+        # Звіт етапів індексації: пропускна здатність parse/enhance/embed/write
+        self.report: Optional[Dict[str, Any]] = None
 
 
 class QueueManager:
-    """Менеджер черги для створення embeddings"""
+    """Менеджер черги для створення embeddings
 
-    def __init__(self):
+    Завдання передаються worker потокам через queue.Queue: потік блокується
+    на get() без опитування, вибір наступного завдання - O(1). Активні
+    завдання (pending, processing) зберігаються окремо від завершених;
+    завершені переходять в обмежену історію.
+    """
+
+    def __init__(
+        self,
+        num_workers: Optional[int] = None,
+        max_history: Optional[int] = None,
+    ):
+        self.num_workers = max(1, num_workers or Config.EMBEDDING_WORKERS)
+        self.max_history = max_history if max_history is not None else Config.EMBEDDING_TASK_HISTORY
+
+        # Активні завдання та обмежена історія завершених (найстаріші витісняються)
         self.tasks: Dict[str, EmbeddingTask] = {}
+        self.history: "OrderedDict[str, EmbeddingTask]" = OrderedDict()
+
         self.processing = False
-        self.worker_thread: Optional[threading.Thread] = None
+        self.workers: List[threading.Thread] = []
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._pending = 0
+        self._accepting = True
         self._lock = threading.Lock()
 
     def add_task(
         self,
         user_id: str,
         swagger_spec_id: str,
-        swagger_data: dict,
+        swagger_data: Optional[dict] = None,
         enable_gpt_enhancement: bool = True,
     ) -> str:
         """Додає нове завдання в чергу"""
         task_id = str(uuid4())
 
         with self._lock:
+            if not self._accepting:
+                raise RuntimeError("Черга embeddings зупиняється, нові завдання не приймаються")
+
             task = EmbeddingTask(
                 task_id, user_id, swagger_spec_id, swagger_data, enable_gpt_enhancement
             )
             self.tasks[task_id] = task
+            self._pending += 1
             logger.info(f"📋 Додано завдання {task_id} для користувача {user_id} з GPT покращенням")
 
-            # Запускаємо worker якщо він не працює
+            # Запускаємо workers якщо вони не працюють
             if not self.processing:
                 self._start_worker()
 
+        self._queue.put(task_id)
         return task_id
 
+    def pending_count(self) -> int:
+        """Кількість завдань, що очікують обробки"""
+        return self._pending
+
+    def _find_task(self, task_id: str) -> Optional[EmbeddingTask]:
+        return self.tasks.get(task_id) or self.history.get(task_id)
+
+    @staticmethod
+    def _task_to_dict(task: EmbeddingTask) -> Dict[str, Any]:
+        return {
+            "task_id": task.task_id,
+            "swagger_spec_id": task.swagger_spec_id,
+            "status": task.status,
+            "progress": task.progress,
+            "phase": task.phase,
+            "created_at": task.created_at.isoformat(),
+            "started_at": task.started_at.isoformat() if task.started_at else None,
+            "completed_at": task.completed_at.isoformat() if task.completed_at else None,
+            "error_message": task.error_message,
+            "report": task.report,
+        }
+
     def get_task_status(self, task_id: str) -> Optional[Dict]:
         """Отримує статус завдання"""
         with self._lock:
-            task = self.tasks.get(task_id)
+            task = self._find_task(task_id)
             if not task:
                 return None
 
-            return {
-                "task_id": task.task_id,
-                "status": task.status,
-                "progress": task.progress,
-                "created_at": task.created_at.isoformat(),
-                "started_at": task.started_at.isoformat() if task.started_at else None,
-                "completed_at": task.completed_at.isoformat() if task.completed_at else None,
-                "error_message": task.error_message,
-            }
+            status = self._task_to_dict(task)
+            del status["swagger_spec_id"]
+            return status
 
     def get_user_tasks(self, user_id: str) -> List[Dict]:
-        """Отримує всі завдання користувача"""
+        """Отримує всі завдання користувача (активні та з історії)"""
         with self._lock:
-            user_tasks = [task for task in self.tasks.values() if task.user_id == user_id]
-
-            return [
-                {
-                    "task_id": task.task_id,
-                    "swagger_spec_id": task.swagger_spec_id,
-                    "status": task.status,
-                    "progress": task.progress,
-                    "created_at": task.created_at.isoformat(),
-                    "started_at": task.started_at.isoformat() if task.started_at else None,
-                    "completed_at": task.completed_at.isoformat() if task.completed_at else None,
-                    "error_message": task.error_message,
-                }
-                for task in user_tasks
+            user_tasks = [
+                task
+                for tasks in (self.history, self.tasks)
+                for task in tasks.values()
+                if task.user_id == user_id
             ]
+            user_tasks.sort(key=lambda task: task.created_at)
+            return [self._task_to_dict(task) for task in user_tasks]
 
     def _start_worker(self):
-        """Запускає worker thread для обробки завдань"""
-        if self.worker_thread and self.worker_thread.is_alive():
+        """Запускає пул worker потоків для обробки завдань"""
+        self.workers = [worker for worker in self.workers if worker.is_alive()]
+        if len(self.workers) >= self.num_workers:
             return
 
         self.processing = True
-        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
-        self.worker_thread.start()
-        logger.info("🚀 Worker thread запущено")
+        for _ in range(self.num_workers - len(self.workers)):
+            worker = threading.Thread(
+                target=self._worker_loop,
+                name=f"embedding-worker-{len(self.workers)}",
+                daemon=True,
+            )
+            worker.start()
+            self.workers.append(worker)
+        logger.info(f"🚀 Запущено {len(self.workers)} worker потоків embeddings")
 
     def _worker_loop(self):
-        """Основний цикл worker'а"""
-        while self.processing:
+        """Основний цикл worker'а: блокується на черзі до появи завдання"""
+        while True:
+            task_id = self._queue.get()
             try:
-                # Знаходимо наступне завдання
-                next_task = None
+                # None - сигнал зупинки, ставиться в чергу після всіх завдань
+                if task_id is None:
+                    return
+
                 with self._lock:
-                    for task in self.tasks.values():
-                        if task.status == "pending":
-                            next_task = task
-                            break
+                    task = self.tasks.get(task_id)
+                    self._pending -= 1
+                if task is None:
+                    continue
 
-                if next_task:
-                    self._process_task(next_task)
-                else:
-                    # Немає завдань, чекаємо
-                    time.sleep(1)
+                self._process_task(task)
+                self._archive_task(task)
 
             except Exception as e:
                 logger.error(f"❌ Помилка в worker loop: {e}")
-                time.sleep(5)
+            finally:
+                self._queue.task_done()
+
+    def _archive_task(self, task: EmbeddingTask):
+        """Переносить завершене завдання в обмежену історію"""
+        with self._lock:
+            self.tasks.pop(task.task_id, None)
+            if self.max_history <= 0:
+                return
+            self.history[task.task_id] = task
+            while len(self.history) > self.max_history:
+                self.history.popitem(last=False)
+
+    def shutdown(self, timeout: Optional[float] = None) -> bool:
+        """
+        Зупиняє прийом завдань і чекає, доки workers оброблять чергу.
+
+        Args:
+            timeout: Максимальний час очікування (секунди), None - без обмеження
+
+        Returns:
+            True, якщо всі workers завершились
+        """
+        with self._lock:
+            self._accepting = False
+            workers = [worker for worker in self.workers if worker.is_alive()]
+
+        if workers:
+            logger.info(f"⏳ Очікування завершення {self._pending} завдань embeddings")
+        for _ in workers:
+            self._queue.put(None)
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for worker in workers:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            worker.join(remaining)
+
+        stopped = not any(worker.is_alive() for worker in workers)
+        if stopped:
+            self.processing = False
+            self.workers = []
+            logger.info("🛑 Workers embeddings зупинено")
+        else:
+            logger.warning("⚠️ Не всі завдання embeddings завершились до таймауту")
+        return stopped
 
     def _process_task(self, task: EmbeddingTask):
         """Обробляє одне завдання"""
@@ -153,41 +242,42 @@ class QueueManager:
             task.status = "processing"
             task.started_at = datetime.now()
 
-            # Створюємо тимчасовий файл
-            with tempfile.NamedTemporaryFile(mode="w", suffix=".json", delete=False) as temp_file:
-                temp_file.write(json.dumps(task.swagger_data))
-                temp_file_path = temp_file.name
+            # Специфікація завантажується лише на час обробки
+            swagger_data = task.swagger_data or self._load_swagger_data(task.swagger_spec_id)
+            task.swagger_data = None
+            if swagger_data is None:
+                raise ValueError(f"Swagger специфікація {task.swagger_spec_id} не знайдена")
 
-            try:
-                # Створюємо RAG engine
-                rag_engine = PostgresRAGEngine(
-                    user_id=task.user_id, swagger_spec_id=task.swagger_spec_id
-                )
+            # Створюємо RAG engine
+            from src.rag_engine import PostgresRAGEngine
 
-                # Оновлюємо прогрес
-                task.progress = 25
+            rag_engine = PostgresRAGEngine(
+                user_id=task.user_id, swagger_spec_id=task.swagger_spec_id
+            )
 
-                # Створюємо embeddings з GPT enhancement
-                success = rag_engine.create_vectorstore_from_swagger(
-                    temp_file_path, enable_gpt_enhancement=task.enable_gpt_enhancement
-                )
+            # Оновлюємо прогрес
+            task.progress = 25
 
-                task.progress = 100
+            # Створюємо embeddings з GPT enhancement
+            success = rag_engine.create_vectorstore_from_swagger_data(
+                swagger_data,
+                enable_gpt_enhancement=task.enable_gpt_enhancement,
+                progress_callback=lambda percent: setattr(task, "progress", percent),
+                phase_callback=lambda phase: setattr(task, "phase", phase),
+            )
+            del swagger_data
+            task.report = rag_engine.last_ingestion_report
 
-                if success:
-                    task.status = "completed"
-                    logger.info(f"✅ Завдання {task.task_id} завершено успішно")
-                else:
-                    task.status = "failed"
-                    task.error_message = "Не вдалося створити embeddings"
-                    logger.warning(f"⚠️ Завдання {task.task_id} завершено з помилкою")
+            task.progress = 100
 
-            finally:
-                # Видаляємо тимчасовий файл
-                try:
-                    os.unlink(temp_file_path)
-                except:
-                    pass
+            if success:
+                task.status = "completed"
+                task.phase = "done"
+                logger.info(f"✅ Завдання {task.task_id} завершено успішно")
+            else:
+                task.status = "failed"
+                task.error_message = "Не вдалося створити embeddings"
+                logger.warning(f"⚠️ Завдання {task.task_id} завершено з помилкою")
 
             task.completed_at = datetime.now()
 
@@ -197,26 +287,41 @@ class QueueManager:
             task.error_message = str(e)
             task.completed_at = datetime.now()
 
+    @staticmethod
+    def _load_swagger_data(swagger_spec_id: str) -> Optional[Dict[str, Any]]:
+        """Читає original_data специфікації з бази даних."""
+        from .database import SessionLocal
+        from .models import SwaggerSpec
+
+        db = SessionLocal()
+        try:
+            row = (
+                db.query(SwaggerSpec.original_data)
+                .filter(SwaggerSpec.id == swagger_spec_id)
+                .first()
+            )
+            return row[0] if row else None
+        finally:
+            db.close()
+
     def cleanup_old_tasks(self, max_age_hours: int = 24):
-        """Видаляє старі завершені завдання"""
+        """Видаляє старі завершені завдання з історії"""
         cutoff_time = datetime.now().timestamp() - (max_age_hours * 3600)
 
         with self._lock:
-            tasks_to_remove = []
-            for task_id, task in self.tasks.items():
-                if (
-                    task.status in ["completed", "failed"]
-                    and task.completed_at
-                    and task.completed_at.timestamp() < cutoff_time
-                ):
-                    tasks_to_remove.append(task_id)
-
-            for task_id in tasks_to_remove:
-                del self.tasks[task_id]
+            # Історія впорядкована за часом завершення - зупиняємось на першому свіжому
+            removed = 0
+            while self.history:
+                task = next(iter(self.history.values()))
+                if task.completed_at and task.completed_at.timestamp() >= cutoff_time:
+                    break
+                self.history.popitem(last=False)
+                removed += 1
 
-            if tasks_to_remove:
-                logger.info(f"🗑️ Видалено {len(tasks_to_remove)} старих завдань")
+            if removed:
+                logger.info(f"🗑️ Видалено {removed} старих завдань")
 
 
 # Глобальний екземпляр менеджера черги
 queue_manager = QueueManager()
+queue_depth.labels("embeddings").set_function(queue_manager.pending_count)
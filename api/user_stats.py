@@ -0,0 +1,106 @@
+"""
+Інкрементальні лічильники статистики користувачів
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .models import ApiEmbedding, ChatMessage, ChatSession, SwaggerSpec, UserStats
+
+logger = logging.getLogger(__name__)
+
+USER_STATS_FIELDS = (
+    "swagger_specs_count",
+    "embeddings_count",
+    "messages_count",
+    "jwt_tokens_count",
+)
+
+
+def apply_user_stats_delta(bind, user_id: str, **deltas: int) -> None:
+    """
+    Змінює лічильники користувача в поточній транзакції.
+
+    Якщо рядка ще немає, нічого не робить - його заповнить
+    compute_user_stats при першому читанні.
+
+    Args:
+        bind: Session або Connection, в транзакції якої відбувається зміна
+        user_id: ID користувача
+        **deltas: Зміни лічильників, наприклад messages_count=2
+    """
+    values = {}
+    for field, delta in deltas.items():
+        if field not in USER_STATS_FIELDS:
+            raise ValueError(f"Невідомий лічильник: {field}")
+        if delta:
+            column = getattr(UserStats, field)
+            values[field] = column + delta
+
+    if not values:
+        return
+
+    values["updated_at"] = datetime.utcnow()
+    bind.execute(update(UserStats).where(UserStats.user_id == user_id).values(**values))
+
+
+def reset_user_stats(bind, user_id: str) -> None:
+    """Видаляє лічильники користувача, щоб вони були перераховані при наступному читанні."""
+    bind.execute(delete(UserStats).where(UserStats.user_id == user_id))
+
+
+def compute_user_stats(db: Session, user_id: str) -> Dict[str, int]:
+    """Повний перерахунок статистики користувача через COUNT запити."""
+    swagger_specs_count = (
+        db.query(SwaggerSpec)
+        .filter(SwaggerSpec.user_id == user_id, SwaggerSpec.is_active == True)
+        .count()
+    )
+    embeddings_count = db.query(ApiEmbedding).filter(ApiEmbedding.user_id == user_id).count()
+    messages_count = (
+        db.query(ChatMessage).join(ChatSession).filter(ChatSession.user_id == user_id).count()
+    )
+    jwt_tokens_count = (
+        db.query(SwaggerSpec)
+        .filter(
+            SwaggerSpec.user_id == user_id,
+            SwaggerSpec.jwt_token.isnot(None),
+            SwaggerSpec.is_active == True,
+        )
+        .count()
+    )
+
+    return {
+        "swagger_specs_count": swagger_specs_count,
+        "embeddings_count": embeddings_count,
+        "messages_count": messages_count,
+        "jwt_tokens_count": jwt_tokens_count,
+    }
+
+
+def get_user_stats(db: Session, user_id: str) -> Dict[str, Any]:
+    """
+    Повертає лічильники користувача одним читанням по первинному ключу.
+
+    При відсутності рядка виконує повний перерахунок і зберігає результат.
+    """
+    stats = db.get(UserStats, user_id)
+
+    if stats is None:
+        counts = compute_user_stats(db, user_id)
+        stats = UserStats(user_id=user_id, updated_at=datetime.utcnow(), **counts)
+        db.add(stats)
+        try:
+            db.commit()
+            logger.info(f"📊 Ініціалізовано лічильники статистики для користувача {user_id}")
+        except IntegrityError:
+            # Інший запит встиг створити рядок паралельно
+            db.rollback()
+            stats = db.get(UserStats, user_id)
+
+    return {field: getattr(stats, field) or 0 for field in USER_STATS_FIELDS}
@@ -10,6 +10,7 @@ from sqlalchemy.orm import Session
 from .auth import authenticate_user, create_demo_user, create_user, get_current_user
 from .database import get_db
 from .models import User, UserCreate, UserResponse
+from .principal_cache import principal_cache
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -92,6 +93,7 @@ async def update_user(
 
     db.commit()
     db.refresh(user)
+    principal_cache.invalidate(user_id)
 
     return UserResponse.from_orm(user)
 
@@ -116,5 +118,6 @@ async def delete_user(
     user.updated_at = datetime.utcnow()
 
     db.commit()
+    principal_cache.invalidate(user_id)
 
     return {"message": "Користувача деактивовано успішно"}
@@ -3,10 +3,14 @@ AWS Lambda handler для AI Swagger Bot API
 Використовує Mangum для адаптації FastAPI додатку до AWS Lambda
 """
 
+import logging
 import os
 import sys
+import time
 from pathlib import Path
 
+_init_started = time.perf_counter()
+
 # Додаємо кореневу директорію проекту до Python path
 project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
@@ -14,9 +18,15 @@ sys.path.insert(0, str(project_root))
 # Імпортуємо Mangum для AWS Lambda
 from mangum import Mangum
 
-# Імпортуємо FastAPI додаток
+# Імпортуємо FastAPI додаток. LangChain, OpenAI та sqladmin завантажуються ліниво,
+# таблиці не створюються при імпорті - схема ведеться міграціями alembic.
+# Розбивка часу імпорту: python scripts/profile_cold_start.py
 from api.main import app
 
+logging.getLogger(__name__).info(
+    f"⏱️ Ініціалізація handler: {(time.perf_counter() - _init_started) * 1000:.0f} ms"
+)
+
 # Створюємо Mangum handler
 # lifespan="off" вимикає startup/shutdown події, що краще для Lambda
 handler = Mangum(app, lifespan="off")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Мікробенчмарк JSON серіалізації для одного ходу /chat.
+
+Порівнює стандартний json (як було) та src.serialization (orjson) на тих
+самих операціях, які виконуються під час обробки одного повідомлення:
+запис Swagger специфікації у тимчасовий файл, розбір результатів
+векторного пошуку, запис API виклику та формування відповіді.
+
+Використання:
+    python scripts/benchmark_serialization.py [--iterations 200] [--swagger path.json]
+"""
+
+import argparse
+import json
+import random
+import sys
+import timeit
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from src.serialization import dumps, dumps_str, loads
+
+DEFAULT_SWAGGER = Path(__file__).parent.parent / "examples" / "swagger_specs" / "shop_api.json"
+EMBEDDING_DIM = 1536
+SEARCH_RESULTS = 5
+HISTORY_PAGE = 50
+
+
+def build_fixtures(swagger_path: Path):
+    """Готує дані, типові для одного ходу чату."""
+    with open(swagger_path, "r", encoding="utf-8") as f:
+        swagger_data = json.load(f)
+
+    rng = random.Random(42)
+    embedding = [rng.uniform(-1, 1) for _ in range(EMBEDDING_DIM)]
+    metadata = {"summary": "Create product", "tags": ["products"], "parameters": ["name", "price"]}
+    search_rows = [(json.dumps(embedding), json.dumps(metadata)) for _ in range(SEARCH_RESULTS)]
+
+    api_request = {
+        "url": "https://api.example.com/products",
+        "method": "POST",
+        "headers": {"Content-Type": "application/json", "Authorization": "Bearer token"},
+        "data": {"name": "Phone", "price": 499.99, "category_id": 3},
+    }
+    api_response = {
+        "status_code": 201,
+        "success": True,
+        "data": {"items": [{"id": i, "name": f"Item {i}", "price": i * 1.5} for i in range(100)]},
+    }
+
+    history = [
+        {
+            "id": str(uuid.uuid4()),
+            "role": "assistant" if i % 2 else "user",
+            "content": "Відповідь асистента " * 40,
+            "created_at": datetime.now(),
+        }
+        for i in range(HISTORY_PAGE)
+    ]
+    chat_response = {
+        "response": "Товар успішно створено " * 20,
+        "user_id": str(uuid.uuid4()),
+        "timestamp": datetime.now(),
+        "swagger_id": str(uuid.uuid4()),
+    }
+
+    return swagger_data, search_rows, api_request, api_response, history, chat_response
+
+
+def make_stdlib_turn(fixtures):
+    """Хід /chat зі стандартним json та JSONResponse."""
+    swagger_data, search_rows, api_request, api_response, history, chat_response = fixtures
+
+    def turn():
+        json.dumps(swagger_data)
+        for embedding_json, metadata_json in search_rows:
+            json.loads(embedding_json)
+            json.loads(metadata_json)
+        json.dumps(api_request)
+        json.dumps(api_response)
+        JSONResponse(jsonable_encoder(chat_response))
+        JSONResponse(jsonable_encoder({"messages": history}))
+
+    return turn
+
+
+def make_orjson_turn(fixtures):
+    """Той самий хід через src.serialization та ORJSONResponse."""
+    swagger_data, search_rows, api_request, api_response, history, chat_response = fixtures
+
+    def turn():
+        dumps(swagger_data)
+        for embedding_json, metadata_json in search_rows:
+            loads(embedding_json)
+            loads(metadata_json)
+        dumps_str(api_request)
+        dumps_str(api_response)
+        ORJSONResponse(jsonable_encoder(chat_response))
+        ORJSONResponse(jsonable_encoder({"messages": history}))
+
+    return turn
+
+
+def measure(func, iterations: int) -> float:
+    """Найкращий з 5 повторів, мікросекунди на виклик."""
+    best = min(timeit.repeat(func, number=iterations, repeat=5))
+    return best / iterations * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк серіалізації одного ходу /chat")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--swagger", type=Path, default=DEFAULT_SWAGGER)
+    args = parser.parse_args()
+
+    fixtures = build_fixtures(args.swagger)
+    swagger_size = len(dumps(fixtures[0]))
+
+    stdlib_us = measure(make_stdlib_turn(fixtures), args.iterations)
+    orjson_us = measure(make_orjson_turn(fixtures), args.iterations)
+
+    print(f"📄 Swagger: {args.swagger.name} ({swagger_size / 1024:.1f} KB)")
+    print(f"🔍 Результатів пошуку: {SEARCH_RESULTS} x {EMBEDDING_DIM} dims")
+    print(f"💬 Повідомлень в історії: {HISTORY_PAGE}")
+    print()
+    print(f"{'Варіант':<12}{'мкс / хід':>14}")
+    print(f"{'json':<12}{stdlib_us:>14.1f}")
+    print(f"{'orjson':<12}{orjson_us:>14.1f}")
+    print()
+    print(f"⚡ Прискорення: {stdlib_us / orjson_us:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
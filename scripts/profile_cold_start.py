@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Профіль cold start API: час імпорту модуля Lambda handler у свіжому процесі.
+
+Кожен прогін запускає окремий інтерпретатор з `python -X importtime`, тому
+результат відповідає фазі INIT в AWS Lambda (без кешу модулів). Звіт містить
+загальний час, розбивку за пакетами верхнього рівня (власний час модулів) та
+найважчі імпорти за кумулятивним часом.
+
+Використання:
+    python scripts/profile_cold_start.py [--runs 5] [--top 20] [--no-lambda]
+    python scripts/profile_cold_start.py --module api.main --json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = Path(__file__).parent.parent
+DEFAULT_MODULE = "deployment.lambda_handler"
+
+# Модулі, які не повинні завантажуватись при старті API
+LAZY_MODULES = (
+    "langchain",
+    "langchain_openai",
+    "openai",
+    "sqladmin",
+    "passlib",
+    "src.interactive_api_agent",
+    "src.rag_engine",
+)
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """Розбирає вивід -X importtime у список (модуль, self_us, cumulative_us)."""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        records.append((name.strip(), int(self_us), int(cumulative_us)))
+    return records
+
+
+def run_once(module: str, env: Dict[str, str]) -> Tuple[float, List[Tuple[str, int, int]]]:
+    """Імпортує модуль у новому процесі, повертає (секунди, записи importtime)."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+    records = parse_importtime(result.stderr)
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if not line.startswith("import time")]
+        raise RuntimeError(f"Імпорт {module} завершився з помилкою:\n" + "\n".join(errors[-20:]))
+    return elapsed, records
+
+
+def build_report(module: str, runs: int, env: Dict[str, str], top: int) -> Dict:
+    """Виконує прогони та агрегує результати."""
+    wall_times = []
+    import_times = []
+    by_package: Dict[str, List[int]] = defaultdict(list)
+    cumulative: Dict[str, List[int]] = defaultdict(list)
+    loaded = set()
+
+    for _ in range(runs):
+        elapsed, records = run_once(module, env)
+        wall_times.append(elapsed)
+
+        package_totals: Dict[str, int] = defaultdict(int)
+        for name, self_us, cumulative_us in records:
+            package_totals[name.split(".")[0]] += self_us
+            cumulative[name].append(cumulative_us)
+            loaded.add(name)
+        for package, total in package_totals.items():
+            by_package[package].append(total)
+
+        root = [r for r in records if r[0] == module]
+        import_times.append(root[-1][2] / 1e6 if root else 0.0)
+
+    packages = sorted(
+        ((name, statistics.median(values) / 1000) for name, values in by_package.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    heaviest = sorted(
+        ((name, statistics.median(values) / 1000) for name, values in cumulative.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+
+    return {
+        "module": module,
+        "runs": runs,
+        "lambda_mode": bool(env.get("AWS_LAMBDA_FUNCTION_NAME")),
+        "wall_seconds": {
+            "median": round(statistics.median(wall_times), 3),
+            "min": round(min(wall_times), 3),
+            "max": round(max(wall_times), 3),
+        },
+        "import_seconds_median": round(statistics.median(import_times), 3),
+        "packages_ms": [(name, round(ms, 1)) for name, ms in packages[:top]],
+        "heaviest_imports_ms": [(name, round(ms, 1)) for name, ms in heaviest[:top]],
+        "eagerly_loaded_lazy_modules": sorted(name for name in LAZY_MODULES if name in loaded),
+    }
+
+
+def print_report(report: Dict):
+    print(f"🚀 Cold start профіль: import {report['module']}")
+    print(f"   Прогонів: {report['runs']}, Lambda режим: {report['lambda_mode']}")
+    wall = report["wall_seconds"]
+    print(
+        f"   Процес (wall): median {wall['median']:.3f}s "
+        f"(min {wall['min']:.3f}s, max {wall['max']:.3f}s)"
+    )
+    print(f"   Імпорти (importtime): median {report['import_seconds_median']:.3f}s")
+
+    print("\n📦 Пакети за власним часом імпорту:")
+    for name, ms in report["packages_ms"]:
+        print(f"   {ms:9.1f} ms  {name}")
+
+    print("\n🐢 Найважчі імпорти (кумулятивно):")
+    for name, ms in report["heaviest_imports_ms"]:
+        print(f"   {ms:9.1f} ms  {name}")
+
+    eager = report["eagerly_loaded_lazy_modules"]
+    if eager:
+        print(f"\n⚠️ Завантажено при старті, хоча мало бути ліниво: {', '.join(eager)}")
+    else:
+        print("\n✅ LangChain, OpenAI, sqladmin та passlib не завантажуються при старті")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--module", default=DEFAULT_MODULE, help="Модуль для імпорту")
+    parser.add_argument("--runs", type=int, default=5, help="Кількість прогонів")
+    parser.add_argument("--top", type=int, default=20, help="Кількість рядків у розбивці")
+    parser.add_argument(
+        "--no-lambda",
+        action="store_true",
+        help="Не імітувати Lambda (адмін панель завантажується як на сервері)",
+    )
+    parser.add_argument("--json", action="store_true", help="Вивести звіт у JSON")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(PROJECT_ROOT), env.get("PYTHONPATH")]))
+    env.setdefault("OPENAI_API_KEY", "sk-profile")
+    if not args.no_lambda:
+        env.setdefault("AWS_LAMBDA_FUNCTION_NAME", "ai-swagger-bot-profile")
+
+    report = build_report(args.module, args.runs, env, args.top)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Окремий процес workers для черги завдань у БД (таблиця jobs).
+
+Запускається на будь-якій кількості вузлів: завдання розподіляються через
+SELECT ... FOR UPDATE SKIP LOCKED, тому пропускна здатність зростає разом з
+кількістю workers. SIGTERM/SIGINT зупиняє прийом нових завдань і чекає на
+завершення поточних.
+
+Використання:
+    python scripts/run_job_worker.py [--workers 4]
+    python scripts/run_job_worker.py --requeue <job_id>
+"""
+
+import argparse
+import logging
+import signal
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.job_queue import job_queue  # noqa: E402
+from src.config import Config  # noqa: E402
+
+logging.basicConfig(level=Config.LOG_LEVEL, format=Config.LOG_FORMAT)
+logger = logging.getLogger("job_worker")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "--workers", type=int, default=max(1, Config.JOB_WORKERS), help="Кількість потоків"
+    )
+    parser.add_argument("--requeue", metavar="JOB_ID", help="Повернути dead завдання в чергу")
+    args = parser.parse_args()
+
+    if args.requeue:
+        if job_queue.requeue(args.requeue):
+            print(f"✅ Завдання {args.requeue} повернуто в чергу")
+        else:
+            print(f"❌ Dead завдання {args.requeue} не знайдено")
+            sys.exit(1)
+        return
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    job_queue.start_workers(args.workers)
+    stop.wait()
+
+    logger.info("⏳ Зупинка: очікування завершення поточних завдань")
+    job_queue.shutdown(timeout=Config.EMBEDDING_SHUTDOWN_TIMEOUT_SECONDS)
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,7 @@ from typing import Any, Dict, List, Optional, Tuple
 import openai
 
 from .config import Config
+from .model_router import model_router, openai_usage
 
 
 @dataclass
@@ -38,16 +39,17 @@ class AIFixSuggestion:
 class AIErrorHandler:
     """AI обробник помилок для автоматичного виправлення та спілкування з користувачем"""
 
-    def __init__(self, openai_api_key: Optional[str] = None, model: str = "gpt-4"):
+    def __init__(self, openai_api_key: Optional[str] = None, model: Optional[str] = None):
         """
         Ініціалізація AI Error Handler
 
         Args:
             openai_api_key: API ключ OpenAI (якщо не передано, береться з .env)
-            model: Модель OpenAI для використання
+            model: Модель OpenAI (за замовчуванням - маршрут етапу error_analysis)
         """
         self.api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
-        self.model = model or os.getenv("OPENAI_MODEL", "gpt-4")
+        self.models = model_router.chain("error_analysis", model)
+        self.model = self.models[0]
 
         if not self.api_key:
             raise ValueError("OpenAI API ключ не знайдено. Встановіть OPENAI_API_KEY в .env файлі")
@@ -81,9 +83,8 @@ class AIErrorHandler:
         prompt = self._create_error_analysis_prompt(error)
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            response = self._complete(
+                [
                     {
                         "role": "system",
                         "content": """Ти експерт з API та валідації даних.
@@ -97,7 +98,6 @@ class AIErrorHandler:
                     {"role": "user", "content": prompt},
                 ],
                 max_tokens=500,
-                temperature=0.1,
             )
 
             ai_response = response.choices[0].message.content
@@ -213,9 +213,8 @@ class AIErrorHandler:
         """
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            response = self._complete(
+                [
                     {
                         "role": "system",
                         "content": "Ти експерт з API валідації та e-commerce систем. Пояснюй українською мовою.",
@@ -223,7 +222,6 @@ class AIErrorHandler:
                     {"role": "user", "content": prompt},
                 ],
                 max_tokens=400,
-                temperature=0.1,
             )
 
             return response.choices[0].message.content
@@ -232,6 +230,21 @@ class AIErrorHandler:
             print(f"❌ Помилка отримання правил валідації: {e}")
             return f"Не вдалося отримати правила валідації для {entity_type}: {str(e)}"
 
+    def _complete(self, messages: List[Dict[str, str]], max_tokens: int):
+        """Виклик моделей етапу error_analysis з fallback на наступну модель ланцюжка."""
+        return model_router.call(
+            "error_analysis",
+            lambda model, route: self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=min(max_tokens, route.max_tokens or max_tokens),
+                temperature=route.temperature,
+                timeout=route.timeout,
+            ),
+            usage=lambda response, model: openai_usage(response),
+            models=self.models,
+        )
+
     def _create_error_analysis_prompt(self, error: APIError) -> str:
         """Створює промпт для аналізу помилки"""
         prompt = f"""
@@ -3,6 +3,7 @@
 """
 
 import os
+import tempfile
 from typing import Any, Dict
 
 from dotenv import load_dotenv
@@ -23,6 +24,20 @@ class Config:
     JWT_TOKEN = os.getenv("JWT_TOKEN")
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "ai_swagger_bot_secret_key_2024")
 
+    # Кеш користувачів для авторизації запитів
+    PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+    PRINCIPAL_CACHE_MAX_SIZE = int(os.getenv("PRINCIPAL_CACHE_MAX_SIZE", "10000"))
+    # Довіряти claims з JWT (username, is_active) замість читання користувача з БД; стан
+    # is_active/updated_at перевіряється в БД раз на PRINCIPAL_CACHE_TTL_SECONDS
+    AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() == "true"
+
+    # Стиснення відповідей API: gzip для тіл, більших за поріг (байт)
+    GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1024"))
+
+    # Ліміти завантаження специфікацій: розмір файлу та розмір після розпакування gzip
+    MAX_UPLOAD_SIZE_BYTES = int(os.getenv("MAX_UPLOAD_SIZE_MB", "50")) * 1024 * 1024
+    MAX_SPEC_SIZE_BYTES = int(os.getenv("MAX_SPEC_SIZE_MB", "100")) * 1024 * 1024
+
     # Swagger налаштування
     SWAGGER_SPEC_PATH = os.getenv("SWAGGER_SPEC_PATH", "examples/swagger_specs/shop_api.json")
     BASE_URL = os.getenv("BASE_URL", "https://db62d2b2c3a5.ngrok-free.app/api")
@@ -76,6 +91,146 @@ class Config:
     RETRY_ON_MISSING_SLUG = True  # slug must be a string
     RETRY_ON_MISSING_REQUIRED_FIELDS = True  # відсутні обов'язкові поля
 
+    # Admission control для /chat: обмеження паралельних запитів та черга очікування
+    ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "16"))
+    ADMISSION_MAX_PER_USER = int(os.getenv("ADMISSION_MAX_PER_USER", "2"))
+    ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+    ADMISSION_MAX_QUEUE_PER_USER = int(os.getenv("ADMISSION_MAX_QUEUE_PER_USER", "4"))
+    ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "10"))
+
+    # Спільний бюджет LLM викликів (token bucket), 0 - без обмеження
+    LLM_CALLS_PER_SECOND = float(os.getenv("LLM_CALLS_PER_SECOND", "5"))
+    LLM_BURST = int(os.getenv("LLM_BURST", "10"))
+    LLM_BUDGET_WAIT_SECONDS = float(os.getenv("LLM_BUDGET_WAIT_SECONDS", "15"))
+
+    # Бюджети токенів payload у промптах за етапами (tiktoken); більші payload скорочуються:
+    # вибірка елементів списків зі схемою пропущених, без headers/text, обрізання рядків
+    TOKEN_BUDGET_ENABLED = os.getenv("TOKEN_BUDGET_ENABLED", "true").lower() == "true"
+    TOKEN_BUDGET_RESPONSE_FORMATTING = int(os.getenv("TOKEN_BUDGET_RESPONSE_FORMATTING", "3000"))
+    TOKEN_BUDGET_RETRY_FIX = int(os.getenv("TOKEN_BUDGET_RETRY_FIX", "1500"))
+    TOKEN_BUDGET_CONTEXT = int(os.getenv("TOKEN_BUDGET_CONTEXT", "1000"))
+    TOKEN_BUDGET_LIST_SAMPLE = int(os.getenv("TOKEN_BUDGET_LIST_SAMPLE", "5"))
+
+    # Маршрутизація моделей за етапами: швидкі моделі для наміру та форматування,
+    # більші - для виправлення помилок; наступна модель ланцюжка - при помилці чи таймауті.
+    # MODEL_ROUTES (JSON) перевизначає етапи: {"intent": {"models": ["gpt-4o-mini", "gpt-4"],
+    # "temperature": 0, "max_tokens": 500, "timeout": 20}}
+    MODEL_ROUTER_ENABLED = os.getenv("MODEL_ROUTER_ENABLED", "true").lower() == "true"
+    MODEL_ROUTES = os.getenv("MODEL_ROUTES", "")
+    # Ціни моделей, USD за 1K токенів (JSON): {"gpt-4o-mini": [0.00015, 0.0006]}
+    MODEL_PRICES = os.getenv("MODEL_PRICES", "")
+    LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "30"))
+    LLM_REQUEST_MAX_RETRIES = int(os.getenv("LLM_REQUEST_MAX_RETRIES", "1"))
+
+    # Генерація промптів через GPT при завантаженні специфікації: паралельні виклики, таймаут, повтори
+    GPT_PROMPT_CONCURRENCY = int(os.getenv("GPT_PROMPT_CONCURRENCY", "8"))
+    GPT_PROMPT_TIMEOUT_SECONDS = float(os.getenv("GPT_PROMPT_TIMEOUT_SECONDS", "60"))
+    GPT_PROMPT_MAX_RETRIES = int(os.getenv("GPT_PROMPT_MAX_RETRIES", "4"))
+    # Пакетна генерація: endpoints в одному запиті, орієнтовний ліміт токенів їх описів та
+    # ліміт токенів відповіді. Пакет вміщує стільки endpoints, скільки відповідей виміряної
+    # довжини (completion_tokens, до вимірів - GPT_PROMPT_ENDPOINT_OUTPUT_TOKENS) вміщується в
+    # ліміт; опис + відповідь пакета за замовчуванням вкладаються в контекст 8K gpt-4
+    GPT_PROMPT_BATCH_SIZE = int(os.getenv("GPT_PROMPT_BATCH_SIZE", "10"))
+    GPT_PROMPT_BATCH_MAX_TOKENS = int(os.getenv("GPT_PROMPT_BATCH_MAX_TOKENS", "3000"))
+    GPT_PROMPT_BATCH_MAX_COMPLETION_TOKENS = int(
+        os.getenv("GPT_PROMPT_BATCH_MAX_COMPLETION_TOKENS", "4500")
+    )
+    GPT_PROMPT_ENDPOINT_OUTPUT_TOKENS = int(os.getenv("GPT_PROMPT_ENDPOINT_OUTPUT_TOKENS", "450"))
+    # Режим генерації промптів при індексації: gpt (усі endpoints через GPT) або hybrid
+    # (шаблони SwaggerPromptGenerator, GPT лише для endpoints з оцінкою повноти нижче порогу)
+    PROMPT_GENERATION_MODE = os.getenv("PROMPT_GENERATION_MODE", "hybrid").lower()
+    HYBRID_PROMPT_MIN_SCORE = float(os.getenv("HYBRID_PROMPT_MIN_SCORE", "0.75"))
+    # Спільний для всіх користувачів кеш відповідей GPT за відбитком операції (gpt_prompt_cache)
+    GPT_PROMPT_CACHE_ENABLED = os.getenv("GPT_PROMPT_CACHE_ENABLED", "true").lower() == "true"
+
+    # Кеш відповідей LLM аналізу наміру (в процесі + таблиця llm_response_cache з TTL).
+    # Точний збіг за нормалізованим запитом, хешем контексту, моделлю та версією промпту;
+    # семантичний пошук за косинусною схожістю ембедінга запиту (0 - вимкнено)
+    INTENT_CACHE_ENABLED = os.getenv("INTENT_CACHE_ENABLED", "true").lower() == "true"
+    INTENT_CACHE_TTL_SECONDS = int(os.getenv("INTENT_CACHE_TTL_SECONDS", "86400"))
+    INTENT_CACHE_MAX_ENTRIES = int(os.getenv("INTENT_CACHE_MAX_ENTRIES", "2048"))
+    INTENT_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("INTENT_CACHE_SEMANTIC_THRESHOLD", "0.95"))
+    INTENT_CACHE_SEMANTIC_CANDIDATES = int(os.getenv("INTENT_CACHE_SEMANTIC_CANDIDATES", "20"))
+    # Локальний класифікатор наміру (правила + kNN по розмічених прикладах) перед викликом LLM:
+    # намір з впевненістю від порогу визначається без LLM, решта - через LLM.
+    # FAST_INTENT_CALIBRATE - поріг підбирається на розміченому наборі під цільову точність
+    # при створенні класифікатора; FAST_INTENT_MIN_CONFIDENCE - поріг без калібрування
+    FAST_INTENT_ENABLED = os.getenv("FAST_INTENT_ENABLED", "true").lower() == "true"
+    FAST_INTENT_MIN_CONFIDENCE = float(os.getenv("FAST_INTENT_MIN_CONFIDENCE", "0.85"))
+    FAST_INTENT_CALIBRATE = os.getenv("FAST_INTENT_CALIBRATE", "true").lower() == "true"
+    FAST_INTENT_TARGET_PRECISION = float(os.getenv("FAST_INTENT_TARGET_PRECISION", "0.95"))
+    FAST_INTENT_KNN = os.getenv("FAST_INTENT_KNN", "true").lower() == "true"
+    FAST_INTENT_KNN_K = int(os.getenv("FAST_INTENT_KNN_K", "5"))
+    # Режим ходу агента: structured - один виклик LLM зі структурованою відповіддю повертає
+    # намір, endpoint з top-k кандидатів та параметри; classic - намір, вибір та формування окремо
+    AGENT_TURN_MODE = os.getenv("AGENT_TURN_MODE", "structured").lower()
+    STRUCTURED_TURN_CANDIDATES = int(os.getenv("STRUCTURED_TURN_CANDIDATES", "5"))
+    # Пошук endpoints (ембедінг + векторний пошук) паралельно з історією та аналізом наміру
+    AGENT_PARALLEL_STAGES = os.getenv("AGENT_PARALLEL_STAGES", "true").lower() == "true"
+    AGENT_STAGE_WORKERS = int(os.getenv("AGENT_STAGE_WORKERS", "16"))
+
+    # Конвеєр індексації parse → enhance → embed → write: workers кожного етапу,
+    # розмір пакета chunks та місткість черг між етапами (у пакетах)
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "8"))
+    INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))
+    INGEST_ENHANCE_WORKERS = int(os.getenv("INGEST_ENHANCE_WORKERS", "4"))
+    INGEST_EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "2"))
+    INGEST_WRITE_WORKERS = int(os.getenv("INGEST_WRITE_WORKERS", "2"))
+
+    # Черга створення embeddings: кількість worker потоків, розмір історії, очікування при зупинці
+    EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "2"))
+    EMBEDDING_TASK_HISTORY = int(os.getenv("EMBEDDING_TASK_HISTORY", "1000"))
+    EMBEDDING_SHUTDOWN_TIMEOUT_SECONDS = float(
+        os.getenv("EMBEDDING_SHUTDOWN_TIMEOUT_SECONDS", "30")
+    )
+
+    # Бекенд черги завдань: memory (один процес) або database (таблиця jobs, кілька вузлів)
+    TASK_QUEUE_BACKEND = os.getenv("TASK_QUEUE_BACKEND", "memory").lower()
+    # Workers таблиці jobs на вузлі API (0 - лише окремий процес scripts/run_job_worker.py)
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+    JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "10"))
+    JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "600"))
+    JOB_POLL_INTERVAL_SECONDS = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", "2"))
+
+    # Метрики Prometheus (/metrics)
+    ENABLE_METRICS = os.getenv("ENABLE_METRICS", "false").lower() == "true"
+
+    # Адмін панель (sqladmin); в AWS Lambda за замовчуванням вимкнена для швидшого cold start
+    ENABLE_ADMIN_PANEL = (
+        os.getenv(
+            "ENABLE_ADMIN_PANEL", "false" if os.getenv("AWS_LAMBDA_FUNCTION_NAME") else "true"
+        ).lower()
+        == "true"
+    )
+
+    # Створення таблиць через create_all при старті сервера (схема ведеться міграціями alembic)
+    AUTO_CREATE_TABLES = os.getenv("AUTO_CREATE_TABLES", "false").lower() == "true"
+
+    # Кеш контейнера (пам'ять + /tmp), переживає виклики теплої Lambda.
+    # Файли в /tmp за замовчуванням лише в Lambda (ізольований /tmp); на інших хостах -
+    # тільки пам'ять, якщо WARM_CACHE_DIR не задано явно (каталог створюється з правами 0700)
+    WARM_CACHE_ENABLED = os.getenv("WARM_CACHE_ENABLED", "true").lower() == "true"
+    WARM_CACHE_DIR = os.getenv(
+        "WARM_CACHE_DIR",
+        (
+            os.path.join(tempfile.gettempdir(), "ai_swagger_bot_cache")
+            if os.getenv("AWS_LAMBDA_FUNCTION_NAME")
+            else ""
+        ),
+    )
+    WARM_CACHE_MAX_ENTRIES = int(os.getenv("WARM_CACHE_MAX_ENTRIES", "256"))
+    WARM_CACHE_MAX_DISK_MB = int(os.getenv("WARM_CACHE_MAX_DISK_MB", "256"))
+    # Пошук у знімку embeddings в пам'яті лише для специфікацій до цієї кількості endpoints
+    WARM_VECTOR_SNAPSHOT_MAX_ROWS = int(os.getenv("WARM_VECTOR_SNAPSHOT_MAX_ROWS", "5000"))
+
+    # Трасування запитів: частка трейсів, що записуються, розмір буфера, JSONL файл
+    ENABLE_TRACING = os.getenv("ENABLE_TRACING", "false").lower() == "true"
+    TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))
+    TRACE_BUFFER_SPANS = int(os.getenv("TRACE_BUFFER_SPANS", "2000"))
+    TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+
     @classmethod
     def get_database_config(cls) -> Dict[str, Any]:
         """Отримує конфігурацію бази даних."""
@@ -4,10 +4,12 @@
 
 import json
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+HTTP_METHODS = ("GET", "POST", "PUT", "DELETE", "PATCH", "HEAD", "OPTIONS")
+
 
 class EnhancedSwaggerParser:
     """Розширений парсер Swagger специфікацій."""
@@ -35,12 +37,15 @@ class EnhancedSwaggerParser:
             logger.error(f"❌ Помилка завантаження Swagger специфікації: {e}")
             raise
 
-    def parse_swagger_spec(self, swagger_data: dict) -> dict:
+    def parse_swagger_spec(
+        self, swagger_data: dict, endpoints: Optional[List[Dict[str, Any]]] = None
+    ) -> dict:
         """
         Парсить Swagger специфікацію.
 
         Args:
             swagger_data: Дані Swagger специфікації
+            endpoints: Вже отримані endpoints (інакше будуються з swagger_data)
 
         Returns:
             Розпарсені дані
@@ -52,7 +57,8 @@ class EnhancedSwaggerParser:
             base_url = self.get_base_url()
 
             # Отримуємо endpoints
-            endpoints = self.get_endpoints()
+            if endpoints is None:
+                endpoints = self.get_endpoints()
 
             # Отримуємо схеми
             schemas = self.get_schemas()
@@ -134,42 +140,38 @@ class EnhancedSwaggerParser:
         Returns:
             Список endpoints
         """
-        endpoints = []
-
         try:
             paths = self.swagger_data.get("paths", {})
-
-            for path, path_data in paths.items():
-                for method, method_data in path_data.items():
-                    if method.upper() in [
-                        "GET",
-                        "POST",
-                        "PUT",
-                        "DELETE",
-                        "PATCH",
-                        "HEAD",
-                        "OPTIONS",
-                    ]:
-                        endpoint = {
-                            "path": path,
-                            "method": method.upper(),
-                            "summary": method_data.get("summary", ""),
-                            "description": method_data.get("description", ""),
-                            "operation_id": method_data.get("operationId", ""),
-                            "tags": method_data.get("tags", []),
-                            "parameters": self._parse_parameters(method_data.get("parameters", [])),
-                            "responses": self._parse_responses(method_data.get("responses", {})),
-                            "security": method_data.get("security", []),
-                            "deprecated": method_data.get("deprecated", False),
-                        }
-                        endpoints.append(endpoint)
-
-            return endpoints
+            return list(self.iter_path_endpoints(paths.items()))
 
         except Exception as e:
             logger.error(f"❌ Помилка отримання endpoints: {e}")
             return []
 
+    def iter_path_endpoints(
+        self, path_items: Iterable[Tuple[str, Dict[str, Any]]]
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Генерує записи endpoints з пар (path, path_data).
+
+        Приймає будь-який ітерований набір пар, наприклад paths.items().
+        """
+        for path, path_data in path_items:
+            for method, method_data in path_data.items():
+                if method.upper() in HTTP_METHODS:
+                    yield {
+                        "path": path,
+                        "method": method.upper(),
+                        "summary": method_data.get("summary", ""),
+                        "description": method_data.get("description", ""),
+                        "operation_id": method_data.get("operationId", ""),
+                        "tags": method_data.get("tags", []),
+                        "parameters": self._parse_parameters(method_data.get("parameters", [])),
+                        "responses": self._parse_responses(method_data.get("responses", {})),
+                        "security": method_data.get("security", []),
+                        "deprecated": method_data.get("deprecated", False),
+                    }
+
     def _parse_parameters(self, parameters: List[Dict]) -> List[Dict]:
         """Парсить параметри endpoint."""
         parsed_params = []
@@ -0,0 +1,159 @@
+"""
+Спільний кеш генерації промптів через GPT (таблиця gpt_prompt_cache).
+
+Ключ - відбиток операції API: нормалізований опис endpoint з розгорнутими
+схемами, модель та версія промпту генератора. Однакові endpoints різних
+користувачів (наприклад, Clickone Shop API) відправляються в GPT один раз,
+далі промпти кожного користувача створюються з кешу без виклику GPT.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+logger = logging.getLogger(__name__)
+
+# INSERT з ON CONFLICT DO NOTHING для діалекту БД сесії
+INSERT_BY_DIALECT = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def resolve_refs(value: Any, document: Dict[str, Any], _stack: Tuple[str, ...] = ()) -> Any:
+    """Підставляє локальні $ref ("#/components/...") з document; циклічні посилання лишає як є."""
+    if isinstance(value, list):
+        return [resolve_refs(item, document, _stack) for item in value]
+    if not isinstance(value, dict):
+        return value
+
+    ref = value.get("$ref")
+    if isinstance(ref, str) and ref.startswith("#/") and ref not in _stack:
+        target: Any = document
+        for part in ref[2:].split("/"):
+            part = part.replace("~1", "/").replace("~0", "~")
+            target = target.get(part) if isinstance(target, dict) else None
+        if target is not None:
+            return resolve_refs(target, document, _stack + (ref,))
+
+    return {key: resolve_refs(item, document, _stack) for key, item in value.items()}
+
+
+def prompt_fingerprint(kind: str, payload: Dict[str, Any], model: str, prompt_version: str) -> str:
+    """sha256 канонічного JSON (відсортовані ключі) опису операції, моделі та версії."""
+    canonical = json.dumps(
+        {"kind": kind, "model": model, "version": prompt_version, "payload": payload},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class GPTPromptCache:
+    """Кеш відповідей GPT у базі даних; помилки БД вважаються промахом кешу."""
+
+    def __init__(self, session_factory: Optional[Callable] = None):
+        """
+        Args:
+            session_factory: Фабрика сесій SQLAlchemy (за замовчуванням api.database.SessionLocal)
+        """
+        self._session_factory = session_factory
+
+    def _session(self):
+        if self._session_factory is None:
+            from api.database import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def get_many(self, fingerprints: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Повертає збережені відповіді для знайдених відбитків і оновлює лічильник звернень."""
+        from api.models import GPTPromptCacheEntry
+
+        keys = list(dict.fromkeys(fingerprints))
+        if not keys:
+            return {}
+
+        db = self._session()
+        try:
+            rows = (
+                db.query(GPTPromptCacheEntry.fingerprint, GPTPromptCacheEntry.response)
+                .filter(GPTPromptCacheEntry.fingerprint.in_(keys))
+                .all()
+            )
+            found = {fingerprint: response for fingerprint, response in rows}
+            if found:
+                db.query(GPTPromptCacheEntry).filter(
+                    GPTPromptCacheEntry.fingerprint.in_(list(found))
+                ).update(
+                    {
+                        GPTPromptCacheEntry.hit_count: GPTPromptCacheEntry.hit_count + 1,
+                        GPTPromptCacheEntry.last_used_at: datetime.utcnow(),
+                    },
+                    synchronize_session=False,
+                )
+                db.commit()
+            return found
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"⚠️ Кеш GPT промптів недоступний: {e}")
+            return {}
+        finally:
+            db.close()
+
+    def put_many(
+        self, entries: Dict[str, Dict[str, Any]], kind: str, model: str, prompt_version: str
+    ) -> int:
+        """
+        Зберігає відповіді GPT одним INSERT ... ON CONFLICT (fingerprint) DO NOTHING.
+
+        Відбиток, який уже записав інший вузол, лишається як є разом з hit_count,
+        а решта пакета зберігається.
+
+        Returns:
+            Кількість переданих відбитків (0 - помилка БД)
+        """
+        from api.models import GPTPromptCacheEntry
+
+        if not entries:
+            return 0
+
+        db = self._session()
+        try:
+            insert = INSERT_BY_DIALECT.get(db.get_bind().dialect.name)
+            if insert is None:
+                raise ValueError(f"ON CONFLICT не підтримується: {db.get_bind().dialect.name}")
+
+            now = datetime.utcnow()
+            rows = [
+                {
+                    "fingerprint": fingerprint,
+                    "kind": kind,
+                    "model": model,
+                    "prompt_version": prompt_version,
+                    "response": response,
+                    "hit_count": 0,
+                    "created_at": now,
+                    "last_used_at": now,
+                }
+                for fingerprint, response in entries.items()
+            ]
+            db.execute(
+                insert(GPTPromptCacheEntry).on_conflict_do_nothing(index_elements=["fingerprint"]),
+                rows,
+            )
+            db.commit()
+            return len(entries)
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"⚠️ Не вдалося зберегти GPT промпти в кеш: {e}")
+            return 0
+        finally:
+            db.close()
+
+
+# Глобальний екземпляр кешу
+gpt_prompt_cache = GPTPromptCache()
@@ -4,13 +4,82 @@ GPT генератор промптів на основі Swagger специфі
 """
 
 import json
+import random
 import re
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.config import Config
+from src.gpt_prompt_cache import (
+    GPTPromptCache,
+    gpt_prompt_cache,
+    prompt_fingerprint,
+    resolve_refs,
+)
+from src.metrics import record_llm_tokens, record_retry
+from src.model_router import model_router, openai_usage
+from src.token_budget import count_tokens
+
+# Прогрес генерації: (завершено операцій, всього операцій)
+ProgressCallback = Callable[[int, int], None]
+
+# Версія промптів генератора: змінюйте при зміні system/user промптів,
+# щоб відповіді з кешу gpt_prompt_cache не використовувались для нових промптів
+PROMPT_VERSION = "1"
+
+# Поля GPTGeneratedPrompt, що зберігаються в кеші (без прив'язки до endpoint)
+CACHED_PROMPT_FIELDS = (
+    "id",
+    "name",
+    "description",
+    "template",
+    "category",
+    "tags",
+    "resource_type",
+)
+
+
+class EndpointOutputTokens:
+    """
+    Виміряна довжина відповіді GPT на один endpoint (completion_tokens з usage API).
+
+    Спільна для всіх генераторів процесу: пакети наступних індексацій плануються
+    за фактичною довжиною відповідей, а не за ліміт на найгірший випадок.
+    """
+
+    # Запас над найбільшою виміряною відповіддю; обрізаний JSON ділить пакет
+    MARGIN = 1.3
+
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
 
-import openai
-from openai import OpenAI
+    def record(self, completion_tokens: Any, endpoints: int):
+        """Зберігає середню довжину відповіді на endpoint для одного виклику GPT."""
+        if isinstance(completion_tokens, int) and completion_tokens > 0 and endpoints > 0:
+            with self._lock:
+                self._samples.append(completion_tokens / endpoints)
+
+    def budget(self, default: int, ceiling: int) -> int:
+        """Ліміт відповіді на endpoint: максимум вимірів із запасом, без вимірів - default."""
+        with self._lock:
+            measured = max(self._samples) if self._samples else None
+        if measured is None:
+            return min(default, ceiling)
+        return max(1, min(ceiling, math.ceil(measured * self.MARGIN)))
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+
+endpoint_output_stats = EndpointOutputTokens()
 
 
 @dataclass
@@ -35,6 +104,7 @@ class GPTGeneratedPrompt:
     success_rate: float = 0.0
     user_id: Optional[str] = None
     source: str = "gpt_generated"
+    model: str = ""  # модель GPT, що згенерувала промпт (ключ кешу генерації)
 
     def __post_init__(self):
         if not self.created_at:
@@ -46,36 +116,234 @@ class GPTGeneratedPrompt:
 class GPTPromptGenerator:
     """Генератор промптів через GPT на основі Swagger специфікації."""
 
-    def __init__(self, api_key: str = None, model: str = "gpt-4"):
+    def __init__(
+        self,
+        api_key: str = None,
+        model: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        request_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        batch_max_tokens: Optional[int] = None,
+        batch_max_completion_tokens: Optional[int] = None,
+        endpoint_output_tokens: Optional[int] = None,
+        prompt_cache: Optional[GPTPromptCache] = None,
+    ):
         """
         Ініціалізація генератора.
 
         Args:
             api_key: OpenAI API ключ
-            model: Модель GPT для використання
+            model: Модель GPT (за замовчуванням - маршрут етапу prompt_generation)
+            max_concurrency: Максимум одночасних викликів GPT (1 - послідовно)
+            request_timeout: Таймаут одного виклику GPT (секунди)
+            max_retries: Кількість повторів при 429, таймаутах та 5xx
+            batch_size: Кількість endpoints в одному запиті до GPT (1 - окремі запити)
+            batch_max_tokens: Орієнтовний ліміт токенів описів endpoints в одному запиті
+            batch_max_completion_tokens: Ліміт токенів відповіді пакетного запиту; пакет
+                містить не більше endpoints, ніж вміщується за виміряною довжиною відповіді
+            endpoint_output_tokens: Оцінка відповіді на endpoint до перших вимірів
+            prompt_cache: Спільний кеш відповідей GPT (за замовчуванням gpt_prompt_cache,
+                якщо GPT_PROMPT_CACHE_ENABLED)
         """
-        self.model = model
-        if api_key:
-            self.client = OpenAI(api_key=api_key)
-        else:
+        # openai імпортується лише при створенні генератора (швидший cold start API)
+        from openai import OpenAI
+
+        self.models = model_router.chain("prompt_generation", model)
+        self.model = self.models[0]
+        self.max_concurrency = max(
+            1, max_concurrency if max_concurrency is not None else Config.GPT_PROMPT_CONCURRENCY
+        )
+        self.request_timeout = request_timeout or Config.GPT_PROMPT_TIMEOUT_SECONDS
+        self.max_retries = max_retries if max_retries is not None else Config.GPT_PROMPT_MAX_RETRIES
+        self.batch_size = max(1, batch_size or Config.GPT_PROMPT_BATCH_SIZE)
+        self.batch_max_tokens = batch_max_tokens or Config.GPT_PROMPT_BATCH_MAX_TOKENS
+        self.batch_max_completion_tokens = (
+            batch_max_completion_tokens or Config.GPT_PROMPT_BATCH_MAX_COMPLETION_TOKENS
+        )
+        self.endpoint_output_tokens = (
+            endpoint_output_tokens or Config.GPT_PROMPT_ENDPOINT_OUTPUT_TOKENS
+        )
+        self.prompt_cache = prompt_cache or (
+            gpt_prompt_cache if Config.GPT_PROMPT_CACHE_ENABLED else None
+        )
+
+        # Модель, що відповіла на останній виклик GPT у поточному потоці
+        self._answered = threading.local()
+
+        # Після 429 усі потоки чекають до цього моменту (time.monotonic)
+        self._cooldown_until = 0.0
+        self._cooldown_lock = threading.Lock()
+        self._sleep = time.sleep
+
+        if not api_key:
             # Спробуємо отримати з змінних середовища
             import os
 
             api_key = os.getenv("OPENAI_API_KEY")
-            if api_key:
-                self.client = OpenAI(api_key=api_key)
-            else:
-                self.client = None
-                print("⚠️ OpenAI API ключ не знайдено. Встановіть OPENAI_API_KEY змінну середовища.")
+        if api_key:
+            # Повтори виконує _chat_completion з урахуванням спільного cooldown
+            self.client = OpenAI(api_key=api_key, max_retries=0)
+        else:
+            self.client = None
+            print("⚠️ OpenAI API ключ не знайдено. Встановіть OPENAI_API_KEY змінну середовища.")
+
+    def _chat_completion(self, messages: List[Dict[str, str]], temperature: float, max_tokens: int):
+        """
+        Виклик GPT моделями етапу prompt_generation; після повторів - наступна модель.
+
+        Модель, що відповіла, повертає _answered_model() у тому ж потоці.
+        """
+
+        def invoke(model: str, route):
+            response = self._chat_completion_with_retries(model, messages, temperature, max_tokens)
+            self._answered.model = model
+            usage = getattr(response, "usage", None)
+            self._answered.completion_tokens = getattr(usage, "completion_tokens", None)
+            return response
+
+        self._answered.model = None
+        self._answered.completion_tokens = None
+        response = model_router.call(
+            "prompt_generation",
+            invoke,
+            usage=lambda response, model: openai_usage(response),
+            models=self.models,
+        )
+        return response.choices[0].message.content
+
+    def _answered_model(self) -> str:
+        return getattr(self._answered, "model", None) or self.model
+
+    def _record_output_tokens(self, endpoints: int):
+        """Передає довжину останньої відповіді в поточному потоці у виміри endpoint_output_stats."""
+        endpoint_output_stats.record(getattr(self._answered, "completion_tokens", None), endpoints)
+
+    def _endpoint_output_budget(self) -> int:
+        return endpoint_output_stats.budget(
+            self.endpoint_output_tokens, self.ENDPOINT_COMPLETION_TOKENS
+        )
+
+    def _chat_completion_with_retries(
+        self, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int
+    ):
+        """Виклик GPT з таймаутом та повторами з backoff при 429, таймаутах та 5xx."""
+        from openai import APIConnectionError, APIStatusError, RateLimitError
+
+        attempt = 0
+        while True:
+            self._wait_for_cooldown()
+            try:
+                response = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    timeout=self.request_timeout,
+                )
+            except (APIConnectionError, APIStatusError) as e:
+                status_code = getattr(e, "status_code", None)
+                retryable = isinstance(e, APIConnectionError) or status_code in (408, 409, 429)
+                retryable = retryable or (status_code is not None and status_code >= 500)
+                if not retryable or attempt >= self.max_retries:
+                    raise
+
+                delay = self._retry_delay(e, attempt)
+                if isinstance(e, RateLimitError):
+                    # Ліміт спільний для всіх потоків - пригальмовуємо всіх
+                    self._set_cooldown(delay)
+                    record_retry("gpt_rate_limit")
+                else:
+                    record_retry("gpt")
+                attempt += 1
+                print(
+                    f"⏳ GPT {status_code or type(e).__name__}: "
+                    f"повтор {attempt}/{self.max_retries} через {delay:.1f}с"
+                )
+                if not isinstance(e, RateLimitError):
+                    self._sleep(delay)
+                continue
+
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                record_llm_tokens("prompt", getattr(usage, "prompt_tokens", 0), "prompt_generation")
+                record_llm_tokens(
+                    "completion", getattr(usage, "completion_tokens", 0), "prompt_generation"
+                )
+            return response
+
+    @staticmethod
+    def _retry_delay(error: Exception, attempt: int) -> float:
+        """Затримка перед повтором: Retry-After від OpenAI або експоненційна з jitter."""
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(60.0, max(0.0, float(retry_after)))
+            except ValueError:
+                pass
+        return min(30.0, 2**attempt) * random.uniform(0.5, 1.0)
+
+    def _set_cooldown(self, delay: float):
+        with self._cooldown_lock:
+            self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+
+    def _wait_for_cooldown(self):
+        with self._cooldown_lock:
+            remaining = self._cooldown_until - time.monotonic()
+        if remaining > 0:
+            self._sleep(remaining)
+
+    def _map_concurrently(
+        self,
+        func: Callable[..., Any],
+        items: List[Tuple],
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> List[Any]:
+        """Виконує func(*item) для кожного елемента, зберігаючи порядок результатів."""
+        total = len(items)
+        done = 0
+        done_lock = threading.Lock()
+
+        def run(item: Tuple) -> Any:
+            nonlocal done
+            try:
+                return func(*item)
+            finally:
+                if progress_callback:
+                    with done_lock:
+                        done += 1
+                        completed = done
+                    try:
+                        progress_callback(completed, total)
+                    except Exception as e:
+                        print(f"⚠️ Помилка callback прогресу: {e}")
+
+        if self.max_concurrency == 1 or total <= 1:
+            return [run(item) for item in items]
+
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_concurrency, total), thread_name_prefix="gpt-prompts"
+        ) as executor:
+            return list(executor.map(run, items))
 
     def generate_prompts_from_swagger(
-        self, swagger_data: Dict[str, Any]
+        self,
+        swagger_data: Dict[str, Any],
+        progress_callback: Optional[ProgressCallback] = None,
     ) -> List[GPTGeneratedPrompt]:
         """
         Генерує промпти через GPT на основі Swagger специфікації.
 
+        Виклики для endpoints та ресурсів виконуються паралельно (не більше
+        max_concurrency одночасно), порядок результатів відповідає порядку
+        операцій у специфікації. При batch_size > 1 кілька endpoints
+        передаються в одному запиті зі спільним описом API.
+
         Args:
             swagger_data: Дані Swagger специфікації
+            progress_callback: Викликається після кожного виклику GPT з (завершено, всього)
 
         Returns:
             Список згенерованих промптів
@@ -84,25 +352,128 @@ class GPTPromptGenerator:
             print("❌ OpenAI клієнт не ініціалізований")
             return []
 
-        prompts = []
-
         # Аналізуємо paths та генеруємо промпти для кожного endpoint
+        operations = []
         paths = swagger_data.get("paths", {})
         for path, path_data in paths.items():
             for method, method_data in path_data.items():
                 if method.upper() in ["GET", "POST", "PUT", "PATCH", "DELETE"]:
-                    prompt = self._generate_prompt_for_endpoint(
-                        path, method, method_data, swagger_data
-                    )
-                    if prompt:
-                        prompts.append(prompt)
+                    operations.append((path, method, method_data, swagger_data))
+
+        resources = self._collect_resources(swagger_data)
+        total = len(operations) + len(resources)
+
+        def endpoint_progress(done: int, _: int):
+            progress_callback(done, total)
+
+        def resource_progress(done: int, _: int):
+            progress_callback(len(operations) + done, total)
+
+        prompts = self.generate_prompts_for_operations(
+            operations, swagger_data, endpoint_progress if progress_callback else None
+        )
 
         # Генеруємо загальні промпти для ресурсів
-        resource_prompts = self._generate_resource_prompts(swagger_data)
-        prompts.extend(resource_prompts)
+        prompts += self._map_concurrently(
+            self._generate_general_resource_prompt,
+            [(resource, swagger_data) for resource in resources],
+            resource_progress if progress_callback else None,
+        )
+
+        return [prompt for prompt in prompts if prompt]
+
+    def generate_prompts_for_operations(
+        self,
+        operations: List[Tuple],
+        swagger_data: Dict[str, Any],
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> List[Optional[GPTGeneratedPrompt]]:
+        """
+        Генерує промпти для переданих операцій (path, method, method_data, swagger_data).
 
+        Результат вирівняний з operations: None для операцій, для яких GPT не дав промпт.
+        Операції, знайдені в кеші генерації, не відправляються в GPT.
+        """
+        # Відбиток - опис endpoint з розгорнутими $ref схемами та блок API з того ж запиту
+        # до GPT: відповідь, згенерована з метаданих іншого API, не потрапляє в чужий кеш
+        api = self._api_info(swagger_data)
+        payloads = [
+            {
+                **resolve_refs(
+                    self._prepare_endpoint_info(path, method, method_data, swagger_data),
+                    swagger_data,
+                ),
+                "api": api,
+            }
+            for path, method, method_data, _ in operations
+        ]
+        fingerprints = [self._fingerprint("endpoint", payload) for payload in payloads]
+        cached = self._cache_get(fingerprints)
+        prompts: List[Optional[GPTGeneratedPrompt]] = [
+            (
+                self._prompt_from_response(cached[fingerprint], path, method, self.model)
+                if fingerprint in cached
+                else None
+            )
+            for (path, method, _, _), fingerprint in zip(operations, fingerprints)
+        ]
+        missing = [i for i, fingerprint in enumerate(fingerprints) if fingerprint not in cached]
+        hits = len(operations) - len(missing)
+        if hits:
+            print(f"♻️ {hits} з {len(operations)} промптів endpoints взято з кешу генерації")
+            if progress_callback:
+                progress_callback(hits, len(operations))
+        if not missing:
+            return prompts
+
+        if not self.client:
+            print("❌ OpenAI клієнт не ініціалізований")
+            return prompts
+
+        def missing_progress(done: int, _: int):
+            progress_callback(hits + done, len(operations))
+
+        missing_operations = [operations[i] for i in missing]
+        if self.batch_size > 1:
+            generated = self._generate_endpoint_prompts_batched(
+                missing_operations, swagger_data, missing_progress if progress_callback else None
+            )
+        else:
+            generated = self._map_concurrently(
+                self._generate_prompt_for_endpoint,
+                missing_operations,
+                missing_progress if progress_callback else None,
+            )
+
+        # Відповідь резервної моделі зберігається під ключем цієї моделі
+        by_model: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for i, prompt in zip(missing, generated):
+            prompts[i] = prompt
+            if prompt:
+                fingerprint = self._fingerprint("endpoint", payloads[i], prompt.model)
+                by_model.setdefault(prompt.model, {})[fingerprint] = self._cached_fields(prompt)
+        for model, entries in by_model.items():
+            self._cache_put(entries, "endpoint", model)
         return prompts
 
+    def _fingerprint(self, kind: str, payload: Dict[str, Any], model: Optional[str] = None) -> str:
+        return prompt_fingerprint(kind, payload, model or self.model, PROMPT_VERSION)
+
+    @staticmethod
+    def _cached_fields(prompt: GPTGeneratedPrompt) -> Dict[str, Any]:
+        return {field: getattr(prompt, field) for field in CACHED_PROMPT_FIELDS}
+
+    def _cache_get(self, fingerprints: List[str]) -> Dict[str, Dict[str, Any]]:
+        if self.prompt_cache is None:
+            return {}
+        return self.prompt_cache.get_many(fingerprints)
+
+    def _cache_put(self, entries: Dict[str, Dict[str, Any]], kind: str, model: str):
+        if self.prompt_cache is not None and entries:
+            self.prompt_cache.put_many(
+                entries, kind=kind, model=model, prompt_version=PROMPT_VERSION
+            )
+
     def _generate_prompt_for_endpoint(
         self, path: str, method: str, method_data: Dict[str, Any], swagger_data: Dict[str, Any]
     ) -> Optional[GPTGeneratedPrompt]:
@@ -112,31 +483,39 @@ class GPTPromptGenerator:
         endpoint_info = self._prepare_endpoint_info(path, method, method_data, swagger_data)
 
         # Генеруємо промпт через GPT
-        gpt_response = self._call_gpt_for_prompt_generation(endpoint_info)
+        gpt_response = self._call_gpt_for_prompt_generation(endpoint_info, swagger_data)
 
         if not gpt_response:
             return None
 
         # Парсимо відповідь GPT
         try:
-            parsed_response = json.loads(gpt_response)
-
-            return GPTGeneratedPrompt(
-                id=parsed_response.get("id", f"gpt_{method}_{path.replace('/', '_')}"),
-                name=parsed_response.get("name", f"GPT промпт для {method} {path}"),
-                description=parsed_response.get("description", ""),
-                template=parsed_response.get("template", ""),
-                category=parsed_response.get("category", "user_defined"),
-                tags=parsed_response.get("tags", []),
-                resource_type=parsed_response.get("resource_type", "custom"),
-                endpoint_path=path,
-                http_method=method.upper(),
+            return self._prompt_from_response(
+                json.loads(gpt_response), path, method, self._answered_model()
             )
 
         except json.JSONDecodeError:
             print(f"⚠️ Помилка парсингу відповіді GPT для {method} {path}")
             return None
 
+    @staticmethod
+    def _prompt_from_response(
+        parsed_response: Dict[str, Any], path: str, method: str, model: str = ""
+    ) -> GPTGeneratedPrompt:
+        """Створює GPTGeneratedPrompt з JSON відповіді GPT для endpoint."""
+        return GPTGeneratedPrompt(
+            id=parsed_response.get("id", f"gpt_{method}_{path.replace('/', '_')}"),
+            name=parsed_response.get("name", f"GPT промпт для {method} {path}"),
+            description=parsed_response.get("description", ""),
+            template=parsed_response.get("template", ""),
+            category=parsed_response.get("category", "user_defined"),
+            tags=parsed_response.get("tags", []),
+            resource_type=parsed_response.get("resource_type", "custom"),
+            endpoint_path=path,
+            http_method=method.upper(),
+            model=model,
+        )
+
     def _prepare_endpoint_info(
         self, path: str, method: str, method_data: Dict[str, Any], swagger_data: Dict[str, Any]
     ) -> Dict[str, Any]:
@@ -165,7 +544,52 @@ class GPTPromptGenerator:
             "responses": method_data.get("responses", {}),
         }
 
-    def _call_gpt_for_prompt_generation(self, endpoint_info: Dict[str, Any]) -> Optional[str]:
+    @staticmethod
+    def _api_info(swagger_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Метадані API, що передаються в GPT разом з endpoints (входять у відбиток кешу)."""
+        info = swagger_data.get("info", {})
+        servers = swagger_data.get("servers", [])
+        return {
+            "title": info.get("title", "Unknown API"),
+            "version": info.get("version", "Unknown"),
+            "description": info.get("description", "Немає опису"),
+            "base_url": servers[0].get("url", "") if servers else "",
+        }
+
+    @classmethod
+    def _api_info_text(cls, swagger_data: Dict[str, Any]) -> str:
+        """Блок з інформацією про API, спільний для всіх endpoints специфікації."""
+        api = cls._api_info(swagger_data)
+        return f"""API ІНФОРМАЦІЯ:
+- Назва: {api['title']}
+- Версія: {api['version']}
+- Опис: {api['description']}
+- Base URL: {api['base_url']}"""
+
+    @staticmethod
+    def _endpoint_text(endpoint_info: Dict[str, Any]) -> str:
+        """Опис одного endpoint для запиту до GPT."""
+        request_schema = endpoint_info["request_schema"]
+        response_schema = endpoint_info["response_schema"]
+        return f"""ENDPOINT: {endpoint_info['method']} {endpoint_info['path']}
+РЕСУРС: {endpoint_info['resource_type']}
+ОПЕРАЦІЯ: {endpoint_info['operation_id']}
+ОПИС: {endpoint_info['summary']}
+ДЕТАЛЬНИЙ ОПИС: {endpoint_info['description']}
+ТЕГИ: {endpoint_info['tags']}
+
+ПАРАМЕТРИ:
+{json.dumps(endpoint_info['parameters'], indent=2, ensure_ascii=False)}
+
+СХЕМА ЗАПИТУ:
+{json.dumps(request_schema, indent=2, ensure_ascii=False) if request_schema else 'Немає схеми запиту'}
+
+СХЕМА ВІДПОВІДІ:
+{json.dumps(response_schema, indent=2, ensure_ascii=False) if response_schema else 'Немає схеми відповіді'}"""
+
+    def _call_gpt_for_prompt_generation(
+        self, endpoint_info: Dict[str, Any], swagger_data: Dict[str, Any]
+    ) -> Optional[str]:
         """Викликає GPT для генерації промпту."""
 
         system_prompt = """
@@ -192,35 +616,12 @@ class GPTPromptGenerator:
 }
 """
 
-        # Отримуємо інформацію про API
-        info = swagger_data.get("info", {})
-        servers = swagger_data.get("servers", [])
-        base_url = servers[0].get("url", "") if servers else ""
-
         user_prompt = f"""
 Створи промпт для наступного API endpoint:
 
-API ІНФОРМАЦІЯ:
-- Назва: {info.get('title', 'Unknown API')}
-- Версія: {info.get('version', 'Unknown')}
-- Опис: {info.get('description', 'Немає опису')}
-- Base URL: {base_url}
+{self._api_info_text(swagger_data)}
 
-ENDPOINT: {endpoint_info['method']} {endpoint_info['path']}
-РЕСУРС: {endpoint_info['resource_type']}
-ОПЕРАЦІЯ: {endpoint_info['operation_id']}
-ОПИС: {endpoint_info['summary']}
-ДЕТАЛЬНИЙ ОПИС: {endpoint_info['description']}
-ТЕГИ: {endpoint_info['tags']}
-
-ПАРАМЕТРИ:
-{json.dumps(endpoint_info['parameters'], indent=2, ensure_ascii=False)}
-
-СХЕМА ЗАПИТУ:
-{json.dumps(endpoint_info['request_schema'], indent=2, ensure_ascii=False) if endpoint_info['request_schema'] else 'Немає схеми запиту'}
-
-СХЕМА ВІДПОВІДІ:
-{json.dumps(endpoint_info['response_schema'], indent=2, ensure_ascii=False) if endpoint_info['response_schema'] else 'Немає схеми відповіді'}
+{self._endpoint_text(endpoint_info)}
 
 ВАЖЛИВО: Поверни ТІЛЬКИ JSON без markdown форматування.
 
@@ -228,22 +629,217 @@ ENDPOINT: {endpoint_info['method']} {endpoint_info['path']}
 """
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            content = self._chat_completion(
+                [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt},
                 ],
                 temperature=0.7,
-                max_tokens=2000,
+                max_tokens=self.ENDPOINT_COMPLETION_TOKENS,
             )
-
-            return response.choices[0].message.content
+            self._record_output_tokens(1)
+            return content
 
         except Exception as e:
             print(f"❌ Помилка виклику GPT: {e}")
             return None
 
+    # Ліміт відповіді окремого запиту і верхня межа виміряної довжини відповіді на endpoint
+    # у пакеті; пакет отримує ліміт за вимірами endpoint_output_stats
+    ENDPOINT_COMPLETION_TOKENS = 2000
+
+    @staticmethod
+    def _endpoint_key(method: str, path: str) -> str:
+        return f"{method.upper()} {path}"
+
+    def _estimate_tokens(self, text: str) -> int:
+        """Кількість токенів тексту (tiktoken, без нього - ~3 символи на токен)."""
+        return count_tokens(text, self.model)
+
+    @staticmethod
+    def _parse_json_response(gpt_response: str) -> Any:
+        """Розбирає JSON відповіді GPT, у тому числі обгорнутий у ```json."""
+        text = gpt_response.strip()
+        if text.startswith("```"):
+            text = text.split("\n", 1)[1] if "\n" in text else ""
+            text = text.rsplit("```", 1)[0]
+        return json.loads(text)
+
+    def _plan_batches(
+        self, endpoints: List[Tuple[str, Dict[str, Any]]]
+    ) -> List[List[Tuple[str, Dict[str, Any]]]]:
+        """
+        Пакує endpoints у пакети не більше batch_size та batch_max_tokens; відповідь
+        пакета (виміряна довжина на endpoint) має вміщуватись у batch_max_completion_tokens.
+        """
+        batch_size = min(
+            self.batch_size,
+            max(1, self.batch_max_completion_tokens // self._endpoint_output_budget()),
+        )
+        batches: List[List[Tuple[str, Dict[str, Any]]]] = []
+        current: List[Tuple[str, Dict[str, Any]]] = []
+        tokens = 0
+        for key, endpoint_info in endpoints:
+            cost = self._estimate_tokens(self._endpoint_text(endpoint_info))
+            if current and (len(current) >= batch_size or tokens + cost > self.batch_max_tokens):
+                batches.append(current)
+                current, tokens = [], 0
+            current.append((key, endpoint_info))
+            tokens += cost
+        if current:
+            batches.append(current)
+        return batches
+
+    def _call_gpt_for_prompt_batch(
+        self, batch: List[Tuple[str, Dict[str, Any]]], swagger_data: Dict[str, Any]
+    ) -> Dict[str, Tuple[Dict[str, Any], str]]:
+        """
+        Один запит до GPT для кількох endpoints.
+
+        Returns:
+            (відповідь, модель, що відповіла) за ключем "METHOD path"
+        """
+
+        system_prompt = """
+Ти - експерт з генерації промптів для AI чат-ботів, які працюють з API.
+
+Для КОЖНОГО endpoint зі списку створи окремий промпт для чат-бота, який допомагає користувачам взаємодіяти з API через природну мову. Промпт повинен:
+1. Бути зрозумілим та корисним
+2. Включати практичні приклади
+3. Пояснювати параметри та їх призначення
+4. Допомагати з валідацією даних
+5. Надавати приклади успішних та неуспішних сценаріїв
+
+Відповідай JSON масивом, по одному об'єкту на endpoint:
+[
+    {
+        "key": "METHOD /path - точно як у заголовку endpoint",
+        "id": "унікальний_ідентифікатор",
+        "name": "Назва промпту",
+        "description": "Опис промпту",
+        "template": "Шаблон промпту з {user_query}",
+        "category": "категорія (data_retrieval/data_creation/data_update/data_deletion/user_defined)",
+        "tags": ["тег1", "тег2"],
+        "resource_type": "тип_ресурсу"
+    }
+]
+"""
+
+        endpoints_text = "\n\n".join(
+            f"### {key}\n{self._endpoint_text(endpoint_info)}" for key, endpoint_info in batch
+        )
+        user_prompt = f"""
+Створи промпти для наступних {len(batch)} API endpoints:
+
+{self._api_info_text(swagger_data)}
+
+{endpoints_text}
+
+ВАЖЛИВО: Поверни ТІЛЬКИ JSON масив без markdown форматування, {len(batch)} елементів.
+"""
+
+        gpt_response = self._chat_completion(
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=0.7,
+            max_tokens=min(
+                self.batch_max_completion_tokens, self._endpoint_output_budget() * len(batch)
+            ),
+        )
+
+        model = self._answered_model()
+        parsed = self._parse_json_response(gpt_response)
+        items = parsed.get("prompts", []) if isinstance(parsed, dict) else parsed
+        expected = {key for key, _ in batch}
+        results = {
+            item["key"]: (item, model)
+            for item in items or []
+            if isinstance(item, dict) and item.get("key") in expected
+        }
+        self._record_output_tokens(len(results))
+        return results
+
+    def _generate_batch(
+        self, batch: List[Tuple[str, Dict[str, Any]]], swagger_data: Dict[str, Any]
+    ) -> Dict[str, Tuple[Dict[str, Any], str]]:
+        """Генерує пакет; при помилці чи неповній відповіді ділить решту навпіл і повторює."""
+        try:
+            results = self._call_gpt_for_prompt_batch(batch, swagger_data)
+        except Exception as e:
+            print(f"⚠️ Пакетний запит GPT для {len(batch)} endpoints не вдався: {e}")
+            results = {}
+
+        missing = [(key, info) for key, info in batch if key not in results]
+        if not missing:
+            return results
+
+        if len(missing) == 1:
+            # Останній endpoint - звичайний запит для одного endpoint
+            key, endpoint_info = missing[0]
+            gpt_response = self._call_gpt_for_prompt_generation(endpoint_info, swagger_data)
+            if gpt_response:
+                try:
+                    results[key] = (
+                        self._parse_json_response(gpt_response),
+                        self._answered_model(),
+                    )
+                except ValueError:
+                    print(f"⚠️ Помилка парсингу відповіді GPT для {key}")
+            return results
+
+        print(f"🔁 GPT не повернув {len(missing)} з {len(batch)} endpoints, ділимо пакет")
+        middle = len(missing) // 2
+        for part in (missing[:middle], missing[middle:]):
+            results.update(self._generate_batch(part, swagger_data))
+        return results
+
+    def _generate_endpoint_prompts_batched(
+        self,
+        operations: List[Tuple],
+        swagger_data: Dict[str, Any],
+        progress_callback: Optional[ProgressCallback] = None,
+    ) -> List[Optional[GPTGeneratedPrompt]]:
+        """Генерує промпти для endpoints пакетами, пакети виконуються паралельно."""
+        endpoints = [
+            (
+                self._endpoint_key(method, path),
+                path,
+                method,
+                self._prepare_endpoint_info(path, method, method_data, swagger_data),
+            )
+            for path, method, method_data, _ in operations
+        ]
+        batches = self._plan_batches([(key, info) for key, _, _, info in endpoints])
+        print(f"📦 {len(endpoints)} endpoints у {len(batches)} пакетних запитах до GPT")
+
+        done = 0
+        done_lock = threading.Lock()
+
+        def run(batch: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Tuple[Dict[str, Any], str]]:
+            nonlocal done
+            results = self._generate_batch(batch, swagger_data)
+            if progress_callback:
+                with done_lock:
+                    done += len(batch)
+                    completed = done
+                progress_callback(completed, len(endpoints))
+            return results
+
+        merged: Dict[str, Tuple[Dict[str, Any], str]] = {}
+        for results in self._map_concurrently(run, [(batch,) for batch in batches]):
+            merged.update(results)
+
+        prompts: List[Optional[GPTGeneratedPrompt]] = []
+        for key, path, method, _ in endpoints:
+            if key in merged:
+                response, model = merged[key]
+                prompts.append(self._prompt_from_response(response, path, method, model))
+            else:
+                prompts.append(None)
+        return prompts
+
     def _detect_resource_type(self, path: str) -> str:
         """Визначає тип ресурсу на основі шляху."""
         path_lower = path.lower()
@@ -313,29 +909,25 @@ ENDPOINT: {endpoint_info['method']} {endpoint_info['path']}
             for param in parameters
         ]
 
-    def _generate_resource_prompts(self, swagger_data: Dict[str, Any]) -> List[GPTGeneratedPrompt]:
-        """Генерує загальні промпти для ресурсів через GPT."""
-        if not self.client:
-            return []
-
-        prompts = []
-
-        # Знаходимо всі унікальні ресурси
+    def _collect_resources(self, swagger_data: Dict[str, Any]) -> List[str]:
+        """Унікальні типи ресурсів специфікації у стабільному порядку."""
         resources = set()
-        paths = swagger_data.get("paths", {})
-
-        for path in paths.keys():
+        for path in swagger_data.get("paths", {}).keys():
             resource_type = self._detect_resource_type(path)
             if resource_type != "custom":
                 resources.add(resource_type)
+        return sorted(resources)
 
-        # Генеруємо промпти для кожного ресурсу
-        for resource in resources:
-            prompt = self._generate_general_resource_prompt(resource, swagger_data)
-            if prompt:
-                prompts.append(prompt)
+    def generate_resource_prompts(self, swagger_data: Dict[str, Any]) -> List[GPTGeneratedPrompt]:
+        """Генерує загальні промпти для ресурсів через GPT."""
+        if not self.client:
+            return []
 
-        return prompts
+        prompts = self._map_concurrently(
+            self._generate_general_resource_prompt,
+            [(resource, swagger_data) for resource in self._collect_resources(swagger_data)],
+        )
+        return [prompt for prompt in prompts if prompt]
 
     def _generate_general_resource_prompt(
         self, resource_type: str, swagger_data: Dict[str, Any]
@@ -369,6 +961,18 @@ ENDPOINT: {endpoint_info['method']} {endpoint_info['path']}
                             }
                         )
 
+        payload = {
+            "resource_type": resource_type,
+            "api": {key: info.get(key) for key in ("title", "version", "description")},
+            "endpoints": resource_endpoints[:5],
+        }
+        fingerprint = self._fingerprint("resource", payload)
+        cached = self._cache_get([fingerprint])
+        if fingerprint in cached:
+            prompt = self._resource_prompt_from_response(cached[fingerprint], resource_type)
+            prompt.model = self.model
+            return prompt
+
         user_prompt = f"""
 Створи загальний промпт для роботи з ресурсом типу: {resource_type}
 
@@ -397,9 +1001,8 @@ API ІНФОРМАЦІЯ:
 """
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            gpt_response = self._chat_completion(
+                [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt},
                 ],
@@ -407,22 +1010,17 @@ API ІНФОРМАЦІЯ:
                 max_tokens=1500,
             )
 
-            gpt_response = response.choices[0].message.content
-
             try:
-                parsed_response = json.loads(gpt_response)
-
-                return GPTGeneratedPrompt(
-                    id=parsed_response.get("id", f"gpt_general_{resource_type}"),
-                    name=parsed_response.get("name", f"Загальний промпт для {resource_type}"),
-                    description=parsed_response.get("description", ""),
-                    template=parsed_response.get("template", ""),
-                    category=parsed_response.get("category", "data_retrieval"),
-                    tags=parsed_response.get("tags", []),
-                    resource_type=resource_type,
-                    endpoint_path="",
-                    http_method="",
+                prompt = self._resource_prompt_from_response(
+                    json.loads(gpt_response), resource_type
+                )
+                prompt.model = self._answered_model()
+                if prompt.model != self.model:
+                    fingerprint = self._fingerprint("resource", payload, prompt.model)
+                self._cache_put(
+                    {fingerprint: self._cached_fields(prompt)}, "resource", prompt.model
                 )
+                return prompt
 
             except json.JSONDecodeError:
                 print(f"⚠️ Помилка парсингу відповіді GPT для ресурсу {resource_type}")
@@ -432,6 +1030,23 @@ API ІНФОРМАЦІЯ:
             print(f"❌ Помилка виклику GPT для ресурсу {resource_type}: {e}")
             return None
 
+    @staticmethod
+    def _resource_prompt_from_response(
+        parsed_response: Dict[str, Any], resource_type: str
+    ) -> GPTGeneratedPrompt:
+        """Створює GPTGeneratedPrompt з JSON відповіді GPT для ресурсу."""
+        return GPTGeneratedPrompt(
+            id=parsed_response.get("id", f"gpt_general_{resource_type}"),
+            name=parsed_response.get("name", f"Загальний промпт для {resource_type}"),
+            description=parsed_response.get("description", ""),
+            template=parsed_response.get("template", ""),
+            category=parsed_response.get("category", "data_retrieval"),
+            tags=parsed_response.get("tags", []),
+            resource_type=resource_type,
+            endpoint_path="",
+            http_method="",
+        )
+
     def generate_smart_suggestions(self, swagger_data: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
         Генерує розумні підказки для користувача на основі Swagger.
@@ -516,9 +1131,8 @@ Base URL: {swagger_data.get('servers', [{}])[0].get('url', 'Unknown') if swagger
 """
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            gpt_response = self._chat_completion(
+                [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt},
                 ],
@@ -526,8 +1140,6 @@ Base URL: {swagger_data.get('servers', [{}])[0].get('url', 'Unknown') if swagger
                 max_tokens=2000,
             )
 
-            gpt_response = response.choices[0].message.content
-
             try:
                 # Спробуємо витягти JSON з markdown коду
                 if "```json" in gpt_response:
@@ -0,0 +1,121 @@
+"""
+Гібридна генерація промптів: спочатку шаблони SwaggerPromptGenerator, GPT - лише для прогалин.
+
+Шаблонний генератор працює без мережі. Кожен шаблонний промпт отримує
+оцінку повноти; в GPT відправляються лише endpoints з оцінкою нижче порогу
+(немає опису, параметри без описів, відсутні схеми або невідомий ресурс).
+Типові CRUD endpoints з повною специфікацією обходяться без виклику LLM.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config import Config
+from src.swagger_prompt_generator import SwaggerPromptGenerator
+
+logger = logging.getLogger(__name__)
+
+
+class HybridPromptGenerator:
+    """Генератор з інтерфейсом GPTPromptGenerator, що використовує GPT лише для прогалин шаблонів."""
+
+    def __init__(
+        self,
+        gpt_generator=None,
+        template_generator: Optional[SwaggerPromptGenerator] = None,
+        min_score: Optional[float] = None,
+    ):
+        """
+        Args:
+            gpt_generator: GPTPromptGenerator для endpoints з низькою оцінкою (None - лише шаблони)
+            template_generator: Детермінований генератор шаблонів
+            min_score: Мінімальна оцінка повноти шаблону (0.0 - 1.0), нижче - GPT
+        """
+        self.gpt_generator = gpt_generator
+        self.template_generator = template_generator or SwaggerPromptGenerator()
+        self.min_score = Config.HYBRID_PROMPT_MIN_SCORE if min_score is None else min_score
+
+        self._lock = threading.Lock()
+        self._template_count = 0
+        self._gpt_count = 0
+        self._gpt_failed = 0
+        self._template_seconds = 0.0
+        self._gpt_seconds = 0.0
+
+    def generate_prompts_for_operations(
+        self,
+        operations: List[Tuple],
+        swagger_data: Dict[str, Any],
+        progress_callback=None,
+    ) -> List[Optional[Any]]:
+        """
+        Генерує промпти для операцій (path, method, method_data, swagger_data).
+
+        Результат вирівняний з operations, як у GPTPromptGenerator.
+        """
+        started = time.perf_counter()
+        prompts: List[Optional[Any]] = []
+        gaps: List[int] = []
+        for index, (path, method, method_data, _) in enumerate(operations):
+            prompt = None
+            score = self.template_generator.completeness_score(
+                path, method, method_data, swagger_data
+            )
+            if score >= self.min_score:
+                prompt = self.template_generator.generate_endpoint_prompt(
+                    path, method, method_data, swagger_data
+                )
+            if prompt is None:
+                gaps.append(index)
+            prompts.append(prompt)
+        template_seconds = time.perf_counter() - started
+
+        gpt_seconds = 0.0
+        failed = len(gaps)
+        if gaps and self.gpt_generator is not None:
+            started = time.perf_counter()
+            generated = self.gpt_generator.generate_prompts_for_operations(
+                [operations[i] for i in gaps], swagger_data
+            )
+            gpt_seconds = time.perf_counter() - started
+            for i, prompt in zip(gaps, generated):
+                prompts[i] = prompt
+            failed = sum(1 for i in gaps if prompts[i] is None)
+
+        with self._lock:
+            self._template_count += len(operations) - len(gaps)
+            self._gpt_count += len(gaps)
+            self._gpt_failed += failed
+            self._template_seconds += template_seconds
+            self._gpt_seconds += gpt_seconds
+
+        if progress_callback:
+            progress_callback(len(operations), len(operations))
+        return prompts
+
+    def generate_resource_prompts(self, swagger_data: Dict[str, Any]) -> List[Any]:
+        """Загальні промпти ресурсів - шаблонні, без виклику GPT."""
+        return self.template_generator.generate_resource_prompts(swagger_data)
+
+    def report(self) -> Dict[str, Any]:
+        """Розподіл endpoints між шаблонами та GPT і оцінка зекономленого часу."""
+        with self._lock:
+            gpt_per_endpoint = self._gpt_seconds / self._gpt_count if self._gpt_count else None
+            return {
+                "mode": "hybrid",
+                "min_score": self.min_score,
+                "endpoints": self._template_count + self._gpt_count,
+                "template": self._template_count,
+                "gpt": self._gpt_count,
+                "gpt_failed": self._gpt_failed,
+                "template_seconds": round(self._template_seconds, 3),
+                "gpt_seconds": round(self._gpt_seconds, 3),
+                # Оцінка за середнім часом GPT на endpoint у цій специфікації
+                "estimated_seconds_saved": (
+                    round(self._template_count * gpt_per_endpoint, 1)
+                    if gpt_per_endpoint is not None
+                    else None
+                ),
+            }
@@ -0,0 +1,230 @@
+"""
+Потоковий конвеєр обробки з обмеженими чергами між етапами.
+
+Кожен етап має власну кількість worker потоків і читає пакети з черги
+попереднього етапу. Черги обмежені, тому швидкий етап не накопичує роботу:
+поки пакет k записується в БД, пакет k+1 отримує embeddings, а пакет k+2
+покращується GPT. Після завершення конвеєр повертає звіт з пропускною
+здатністю кожного етапу.
+"""
+
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sized
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+@dataclass
+class PipelineStage:
+    """Етап конвеєра: func(пакет) -> пакет для наступного етапу (None - відкинути)."""
+
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+
+
+@dataclass
+class StageStats:
+    """Статистика етапу: пакети, елементи, час роботи та помилки."""
+
+    name: str
+    workers: int = 1
+    batches: int = 0
+    items: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, items: int, seconds: float, failed: bool = False):
+        with self._lock:
+            self.batches += 1
+            self.items += items
+            self.busy_seconds += seconds
+            if failed:
+                self.errors += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        wall = (self.finished_at or time.perf_counter()) - (self.started_at or time.perf_counter())
+        return {
+            "workers": self.workers,
+            "batches": self.batches,
+            "items": self.items,
+            "errors": self.errors,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "wall_seconds": round(wall, 3),
+            "items_per_second": round(self.items / wall, 2) if wall > 0 else None,
+            # Частка часу, коли workers етапу були зайняті (1.0 - вузьке місце)
+            "utilization": (
+                round(self.busy_seconds / (wall * self.workers), 2) if wall > 0 else None
+            ),
+        }
+
+
+def _size(batch: Any) -> int:
+    return len(batch) if isinstance(batch, Sized) else 1
+
+
+class StagedPipeline:
+    """Конвеєр етапів з обмеженими чергами та власним пулом потоків для кожного етапу."""
+
+    def __init__(
+        self,
+        stages: List[PipelineStage],
+        queue_size: int = 4,
+        source_name: str = "source",
+        on_item_done: Optional[Callable[[int], None]] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ):
+        """
+        Args:
+            stages: Етапи у порядку обробки
+            queue_size: Максимум пакетів у черзі між етапами
+            source_name: Назва етапу-джерела у звіті
+            on_item_done: Викликається з кількістю елементів пакета, що пройшов останній етап;
+                його помилка зупиняє конвеєр і повторно піднімається з run()
+            cancel_event: Зовнішня подія скасування (наприклад, втрата lease завдання):
+                нові пакети не обробляються, run() повертає звіт з cancelled=True
+        """
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.source_name = source_name
+        self.on_item_done = on_item_done
+        self.cancel_event = cancel_event or threading.Event()
+
+    def run(self, source: Iterable[Any]) -> Dict[str, Any]:
+        """
+        Пропускає пакети з source через усі етапи, повертає звіт.
+
+        Raises:
+            Exception: Помилка on_item_done - після зупинки та завершення всіх workers
+        """
+        started = time.perf_counter()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        source_stats = StageStats(self.source_name, started_at=started)
+        stats = [StageStats(stage.name, workers=max(1, stage.workers)) for stage in self.stages]
+        remaining = [s.workers for s in stats]
+        remaining_lock = threading.Lock()
+        # Помилка on_item_done зупиняє конвеєр: workers дочитують черги без обробки
+        stop = threading.Event()
+        failures: List[BaseException] = []
+
+        def stopping() -> bool:
+            return stop.is_set() or self.cancel_event.is_set()
+
+        def worker(index: int):
+            stage, stage_stats = self.stages[index], stats[index]
+            inbox = queues[index]
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+
+            try:
+                while True:
+                    batch = inbox.get()
+                    if batch is _DONE:
+                        break
+                    if stopping():
+                        continue
+
+                    size = _size(batch)
+                    begin = time.perf_counter()
+                    try:
+                        result = stage.func(batch)
+                    except Exception as e:
+                        stage_stats.record(size, time.perf_counter() - begin, failed=True)
+                        logger.error(f"❌ Етап {stage.name}: помилка обробки пакета: {e}")
+                        continue
+                    stage_stats.record(size, time.perf_counter() - begin)
+
+                    if result is None:
+                        continue
+                    if outbox is not None:
+                        outbox.put(result)
+                    elif self.on_item_done:
+                        try:
+                            self.on_item_done(_size(result))
+                        except Exception as e:
+                            logger.error(
+                                f"❌ Етап {stage.name}: on_item_done, зупинка конвеєра: {e}"
+                            )
+                            failures.append(e)
+                            stop.set()
+            finally:
+                # Останній worker етапу закриває вхід наступного етапу
+                with remaining_lock:
+                    remaining[index] -= 1
+                    last = remaining[index] == 0
+                if last:
+                    stage_stats.finished_at = time.perf_counter()
+                    if outbox is not None:
+                        for _ in range(stats[index + 1].workers):
+                            outbox.put(_DONE)
+
+        threads = []
+        for index, stage_stats in enumerate(stats):
+            stage_stats.started_at = started
+            for n in range(stage_stats.workers):
+                thread = threading.Thread(
+                    target=worker,
+                    args=(index,),
+                    name=f"pipeline-{stage_stats.name}-{n}",
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+
+        try:
+            iterator = iter(source)
+            while not stopping():
+                begin = time.perf_counter()
+                try:
+                    batch = next(iterator)
+                except StopIteration:
+                    break
+                source_stats.record(_size(batch), time.perf_counter() - begin)
+                queues[0].put(batch)
+        finally:
+            source_stats.finished_at = time.perf_counter()
+            for _ in range(stats[0].workers):
+                queues[0].put(_DONE)
+            for thread in threads:
+                thread.join()
+
+        if failures:
+            raise failures[0]
+
+        total = time.perf_counter() - started
+        report = {
+            "total_seconds": round(total, 3),
+            "items": source_stats.items,
+            "cancelled": self.cancel_event.is_set(),
+            "stages": {
+                stage_stats.name: stage_stats.to_dict() for stage_stats in [source_stats] + stats
+            },
+        }
+        logger.info(
+            "📊 Конвеєр: "
+            + ", ".join(
+                f"{name} {data['items_per_second']}/с" for name, data in report["stages"].items()
+            )
+            + f" (всього {total:.2f}с)"
+        )
+        return report
+
+
+def batched(items: Iterable[Any], size: int) -> Iterable[List[Any]]:
+    """Розбиває послідовність на пакети розміру size."""
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
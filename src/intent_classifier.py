@@ -0,0 +1,508 @@
+"""
+Локальний класифікатор наміру: швидкий шлях без виклику LLM для типових запитів.
+
+Правила (ключові слова та регулярні вирази) розпізнають найчастіші запити:
+список endpoints, список ресурсу, ресурс за id, створення ресурсу з полями.
+Результат має ту саму JSON схему, що й аналіз наміру через LLM. Кожне слово
+запиту, яке не пояснене правилом (фільтри, умови, невідомі поля), знижує
+впевненість. Якщо задано ембедінги, операцію правила перевіряє голосування
+kNN серед розмічених прикладів запитів: незгода знижує впевненість удвічі.
+Запити з впевненістю нижче порогу передаються в LLM. Поріг підбирає calibrate
+на розміченому наборі (EXAMPLE_QUERIES та CALIBRATION_QUERIES) під цільову точність.
+"""
+
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config import Config
+from src.warm_cache import warm_cache
+
+logger = logging.getLogger(__name__)
+
+# Основи слів ресурсу (українською та англійською) - збіг за префіксом слова
+RESOURCE_ALIASES = {
+    "products": ("товар", "продукт", "product"),
+    "categories": ("категор", "category", "categories"),
+    "orders": ("замовлен", "order"),
+    "users": ("користувач", "user"),
+    "customers": ("клієнт", "customer"),
+    "brands": ("бренд", "brand"),
+    "collections": ("колекці", "collection"),
+    "attributes": ("атрибут", "attribute"),
+    "families": ("сімейств", "famil"),
+    "settings": ("налаштуван", "setting"),
+}
+
+INFO_PHRASES = (
+    "endpoint",
+    "ендпоінт",
+    "ендпоїнт",
+    "документац",
+    "які методи",
+    "доступні операції",
+    "що можна",
+    "що я можу",
+    "що вмієш",
+)
+LIST_WORDS = {
+    "покажи",
+    "показати",
+    "отримай",
+    "отримати",
+    "виведи",
+    "список",
+    "всі",
+    "усі",
+    "list",
+    "show",
+    "get",
+    "all",
+}
+CREATE_WORDS = {
+    "створи",
+    "створити",
+    "додай",
+    "додати",
+    "create",
+    "add",
+    "новий",
+    "нову",
+    "нове",
+    "new",
+}
+# Зміна та видалення завжди йдуть через LLM
+MUTATION_STEMS = ("онов", "змін", "редаг", "видал", "update", "change", "edit", "delete", "remove")
+FILLER_WORDS = {
+    "мені",
+    "будь",
+    "ласка",
+    "please",
+    "me",
+    "the",
+    "a",
+    "an",
+    "з",
+    "із",
+    "для",
+    "по",
+    "в",
+    "у",
+    "та",
+    "і",
+    "and",
+    "of",
+    "with",
+    "api",
+    "які",
+    "є",
+    "доступні",
+    "можна",
+}
+ID_MARKERS = {"id", "ід", "№", "#", "номер", "номером"}
+FIELD_ALIASES = {
+    "назва": "name",
+    "назвою": "name",
+    "імя": "name",
+    "ім'я": "name",
+    "опис": "description",
+    "описом": "description",
+    "ціна": "price",
+    "ціною": "price",
+}
+
+# Розмічені приклади для kNN перевірки операції; змінюйте EXAMPLES_VERSION разом зі списком
+EXAMPLE_QUERIES = [
+    ("покажи всі endpoints", "INFO"),
+    ("які методи є в API", "INFO"),
+    ("що я можу зробити з цим API", "INFO"),
+    ("show available endpoints", "INFO"),
+    ("покажи всі категорії", "GET"),
+    ("отримай список товарів", "GET"),
+    ("list all orders", "GET"),
+    ("покажи товар з id 5", "GET"),
+    ("get product 42", "GET"),
+    ("створи категорію назва: Електроніка", "POST"),
+    ("додай новий товар з назвою Телефон", "POST"),
+    ("create a brand name=Acme", "POST"),
+    ("онови ціну товару 5 на 100", "PUT"),
+    ("зміни назву категорії 3", "PUT"),
+    ("update order 7 status", "PUT"),
+    ("видали товар 5", "DELETE"),
+    ("delete category 3", "DELETE"),
+    ("прибери бренд Acme", "DELETE"),
+]
+EXAMPLES_VERSION = "1"
+
+# Розмічений набір для калібрування порогу (None - запит має йти в LLM);
+# змінюйте CALIBRATION_VERSION разом зі списком
+CALIBRATION_QUERIES = [
+    ("список товарів", "GET"),
+    ("покажи всі замовлення", "GET"),
+    ("отримати всі бренди", "GET"),
+    ("show categories", "GET"),
+    ("покажи товар 42", "GET"),
+    ("покажи категорію з id 7", "GET"),
+    ("get order 15", "GET"),
+    ("товар №3", "GET"),
+    ("створи категорію назва: Взуття", "POST"),
+    ("додай товар з назвою Телефон, ціна: 500", "POST"),
+    ("які endpoints є", "INFO"),
+    ("покажи документацію API", "INFO"),
+    ("що я можу робити з товарами", "INFO"),
+    ("покажи товари дешевше 100", None),
+    ("покажи всі товари крім архівних", None),
+    ("отримай замовлення за вчора", None),
+    ("покажи топ 5 товарів", None),
+    ("покажи останні замовлення клієнта Іван", None),
+    ("покажи категорії і товари", None),
+    ("скільки товарів у категорії 3", None),
+    ("товари бренду Acme", None),
+    ("створи категорію", None),
+    ("додай товар у категорію 3", None),
+    ("онови ціну товару 5", None),
+    ("видали товар 5", None),
+]
+CALIBRATION_VERSION = "1"
+
+TOKEN_PATTERN = re.compile(r"[\w'’-]+|[#№]")
+ID_PATTERN = re.compile(r"^(?:\d+|[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12})$", re.IGNORECASE)
+# Значення поля: в лапках або до коми, крапки з комою чи наступного "поле:"
+_VALUE = r"(\"[^\"]*\"|«[^»]*»|'[^']*'|[^,;]+?(?=\s*[,;]|\s+[\w'’]+\s*[:=]|\s*$))"
+FIELD_PATTERN = re.compile(r"([\w'’]+)\s*[:=]\s*" + _VALUE)
+NAMED_PATTERN = re.compile(r"(?:з назвою|named|called)\s+" + _VALUE, re.IGNORECASE)
+
+
+@dataclass
+class IntentMatch:
+    """Намір, визначений локально, з впевненістю та назвою правила."""
+
+    intent: Dict[str, Any]
+    confidence: float
+    rule: str
+
+
+def _singular(name: str) -> str:
+    if name.endswith("ies"):
+        return name[:-3] + "y"
+    if name.endswith("s"):
+        return name[:-1]
+    return name
+
+
+def _aliases_for(name: str) -> Tuple[str, ...]:
+    for key, aliases in RESOURCE_ALIASES.items():
+        if name == key or _singular(name) in aliases:
+            return aliases + (name,)
+    return (name, _singular(name))
+
+
+def resources_from_paths(paths: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Ресурси специфікації: перший сегмент шляху без "api", версії та параметрів.
+
+    Для кожного ресурсу зберігаються основи слів для пошуку в запиті та назва
+    path параметра елемента ("/categories/{categoryId}" -> "categoryId").
+    """
+    resources: Dict[str, Dict[str, Any]] = {}
+    for path in paths:
+        segments = [segment for segment in path.strip("/").split("/") if segment]
+        for index, segment in enumerate(segments):
+            name = segment.lower()
+            if name.startswith("{") or name == "api" or re.fullmatch(r"v\d+", name):
+                continue
+            info = resources.setdefault(name, {"aliases": _aliases_for(name), "id_param": None})
+            following = segments[index + 1] if index + 1 < len(segments) else ""
+            if info["id_param"] is None and following.startswith("{"):
+                info["id_param"] = following.strip("{}")
+            break
+    return resources
+
+
+def _clean_value(value: str) -> str:
+    return value.strip().strip("\"'«»").strip()
+
+
+class LocalIntentClassifier:
+    """Визначає типові наміри правилами та kNN без виклику LLM."""
+
+    def __init__(
+        self,
+        paths: Optional[Iterable[str]] = None,
+        embed_fn: Optional[Callable[[str], List[float]]] = None,
+        embed_many_fn: Optional[Callable[[List[str]], List[List[float]]]] = None,
+        embedding_model: str = "",
+        min_confidence: Optional[float] = None,
+        k: Optional[int] = None,
+    ):
+        """
+        Args:
+            paths: Шляхи специфікації (ресурси та path параметри); без них - типові ресурси
+            embed_fn: Ембедінг запиту для kNN (None - без kNN перевірки)
+            embed_many_fn: Ембедінги розмічених прикладів одним викликом
+            embedding_model: Модель ембедінгів (ключ кешу прикладів)
+            min_confidence: Поріг впевненості, нижче якого запит іде в LLM
+            k: Кількість сусідів kNN
+        """
+        paths = list(paths or [])
+        self.resources = resources_from_paths(paths) or {
+            name: {"aliases": aliases + (name,), "id_param": None}
+            for name, aliases in RESOURCE_ALIASES.items()
+        }
+        self.embed_fn = embed_fn
+        self.embed_many_fn = embed_many_fn
+        self.embedding_model = embedding_model
+        self.min_confidence = (
+            Config.FAST_INTENT_MIN_CONFIDENCE if min_confidence is None else min_confidence
+        )
+        self.k = Config.FAST_INTENT_KNN_K if k is None else k
+
+        self._lock = threading.Lock()
+        self._resolved = 0
+        self._fallbacks = 0
+
+    def classify(
+        self, query: str, embedding_fn: Optional[Callable[[], List[float]]] = None
+    ) -> Optional[IntentMatch]:
+        """
+        Найкращий локальний намір з впевненістю (навіть нижче порогу) або None.
+
+        embedding_fn - вже запущений ембедінг запиту (фоновий пошук endpoints),
+        щоб kNN не обчислював його вдруге.
+        """
+        match = self._apply_rules(query)
+        if match is None:
+            return None
+
+        # Ембедінг запиту той самий, що й для пошуку endpoints (warm кеш)
+        if self.embed_fn is not None:
+            label = self._knn_label(query, embedding_fn)
+            if label is not None:
+                if label == match.intent["operation"]:
+                    match.confidence = min(0.99, match.confidence + 0.05)
+                else:
+                    match.confidence *= 0.5
+                    match.rule += f"+knn:{label}"
+        match.confidence = round(max(match.confidence, 0.0), 4)
+        return match
+
+    def resolve(
+        self, query: str, embedding_fn: Optional[Callable[[], List[float]]] = None
+    ) -> Optional[IntentMatch]:
+        """Намір з впевненістю від порогу або None (запит треба передати в LLM)."""
+        match = self.classify(query, embedding_fn)
+        resolved = match is not None and match.confidence >= self.min_confidence
+        with self._lock:
+            if resolved:
+                self._resolved += 1
+            else:
+                self._fallbacks += 1
+        return match if resolved else None
+
+    def calibrate(
+        self,
+        samples: Optional[Sequence[Tuple[str, Optional[str]]]] = None,
+        target_precision: Optional[float] = None,
+    ) -> float:
+        """
+        Підбирає найнижчий поріг, за якого точність локальних рішень не нижча за target_precision.
+
+        Args:
+            samples: Пари (запит, очікувана операція); None - запит має йти в LLM.
+                Без samples - EXAMPLE_QUERIES та CALIBRATION_QUERIES
+            target_precision: Цільова точність (None - FAST_INTENT_TARGET_PRECISION)
+
+        Returns:
+            Новий поріг (1.0 - жоден поріг не досягає точності, швидкий шлях вимкнено)
+        """
+        if target_precision is None:
+            target_precision = Config.FAST_INTENT_TARGET_PRECISION
+        if samples is None:
+            samples = EXAMPLE_QUERIES + CALIBRATION_QUERIES
+        embeddings = self._sample_embeddings([query for query, _ in samples])
+
+        scored = []
+        for i, (query, expected) in enumerate(samples):
+            embedding_fn = (lambda vector=embeddings[i]: vector) if embeddings else None
+            match = self.classify(query, embedding_fn)
+            if match is not None:
+                scored.append((match.confidence, match.intent["operation"] == expected))
+
+        threshold = 1.0
+        for candidate in sorted({confidence for confidence, _ in scored}, reverse=True):
+            accepted = [correct for confidence, correct in scored if confidence >= candidate]
+            if sum(accepted) / len(accepted) < target_precision:
+                break
+            threshold = candidate
+
+        self.min_confidence = threshold
+        logger.info(f"🎯 Поріг локального класифікатора наміру: {threshold}")
+        return threshold
+
+    def stats(self) -> Dict[str, Any]:
+        """Скільки запитів визначено локально, а скільки передано в LLM."""
+        with self._lock:
+            total = self._resolved + self._fallbacks
+            return {
+                "resolved": self._resolved,
+                "fallbacks": self._fallbacks,
+                "resolved_ratio": round(self._resolved / total, 4) if total else 0.0,
+                "min_confidence": self.min_confidence,
+            }
+
+    def _apply_rules(self, query: str) -> Optional[IntentMatch]:
+        text = query.strip()
+        lower = text.lower()
+        tokens = TOKEN_PATTERN.findall(lower)
+        if not tokens or any(token.startswith(MUTATION_STEMS) for token in tokens):
+            return None
+
+        if any(phrase in lower for phrase in INFO_PHRASES) and not CREATE_WORDS & set(tokens):
+            found = self._find_resources(tokens)
+            resource = found[0][0] if len(found) == 1 else "api"
+            return IntentMatch(self._intent("INFO", resource, text), 0.95, "info")
+
+        if CREATE_WORDS & set(tokens):
+            return self._create_rule(text)
+        return self._read_rule(text, tokens)
+
+    def _create_rule(self, text: str) -> Optional[IntentMatch]:
+        data: Dict[str, Any] = {}
+        unexplained = 0
+        for name, value in FIELD_PATTERN.findall(text):
+            field = FIELD_ALIASES.get(name.lower(), name)
+            if not field.isascii():
+                unexplained += 1
+            data[field] = _clean_value(value)
+        for value in NAMED_PATTERN.findall(text):
+            data["name"] = _clean_value(value)
+
+        rest = NAMED_PATTERN.sub(" ", FIELD_PATTERN.sub(" ", text)).lower()
+        tokens = TOKEN_PATTERN.findall(rest)
+        found = self._find_resources(tokens)
+        if len(found) != 1:
+            return None
+
+        resource, index = found[0]
+        unexplained += sum(
+            1
+            for i, token in enumerate(tokens)
+            if i != index and token not in CREATE_WORDS | FILLER_WORDS
+        )
+        confidence = (0.9 if data else 0.5) - 0.15 * unexplained
+        intent = self._intent("POST", resource, f"створити {resource}", data=data)
+        return IntentMatch(intent, confidence, "create")
+
+    def _read_rule(self, text: str, tokens: List[str]) -> Optional[IntentMatch]:
+        found = self._find_resources(tokens)
+        if len(found) != 1:
+            return None
+
+        resource, index = found[0]
+        explained = {index}
+        record_id = None
+        for i, token in enumerate(tokens):
+            if (
+                i > 0
+                and ID_PATTERN.match(token)
+                and (i - 1 == index or tokens[i - 1] in ID_MARKERS)
+            ):
+                record_id = token
+                explained.update({i, i - 1})
+                break
+
+        explained.update(
+            i for i, token in enumerate(tokens) if token in LIST_WORDS | FILLER_WORDS | ID_MARKERS
+        )
+        unexplained = len(tokens) - len(explained)
+
+        if record_id is not None:
+            id_param = self.resources[resource]["id_param"] or "id"
+            intent = self._intent(
+                "GET", resource, f"отримати {resource} за id", parameters={id_param: record_id}
+            )
+            return IntentMatch(intent, 0.9 - 0.15 * unexplained, "get_by_id")
+
+        has_verb = bool(LIST_WORDS & set(tokens))
+        intent = self._intent("GET", resource, f"отримати всі {resource}")
+        return IntentMatch(intent, (0.9 if has_verb else 0.6) - 0.15 * unexplained, "list")
+
+    def _find_resources(self, tokens: List[str]) -> List[Tuple[str, int]]:
+        """Ресурси, згадані в запиті, з індексом першого слова (кожен ресурс один раз)."""
+        found: Dict[str, int] = {}
+        for index, token in enumerate(tokens):
+            for name, info in self.resources.items():
+                if name not in found and token.startswith(info["aliases"]):
+                    found[name] = index
+        return list(found.items())
+
+    @staticmethod
+    def _intent(
+        operation: str,
+        resource: str,
+        goal: str,
+        parameters: Optional[Dict[str, Any]] = None,
+        data: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        return {
+            "is_informational": operation == "INFO",
+            "operation": operation,
+            "resource": resource,
+            "parameters": parameters or {},
+            "data": data or {},
+            "intent": goal,
+        }
+
+    def _example_matrix(self) -> Optional[np.ndarray]:
+        if self.embed_many_fn is None:
+            return None
+        vectors = warm_cache.get_or_create(
+            "intent_examples",
+            (self.embedding_model, EXAMPLES_VERSION),
+            lambda: self.embed_many_fn([query for query, _ in EXAMPLE_QUERIES]),
+            version=EXAMPLES_VERSION,
+        )
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
+
+    def _sample_embeddings(self, queries: List[str]) -> Optional[List[List[float]]]:
+        """Ембедінги запитів калібрування одним викликом (None - без kNN перевірки)."""
+        if self.embed_fn is None or self.embed_many_fn is None:
+            return None
+        if queries == [query for query, _ in EXAMPLE_QUERIES + CALIBRATION_QUERIES]:
+            return warm_cache.get_or_create(
+                "intent_calibration",
+                (self.embedding_model, EXAMPLES_VERSION, CALIBRATION_VERSION),
+                lambda: self.embed_many_fn(queries),
+                version=CALIBRATION_VERSION,
+            )
+        return self.embed_many_fn(queries)
+
+    def _knn_label(
+        self, query: str, embedding_fn: Optional[Callable[[], List[float]]] = None
+    ) -> Optional[str]:
+        """Операція за зваженим голосуванням k найближчих розмічених прикладів."""
+        try:
+            matrix = self._example_matrix()
+            if matrix is None:
+                return None
+            embedding = embedding_fn() if embedding_fn is not None else self.embed_fn(query)
+            vector = np.asarray(embedding, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            if norm == 0:
+                return None
+            similarities = matrix @ (vector / norm)
+        except Exception as e:
+            logger.warning(f"⚠️ kNN перевірка наміру недоступна: {e}")
+            return None
+
+        votes: Dict[str, float] = {}
+        for i in np.argsort(similarities)[::-1][: self.k]:
+            label = EXAMPLE_QUERIES[i][1]
+            votes[label] = votes.get(label, 0.0) + float(similarities[i])
+        return max(votes, key=votes.get)
@@ -2,12 +2,16 @@
 Інтерактивний API агент з діалогом для виправлення помилок сервера.
 """
 
+import contextvars
+import copy
 import hashlib
 import json
 import logging
 import os
 import pickle
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
@@ -21,23 +25,105 @@ logger = logging.getLogger(__name__)
 try:
     from .enhanced_prompt_manager import EnhancedPromptManager
     from .enhanced_swagger_parser import EnhancedSwaggerParser
+    from .intent_classifier import LocalIntentClassifier
+    from .llm_cache import intent_cache
+    from .metrics import (
+        observe_upstream_call,
+        record_intent_resolution,
+        record_retry,
+        timed_stage,
+    )
+    from .model_router import model_router
     from .rag_engine import PostgresRAGEngine
+    from .request_planner import PLAN_PROMPT_VERSION, EndpointCandidate, RequestPlanner
+    from .token_budget import strip_transport_fields, token_budget, truncate_text
+    from .tracing import STATUS_ERROR, current_span, traced
 except ImportError:
     try:
         from enhanced_prompt_manager import EnhancedPromptManager
         from enhanced_swagger_parser import EnhancedSwaggerParser
+        from intent_classifier import LocalIntentClassifier
+        from llm_cache import intent_cache
+        from metrics import (
+            observe_upstream_call,
+            record_intent_resolution,
+            record_retry,
+            timed_stage,
+        )
+        from model_router import model_router
         from rag_engine import PostgresRAGEngine
+        from request_planner import PLAN_PROMPT_VERSION, EndpointCandidate, RequestPlanner
+        from token_budget import strip_transport_fields, token_budget, truncate_text
+        from tracing import STATUS_ERROR, current_span, traced
     except ImportError as e:
         print(f"❌ Помилка імпорту: {e}")
         raise
 
 try:
     from langchain.schema import HumanMessage, SystemMessage
-    from langchain_openai import ChatOpenAI
 except ImportError:
     logging.error("LangChain не встановлено. Встановіть: pip install langchain langchain-openai")
     raise
 
+# Версія промпту аналізу наміру; змінюйте при зміні промпту, щоб інвалідувати кеш відповідей
+INTENT_PROMPT_VERSION = "1"
+# Етапи агента з окремими маршрутами моделей (MODEL_ROUTES)
+LLM_STAGES = ("intent", "request_planning", "retry_fix", "response_formatting", "object_creation")
+# Кількість кандидатів endpoints для класичного ходу (вибір endpoint за наміром)
+CLASSIC_TURN_CANDIDATES = 3
+
+_stage_executor: Optional[ThreadPoolExecutor] = None
+_stage_executor_lock = threading.Lock()
+
+
+def get_stage_executor() -> ThreadPoolExecutor:
+    """Спільний пул потоків для незалежних етапів ходу агента."""
+    global _stage_executor
+    with _stage_executor_lock:
+        if _stage_executor is None:
+            from src.config import Config
+
+            _stage_executor = ThreadPoolExecutor(
+                max_workers=max(1, Config.AGENT_STAGE_WORKERS), thread_name_prefix="agent-stage"
+            )
+        return _stage_executor
+
+
+class SpeculativeRetrieval:
+    """
+    Ембедінг запиту та пошук endpoints, запущені у фоні до аналізу наміру:
+    вони не залежать ні від історії, ні від наміру. Ембедінг доступний окремо
+    (семантичний кеш наміру) ще до завершення векторного пошуку.
+    """
+
+    def __init__(self, rag_engine: Any, user_query: str, limit: int, executor: ThreadPoolExecutor):
+        self.embedding: Future = Future()
+        # Копія контексту: спани та етапи метрик фонового потоку належать поточному ходу
+        context = contextvars.copy_context()
+        self._endpoints = executor.submit(context.run, self._run, rag_engine, user_query, limit)
+
+    def _run(self, rag_engine: Any, user_query: str, limit: int) -> List[Dict[str, Any]]:
+        try:
+            vector = rag_engine.embed_query(user_query)
+        except Exception as e:
+            self.embedding.set_exception(e)
+            raise
+        self.embedding.set_result(vector)
+        return rag_engine.search_similar_endpoints(user_query, limit=limit, query_embedding=vector)
+
+    def embedding_fn(self) -> List[float]:
+        """Ембедінг запиту (чекає на фонове обчислення)."""
+        return self.embedding.result()
+
+    def endpoints(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Знайдені endpoints (перші limit); при помилці пошуку - порожній список."""
+        try:
+            results = self._endpoints.result()
+        except Exception as e:
+            logger.error(f"Помилка пошуку endpoints: {e}")
+            return []
+        return results[:limit] if limit else results
+
 
 class InteractiveConversationHistory:
     """Клас для збереження інтерактивної історії розмови."""
@@ -84,17 +170,22 @@ class InteractiveConversationHistory:
 
         recent = conversation[-max_interactions:]
         context_parts = []
+        # Відповідь бота обмежується частиною бюджету контексту, весь контекст - бюджетом
+        budget = token_budget.budget("context")
+        message_budget = budget // max(len(recent), 1) if budget else None
 
         for interaction in recent:
             timestamp = interaction.get("timestamp", datetime.now()).strftime("%H:%M")
             user_msg = interaction.get("user_message", "")
             bot_msg = interaction.get("bot_response", "")
+            if message_budget:
+                bot_msg = truncate_text(bot_msg, message_budget, token_budget.model)
             status = interaction.get("status", "unknown")
 
             context_parts.append(f"Користувач ({timestamp}): {user_msg}")
             context_parts.append(f"Бот ({timestamp}) [{status}]: {bot_msg}")
 
-        return "\n".join(context_parts)
+        return token_budget.fit_text("context", "\n".join(context_parts), keep="tail")
 
 
 class InteractiveSwaggerAgent:
@@ -105,13 +196,14 @@ class InteractiveSwaggerAgent:
 
     def __init__(
         self,
-        swagger_spec_path: str,
+        swagger_spec_path: Optional[str] = None,
         enable_api_calls: bool = False,
         openai_api_key: Optional[str] = None,
         jwt_token: Optional[str] = None,
         base_url_override: Optional[str] = None,
         user_id: Optional[str] = None,
         swagger_spec_id: Optional[str] = None,
+        parser: Optional[EnhancedSwaggerParser] = None,
     ):
         """
         Ініціалізація інтерактивного агента.
@@ -121,10 +213,11 @@ class InteractiveSwaggerAgent:
             enable_api_calls: Чи дозволити реальні API виклики
             openai_api_key: OpenAI API ключ (опціонально)
             jwt_token: JWT токен для авторизації (опціонально)
+            parser: Вже розібрана специфікація (замість swagger_spec_path)
         """
         try:
             # Перевіряємо наявність файлу
-            if not os.path.exists(swagger_spec_path):
+            if parser is None and not (swagger_spec_path and os.path.exists(swagger_spec_path)):
                 raise FileNotFoundError(f"Swagger файл не знайдено: {swagger_spec_path}")
 
             # Отримуємо API ключ
@@ -138,7 +231,7 @@ class InteractiveSwaggerAgent:
             self.jwt_token = jwt_token or os.getenv("JWT_TOKEN")
 
             # Парсимо Swagger специфікацію
-            self.parser = EnhancedSwaggerParser(swagger_spec_path)
+            self.parser = parser or EnhancedSwaggerParser(swagger_spec_path)
             self.base_url = base_url_override or self.parser.get_base_url()
             self.api_info = self.parser.get_api_info()
 
@@ -149,14 +242,22 @@ class InteractiveSwaggerAgent:
             self.model = os.getenv("OPENAI_MODEL", "gpt-4")
             self.temperature = float(os.getenv("OPENAI_TEMPERATURE", "0"))
 
-            # Ініціалізуємо LangChain LLM
-            self.llm = ChatOpenAI(
-                model=self.model, temperature=self.temperature, openai_api_key=self.openai_api_key
-            )
+            # LangChain LLM за етапами: модель, температура, ліміт токенів та fallback
+            # з MODEL_ROUTES; всі виклики списуються зі спільного бюджету
+            self.llm = model_router.chat_model("default", self.openai_api_key)
+            self.stage_llms = {
+                stage: model_router.chat_model(stage, self.openai_api_key) for stage in LLM_STAGES
+            }
 
             # Ініціалізуємо RAG engine
             self._initialize_rag()
 
+            # Локальний класифікатор наміру (швидкий шлях без LLM)
+            self.intent_classifier = self._create_intent_classifier()
+
+            # Планування запиту одним структурованим викликом LLM
+            self.request_planner = RequestPlanner(self._llm_for("request_planning"))
+
             # Ініціалізуємо менеджер промптів
             self.prompt_manager = EnhancedPromptManager()
 
@@ -169,6 +270,42 @@ class InteractiveSwaggerAgent:
             logging.error(f"Помилка ініціалізації інтерактивного агента: {e}")
             raise
 
+    def _llm_for(self, stage: str):
+        """LLM етапу за маршрутом моделей (без окремого маршруту - self.llm)."""
+        return self.stage_llms.get(stage, self.llm)
+
+    def _create_intent_classifier(self) -> Optional[LocalIntentClassifier]:
+        """Класифікатор наміру за ресурсами специфікації; kNN - на ембедінгах RAG engine."""
+        from src.config import Config
+
+        if not Config.FAST_INTENT_ENABLED:
+            return None
+
+        swagger_data = getattr(self.parser, "swagger_data", None)
+        paths = swagger_data.get("paths", {}) if isinstance(swagger_data, dict) else {}
+        embeddings = (
+            getattr(self.rag_engine, "embeddings", None) if Config.FAST_INTENT_KNN else None
+        )
+        if embeddings is None:
+            classifier = LocalIntentClassifier(paths=paths)
+        else:
+            classifier = LocalIntentClassifier(
+                paths=paths,
+                embed_fn=self.rag_engine.embed_query,
+                embed_many_fn=embeddings.embed_documents,
+                embedding_model=str(getattr(embeddings, "model", "")),
+            )
+
+        if Config.FAST_INTENT_CALIBRATE:
+            try:
+                classifier.calibrate()
+            except Exception as e:
+                logger.warning(
+                    f"⚠️ Калібрування порогу наміру не вдалося, поріг "
+                    f"{classifier.min_confidence}: {e}"
+                )
+        return classifier
+
     def _initialize_rag(self):
         """Ініціалізація RAG engine з покращеним парсером."""
         try:
@@ -185,10 +322,22 @@ class InteractiveSwaggerAgent:
             logging.error(f"Помилка ініціалізації RAG: {e}")
             raise
 
+    def _start_retrieval(self, user_query: str) -> Optional[SpeculativeRetrieval]:
+        """Запускає ембедінг та пошук endpoints у фоні (AGENT_PARALLEL_STAGES)."""
+        from src.config import Config
+
+        if not Config.AGENT_PARALLEL_STAGES or getattr(self, "rag_engine", None) is None:
+            return None
+        limit = CLASSIC_TURN_CANDIDATES
+        if Config.AGENT_TURN_MODE == "structured":
+            limit = max(limit, Config.STRUCTURED_TURN_CANDIDATES)
+        return SpeculativeRetrieval(self.rag_engine, user_query, limit, get_stage_executor())
+
     def _generate_user_id(self, user_identifier: str) -> str:
         """Генерує унікальний ID користувача."""
         return hashlib.md5(user_identifier.encode()).hexdigest()
 
+    @traced("agent.process_interactive_query")
     def process_interactive_query(
         self, user_query: str, user_identifier: str = "default_user"
     ) -> Dict[str, Any]:
@@ -212,6 +361,7 @@ class InteractiveSwaggerAgent:
 
             user_id = self._generate_user_id(user_identifier)
             logging.info(f"Обробка інтерактивного запиту для користувача {user_id}: {user_query}")
+            current_span().set_attributes({"user.id": user_id, "query.chars": len(user_query)})
 
             # Перевіряємо чи це запит на створення об'єкта
             is_creation = self._is_creation_request(user_query)
@@ -220,13 +370,25 @@ class InteractiveSwaggerAgent:
                 logger.info("➡️ Перенаправляю на створення об'єкта")
                 return self._handle_creation_request(user_query, user_id)
 
-            # Отримуємо контекст попередніх взаємодій
+            # Пошук endpoints не залежить від історії та наміру - запускаємо його одразу
+            retrieval = self._start_retrieval(user_query)
+
+            # Отримуємо контекст попередніх взаємодій (паралельно з пошуком)
             context = self.conversation_history.get_recent_context(user_id)
 
-            # Аналізуємо намір користувача
-            logger.info("🧠 Аналізую намір користувача")
-            intent = self._analyze_user_intent(user_query, context)
-            logger.info(f"💡 Результат аналізу наміру: {intent}")
+            # Намір, endpoint та параметри одним структурованим викликом LLM
+            planned = self._plan_turn(user_query, context, retrieval)
+            intent, endpoints, api_request = planned or (None, None, None)
+
+            # Аналізуємо намір користувача (паралельно з пошуком)
+            if intent is None:
+                logger.info("🧠 Аналізую намір користувача")
+                intent = self._analyze_user_intent(
+                    user_query,
+                    context,
+                    embedding_fn=retrieval.embedding_fn if retrieval is not None else None,
+                )
+                logger.info(f"💡 Результат аналізу наміру: {intent}")
             if not intent:
                 response = self._generate_helpful_error_response(user_query)
                 self.conversation_history.add_interaction(
@@ -240,8 +402,13 @@ class InteractiveSwaggerAgent:
                 )
                 return {"response": response, "status": "error", "needs_followup": False}
 
-            # Шукаємо відповідні endpoints
-            endpoints = self.rag_engine.search_similar_endpoints(user_query)
+            # Шукаємо відповідні endpoints (або беремо результат фонового пошуку)
+            if endpoints is None and retrieval is not None:
+                endpoints = retrieval.endpoints(CLASSIC_TURN_CANDIDATES)
+            elif endpoints is None:
+                endpoints = self.rag_engine.search_similar_endpoints(
+                    user_query, limit=CLASSIC_TURN_CANDIDATES
+                )
             if not endpoints:
                 response = self._generate_no_endpoint_response(user_query)
                 self.conversation_history.add_interaction(
@@ -272,7 +439,8 @@ class InteractiveSwaggerAgent:
                 return {"response": response, "status": "informational", "needs_followup": False}
 
             # Формуємо API запит
-            api_request = self._form_api_request(user_query, intent, endpoints)
+            if api_request is None:
+                api_request = self._form_api_request(user_query, intent, endpoints)
             if not api_request:
                 response = self._generate_request_formation_error(user_query, intent)
                 self.conversation_history.add_interaction(
@@ -622,8 +790,44 @@ class InteractiveSwaggerAgent:
             logging.error(f"Помилка оновлення API запиту: {e}")
             return original_request
 
-    def _analyze_user_intent(self, user_query: str, context: str = "") -> Optional[Dict[str, Any]]:
-        """Аналізує намір користувача з урахуванням контексту."""
+    @timed_stage("intent")
+    @traced("agent.intent")
+    def _analyze_user_intent(
+        self, user_query: str, context: str = "", embedding_fn=None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Аналізує намір користувача з урахуванням контексту.
+
+        Типові запити визначає локальний класифікатор, далі - кеш відповідей LLM, далі - LLM.
+        embedding_fn - ембедінг запиту для семантичного кешу (наприклад, з фонового пошуку).
+        """
+        from src.config import Config
+
+        classifier = getattr(self, "intent_classifier", None)
+        if classifier is not None:
+            match = classifier.resolve(user_query, embedding_fn)
+            if match is not None:
+                logger.info(
+                    f"⚡ Намір визначено локально: {match.rule} (впевненість {match.confidence})"
+                )
+                record_intent_resolution("local")
+                current_span().set_attributes({"intent.source": "local"})
+                return match.intent
+
+        cache = intent_cache if Config.INTENT_CACHE_ENABLED else None
+        scope = str(self.swagger_spec_id or self.base_url)
+        model = model_router.route("intent").primary
+        embedding_fn = embedding_fn or self._intent_cache_embedding_fn(user_query)
+        if cache is not None:
+            cached = cache.get(
+                scope, user_query, context, model, INTENT_PROMPT_VERSION, embedding_fn
+            )
+            if cached is not None:
+                logger.info("⚡ Намір взято з кешу відповідей LLM")
+                record_intent_resolution("cache")
+                current_span().set_attributes({"intent.source": "cache"})
+                return copy.deepcopy(cached)
+
         try:
             # Спочатку перевіряємо чи це інформаційний запит
             query_lower = user_query.lower()
@@ -669,20 +873,138 @@ class InteractiveSwaggerAgent:
 
             messages = [SystemMessage(content=system_prompt), HumanMessage(content=user_query)]
 
-            response = self.llm.invoke(messages)
+            response = self._llm_for("intent").invoke(messages)
+            record_intent_resolution("llm")
+            current_span().set_attributes({"intent.source": "llm"})
 
             # Парсимо JSON відповідь
             try:
                 intent_data = json.loads(response.content)
-                return intent_data
             except json.JSONDecodeError:
                 logging.warning("Не вдалося розпарсити JSON відповідь LLM")
                 return None
 
+            if cache is not None and isinstance(intent_data, dict):
+                embedding = None
+                if cache.semantic_enabled and embedding_fn is not None:
+                    embedding = embedding_fn()
+                cache.set(
+                    scope,
+                    user_query,
+                    context,
+                    model,
+                    INTENT_PROMPT_VERSION,
+                    copy.deepcopy(intent_data),
+                    embedding,
+                )
+            return intent_data
+
         except Exception as e:
             logging.error(f"Помилка аналізу наміру: {e}")
             return None
 
+    @timed_stage("request_planning")
+    @traced("agent.request_planning")
+    def _plan_turn(
+        self, user_query: str, context: str, retrieval: Optional[SpeculativeRetrieval] = None
+    ) -> Optional[Tuple[Dict[str, Any], List[Dict[str, Any]], Optional[Dict[str, Any]]]]:
+        """
+        Структурований хід (AGENT_TURN_MODE=structured): один виклик LLM повертає
+        намір, endpoint з top-k кандидатів та параметри запиту. Кандидати беруться
+        з фонового пошуку retrieval, якщо його запущено.
+
+        Returns:
+            (намір, кандидати endpoints, API запит або None для інформаційного запиту);
+            None - класичний шлях (локальний намір, немає кандидатів або план відкинуто)
+        """
+        from src.config import Config
+
+        planner = getattr(self, "request_planner", None)
+        if Config.AGENT_TURN_MODE != "structured" or planner is None:
+            return None
+
+        # Типові запити визначаються локально без LLM
+        classifier = getattr(self, "intent_classifier", None)
+        if classifier is not None:
+            embedding_fn = retrieval.embedding_fn if retrieval is not None else None
+            match = classifier.classify(user_query, embedding_fn)
+            if match is not None and match.confidence >= classifier.min_confidence:
+                return None
+
+        if retrieval is not None:
+            endpoints = retrieval.endpoints(Config.STRUCTURED_TURN_CANDIDATES)
+        else:
+            endpoints = self.rag_engine.search_similar_endpoints(
+                user_query, limit=Config.STRUCTURED_TURN_CANDIDATES
+            )
+        if not endpoints:
+            return None
+
+        swagger_data = getattr(self.parser, "swagger_data", None) or {}
+        candidates = []
+        for endpoint in endpoints:
+            metadata = endpoint.get("metadata", {})
+            path = metadata.get("path", "")
+            candidates.append(
+                EndpointCandidate.from_spec(
+                    metadata.get("method", "GET"),
+                    path,
+                    endpoint.get("endpoint_path") or f"{self.base_url}{path}",
+                    metadata.get("summary", ""),
+                    swagger_data,
+                )
+            )
+
+        # Кандидати входять у контекст ключа кешу: інший набір endpoints - інший план.
+        # План містить параметри конкретного запиту, тому кеш лише за точним ключем:
+        # семантичне влучення відправило б в API значення з іншого запиту
+        cache = intent_cache if Config.INTENT_CACHE_ENABLED else None
+        scope = str(self.swagger_spec_id or self.base_url)
+        cache_context = context + "\n" + "|".join(f"{c.method} {c.path}" for c in candidates)
+        model = model_router.route("request_planning").primary
+        data = None
+        if cache is not None:
+            data = cache.get(scope, user_query, cache_context, model, PLAN_PROMPT_VERSION)
+        source = "cache" if data is not None else "structured"
+        if data is None:
+            try:
+                data = planner.request(user_query, context, candidates)
+            except Exception as e:
+                logger.warning(f"⚠️ Структурований план недоступний: {e}")
+                return None
+
+        plan = planner.validate(data, candidates) if data else None
+        if plan is None:
+            return None
+        if source == "structured" and cache is not None:
+            cache.set(scope, user_query, cache_context, model, PLAN_PROMPT_VERSION, data)
+
+        record_intent_resolution(source)
+        current_span().set_attributes({"intent.source": source})
+        logger.info(f"🧭 План запиту ({source}): {plan.intent} -> {plan.method} {plan.url}")
+        if plan.missing_fields:
+            logger.info(f"📝 У запиті бракує полів: {plan.missing_fields}")
+        if plan.intent["is_informational"]:
+            return plan.intent, endpoints, None
+
+        endpoint = endpoints[plan.endpoint_id]
+        api_request = {
+            "url": plan.url,
+            "method": plan.method,
+            "headers": self._get_headers(),
+            "data": plan.body,
+            "params": plan.query_params,
+            "endpoint_info": self._get_endpoint_details(endpoint),
+        }
+        return plan.intent, endpoints, api_request
+
+    def _intent_cache_embedding_fn(self, user_query: str):
+        """Ембедінг запиту для семантичного пошуку в кеші (той самий, що й для пошуку endpoints)."""
+        rag_engine = getattr(self, "rag_engine", None)
+        if rag_engine is None:
+            return None
+        return lambda: rag_engine.embed_query(user_query)
+
     def _form_api_request(
         self, user_query: str, intent: Dict[str, Any], endpoints: List[Dict[str, Any]]
     ) -> Optional[Dict[str, Any]]:
@@ -721,6 +1043,7 @@ class InteractiveSwaggerAgent:
             logging.error(f"Помилка формування API запиту: {e}")
             return None
 
+    @timed_stage("endpoint_selection")
     def _find_best_endpoint(
         self, intent: Dict[str, Any], endpoints: List[Dict[str, Any]]
     ) -> Optional[Dict[str, Any]]:
@@ -912,6 +1235,7 @@ class InteractiveSwaggerAgent:
             print(f"❌ Помилка отримання JWT токена з БД: {e}")
             return None
 
+    @traced("api.call", kind="CLIENT")
     def _call_api(self, api_request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Виконує API виклик з обробкою помилок."""
         try:
@@ -930,6 +1254,20 @@ class InteractiveSwaggerAgent:
             )
 
             execution_time = int((time.time() - start_time) * 1000)  # в мілісекундах
+            observe_upstream_call(response.status_code, time.time() - start_time)
+            span = current_span()
+            if span.is_recording:
+                span.set_attributes(
+                    {
+                        "http.method": api_request["method"],
+                        "http.url": api_request["url"],
+                        "http.status_code": response.status_code,
+                        "http.request_body_size": len(response.request.body or b""),
+                        "http.response_body_size": len(response.content),
+                    }
+                )
+                if response.status_code >= 400:
+                    span.set_status(STATUS_ERROR, f"HTTP {response.status_code}")
 
             api_response = {
                 "status_code": response.status_code,
@@ -958,17 +1296,21 @@ class InteractiveSwaggerAgent:
             return api_response
 
         except requests.exceptions.Timeout:
+            observe_upstream_call(None, time.time() - start_time)
             error_response = {
                 "error": "Таймаут запиту",
                 "details": "Сервер не відповідає протягом 30 секунд",
             }
+            current_span().set_status(STATUS_ERROR, error_response["error"])
             self._record_api_call(api_request, error_response, 0)
             return error_response
         except requests.exceptions.ConnectionError:
+            observe_upstream_call(None, time.time() - start_time)
             error_response = {
                 "error": "Помилка з'єднання",
                 "details": "Не вдалося підключитися до сервера",
             }
+            current_span().set_status(STATUS_ERROR, error_response["error"])
             self._record_api_call(api_request, error_response, 0)
             return error_response
         except UnicodeEncodeError as e:
@@ -977,13 +1319,17 @@ class InteractiveSwaggerAgent:
                 "details": f"Неможливо закодувати символи: {str(e)}. Використовуйте тільки латинські символи для slug.",
                 "encoding_error": True,
             }
+            current_span().set_status(STATUS_ERROR, error_response["error"])
             self._record_api_call(api_request, error_response, 0)
             return error_response
         except Exception as e:
             error_response = {"error": str(e), "details": "Невідома помилка при виконанні запиту"}
+            current_span().set_status(STATUS_ERROR, error_response["error"])
             self._record_api_call(api_request, error_response, 0)
             return error_response
 
+    @timed_stage("db_write")
+    @traced("db.record_api_call")
     def _record_api_call(
         self, api_request: Dict[str, Any], api_response: Dict[str, Any], execution_time: int
     ):
@@ -1066,6 +1412,8 @@ class InteractiveSwaggerAgent:
             )
 
             # Виконуємо API виклик
+            if attempt > 1:
+                record_retry("api_call")
             api_response = self._call_api(current_request)
 
             # Перевіряємо чи потрібен retry
@@ -1153,6 +1501,8 @@ class InteractiveSwaggerAgent:
 
         return False
 
+    @timed_stage("retry_fix")
+    @traced("agent.retry_fix")
     def _analyze_and_fix_with_gpt(
         self,
         original_request: Dict[str, Any],
@@ -1163,6 +1513,13 @@ class InteractiveSwaggerAgent:
         max_attempts: int,
     ) -> Optional[Dict[str, Any]]:
         """Використовує GPT для аналізу помилки та пропозиції виправлень."""
+        current_span().set_attributes(
+            {
+                "retry.attempt": attempt,
+                "http.url": current_request.get("url"),
+                "http.status_code": api_response.get("status_code"),
+            }
+        )
         try:
             import json
 
@@ -1172,11 +1529,20 @@ class InteractiveSwaggerAgent:
             prompt_manager = EnhancedPromptManager()
 
             # Формуємо контекст для GPT
+            # Запити без headers (Authorization не потрапляє в промпт) та в межах бюджету
+            def fitted(request: Dict[str, Any]) -> str:
+                payload = token_budget.fit_payload("retry_fix", strip_transport_fields(request))
+                return (
+                    payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+                )
+
             error_info = {
                 "user_query": user_query,
-                "original_request": json.dumps(original_request, ensure_ascii=False),
-                "current_request": json.dumps(current_request, ensure_ascii=False),
-                "api_error": str(api_response.get("error", api_response.get("data", {}))),
+                "original_request": fitted(original_request),
+                "current_request": fitted(current_request),
+                "api_error": token_budget.fit_text(
+                    "retry_fix", str(api_response.get("error", api_response.get("data", {})))
+                ),
                 "status_code": api_response.get("status_code", "Unknown"),
                 "retry_attempt": attempt,
                 "max_retries": max_attempts,
@@ -1203,7 +1569,7 @@ class InteractiveSwaggerAgent:
 
             # Викликаємо GPT через LangChain
             messages = [HumanMessage(content=filled_prompt)]
-            response = self.llm(messages)
+            response = self._llm_for("retry_fix")(messages)
 
             if not response or not response.content:
                 logger.error("❌ GPT не надав відповіді для аналізу помилки")
@@ -1287,6 +1653,8 @@ class InteractiveSwaggerAgent:
             logging.error(f"Помилка форматування відповіді: {e}")
             return self._generate_error_response(f"Помилка форматування: {str(e)}")
 
+    @timed_stage("response_formatting")
+    @traced("agent.response_formatting")
     def _process_api_response_with_gpt(
         self, api_request: Dict[str, Any], api_response: Dict[str, Any]
     ) -> str:
@@ -1296,9 +1664,12 @@ class InteractiveSwaggerAgent:
             user_query = self._get_last_user_query()
 
             # Генеруємо промпт для обробки відповіді
+            # Без headers/text та в межах бюджету токенів (великі списки - вибірка + схема)
             processing_prompt = self.prompt_manager.get_api_response_processing_prompt(
                 user_query=user_query,
-                api_response=api_response,
+                api_response=token_budget.fit_payload(
+                    "response_formatting", strip_transport_fields(api_response)
+                ),
                 available_fields=self._extract_available_fields(api_response),
             )
 
@@ -1308,7 +1679,7 @@ class InteractiveSwaggerAgent:
                 HumanMessage(content=processing_prompt),
             ]
 
-            llm_response = self.llm.invoke(messages)
+            llm_response = self._llm_for("response_formatting").invoke(messages)
             processed_response = llm_response.content
 
             # Додаємо інформацію про API запит
@@ -1352,7 +1723,7 @@ class InteractiveSwaggerAgent:
                 HumanMessage(content=creation_prompt),
             ]
 
-            llm_response = self.llm.invoke(messages)
+            llm_response = self._llm_for("object_creation").invoke(messages)
             creation_response = llm_response.content
 
             # Парсимо відповідь GPT для отримання даних об'єкта
@@ -0,0 +1,231 @@
+"""
+Спільний бюджет LLM викликів на основі token bucket.
+
+Всі етапи InteractiveSwaggerAgent (аналіз наміру, виправлення помилок,
+форматування відповіді) беруть токен з одного bucket перед викликом GPT,
+тому сплеск запитів не може вичерпати rate limit OpenAI.
+"""
+
+import logging
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.config import Config
+from src.metrics import current_stage, metrics_enabled, record_llm_tokens
+from src.tracing import start_span
+
+logger = logging.getLogger(__name__)
+
+
+class LLMBudgetExceeded(RuntimeError):
+    """Бюджет LLM викликів вичерпано і токен не з'явився вчасно."""
+
+
+def reported_usage(result: Any) -> Optional[Tuple[int, int]]:
+    """
+    Токени запиту та відповіді, які повернув API, з повідомлення LangChain
+    (usage_metadata або response_metadata["token_usage"]); None - їх немає.
+    """
+    usage = getattr(result, "usage_metadata", None)
+    if isinstance(usage, dict) and "input_tokens" in usage:
+        return int(usage["input_tokens"] or 0), int(usage.get("output_tokens") or 0)
+
+    metadata = getattr(result, "response_metadata", None)
+    token_usage = metadata.get("token_usage") if isinstance(metadata, dict) else None
+    if isinstance(token_usage, dict) and "prompt_tokens" in token_usage:
+        return (
+            int(token_usage["prompt_tokens"] or 0),
+            int(token_usage.get("completion_tokens") or 0),
+        )
+    return None
+
+
+def _usage_callback():
+    """
+    Callback LangChain з usage відповіді OpenAI: версії LangChain без
+    usage_metadata передають його лише в llm_output.
+    """
+    try:
+        from langchain.callbacks import get_openai_callback
+    except ImportError:
+        return nullcontext(None)
+    return get_openai_callback()
+
+
+class TokenBucket:
+    """Потокобезпечний token bucket. rate <= 0 вимикає обмеження."""
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: int,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.capacity)
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.rejected = 0
+        self.waited_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self, now: float):
+        elapsed = max(0.0, now - self._updated_at)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    def try_acquire(self, tokens: int = 1) -> bool:
+        """Бере токени без очікування."""
+        if not self.enabled:
+            return True
+
+        with self._lock:
+            self._refill(self._clock())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                self.granted += 1
+                return True
+            return False
+
+    def acquire(self, tokens: int = 1, timeout: Optional[float] = None) -> bool:
+        """
+        Бере токени, чекаючи на поповнення не довше timeout секунд.
+
+        Returns:
+            True якщо токени отримано, False якщо час очікування вичерпано
+        """
+        if not self.enabled:
+            return True
+
+        start = self._clock()
+        deadline = None if timeout is None else start + timeout
+
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    self.granted += 1
+                    self.waited_seconds += now - start
+                    return True
+
+                wait = (tokens - self._tokens) / self.rate
+                if deadline is not None and now + wait > deadline:
+                    self.rejected += 1
+                    return False
+
+            self._sleep(wait)
+
+    def stats(self) -> Dict[str, Any]:
+        """Поточний стан bucket."""
+        with self._lock:
+            if self.enabled:
+                self._refill(self._clock())
+            return {
+                "enabled": self.enabled,
+                "rate_per_second": self.rate,
+                "capacity": self.capacity,
+                "available_tokens": round(self._tokens, 3),
+                "granted": self.granted,
+                "rejected": self.rejected,
+                "waited_seconds": round(self.waited_seconds, 3),
+            }
+
+
+class BudgetedLLM:
+    """
+    Обгортка над LangChain chat моделлю, що списує токен з bucket
+    перед кожним викликом invoke() або __call__().
+    """
+
+    def __init__(
+        self,
+        llm: Any,
+        bucket: TokenBucket,
+        wait_timeout: Optional[float] = Config.LLM_BUDGET_WAIT_SECONDS,
+    ):
+        self._llm = llm
+        self._bucket = bucket
+        self._wait_timeout = wait_timeout
+        self._usage = threading.local()
+
+    def _take_budget(self):
+        if not self._bucket.acquire(timeout=self._wait_timeout):
+            logger.warning("⏳ Бюджет LLM викликів вичерпано")
+            raise LLMBudgetExceeded("Перевищено ліміт LLM викликів, спробуйте пізніше")
+
+    def last_usage(self) -> Optional[Tuple[int, int]]:
+        """Токени останнього виклику в поточному потоці за даними API (None - невідомо)."""
+        return getattr(self._usage, "value", None)
+
+    def _record_tokens(
+        self, messages: Any, result: Any, span: Any, usage: Optional[Tuple[int, int]]
+    ):
+        """
+        Записує токени запиту та відповіді для метрик і трасування: з usage API,
+        а якщо його немає - підрахунком токенізатором моделі.
+        """
+        try:
+            prompt_tokens = completion_tokens = None
+            if usage is not None:
+                prompt_tokens, completion_tokens = usage
+            if isinstance(messages, list):
+                if usage is None:
+                    prompt_tokens = self._llm.get_num_tokens_from_messages(messages)
+                span.set_attribute(
+                    "llm.prompt_chars",
+                    sum(len(getattr(m, "content", "") or "") for m in messages),
+                )
+            content = getattr(result, "content", None)
+            if isinstance(content, str):
+                if usage is None:
+                    completion_tokens = self._llm.get_num_tokens(content)
+                span.set_attribute("llm.completion_chars", len(content))
+        except Exception as e:
+            logger.debug(f"Не вдалося порахувати токени LLM: {e}")
+            return
+
+        record_llm_tokens("prompt", prompt_tokens)
+        record_llm_tokens("completion", completion_tokens)
+        span.set_attribute("llm.usage.prompt_tokens", prompt_tokens)
+        span.set_attribute("llm.usage.completion_tokens", completion_tokens)
+
+    def _call(self, method: Callable, args: tuple, kwargs: dict):
+        with start_span("llm.call", kind="CLIENT") as span:
+            self._take_budget()
+            self._usage.value = None
+            with _usage_callback() as callback:
+                result = method(*args, **kwargs)
+            usage = reported_usage(result)
+            if usage is None and callback is not None and callback.total_tokens:
+                usage = (callback.prompt_tokens, callback.completion_tokens)
+            self._usage.value = usage
+            if args and (span.is_recording or metrics_enabled()):
+                span.set_attribute("llm.model", getattr(self._llm, "model_name", None))
+                span.set_attribute("llm.stage", current_stage())
+                self._record_tokens(args[0], result, span, usage)
+            return result
+
+    def invoke(self, *args, **kwargs):
+        return self._call(self._llm.invoke, args, kwargs)
+
+    def __call__(self, *args, **kwargs):
+        return self._call(self._llm, args, kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self._llm, name)
+
+
+# Глобальний bucket, спільний для всіх агентів процесу
+llm_token_bucket = TokenBucket(rate=Config.LLM_CALLS_PER_SECOND, capacity=Config.LLM_BURST)
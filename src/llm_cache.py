@@ -0,0 +1,428 @@
+"""
+Кеш відповідей LLM для аналізу наміру користувача.
+
+Два рівні: LRU в пам'яті процесу (TTLCache) та таблиця llm_response_cache
+з терміном дії, спільна для всіх вузлів. Ключ - sha256 області (специфікації),
+нормалізованого запиту, хешу контексту, моделі та версії промпту, тому
+відповіді різних специфікацій не змішуються, а зміна промпту чи моделі
+інвалідовує кеш.
+
+Якщо точного збігу немає, виконується семантичний пошук: косинусна схожість
+ембедінга запиту з ембедінгами збережених запитів тієї ж області, контексту,
+моделі та версії промпту. Збіг вище порогу вважається влученням. У PostgreSQL
+ембедінги зберігаються в колонці pgvector і ранжуються оператором <=> у БД.
+
+Семантично повторно використовуються лише відповіді без заповнених
+parameters/data (або інформаційні): "видали категорію Одяг" і "видали
+категорію Взуття" мають майже однакові ембедінги, але різні параметри.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import text
+
+from src.config import Config
+from src.gpt_prompt_cache import INSERT_BY_DIALECT
+from src.metrics import record_cache_lookup
+from src.serialization import dumps_str, loads
+from src.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Очищення прострочених записів у БД після кожних N збережень
+PURGE_EVERY = 100
+
+# Найближчі записи вище порогу схожості, ранжовані pgvector у БД
+VECTOR_MATCH_SQL = text("""
+    SELECT key, query_text, 1 - (embedding <=> CAST(:embedding AS vector)) AS similarity
+    FROM llm_response_cache
+    WHERE scope = :scope AND kind = :kind AND context_hash = :context_hash
+      AND model = :model AND prompt_version = :prompt_version
+      AND expires_at > :now AND embedding IS NOT NULL
+      AND embedding <=> CAST(:embedding AS vector) <= :max_distance
+    ORDER BY embedding <=> CAST(:embedding AS vector)
+    LIMIT :limit
+    """)
+
+
+def normalize_query(query: str) -> str:
+    """Нижній регістр, один пробіл між словами, без розділових знаків у кінці."""
+    return re.sub(r"\s+", " ", query.lower()).strip().rstrip(" .,!?;:…").strip()
+
+
+def query_literals(query: str) -> List[str]:
+    """Числа, ідентифікатори та рядки в лапках, що мають збігатися для семантичного влучення."""
+    quoted = re.findall(r"[\"'«“]([^\"'»”]+)[\"'»”]", query)
+    tokens = re.findall(r"[\w-]*\d[\w-]*", query)
+    return sorted(set(normalize_query(q) for q in quoted) | set(t.lower() for t in tokens))
+
+
+def semantic_reusable(response: Any) -> bool:
+    """Чи можна віддати відповідь іншому, лише схожому запиту: інформаційна або без параметрів."""
+    if not isinstance(response, dict):
+        return False
+    if response.get("is_informational"):
+        return True
+    return not response.get("parameters") and not response.get("data")
+
+
+def context_hash(context: str) -> str:
+    """sha256 контексту розмови без пробілів на краях."""
+    return hashlib.sha256((context or "").strip().encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Кеш відповідей LLM; помилки БД вважаються промахом кешу."""
+
+    def __init__(
+        self,
+        kind: str = "intent",
+        session_factory: Optional[Callable] = None,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[int] = None,
+        semantic_threshold: Optional[float] = None,
+        semantic_candidates: Optional[int] = None,
+    ):
+        """
+        Args:
+            kind: Тип відповіді (intent), входить у ключ
+            session_factory: Фабрика сесій SQLAlchemy (за замовчуванням api.database.SessionLocal)
+            max_entries: Місткість LRU в пам'яті
+            ttl_seconds: Термін дії запису в пам'яті та в БД
+            semantic_threshold: Мінімальна косинусна схожість для семантичного влучення (0 - вимкнено)
+            semantic_candidates: Скільки найближчих записів перевіряти при семантичному пошуку
+        """
+        self.kind = kind
+        self._session_factory = session_factory
+        self.ttl_seconds = Config.INTENT_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.semantic_threshold = (
+            Config.INTENT_CACHE_SEMANTIC_THRESHOLD
+            if semantic_threshold is None
+            else semantic_threshold
+        )
+        self.semantic_candidates = (
+            Config.INTENT_CACHE_SEMANTIC_CANDIDATES
+            if semantic_candidates is None
+            else semantic_candidates
+        )
+        self.memory = TTLCache(
+            max_size=Config.INTENT_CACHE_MAX_ENTRIES if max_entries is None else max_entries,
+            ttl_seconds=self.ttl_seconds,
+        )
+
+        self._lock = threading.Lock()
+        self._exact_hits = 0
+        self._db_hits = 0
+        self._semantic_hits = 0
+        self._misses = 0
+        self._stores = 0
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.semantic_threshold > 0
+
+    def _session(self):
+        if self._session_factory is None:
+            from api.database import SessionLocal
+
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def make_key(
+        self, scope: str, query: str, context: str, model: str, prompt_version: str
+    ) -> str:
+        """Ключ точного збігу."""
+        canonical = json.dumps(
+            [
+                scope,
+                self.kind,
+                normalize_query(query),
+                context_hash(context),
+                model,
+                prompt_version,
+            ],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(
+        self,
+        scope: str,
+        query: str,
+        context: str,
+        model: str,
+        prompt_version: str,
+        embedding_fn: Optional[Callable[[], List[float]]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Шукає відповідь: пам'ять, БД за ключем, семантичний пошук у БД.
+
+        Args:
+            embedding_fn: Повертає ембедінг запиту; викликається лише для семантичного пошуку
+        """
+        key = self.make_key(scope, query, context, model, prompt_version)
+        response = self.memory.get(key)
+        if response is not None:
+            return self._hit("exact", response)
+
+        from api.models import LLMResponseCacheEntry
+
+        now = datetime.utcnow()
+        db = self._session()
+        try:
+            entry = (
+                db.query(LLMResponseCacheEntry)
+                .filter(
+                    LLMResponseCacheEntry.key == key,
+                    LLMResponseCacheEntry.expires_at > now,
+                )
+                .first()
+            )
+            if entry is None and self.semantic_enabled and embedding_fn is not None:
+                entry = self._semantic_match(
+                    db, scope, query, context, model, prompt_version, embedding_fn
+                )
+                source = "semantic"
+            else:
+                source = "db"
+
+            if entry is None:
+                return self._miss()
+
+            entry.hit_count = (entry.hit_count or 0) + 1
+            response = entry.response
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"⚠️ Кеш відповідей LLM недоступний: {e}")
+            return self._miss()
+        finally:
+            db.close()
+
+        # Наступний такий самий запит обслуговується з пам'яті
+        self.memory.set(key, response)
+        return self._hit(source, response)
+
+    def _semantic_match(self, db, scope, query, context, model, prompt_version, embedding_fn):
+        """
+        Найближчий за косинусною схожістю запис вище порогу або None.
+
+        Кандидати з іншими числами чи рядками в лапках ("товар 5" і "товар 6")
+        відкидаються: їхні ембедінги майже однакові, а параметри наміру - ні.
+        Відповіді з параметрами семантично не повторюються (semantic_reusable).
+        """
+        from api.models import LLMResponseCacheEntry
+
+        vector = [float(x) for x in embedding_fn()]
+        filters = {
+            "scope": scope,
+            "kind": self.kind,
+            "context_hash": context_hash(context),
+            "model": model,
+            "prompt_version": prompt_version,
+            "now": datetime.utcnow(),
+        }
+        if db.get_bind().dialect.name == "postgresql":
+            ranked = self._rank_pgvector(db, filters, vector)
+        else:
+            ranked = self._rank_scan(db, filters, vector)
+
+        literals = query_literals(query)
+        for key, query_text, similarity in ranked:
+            if query_literals(query_text) != literals:
+                continue
+            entry = db.get(LLMResponseCacheEntry, key)
+            if entry is None or not semantic_reusable(entry.response):
+                continue
+            logger.info(f"🎯 Семантичне влучення кешу LLM (схожість {similarity:.3f})")
+            return entry
+        return None
+
+    def _rank_pgvector(self, db, filters, vector):
+        """Кандидати вище порогу від найближчого; ранжування в PostgreSQL без читання векторів."""
+        rows = db.execute(
+            VECTOR_MATCH_SQL,
+            {
+                **filters,
+                "embedding": dumps_str(vector),
+                "max_distance": 1 - self.semantic_threshold,
+                "limit": self.semantic_candidates,
+            },
+        ).fetchall()
+        return [(row.key, row.query_text, float(row.similarity)) for row in rows]
+
+    def _rank_scan(self, db, filters, vector):
+        """Те саме ранжування в numpy для БД без pgvector (SQLite у тестах)."""
+        from api.models import LLMResponseCacheEntry
+
+        candidates = (
+            db.query(
+                LLMResponseCacheEntry.key,
+                LLMResponseCacheEntry.query_text,
+                LLMResponseCacheEntry.embedding,
+            )
+            .filter(
+                LLMResponseCacheEntry.scope == filters["scope"],
+                LLMResponseCacheEntry.kind == filters["kind"],
+                LLMResponseCacheEntry.context_hash == filters["context_hash"],
+                LLMResponseCacheEntry.model == filters["model"],
+                LLMResponseCacheEntry.prompt_version == filters["prompt_version"],
+                LLMResponseCacheEntry.expires_at > filters["now"],
+                LLMResponseCacheEntry.embedding.isnot(None),
+            )
+            .all()
+        )
+        if not candidates:
+            return []
+
+        query_vector = np.asarray(vector, dtype=np.float32)
+        matrix = np.asarray([loads(c.embedding) for c in candidates], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vector)
+        similarities = matrix @ query_vector / np.where(norms == 0, 1.0, norms)
+        order = np.argsort(-similarities)[: self.semantic_candidates]
+        return [
+            (candidates[i].key, candidates[i].query_text, float(similarities[i]))
+            for i in order
+            if similarities[i] >= self.semantic_threshold
+        ]
+
+    def set(
+        self,
+        scope: str,
+        query: str,
+        context: str,
+        model: str,
+        prompt_version: str,
+        response: Dict[str, Any],
+        embedding: Optional[List[float]] = None,
+    ):
+        """
+        Зберігає відповідь у пам'ять та БД.
+
+        Ембедінг зберігається лише для відповідей, придатних для семантичного
+        пошуку (semantic_reusable); решта доступні тільки за точним ключем.
+        """
+        from api.models import LLMResponseCacheEntry
+
+        key = self.make_key(scope, query, context, model, prompt_version)
+        self.memory.set(key, response)
+        if embedding is not None and semantic_reusable(response):
+            embedding = dumps_str([float(x) for x in embedding])
+        else:
+            embedding = None
+
+        now = datetime.utcnow()
+        db = self._session()
+        try:
+            insert = INSERT_BY_DIALECT.get(db.get_bind().dialect.name)
+            if insert is None:
+                raise ValueError(f"ON CONFLICT не підтримується: {db.get_bind().dialect.name}")
+
+            # Інший вузол міг уже записати той самий ключ: одна атомарна вставка чи
+            # оновлення (прострочений запис поновлюється) без SELECT перед INSERT
+            statement = insert(LLMResponseCacheEntry).values(
+                key=key,
+                kind=self.kind,
+                scope=scope,
+                model=model,
+                prompt_version=prompt_version,
+                query_text=normalize_query(query),
+                context_hash=context_hash(context),
+                embedding=embedding,
+                response=response,
+                hit_count=0,
+                created_at=now,
+                expires_at=now + timedelta(seconds=self.ttl_seconds),
+            )
+            db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=["key"],
+                    set_={
+                        column: statement.excluded[column]
+                        for column in ("embedding", "response", "created_at", "expires_at")
+                    },
+                )
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"⚠️ Не вдалося зберегти відповідь LLM у кеш: {e}")
+            return
+        finally:
+            db.close()
+
+        with self._lock:
+            self._stores += 1
+            purge = self._stores % PURGE_EVERY == 0
+        if purge:
+            self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """Видаляє прострочені записи з БД; повертає кількість видалених."""
+        from api.models import LLMResponseCacheEntry
+
+        db = self._session()
+        try:
+            deleted = (
+                db.query(LLMResponseCacheEntry)
+                .filter(LLMResponseCacheEntry.expires_at <= datetime.utcnow())
+                .delete(synchronize_session=False)
+            )
+            db.commit()
+            return deleted
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"⚠️ Не вдалося очистити кеш відповідей LLM: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def clear_memory(self):
+        """Очищає рівень у пам'яті процесу."""
+        self.memory.clear()
+
+    def _hit(self, source: str, response: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            if source == "exact":
+                self._exact_hits += 1
+            elif source == "db":
+                self._db_hits += 1
+            else:
+                self._semantic_hits += 1
+        record_cache_lookup(f"llm_{self.kind}", True)
+        return response
+
+    def _miss(self) -> None:
+        with self._lock:
+            self._misses += 1
+        record_cache_lookup(f"llm_{self.kind}", False)
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        """Влучення за джерелом (пам'ять, БД, семантичне), промахи та частка влучень."""
+        with self._lock:
+            hits = self._exact_hits + self._db_hits + self._semantic_hits
+            lookups = hits + self._misses
+            return {
+                "kind": self.kind,
+                "lookups": lookups,
+                "memory_hits": self._exact_hits,
+                "db_hits": self._db_hits,
+                "semantic_hits": self._semantic_hits,
+                "misses": self._misses,
+                "stores": self._stores,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "semantic_threshold": self.semantic_threshold,
+                "memory": self.memory.stats(),
+            }
+
+
+# Глобальний кеш аналізу наміру
+intent_cache = LLMResponseCache("intent")
@@ -0,0 +1,498 @@
+"""
+Метрики сервісу у форматі Prometheus (text exposition 0.0.4).
+
+Невеликий власний реєстр без зовнішніх залежностей: лічильники, гістограми
+та gauge з мітками. Етапи обробки /chat інструментуються через
+контекст-менеджер `stage_timer` або декоратор `timed_stage`. Коли метрики
+вимкнені (ENABLE_METRICS=false), обидва повертають спільний no-op, тому
+накладні витрати зводяться до однієї перевірки прапорця.
+"""
+
+import bisect
+import functools
+import logging
+import math
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.config import Config
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+NAMESPACE = "ai_swagger_bot"
+
+# Межі гістограм латентності: від 5 мс до 2 хв (LLM виклики бувають довгими)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_enabled = Config.ENABLE_METRICS
+
+# Поточний етап обробки - для атрибуції токенів LLM
+_current_stage: ContextVar[Optional[str]] = ContextVar("metrics_stage", default=None)
+
+
+def metrics_enabled() -> bool:
+    """Чи збираються метрики."""
+    return _enabled
+
+
+def set_metrics_enabled(enabled: bool):
+    """Вмикає або вимикає збір метрик під час роботи (для тестів та адмінки)."""
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def current_stage() -> Optional[str]:
+    """Етап, всередині якого виконується поточний код."""
+    return _current_stage.get()
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Базовий клас метрики з мітками."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: Any, **kwargs: Any):
+        """Повертає дочірню метрику для конкретних значень міток."""
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(v) for v in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name}: очікувались мітки {self.labelnames}")
+
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self._samples())
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        if amount < 0:
+            raise ValueError("Лічильник не може зменшуватись")
+        with self._lock:
+            self._value += amount
+
+    def get(self) -> float:
+        return self._value
+
+
+class Counter(_Metric):
+    """Монотонний лічильник."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(child.get())}"
+            for key, child in sorted(self._children.items())
+        ]
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        with self._lock:
+            self._value = float(value)
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self._value -= amount
+
+    def set_function(self, function: Callable[[], float]):
+        """Значення обчислюється під час збору метрик."""
+        self._function = function
+
+    def get(self) -> float:
+        if self._function is not None:
+            try:
+                return float(self._function())
+            except Exception as e:
+                logger.warning(f"⚠️ Не вдалося обчислити gauge: {e}")
+                return math.nan
+        return self._value
+
+
+class Gauge(_Metric):
+    """Значення, що може зростати і зменшуватись."""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        self.labels().set_function(function)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.get())}"
+            for key, child in sorted(self._children.items())
+        ]
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class Histogram(_Metric):
+    """Розподіл значень за кумулятивними кошиками."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != math.inf))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, child in sorted(self._children.items()):
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                labels = _format_labels(self.labelnames, key, le)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Реєстр метрик процесу."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Текстове представлення всіх метрик для Prometheus."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class _NoopTimer:
+    """Спільний порожній таймер для вимкнених метрик."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+class _StageTimer:
+    """Вимірює тривалість етапу та робить його поточним для атрибуції токенів."""
+
+    __slots__ = ("stage", "_start", "_token")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self._token = _current_stage.set(self.stage)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        stage_duration.labels(self.stage).observe(time.perf_counter() - self._start)
+        _current_stage.reset(self._token)
+        return False
+
+
+def stage_timer(stage: str):
+    """
+    Контекст-менеджер вимірювання етапу.
+
+    Usage:
+        with stage_timer("vector_search"):
+            ...
+    """
+    if not _enabled:
+        return _NOOP_TIMER
+    return _StageTimer(stage)
+
+
+def timed_stage(stage: str):
+    """Декоратор: вимірює тривалість виклику функції як етап `stage`."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _StageTimer(stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def status_class(status_code: Optional[int]) -> str:
+    """2xx/3xx/4xx/5xx або "error" для запитів без відповіді."""
+    if not status_code:
+        return "error"
+    return f"{int(status_code) // 100}xx"
+
+
+def observe_upstream_call(status_code: Optional[int], seconds: float):
+    """Фіксує тривалість виклику зовнішнього API з класом статусу."""
+    if _enabled:
+        upstream_duration.labels(status_class(status_code)).observe(seconds)
+
+
+def record_llm_tokens(kind: str, amount: int, stage: Optional[str] = None):
+    """Додає токени LLM (kind: prompt/completion) до поточного етапу."""
+    if _enabled and amount:
+        llm_tokens.labels(stage or current_stage() or "other", kind).inc(amount)
+
+
+def record_payload_tokens(stage: str, sent: int, saved: int):
+    """Фіксує токени payload, надіслані в LLM та заощаджені скороченням, за етапом."""
+    if _enabled:
+        if sent:
+            payload_tokens.labels(stage, "sent").inc(sent)
+        if saved:
+            payload_tokens.labels(stage, "saved").inc(saved)
+
+
+def observe_llm_call(stage: str, model: str, outcome: str, seconds: float, cost: float = 0.0):
+    """Фіксує виклик моделі етапу (outcome: ok/error) з тривалістю та вартістю, USD."""
+    if _enabled:
+        llm_call_duration.labels(stage, model, outcome).observe(seconds)
+        if cost:
+            llm_cost.labels(stage, model).inc(cost)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    """Фіксує звернення до кешу."""
+    if _enabled:
+        cache_lookups.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_retry(kind: str):
+    """Фіксує повторну спробу (kind: api_call, ...)."""
+    if _enabled:
+        retries.labels(kind).inc()
+
+
+def record_intent_resolution(source: str):
+    """Фіксує, чим визначено намір (source: local, cache, llm, structured)."""
+    if _enabled:
+        intent_resolutions.labels(source).inc()
+
+
+class InFlightRequestsMiddleware:
+    """ASGI middleware: кількість HTTP запитів, що зараз обробляються."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _enabled:
+            await self.app(scope, receive, send)
+            return
+
+        gauge = in_flight.labels("http")
+        gauge.inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gauge.dec()
+
+
+def render_metrics() -> str:
+    """Текст /metrics."""
+    return registry.render()
+
+
+# Глобальний реєстр та метрики процесу
+registry = MetricsRegistry()
+
+stage_duration = registry.histogram(
+    f"{NAMESPACE}_stage_duration_seconds",
+    "Тривалість етапів обробки запиту",
+    ["stage"],
+)
+upstream_duration = registry.histogram(
+    f"{NAMESPACE}_upstream_api_duration_seconds",
+    "Тривалість викликів зовнішнього API за класом статусу",
+    ["status_class"],
+)
+llm_tokens = registry.counter(
+    f"{NAMESPACE}_llm_tokens",
+    "Токени LLM за етапом та типом",
+    ["stage", "kind"],
+)
+payload_tokens = registry.counter(
+    f"{NAMESPACE}_llm_payload_tokens",
+    "Токени payload у промптах LLM за етапом: надіслані та заощаджені скороченням",
+    ["stage", "kind"],
+)
+llm_call_duration = registry.histogram(
+    f"{NAMESPACE}_llm_call_duration_seconds",
+    "Тривалість викликів LLM за етапом, моделлю та результатом",
+    ["stage", "model", "outcome"],
+)
+llm_cost = registry.counter(
+    f"{NAMESPACE}_llm_cost_usd",
+    "Орієнтовна вартість викликів LLM за етапом та моделлю, USD",
+    ["stage", "model"],
+)
+cache_lookups = registry.counter(
+    f"{NAMESPACE}_cache_lookups",
+    "Звернення до кешів за результатом",
+    ["cache", "result"],
+)
+retries = registry.counter(
+    f"{NAMESPACE}_retries",
+    "Повторні спроби за типом",
+    ["kind"],
+)
+intent_resolutions = registry.counter(
+    f"{NAMESPACE}_intent_resolutions",
+    "Визначення наміру користувача за джерелом",
+    ["source"],
+)
+queue_depth = registry.gauge(
+    f"{NAMESPACE}_queue_depth",
+    "Кількість завдань у черзі",
+    ["queue"],
+)
+in_flight = registry.gauge(
+    f"{NAMESPACE}_in_flight_requests",
+    "Запити в обробці",
+    ["scope"],
+)
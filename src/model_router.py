@@ -0,0 +1,388 @@
+"""
+Маршрутизація моделей LLM за етапами обробки.
+
+Кожен етап (аналіз наміру, планування запиту, форматування відповіді,
+виправлення помилок, ...) має свій ланцюжок моделей, температуру, ліміт
+токенів відповіді та таймаут. Якщо модель повертає помилку або не вкладається
+в таймаут, виклик повторюється наступною моделлю ланцюжка. Для кожного
+виклику фіксуються тривалість та орієнтовна вартість за етапом і моделлю,
+тому баланс швидкості та якості налаштовується через MODEL_ROUTES без змін коду.
+"""
+
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.config import Config
+from src.llm_budget import BudgetedLLM, LLMBudgetExceeded, llm_token_bucket, reported_usage
+from src.metrics import observe_llm_call
+from src.token_budget import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Модель за замовчуванням (OPENAI_MODEL) підставляється замість None
+DEFAULT_ROUTES: Dict[str, Dict[str, Any]] = {
+    "intent": {"models": ["gpt-4o-mini", None], "max_tokens": 500},
+    "request_planning": {"models": ["gpt-4o-mini", None], "max_tokens": 800},
+    "response_formatting": {"models": ["gpt-4o-mini", None], "max_tokens": 1200},
+    "retry_fix": {"models": [None, "gpt-4o"], "max_tokens": 1000},
+    "object_creation": {"models": [None, "gpt-4o"], "max_tokens": 1000},
+    "error_analysis": {"models": [None, "gpt-4o"], "temperature": 0.1, "max_tokens": 500},
+    "prompt_generation": {"models": [None]},
+    "default": {"models": [None]},
+}
+
+# USD за 1K токенів: (prompt, completion)
+DEFAULT_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+
+
+@dataclass
+class StageRoute:
+    """Налаштування моделей етапу."""
+
+    stage: str
+    models: List[str]
+    temperature: float = 0.0
+    max_tokens: Optional[int] = None
+    timeout: Optional[float] = None
+
+    @property
+    def primary(self) -> str:
+        return self.models[0]
+
+
+@dataclass
+class _StageStats:
+    calls: int = 0
+    errors: int = 0
+    fallbacks: int = 0
+    seconds: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost_usd: float = 0.0
+    models: Dict[str, int] = field(default_factory=dict)
+
+
+def _load_json(raw: str, name: str) -> Dict[str, Any]:
+    if not raw:
+        return {}
+    try:
+        value = json.loads(raw)
+    except ValueError as e:
+        logger.error(
+            f"❌ {name} не є валідним JSON, використовуються значення за замовчуванням: {e}"
+        )
+        return {}
+    return value if isinstance(value, dict) else {}
+
+
+def load_routes(
+    overrides: Optional[Dict[str, Dict[str, Any]]] = None,
+    default_model: Optional[str] = None,
+    enabled: Optional[bool] = None,
+) -> Dict[str, StageRoute]:
+    """
+    Маршрути етапів: DEFAULT_ROUTES, перевизначені MODEL_ROUTES.
+
+    Якщо маршрутизацію вимкнено, всі етапи використовують OPENAI_MODEL
+    без обмеження токенів відповіді (як до появи маршрутизатора).
+    """
+    default_model = default_model or Config.OPENAI_MODEL
+    enabled = Config.MODEL_ROUTER_ENABLED if enabled is None else enabled
+    if overrides is None:
+        overrides = _load_json(Config.MODEL_ROUTES, "MODEL_ROUTES")
+
+    routes: Dict[str, StageRoute] = {}
+    for stage in set(DEFAULT_ROUTES) | set(overrides):
+        settings = {"temperature": Config.OPENAI_TEMPERATURE, "timeout": None}
+        if enabled:
+            settings.update(DEFAULT_ROUTES.get(stage, DEFAULT_ROUTES["default"]))
+            settings.update(overrides.get(stage) or {})
+            models = settings.get("models") or [None]
+        else:
+            models = [None]
+
+        chain: List[str] = []
+        for model in models:
+            model = model or default_model
+            if model not in chain:
+                chain.append(model)
+        routes[stage] = StageRoute(
+            stage=stage,
+            models=chain,
+            temperature=float(settings["temperature"]),
+            max_tokens=settings.get("max_tokens"),
+            timeout=settings.get("timeout") or Config.LLM_REQUEST_TIMEOUT_SECONDS,
+        )
+    return routes
+
+
+def _message_tokens(messages: Any, model: str) -> int:
+    if isinstance(messages, str):
+        return count_tokens(messages, model)
+    if not isinstance(messages, list):
+        return 0
+    contents = (
+        m.get("content") if isinstance(m, dict) else getattr(m, "content", "") for m in messages
+    )
+    return sum(count_tokens(str(content or ""), model) for content in contents)
+
+
+def langchain_usage(
+    messages: Any, result: Any, model: str, tools: Optional[List[Any]] = None
+) -> Tuple[int, int]:
+    """
+    Токени запиту та відповіді LangChain виклику: з usage API, а без нього -
+    підрахунком токенізатором (повідомлення, схема tools та аргументи tool calls).
+    """
+    usage = reported_usage(result)
+    if usage is not None:
+        return usage
+
+    prompt = _message_tokens(messages, model)
+    if tools:
+        prompt += count_tokens(json.dumps(tools, ensure_ascii=False), model)
+    completion = str(getattr(result, "content", "") or "")
+    tool_calls = (getattr(result, "additional_kwargs", None) or {}).get("tool_calls")
+    if tool_calls:
+        completion += json.dumps(tool_calls, ensure_ascii=False)
+    return prompt, count_tokens(completion, model) if completion else 0
+
+
+def openai_usage(response: Any) -> Tuple[int, int]:
+    """Токени з usage відповіді OpenAI SDK."""
+    usage = getattr(response, "usage", None)
+    return (
+        getattr(usage, "prompt_tokens", 0) or 0,
+        getattr(usage, "completion_tokens", 0) or 0,
+    )
+
+
+class ModelRouter:
+    """Моделі етапів, fallback між ними та облік тривалості і вартості викликів."""
+
+    def __init__(
+        self,
+        routes: Optional[Dict[str, StageRoute]] = None,
+        prices: Optional[Dict[str, Tuple[float, float]]] = None,
+    ):
+        """
+        Args:
+            routes: Маршрути етапів (за замовчуванням load_routes())
+            prices: Ціни моделей, USD за 1K токенів (за замовчуванням DEFAULT_PRICES + MODEL_PRICES)
+        """
+        self.routes = routes if routes is not None else load_routes()
+        if prices is None:
+            prices = dict(DEFAULT_PRICES)
+            for model, price in _load_json(Config.MODEL_PRICES, "MODEL_PRICES").items():
+                prices[model] = (float(price[0]), float(price[1]))
+        self.prices = prices
+
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _StageStats] = {}
+
+    def route(self, stage: str) -> StageRoute:
+        """Маршрут етапу (невідомий етап - маршрут default)."""
+        return self.routes.get(stage) or self.routes["default"]
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """Орієнтовна вартість виклику, USD (0 - ціна моделі невідома)."""
+        price = self.prices.get(model)
+        if price is None:
+            # Версіоновані назви (gpt-4o-mini-2024-07-18) - за найдовшим префіксом
+            prefixes = [name for name in self.prices if model.startswith(f"{name}-")]
+            price = self.prices[max(prefixes, key=len)] if prefixes else (0.0, 0.0)
+        return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1000
+
+    def call(
+        self,
+        stage: str,
+        invoke: Callable[[str, StageRoute], Any],
+        usage: Optional[Callable[[Any, str], Tuple[int, int]]] = None,
+        models: Optional[List[str]] = None,
+    ) -> Any:
+        """
+        Виконує виклик моделями ланцюжка етапу до першого успішного.
+
+        Args:
+            stage: Етап обробки
+            invoke: Виклик моделі: invoke(model, route) -> відповідь
+            usage: Токени відповіді: usage(response, model) -> (prompt, completion)
+            models: Ланцюжок моделей замість ланцюжка маршруту
+
+        Raises:
+            LLMBudgetExceeded: Бюджет LLM викликів вичерпано (без fallback)
+            Exception: Помилка останньої моделі ланцюжка
+        """
+        route = self.route(stage)
+        models = models or route.models
+        last_error: Optional[Exception] = None
+        for index, model in enumerate(models):
+            start = time.perf_counter()
+            try:
+                response = invoke(model, route)
+            except LLMBudgetExceeded:
+                raise
+            except Exception as e:
+                self._record(stage, model, time.perf_counter() - start, error=True)
+                last_error = e
+                if index + 1 < len(models):
+                    logger.warning(
+                        f"⚠️ Модель {model} етапу {stage} недоступна ({type(e).__name__}), "
+                        f"fallback на {models[index + 1]}"
+                    )
+                continue
+
+            tokens = (0, 0)
+            if usage is not None:
+                try:
+                    tokens = usage(response, model)
+                except Exception as e:
+                    logger.debug(f"Не вдалося порахувати токени {model}: {e}")
+            self._record(
+                stage, model, time.perf_counter() - start, tokens=tokens, fallback=index > 0
+            )
+            return response
+        raise last_error
+
+    def chain(self, stage: str, preferred: Optional[str] = None) -> List[str]:
+        """Ланцюжок моделей етапу; явно вказана модель іде першою."""
+        models = self.route(stage).models
+        if not preferred:
+            return list(models)
+        return [preferred] + [model for model in models if model != preferred]
+
+    def chat_model(self, stage: str, api_key: Optional[str] = None) -> "RoutedChatModel":
+        """LangChain chat модель етапу з fallback та спільним бюджетом LLM викликів."""
+        return RoutedChatModel(self, stage, api_key)
+
+    def _record(
+        self,
+        stage: str,
+        model: str,
+        seconds: float,
+        tokens: Tuple[int, int] = (0, 0),
+        error: bool = False,
+        fallback: bool = False,
+    ):
+        cost = 0.0 if error else self.cost(model, *tokens)
+        with self._lock:
+            stats = self._stats.setdefault(stage, _StageStats())
+            stats.calls += 1
+            stats.errors += 1 if error else 0
+            stats.fallbacks += 1 if fallback else 0
+            stats.seconds += seconds
+            stats.prompt_tokens += tokens[0]
+            stats.completion_tokens += tokens[1]
+            stats.cost_usd += cost
+            stats.models[model] = stats.models.get(model, 0) + 1
+        observe_llm_call(stage, model, "error" if error else "ok", seconds, cost)
+
+    def stats(self) -> Dict[str, Any]:
+        """Маршрути етапів, тривалість та вартість викликів."""
+        with self._lock:
+            stages = {
+                stage: {
+                    "calls": stats.calls,
+                    "errors": stats.errors,
+                    "fallbacks": stats.fallbacks,
+                    "avg_latency_seconds": round(stats.seconds / stats.calls, 3),
+                    "prompt_tokens": stats.prompt_tokens,
+                    "completion_tokens": stats.completion_tokens,
+                    "cost_usd": round(stats.cost_usd, 6),
+                    "models": dict(stats.models),
+                }
+                for stage, stats in self._stats.items()
+            }
+        return {
+            "routes": {
+                stage: {
+                    "models": route.models,
+                    "temperature": route.temperature,
+                    "max_tokens": route.max_tokens,
+                    "timeout": route.timeout,
+                }
+                for stage, route in sorted(self.routes.items())
+            },
+            "stages": stages,
+        }
+
+
+class RoutedChatModel:
+    """
+    LangChain chat модель етапу: invoke() та __call__() виконуються моделями
+    ланцюжка етапу, кожен виклик списує токен зі спільного бюджету LLM.
+    """
+
+    def __init__(self, router: ModelRouter, stage: str, api_key: Optional[str] = None):
+        self.router = router
+        self.stage = stage
+        self._api_key = api_key
+        self._clients: Dict[str, BudgetedLLM] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def model_name(self) -> str:
+        return self.router.route(self.stage).primary
+
+    def _client(self, model: str, route: StageRoute) -> BudgetedLLM:
+        with self._lock:
+            client = self._clients.get(model)
+            if client is None:
+                from langchain_openai import ChatOpenAI
+
+                client = BudgetedLLM(
+                    ChatOpenAI(
+                        model=model,
+                        temperature=route.temperature,
+                        max_tokens=route.max_tokens,
+                        request_timeout=route.timeout,
+                        # Подальші повтори замінює наступна модель ланцюжка
+                        max_retries=Config.LLM_REQUEST_MAX_RETRIES,
+                        openai_api_key=self._api_key,
+                    ),
+                    llm_token_bucket,
+                )
+                self._clients[model] = client
+            return client
+
+    def _usage(self, messages: Any, kwargs: dict, response: Any, model: str) -> Tuple[int, int]:
+        # Usage з відповіді API вже включає схему tools примусового tool call
+        usage = self._clients[model].last_usage()
+        if usage is not None:
+            return usage
+        tools = kwargs.get("tools") or kwargs.get("functions")
+        return langchain_usage(messages, response, model, tools)
+
+    def _call(self, method: str, args: tuple, kwargs: dict):
+        messages = args[0] if args else kwargs.get("input")
+        return self.router.call(
+            self.stage,
+            lambda model, route: getattr(self._client(model, route), method)(*args, **kwargs),
+            usage=lambda response, model: self._usage(messages, kwargs, response, model),
+        )
+
+    def invoke(self, *args, **kwargs):
+        return self._call("invoke", args, kwargs)
+
+    def __call__(self, *args, **kwargs):
+        return self._call("__call__", args, kwargs)
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        route = self.router.route(self.stage)
+        return getattr(self._client(route.primary, route), name)
+
+
+# Глобальний маршрутизатор моделей
+model_router = ModelRouter()
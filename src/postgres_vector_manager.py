@@ -2,16 +2,22 @@
 Менеджер векторів для PostgreSQL з pgvector.
 """
 
-import json
 import uuid
+import weakref
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 from sqlalchemy import text
 from sqlalchemy.engine import Engine
 
 from src.config import Config
+from src.metrics import timed_stage
+from src.serialization import dumps_str, loads
+from src.warm_cache import cache_version, warm_cache
+
+# Engines, для яких схема (pgvector, api_embeddings) вже перевірена в цьому процесі
+_schema_checked_engines: "weakref.WeakSet[Engine]" = weakref.WeakSet()
 
 
 class PostgresVectorManager:
@@ -31,11 +37,14 @@ class PostgresVectorManager:
 
             self.engine = engine
 
-        # Перевіряємо чи встановлений pgvector
-        self._check_pgvector_extension()
+        # Схема перевіряється один раз на engine за життя процесу (теплого контейнера)
+        if self.engine not in _schema_checked_engines:
+            # Перевіряємо чи встановлений pgvector
+            self._check_pgvector_extension()
 
-        # Створюємо таблицю якщо не існує
-        self._create_embeddings_table()
+            # Створюємо таблицю якщо не існує
+            self._create_embeddings_table()
+            _schema_checked_engines.add(self.engine)
 
     def _check_pgvector_extension(self):
         """Перевіряє чи встановлений pgvector extension."""
@@ -138,6 +147,7 @@ class PostgresVectorManager:
             print(f"❌ Помилка створення таблиці: {e}")
             raise
 
+    @timed_stage("db_write")
     def add_embedding(
         self,
         user_id: str,
@@ -164,7 +174,7 @@ class PostgresVectorManager:
             ID створеного або оновленого запису
         """
         try:
-            embedding_json = json.dumps(embedding)
+            embedding_json = dumps_str(embedding)
 
             with self.engine.connect() as conn:
                 # Перевіряємо чи існує вже такий embedding
@@ -196,7 +206,7 @@ class PostgresVectorManager:
                             """
                         UPDATE api_embeddings
                         SET description = :description, embedding = :embedding,
-                            embedding_metadata = :metadata, created_at = :created_at
+                            embedding_metadata = :embedding_metadata, created_at = :created_at
                         WHERE id = :id
                     """
                         ),
@@ -204,7 +214,7 @@ class PostgresVectorManager:
                             "id": embedding_id,
                             "description": description,
                             "embedding": embedding_json,
-                            "embedding_metadata": json.dumps(metadata) if metadata else None,
+                            "embedding_metadata": dumps_str(metadata) if metadata else None,
                             "created_at": datetime.now().isoformat(),
                         },
                     )
@@ -232,10 +242,11 @@ class PostgresVectorManager:
                             "method": method,
                             "description": description,
                             "embedding": embedding_json,
-                            "embedding_metadata": json.dumps(metadata) if metadata else None,
+                            "embedding_metadata": dumps_str(metadata) if metadata else None,
                             "created_at": datetime.now().isoformat(),
                         },
                     )
+                    self._update_embeddings_counter(conn, user_id, 1)
                     print(
                         f"✅ Додано новий вектор: {method} {endpoint_path} для користувача {user_id}"
                     )
@@ -247,6 +258,22 @@ class PostgresVectorManager:
             print(f"❌ Помилка додавання вектора: {e}")
             raise
 
+    @staticmethod
+    def _update_embeddings_counter(conn, user_id: str, delta: int):
+        """Змінює лічильник embeddings у user_stats в тій самій транзакції."""
+        if not delta:
+            return
+        conn.execute(
+            text(
+                """
+            UPDATE user_stats
+            SET embeddings_count = embeddings_count + :delta, updated_at = :updated_at
+            WHERE user_id = :user_id
+        """
+            ),
+            {"delta": delta, "user_id": user_id, "updated_at": datetime.utcnow()},
+        )
+
     def search_similar(
         self,
         query_embedding: List[float],
@@ -267,7 +294,17 @@ class PostgresVectorManager:
             Список подібних embeddings з метаданими
         """
         try:
-            query_embedding_json = json.dumps(query_embedding)
+            if swagger_spec_id:
+                try:
+                    results = self._search_snapshot(
+                        query_embedding, user_id, swagger_spec_id, limit
+                    )
+                    if results is not None:
+                        return results
+                except Exception as e:
+                    print(f"⚠️ Пошук у знімку embeddings недоступний, використовуємо pgvector: {e}")
+
+            query_embedding_json = dumps_str(query_embedding)
 
             # Запит з векторним пошуком за косинусною схожістю
             base_query = f"""
@@ -297,7 +334,7 @@ class PostgresVectorManager:
                     # Конвертуємо JSON string назад в список, або використовуємо як є, якщо вже dict/list
                     if row[4]:
                         if isinstance(row[4], str):
-                            embedding = json.loads(row[4])
+                            embedding = loads(row[4])
                         else:
                             embedding = row[4]  # Вже список або dict
                     else:
@@ -306,7 +343,7 @@ class PostgresVectorManager:
                     # Аналогічно для metadata
                     if row[5]:
                         if isinstance(row[5], str):
-                            metadata = json.loads(row[5])
+                            metadata = loads(row[5])
                         else:
                             metadata = row[5]  # Вже dict
                     else:
@@ -331,6 +368,97 @@ class PostgresVectorManager:
             print(f"❌ Помилка пошуку подібних векторів: {e}")
             return []
 
+    def _snapshot_version(self, conn, user_id: str, swagger_spec_id: str) -> Tuple[str, int]:
+        """Версія embeddings специфікації: SwaggerSpec.updated_at, кількість та остання зміна."""
+        row = conn.execute(
+            text(
+                """
+            SELECT (SELECT updated_at FROM swagger_specs WHERE id = :swagger_spec_id),
+                   COUNT(*), MAX(created_at)
+            FROM api_embeddings
+            WHERE user_id = :user_id AND swagger_spec_id = :swagger_spec_id
+        """
+            ),
+            {"user_id": user_id, "swagger_spec_id": swagger_spec_id},
+        ).fetchone()
+        return cache_version(row[0], row[1], row[2]), int(row[1] or 0)
+
+    def _load_snapshot(self, conn, user_id: str, swagger_spec_id: str) -> Dict[str, Any]:
+        """Завантажує всі embeddings специфікації в матрицю numpy."""
+        rows = conn.execute(
+            text(
+                """
+            SELECT id, endpoint_path, method, description, embedding, embedding_metadata, created_at
+            FROM api_embeddings
+            WHERE user_id = :user_id AND swagger_spec_id = :swagger_spec_id
+        """
+            ),
+            {"user_id": user_id, "swagger_spec_id": swagger_spec_id},
+        ).fetchall()
+
+        records = []
+        vectors = []
+        for row in rows:
+            embedding = loads(row[4]) if isinstance(row[4], str) else row[4]
+            metadata = loads(row[5]) if isinstance(row[5], str) else row[5]
+            vectors.append(embedding if embedding is not None else [])
+            records.append(
+                {
+                    "id": row[0],
+                    "endpoint_path": row[1],
+                    "method": row[2],
+                    "description": row[3],
+                    "metadata": metadata or {},
+                    "created_at": row[6],
+                }
+            )
+
+        matrix = np.asarray(vectors, dtype=np.float32)
+        return {"records": records, "matrix": matrix, "norms": np.linalg.norm(matrix, axis=1)}
+
+    def _search_snapshot(
+        self, query_embedding: List[float], user_id: str, swagger_spec_id: str, limit: int
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Косинусний пошук у знімку embeddings з warm кешу контейнера.
+
+        Повертає None, якщо знімок недоступний (кеш вимкнено, забагато
+        endpoints або вектори різної розмірності) - тоді шукаємо в pgvector.
+        """
+        if not warm_cache.enabled:
+            return None
+
+        with self.engine.connect() as conn:
+            version, count = self._snapshot_version(conn, user_id, swagger_spec_id)
+            if count == 0 or count > Config.WARM_VECTOR_SNAPSHOT_MAX_ROWS:
+                return None
+            snapshot = warm_cache.get_or_create(
+                "vectors",
+                (user_id, swagger_spec_id),
+                lambda: self._load_snapshot(conn, user_id, swagger_spec_id),
+                version=version,
+            )
+
+        matrix = snapshot["matrix"]
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[1] != query.shape[0]:
+            return None
+
+        denominator = snapshot["norms"] * np.linalg.norm(query)
+        similarities = np.divide(
+            matrix @ query, denominator, out=np.zeros(len(matrix)), where=denominator > 0
+        )
+        top = np.argsort(-similarities, kind="stable")[:limit]
+
+        return [
+            {
+                **snapshot["records"][i],
+                "embedding": matrix[i].tolist(),
+                "similarity": float(similarities[i]),
+            }
+            for i in top
+        ]
+
     def get_embeddings_for_user(
         self, user_id: str, swagger_spec_id: str = None
     ) -> List[Dict[str, Any]]:
@@ -368,7 +496,7 @@ class PostgresVectorManager:
                     # Конвертуємо JSON string назад в список, або використовуємо як є, якщо вже dict/list
                     if row[4]:
                         if isinstance(row[4], str):
-                            embedding = json.loads(row[4])
+                            embedding = loads(row[4])
                         else:
                             embedding = row[4]  # Вже список або dict
                     else:
@@ -377,7 +505,7 @@ class PostgresVectorManager:
                     # Аналогічно для metadata
                     if row[5]:
                         if isinstance(row[5], str):
-                            metadata = json.loads(row[5])
+                            metadata = loads(row[5])
                         else:
                             metadata = row[5]  # Вже dict
                     else:
@@ -422,9 +550,10 @@ class PostgresVectorManager:
 
             with self.engine.connect() as conn:
                 result = conn.execute(text(base_query), params)
+                deleted_count = result.rowcount
+                self._update_embeddings_counter(conn, user_id, -deleted_count)
                 conn.commit()
 
-                deleted_count = result.rowcount
                 print(f"✅ Видалено {deleted_count} embeddings для користувача {user_id}")
                 return True
 
@@ -523,11 +652,20 @@ class PostgresVectorManager:
                         ) t
                         WHERE t.rn > 1
                     )
+                    RETURNING user_id
                 """
                     )
                 )
 
-                deleted_count = result.rowcount
+                deleted_rows = result.fetchall()
+                deleted_count = len(deleted_rows)
+                affected_users = {row[0] for row in deleted_rows}
+                if affected_users:
+                    from api.user_stats import reset_user_stats
+
+                    # Лічильники власників дублікатів буде перераховано при наступному читанні
+                    for user_id in affected_users:
+                        reset_user_stats(conn, user_id)
                 conn.commit()
 
                 if deleted_count > 0:
@@ -4,17 +4,40 @@ RAG двигун для роботи з API endpoints.
 
 import logging
 import os
-from typing import Any, Dict, List, Optional
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_openai import OpenAIEmbeddings
 
+from src.config import Config
 from src.enhanced_swagger_parser import EnhancedSwaggerParser
+from src.ingestion_pipeline import PipelineStage, StagedPipeline, batched
+from src.metrics import stage_timer
 from src.postgres_vector_manager import PostgresVectorManager
+from src.tracing import start_span
+from src.warm_cache import warm_cache
 
 logger = logging.getLogger(__name__)
 
 
+class _ProgressReporter:
+    """Передає прогрес 0-100 у callback лише коли значення зростає."""
+
+    def __init__(self, callback: Optional[Callable[[int], None]]):
+        self._callback = callback
+        self._last = -1
+        self._lock = threading.Lock()
+
+    def __call__(self, percent: int):
+        percent = min(100, int(percent))
+        with self._lock:
+            if self._callback is None or percent <= self._last:
+                return
+            self._last = percent
+        self._callback(percent)
+
+
 class PostgresRAGEngine:
     """RAG двигун з використанням PostgreSQL та pgvector."""
 
@@ -27,8 +50,6 @@ class PostgresRAGEngine:
             swagger_spec_id: ID Swagger специфікації
             config: Конфігурація RAG
         """
-        from src.config import Config
-
         self.user_id = user_id
         self.swagger_spec_id = swagger_spec_id
         self.vector_manager = PostgresVectorManager()
@@ -46,6 +67,9 @@ class PostgresRAGEngine:
             chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=["\n\n", "\n", " ", ""]
         )
 
+        # Звіт етапів останньої індексації (пропускна здатність, помилки)
+        self.last_ingestion_report: Optional[Dict[str, Any]] = None
+
         logger.info(f"Ініціалізація PostgreSQL RAG Engine для користувача {user_id}")
 
     def create_vectorstore_from_swagger(
@@ -62,45 +86,137 @@ class PostgresRAGEngine:
         Returns:
             True якщо успішно створено
         """
+        logger.info("Парсинг Swagger специфікації...")
         try:
-            logger.info("Парсинг Swagger специфікації...")
             # Парсимо Swagger файл
             parser = EnhancedSwaggerParser(swagger_spec_path)
+        except Exception as e:
+            logger.error(f"Помилка створення векторної бази: {e}")
+            return False
+
+        return self._create_vectorstore_with_parser(parser, enable_gpt_enhancement)
+
+    def create_vectorstore_from_swagger_data(
+        self,
+        swagger_data: Dict[str, Any],
+        enable_gpt_enhancement: bool = True,
+        progress_callback: Optional[Callable[[int], None]] = None,
+        phase_callback: Optional[Callable[[str], None]] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> bool:
+        """
+        Створює векторну базу з вже завантаженої Swagger специфікації (без тимчасового файлу).
+
+        Args:
+            swagger_data: Дані Swagger специфікації
+            enable_gpt_enhancement: Чи використовувати GPT для покращення
+            progress_callback: Отримує загальний прогрес 0-100
+                (базові chunks: 25-50, GPT покращення: 50-100)
+            phase_callback: Отримує фазу індексації: "base", потім "enhancing"
+            cancel_event: Подія скасування (втрата lease завдання): індексація зупиняється
+                між пакетами, результат - False
 
-            # Використовуємо новий метод для створення chunks
-            chunks = parser.create_enhanced_endpoint_chunks()
-            logger.info(f"Створено {len(chunks)} базових chunks")
+        Returns:
+            True якщо успішно створено
+        """
+        parser = EnhancedSwaggerParser()
+        parser.swagger_data = swagger_data
+        return self._create_vectorstore_with_parser(
+            parser, enable_gpt_enhancement, progress_callback, phase_callback, cancel_event
+        )
 
-            # GPT покращення (опціонально)
+    def _create_vectorstore_with_parser(
+        self,
+        parser: EnhancedSwaggerParser,
+        enable_gpt_enhancement: bool,
+        progress_callback: Optional[Callable[[int], None]] = None,
+        phase_callback: Optional[Callable[[str], None]] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> bool:
+        """
+        Створює chunks, зберігає їх embeddings та опціонально покращує їх GPT.
+
+        Індексація прогресивна: спочатку записуються embeddings базових chunks
+        (специфікація доступна для пошуку за секунди), потім chunks, покращені
+        GPT, повторно вбудовуються й замінюють свої рядки. В обох фазах етапи
+        конвеєра працюють одночасно над різними пакетами; звіти фаз
+        зберігаються в last_ingestion_report.
+        """
+        report = _ProgressReporter(progress_callback)
+        set_phase = phase_callback or (lambda phase: None)
+        try:
+            swagger_data = getattr(parser, "swagger_data", None)
+            gpt_generator = None
             if enable_gpt_enhancement:
-                try:
-                    # Перевіряємо чи є swagger_data у parser
-                    if hasattr(parser, "swagger_data") and parser.swagger_data:
-                        enhanced_chunks, gpt_prompts = self._enhance_chunks_with_gpt(
-                            chunks, parser.swagger_data
+                if swagger_data:
+                    try:
+                        gpt_generator = self._create_prompt_generator()
+                    except Exception as gpt_error:
+                        logger.warning(
+                            f"⚠️ GPT enhancement недоступний: {gpt_error}. Продовжуємо з базовими chunks"
                         )
-                        if enhanced_chunks and gpt_prompts:
-                            chunks = enhanced_chunks
-                            logger.info(
-                                f"✨ Покращено за допомогою GPT: {len(chunks)} chunks, {len(gpt_prompts)} промптів"
-                            )
-
-                            # Зберігаємо GPT-генеровані промпти
-                            self._save_gpt_prompts(gpt_prompts)
-                        else:
-                            logger.warning(
-                                "⚠️ GPT enhancement не дав результатів, використовуємо базові chunks"
-                            )
-                    else:
-                        logger.warning("⚠️ Swagger data недоступна для GPT аналізу")
-                except Exception as gpt_error:
+                else:
+                    logger.warning("⚠️ Swagger data недоступна для GPT аналізу")
+
+            chunks: List[Dict[str, Any]] = []
+            base_end = 50 if gpt_generator else 100
+
+            def parse():
+                # Використовуємо новий метод для створення chunks
+                chunks.extend(parser.create_enhanced_endpoint_chunks())
+                logger.info(f"Створено {len(chunks)} базових chunks")
+                report(25)
+                yield from batched(chunks, Config.INGEST_BATCH_SIZE)
+
+            # Фаза 1: базові chunks без GPT
+            set_phase("base")
+            ingestion_report = {
+                "base": self._run_ingestion(
+                    parse(),
+                    [],
+                    lambda done: report(25 + (base_end - 25) * done // max(len(chunks), 1)),
+                    cancel_event=cancel_event,
+                )
+            }
+            logger.info(f"🔎 Базові embeddings записано: {ingestion_report['base']['written']}")
+            if cancel_event is not None and cancel_event.is_set():
+                logger.warning("⚠️ Індексацію скасовано")
+                return False
+
+            # Фаза 2: GPT покращення та заміна рядків покращеними embeddings
+            if gpt_generator:
+                set_phase("enhancing")
+                ingestion_report["enhanced"], gpt_prompts = self._reindex_with_gpt(
+                    chunks,
+                    swagger_data,
+                    gpt_generator,
+                    lambda done: report(50 + 50 * done // max(len(chunks), 1)),
+                    cancel_event,
+                )
+                if cancel_event is not None and cancel_event.is_set():
+                    logger.warning("⚠️ Індексацію скасовано")
+                    return False
+                if gpt_prompts:
+                    # Загальні промпти ресурсів не впливають на chunks - генеруємо після запису
+                    gpt_prompts.extend(gpt_generator.generate_resource_prompts(swagger_data))
+                    logger.info(
+                        f"✨ Покращено за допомогою GPT: {ingestion_report['enhanced']['written']} chunks, {len(gpt_prompts)} промптів"
+                    )
+
+                    # Зберігаємо GPT-генеровані промпти
+                    self._save_gpt_prompts(gpt_prompts)
+                else:
                     logger.warning(
-                        f"⚠️ GPT enhancement недоступний: {gpt_error}. Продовжуємо з базовими chunks"
+                        "⚠️ GPT enhancement не дав результатів, використовуємо базові chunks"
                     )
-                    # Продовжуємо з базовими chunks
+                ingestion_report["gpt_prompts"] = len(gpt_prompts)
 
-            # Створюємо векторну базу
-            self.create_vectorstore(chunks)
+                generation_report = getattr(gpt_generator, "report", None)
+                if generation_report:
+                    ingestion_report["prompt_generation"] = generation_report()
+                    logger.info(f"🧩 Генерація промптів: {ingestion_report['prompt_generation']}")
+
+            self.last_ingestion_report = ingestion_report
             logger.info("Векторна база створена успішно")
             return True
 
@@ -108,18 +224,130 @@ class PostgresRAGEngine:
             logger.error(f"Помилка створення векторної бази: {e}")
             return False
 
-    def create_vectorstore(self, chunks: List[Dict[str, Any]]) -> None:
+    def create_vectorstore(
+        self,
+        chunks: List[Dict[str, Any]],
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+    ) -> None:
         """
         Створює векторну базу даних з chunks для конкретного користувача.
 
         Args:
             chunks: Список chunks з метаданими
+            progress_callback: Викликається після запису кожного пакета з (оброблено, всього)
         """
+        self.last_ingestion_report = self._run_ingestion(
+            batched(chunks, Config.INGEST_BATCH_SIZE),
+            [],
+            (lambda done: progress_callback(done, len(chunks))) if progress_callback else None,
+        )
+
+    @staticmethod
+    def _create_prompt_generator():
+        """GPT генератор або гібридний (шаблони, GPT лише для прогалин) за PROMPT_GENERATION_MODE."""
+        from src.gpt_prompt_generator import GPTPromptGenerator
+
+        gpt_generator = GPTPromptGenerator()
+        if Config.PROMPT_GENERATION_MODE == "hybrid":
+            from src.hybrid_prompt_generator import HybridPromptGenerator
+
+            return HybridPromptGenerator(gpt_generator)
+        return gpt_generator
+
+    def _reindex_with_gpt(
+        self,
+        chunks: List[Dict[str, Any]],
+        swagger_data: Dict[str, Any],
+        gpt_generator,
+        progress_callback: Optional[Callable[[int], None]] = None,
+        cancel_event: Optional[threading.Event] = None,
+    ) -> tuple[Dict[str, Any], List]:
+        """
+        Покращує chunks GPT і перезаписує embeddings лише покращених chunks.
+
+        Returns:
+            Tuple: (звіт етапів, список GPT промптів)
+        """
+        gpt_prompts = []
+        enhanced = {"chunks": 0}
+        lock = threading.Lock()
+
+        def enhance(batch: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+            batch, prompts = self._enhance_chunks_with_gpt(batch, swagger_data, gpt_generator)
+            with lock:
+                gpt_prompts.extend(prompts)
+                enhanced["chunks"] += len(batch)
+                done = enhanced["chunks"]
+            if progress_callback:
+                progress_callback(done)
+            # Не покращені chunks вже записані в базовій фазі
+            return [chunk for chunk in batch if chunk["metadata"].get("prompt_source")] or None
+
+        ingestion_report = self._run_ingestion(
+            batched(chunks, Config.INGEST_BATCH_SIZE),
+            [PipelineStage("enhance", enhance, Config.INGEST_ENHANCE_WORKERS)],
+            source_name="chunks",
+            cancel_event=cancel_event,
+        )
+        return ingestion_report, gpt_prompts
+
+    def _run_ingestion(
+        self,
+        source: Iterable[List[Dict[str, Any]]],
+        stages: List[PipelineStage],
+        progress_callback: Optional[Callable[[int], None]] = None,
+        source_name: str = "parse",
+        cancel_event: Optional[threading.Event] = None,
+    ) -> Dict[str, Any]:
+        """Пропускає пакети chunks через stages, embed та write; повертає звіт етапів."""
+        written = {"chunks": 0}
+        written_lock = threading.Lock()
+
+        def on_written(count: int):
+            with written_lock:
+                written["chunks"] += count
+                done = written["chunks"]
+            if progress_callback:
+                progress_callback(done)
+
+        pipeline = StagedPipeline(
+            stages
+            + [
+                PipelineStage("embed", self._embed_chunks, Config.INGEST_EMBED_WORKERS),
+                PipelineStage("write", self._write_chunks, Config.INGEST_WRITE_WORKERS),
+            ],
+            queue_size=Config.INGEST_QUEUE_SIZE,
+            source_name=source_name,
+            on_item_done=on_written,
+            cancel_event=cancel_event,
+        )
+        ingestion_report = pipeline.run(source)
+        ingestion_report["written"] = written["chunks"]
+        return ingestion_report
+
+    def _embed_chunks(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Створює embeddings для пакета chunks одним запитом."""
+        try:
+            embeddings = self.embeddings.embed_documents([chunk["text"] for chunk in chunks])
+        except Exception as e:
+            logger.warning(f"⚠️ Пакетний embedding не вдався ({e}), повторюємо по одному chunk")
+            embeddings = []
+            for chunk in chunks:
+                try:
+                    embeddings.append(self.embeddings.embed_query(chunk["text"]))
+                except Exception as chunk_error:
+                    logger.error(f"Помилка створення вектора: {chunk_error}")
+                    embeddings.append(None)
+
+        for chunk, embedding in zip(chunks, embeddings):
+            chunk["embedding"] = embedding
+        return [chunk for chunk in chunks if chunk.get("embedding") is not None]
+
+    def _write_chunks(self, chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Записує пакет chunks з embeddings у PostgreSQL."""
+        written = []
         for chunk in chunks:
             try:
-                # Створюємо ембедінг для тексту
-                embedding = self.embeddings.embed_query(chunk["text"])
-
                 # Додаємо в PostgreSQL з прив'язкою до користувача
                 # Використовуємо full_url (base URL + path) замість тільки path
                 endpoint_path = chunk["metadata"].get("full_url", chunk["metadata"].get("path", ""))
@@ -129,35 +357,48 @@ class PostgresRAGEngine:
                     endpoint_path=endpoint_path,
                     method=chunk["metadata"].get("method", "GET"),
                     description=chunk["text"],
-                    embedding=embedding,
+                    embedding=chunk.pop("embedding"),
                     metadata=chunk["metadata"],
                 )
+                written.append(chunk)
             except Exception as e:
                 logger.error(f"Помилка створення вектора: {e}")
-                continue
+        return written
 
-    def search_similar_endpoints(self, query: str, limit: int = 3) -> List[Dict[str, Any]]:
+    def search_similar_endpoints(
+        self, query: str, limit: int = 3, query_embedding: Optional[List[float]] = None
+    ) -> List[Dict[str, Any]]:
         """
         Шукає подібні endpoints для конкретного користувача.
 
         Args:
             query: Пошуковий запит
             limit: Кількість результатів
+            query_embedding: Вже обчислений ембедінг запиту (embed_query)
 
         Returns:
             Список знайдених endpoints
         """
         try:
             # Створюємо ембедінг для запиту
-            query_embedding = self.embeddings.embed_query(query)
+            if query_embedding is None:
+                with stage_timer("query_embedding"), start_span(
+                    "embedding.embed_query", kind="CLIENT", **{"query.chars": len(query)}
+                ) as span:
+                    query_embedding = self._embed_query(query)
+                    span.set_attribute("embedding.dimensions", len(query_embedding))
 
             # Шукаємо подібні вектори
-            results = self.vector_manager.search_similar(
-                query_embedding=query_embedding,
-                user_id=self.user_id,
-                swagger_spec_id=self.swagger_spec_id,
-                limit=limit,
-            )
+            with stage_timer("vector_search"), start_span(
+                "db.vector_search", kind="CLIENT", **{"db.system": "postgresql", "db.limit": limit}
+            ) as span:
+                results = self.vector_manager.search_similar(
+                    query_embedding=query_embedding,
+                    user_id=self.user_id,
+                    swagger_spec_id=self.swagger_spec_id,
+                    limit=limit,
+                )
+                span.set_attribute("db.rows", len(results))
 
             logger.info(
                 f"🔍 Знайдено {len(results)} подібних endpoints для користувача {self.user_id}"
@@ -168,6 +409,23 @@ class PostgresRAGEngine:
             logger.error(f"Помилка пошуку endpoints: {e}")
             return []
 
+    def embed_query(self, query: str) -> List[float]:
+        """Ембедінг запиту користувача (спільний warm кеш з пошуком endpoints)."""
+        with stage_timer("query_embedding"), start_span(
+            "embedding.embed_query", kind="CLIENT", **{"query.chars": len(query)}
+        ):
+            return self._embed_query(query)
+
+    def _embed_query(self, query: str) -> List[float]:
+        """Ембедінг запиту; повторювані запити беруться з warm кешу контейнера."""
+        model = getattr(self.embeddings, "model", None)
+        return warm_cache.get_or_create(
+            "query_embedding",
+            (model, query),
+            lambda: self.embeddings.embed_query(query),
+            version=str(model),
+        )
+
     def get_all_endpoints(self) -> List[Dict[str, Any]]:
         """
         Отримує всі endpoints для конкретного користувача.
@@ -227,33 +485,39 @@ class PostgresRAGEngine:
             return {}
 
     def _enhance_chunks_with_gpt(
-        self, chunks: List[Dict[str, Any]], swagger_data: Dict[str, Any]
+        self,
+        chunks: List[Dict[str, Any]],
+        swagger_data: Dict[str, Any],
+        gpt_generator,
     ) -> tuple[List[Dict[str, Any]], List]:
         """
-        Збагачує chunks за допомогою GPT-аналізу.
+        Збагачує пакет chunks за допомогою GPT-аналізу.
 
         Args:
             chunks: Базові chunks від parser
             swagger_data: Оригінальні дані Swagger
+            gpt_generator: GPTPromptGenerator або HybridPromptGenerator для генерації промптів
 
         Returns:
             Tuple: (покращені chunks, список GPT промптів)
         """
         try:
-            from src.gpt_prompt_generator import GPTPromptGenerator
-
-            # Ініціалізуємо GPT генератор
-            gpt_generator = GPTPromptGenerator()
-
-            # Генеруємо промпти для всіх endpoint'ів
-            logger.debug(f"Передаємо swagger_data типу {type(swagger_data)} до GPT generator")
-            gpt_prompts = gpt_generator.generate_prompts_from_swagger(swagger_data)
-
-            if not gpt_prompts:
-                logger.warning("GPT не згенерував промптів")
-                return chunks, []
-
-            enhanced_chunks = []
+            paths = swagger_data.get("paths", {})
+            operations = []
+            for chunk in chunks:
+                path = chunk["metadata"].get("path", "")
+                method = chunk["metadata"].get("method", "").lower()
+                method_data = paths.get(path, {}).get(method)
+                if isinstance(method_data, dict):
+                    operations.append((path, method, method_data, swagger_data))
+
+            gpt_prompts = [
+                prompt
+                for prompt in gpt_generator.generate_prompts_for_operations(
+                    operations, swagger_data
+                )
+                if prompt
+            ]
 
             for chunk in chunks:
                 # Знаходимо відповідний GPT промпт
@@ -261,25 +525,17 @@ class PostgresRAGEngine:
 
                 if matching_prompt:
                     # Збагачуємо chunk GPT insights
-                    enhanced_text = self._create_enhanced_chunk_text(chunk, matching_prompt)
-
-                    chunk["text"] = enhanced_text
-                    chunk["metadata"]["gpt_enhanced"] = True
+                    chunk["text"] = self._create_enhanced_chunk_text(chunk, matching_prompt)
+                    source = getattr(matching_prompt, "source", "gpt_generated")
+                    chunk["metadata"]["prompt_source"] = source
+                    chunk["metadata"]["gpt_enhanced"] = source == "gpt_generated"
                     chunk["metadata"]["gpt_prompt_id"] = matching_prompt.id
-                    chunk["metadata"]["gpt_insights"] = True
+                    chunk["metadata"]["gpt_insights"] = source == "gpt_generated"
 
-                enhanced_chunks.append(chunk)
-
-            logger.info(
-                f"✨ GPT збагатив {len([c for c in enhanced_chunks if c['metadata'].get('gpt_enhanced')])} chunks"
-            )
-            return enhanced_chunks, gpt_prompts
+            return chunks, gpt_prompts
 
         except Exception as e:
             logger.error(f"Помилка GPT покращення: {e}")
-            import traceback
-
-            logger.error(f"Traceback: {traceback.format_exc()}")
             return chunks, []
 
     def _find_matching_gpt_prompt(self, chunk: Dict[str, Any], gpt_prompts: List) -> any:
@@ -366,7 +622,7 @@ class PostgresRAGEngine:
                         http_method=gpt_prompt.http_method,
                         resource_type=gpt_prompt.resource_type,
                         tags=gpt_prompt.tags if hasattr(gpt_prompt, "tags") else [],
-                        source="gpt_generated",
+                        source=getattr(gpt_prompt, "source", "gpt_generated"),
                         priority=getattr(gpt_prompt, "priority", 1),
                         is_public=False,
                         is_active=True,
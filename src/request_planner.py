@@ -0,0 +1,338 @@
+"""
+Планування API запиту одним викликом LLM зі структурованою відповіддю.
+
+Модель отримує top-k кандидатів endpoints з компактними схемами параметрів
+і через обов'язковий виклик функції plan_api_request повертає намір,
+обраний endpoint та заповнені параметри. Відповідь перевіряється на нашому
+боці: JSON схема плану, існування endpoint серед кандидатів, відповідність
+методу, заповненість path параметрів та відомі назви query параметрів.
+План, що не пройшов перевірку, відкидається - агент переходить до
+класичного шляху (аналіз наміру, вибір endpoint, формування запиту).
+"""
+
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+from src.gpt_prompt_cache import resolve_refs
+
+logger = logging.getLogger(__name__)
+
+PLAN_FUNCTION_NAME = "plan_api_request"
+# Версія промпту та схеми плану; змінюйте разом з ними, щоб інвалідувати кеш планів
+PLAN_PROMPT_VERSION = "plan-1"
+
+PLAN_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "is_informational": {"type": "boolean"},
+        "operation": {"type": "string", "enum": ["GET", "POST", "PUT", "PATCH", "DELETE", "INFO"]},
+        "resource": {"type": "string"},
+        "intent": {"type": "string"},
+        "endpoint_id": {"type": ["integer", "null"]},
+        "path_params": {"type": "object"},
+        "query_params": {"type": "object"},
+        "body": {"type": ["object", "null"]},
+        "missing_fields": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": [
+        "is_informational",
+        "operation",
+        "resource",
+        "intent",
+        "endpoint_id",
+        "path_params",
+        "query_params",
+    ],
+    "additionalProperties": False,
+}
+
+_JSON_TYPES = {
+    "boolean": bool,
+    "integer": int,
+    "string": str,
+    "object": dict,
+    "array": list,
+    "null": type(None),
+}
+
+# Скільки полів тіла запиту показувати моделі для одного endpoint
+MAX_BODY_FIELDS = 25
+
+
+def validate_schema(value: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """
+    Перевіряє значення за підмножиною JSON Schema (type, enum, required,
+    properties, additionalProperties, items), якої достатньо для схеми плану.
+
+    Returns:
+        Список помилок (порожній - значення валідне)
+    """
+    errors: List[str] = []
+    expected = schema.get("type")
+    if expected is not None:
+        types = expected if isinstance(expected, list) else [expected]
+        # bool - підклас int, але не є integer у JSON Schema
+        matches = any(
+            isinstance(value, _JSON_TYPES[name])
+            and not (name == "integer" and isinstance(value, bool))
+            for name in types
+        )
+        if not matches:
+            return [f"{path}: очікується {'|'.join(types)}"]
+
+    if "enum" in schema and value not in schema["enum"]:
+        errors.append(f"{path}: недопустиме значення {value!r}")
+
+    if isinstance(value, dict):
+        properties = schema.get("properties", {})
+        for name in schema.get("required", []):
+            if name not in value:
+                errors.append(f"{path}.{name}: обов'язкове поле відсутнє")
+        for name, item in value.items():
+            if name in properties:
+                errors.extend(validate_schema(item, properties[name], f"{path}.{name}"))
+            elif schema.get("additionalProperties") is False:
+                errors.append(f"{path}.{name}: невідоме поле")
+
+    if isinstance(value, list) and "items" in schema:
+        for index, item in enumerate(value):
+            errors.extend(validate_schema(item, schema["items"], f"{path}[{index}]"))
+    return errors
+
+
+def _schema_type(schema: Dict[str, Any]) -> str:
+    if not isinstance(schema, dict):
+        return "string"
+    if schema.get("enum"):
+        return "enum(" + ",".join(str(v) for v in schema["enum"][:10]) + ")"
+    return str(schema.get("type") or ("object" if "properties" in schema else "string"))
+
+
+def _body_schema(method_data: Dict[str, Any], swagger_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Схема тіла запиту (OpenAPI 3 requestBody або Swagger 2 параметр in: body)."""
+    content = (method_data.get("requestBody") or {}).get("content", {})
+    schema = (content.get("application/json") or next(iter(content.values()), {})).get("schema")
+    if schema is None:
+        for param in method_data.get("parameters", []):
+            if isinstance(param, dict) and param.get("in") == "body":
+                schema = param.get("schema")
+    return resolve_refs(schema or {}, swagger_data)
+
+
+@dataclass
+class EndpointCandidate:
+    """Кандидат endpoint для моделі: шлях, метод та компактні схеми параметрів."""
+
+    method: str
+    path: str
+    url: str
+    summary: str = ""
+    path_params: Dict[str, str] = field(default_factory=dict)
+    query_params: Dict[str, str] = field(default_factory=dict)
+    required_query: List[str] = field(default_factory=list)
+    body_fields: Dict[str, str] = field(default_factory=dict)
+    required_body: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_spec(
+        cls, method: str, path: str, url: str, summary: str, swagger_data: Dict[str, Any]
+    ) -> "EndpointCandidate":
+        """Кандидат з операції специфікації (параметри шляху та операції, $ref розгорнуто)."""
+        path_item = swagger_data.get("paths", {}).get(path, {})
+        method_data = path_item.get(method.lower(), {}) or {}
+        candidate = cls(method=method.upper(), path=path, url=url, summary=summary)
+
+        parameters = resolve_refs(
+            list(path_item.get("parameters", [])) + list(method_data.get("parameters", [])),
+            swagger_data,
+        )
+        for param in parameters:
+            if not isinstance(param, dict):
+                continue
+            name, location = param.get("name", ""), param.get("in")
+            param_type = _schema_type(param.get("schema") or param)
+            if location == "path":
+                candidate.path_params[name] = param_type
+            elif location == "query":
+                candidate.query_params[name] = param_type
+                if param.get("required"):
+                    candidate.required_query.append(name)
+
+        # Змінні шляху без опису в parameters
+        for segment in path.split("/"):
+            if segment.startswith("{") and segment.endswith("}"):
+                candidate.path_params.setdefault(segment[1:-1], "string")
+
+        body = _body_schema(method_data, swagger_data)
+        for name, schema in list(body.get("properties", {}).items())[:MAX_BODY_FIELDS]:
+            candidate.body_fields[name] = _schema_type(schema)
+        candidate.required_body = [
+            name for name in body.get("required", []) if name in candidate.body_fields
+        ]
+        return candidate
+
+    def compact(self, endpoint_id: int) -> Dict[str, Any]:
+        """Опис для промпту без порожніх полів."""
+        data = {
+            "endpoint_id": endpoint_id,
+            "method": self.method,
+            "path": self.path,
+            "summary": self.summary,
+            "path_params": self.path_params,
+            "query_params": self.query_params,
+            "required_query": self.required_query,
+            "body": self.body_fields,
+            "required_body": self.required_body,
+        }
+        return {key: value for key, value in data.items() if value or key == "endpoint_id"}
+
+
+@dataclass
+class RequestPlan:
+    """Перевірений план: намір у форматі аналізу наміру та обраний endpoint."""
+
+    intent: Dict[str, Any]
+    endpoint_id: Optional[int] = None
+    url: Optional[str] = None
+    method: Optional[str] = None
+    query_params: Dict[str, Any] = field(default_factory=dict)
+    body: Optional[Dict[str, Any]] = None
+    missing_fields: List[str] = field(default_factory=list)
+
+
+class RequestPlanner:
+    """Один виклик LLM: намір + вибір endpoint + параметри запиту."""
+
+    def __init__(self, llm: Any):
+        """
+        Args:
+            llm: LangChain chat модель (BudgetedLLM), що підтримує tools у invoke()
+        """
+        self.llm = llm
+
+    def messages(self, user_query: str, context: str, candidates: List[EndpointCandidate]):
+        """Повідомлення для моделі з кандидатами endpoints."""
+        from langchain.schema import HumanMessage, SystemMessage
+
+        endpoints = json.dumps(
+            [candidate.compact(i) for i, candidate in enumerate(candidates)],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        system_prompt = f"""Ти - експерт з API. Визнач намір користувача, обери endpoint
+з кандидатів та заповни параметри запиту, викликавши функцію {PLAN_FUNCTION_NAME}.
+
+Правила:
+- Запит показати endpoints, документацію чи можливості API - інформаційний:
+  is_informational=true, operation="INFO", endpoint_id=null.
+- Інакше endpoint_id - номер кандидата, operation - його метод.
+- path_params - усі змінні шляху обраного endpoint; query_params та body - лише поля
+  зі схеми кандидата, значення беруться із запиту або контексту.
+- Обов'язкові поля тіла, яких немає в запиті, перелічи в missing_fields, не вигадуй їх.
+
+Контекст попередніх взаємодій:
+{context}
+
+Кандидати endpoints:
+{endpoints}"""
+        return [SystemMessage(content=system_prompt), HumanMessage(content=user_query)]
+
+    def request(self, user_query: str, context: str, candidates: List[EndpointCandidate]):
+        """Виклик LLM з обов'язковим викликом функції плану; повертає аргументи або None."""
+        response = self.llm.invoke(
+            self.messages(user_query, context, candidates),
+            tools=[
+                {
+                    "type": "function",
+                    "function": {
+                        "name": PLAN_FUNCTION_NAME,
+                        "description": "План API запиту для запиту користувача",
+                        "parameters": PLAN_SCHEMA,
+                    },
+                }
+            ],
+            tool_choice={"type": "function", "function": {"name": PLAN_FUNCTION_NAME}},
+        )
+        return self.parse_response(response)
+
+    @staticmethod
+    def parse_response(response: Any) -> Optional[Dict[str, Any]]:
+        """Аргументи виклику функції (або JSON у content для моделей без tools)."""
+        tool_calls = (getattr(response, "additional_kwargs", None) or {}).get("tool_calls") or []
+        for call in tool_calls:
+            function = call.get("function", {})
+            if function.get("name") == PLAN_FUNCTION_NAME:
+                raw = function.get("arguments", "")
+                break
+        else:
+            raw = getattr(response, "content", "") or ""
+        try:
+            data = json.loads(raw)
+        except (TypeError, ValueError):
+            logger.warning("⚠️ План запиту не є валідним JSON")
+            return None
+        return data if isinstance(data, dict) else None
+
+    def validate(
+        self, data: Dict[str, Any], candidates: List[EndpointCandidate]
+    ) -> Optional[RequestPlan]:
+        """Перевіряє план за схемою та кандидатами; None - план відкинуто."""
+        errors = validate_schema(data, PLAN_SCHEMA)
+        if errors:
+            logger.warning(f"⚠️ План запиту не відповідає схемі: {errors}")
+            return None
+
+        intent = {
+            "is_informational": data["is_informational"] or data["operation"] == "INFO",
+            "operation": data["operation"],
+            "resource": data["resource"],
+            "parameters": {**data["query_params"], **data["path_params"]},
+            "data": data.get("body") or {},
+            "intent": data["intent"],
+        }
+        if intent["is_informational"]:
+            return RequestPlan(intent=intent)
+
+        endpoint_id = data["endpoint_id"]
+        if endpoint_id is None or not 0 <= endpoint_id < len(candidates):
+            logger.warning(f"⚠️ План обрав endpoint поза кандидатами: {endpoint_id}")
+            return None
+        candidate = candidates[endpoint_id]
+        if candidate.method != data["operation"]:
+            logger.warning(f"⚠️ Метод плану {data['operation']} не збігається з {candidate.method}")
+            return None
+
+        path_params = data["path_params"]
+        missing_path = [name for name in candidate.path_params if name not in path_params]
+        unknown_query = [
+            name for name in data["query_params"] if name not in candidate.query_params
+        ]
+        if missing_path or unknown_query:
+            logger.warning(
+                f"⚠️ План з неповними path {missing_path} або невідомими query {unknown_query}"
+            )
+            return None
+
+        url = candidate.url
+        for name in candidate.path_params:
+            url = url.replace(f"{{{name}}}", quote(str(path_params[name]), safe=""))
+
+        body = data.get("body") or None
+        if candidate.method not in ("POST", "PUT", "PATCH"):
+            body = None
+        elif body is not None and candidate.body_fields:
+            body = {key: value for key, value in body.items() if key in candidate.body_fields}
+        missing_fields = list(data.get("missing_fields") or [])
+        missing_fields += [name for name in candidate.required_body if name not in (body or {})]
+        return RequestPlan(
+            intent=intent,
+            endpoint_id=endpoint_id,
+            url=url,
+            method=candidate.method,
+            query_params=dict(data["query_params"]),
+            body=body,
+            missing_fields=sorted(set(missing_fields)),
+        )
@@ -0,0 +1,61 @@
+"""
+Спільний шар JSON серіалізації на основі orjson.
+
+orjson нативно серіалізує datetime, UUID, dataclass та масиви NumPy,
+тому значення з БД і вектори embeddings не потребують попереднього
+перетворення через стандартний json.
+"""
+
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Union
+
+import orjson
+
+# NumPy масиви та числа, а також не-рядкові ключі словників (int, UUID, datetime)
+DEFAULT_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    """Обробка типів, яких orjson не підтримує нативно."""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, Path):
+        return str(obj)
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if hasattr(obj, "tolist"):
+        # NumPy масиви з dtype, які orjson не серіалізує напряму
+        return obj.tolist()
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8", errors="replace")
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any, *, indent: bool = False, sort_keys: bool = False) -> bytes:
+    """
+    Серіалізує об'єкт у JSON bytes.
+
+    Args:
+        obj: Об'єкт для серіалізації
+        indent: Форматування з відступом у 2 пробіли
+        sort_keys: Сортування ключів словників
+    """
+    option = DEFAULT_OPTIONS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(obj, default=_default, option=option)
+
+
+def dumps_str(obj: Any, **kwargs: Any) -> str:
+    """Серіалізує об'єкт у JSON рядок (для текстових колонок і SQL параметрів)."""
+    return dumps(obj, **kwargs).decode("utf-8")
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """Десеріалізує JSON з рядка або bytes."""
+    return orjson.loads(data)
@@ -104,11 +104,49 @@ class SwaggerPromptGenerator:
                         prompts.append(prompt)
 
         # Генеруємо загальні промпти для ресурсів
-        resource_prompts = self._generate_resource_prompts(swagger_data)
+        resource_prompts = self.generate_resource_prompts(swagger_data)
         prompts.extend(resource_prompts)
 
         return prompts
 
+    def completeness_score(
+        self, path: str, method: str, method_data: Dict[str, Any], swagger_data: Dict[str, Any]
+    ) -> float:
+        """
+        Оцінює повноту шаблонного промпту для endpoint (0.0 - 1.0).
+
+        Складові по 0.25: опис операції (summary/description), опис кожного
+        параметра, схема запиту для POST/PUT/PATCH, схема відповіді (крім DELETE).
+        Endpoint з невідомим типом ресурсу шаблоном не покривається - оцінка 0.
+        """
+        if not self._detect_resource_type(path):
+            return 0.0
+
+        method = method.upper()
+        score = 0.0
+        if method_data.get("summary") or method_data.get("description"):
+            score += 0.25
+
+        parameters = self._get_parameters_info(method_data)
+        if all(param["description"] for param in parameters):
+            score += 0.25
+
+        if method not in ["POST", "PUT", "PATCH"] or self._get_request_schema(
+            method_data, swagger_data
+        ):
+            score += 0.25
+
+        if method == "DELETE" or self._get_response_schema(method_data, swagger_data):
+            score += 0.25
+
+        return score
+
+    def generate_endpoint_prompt(
+        self, path: str, method: str, method_data: Dict[str, Any], swagger_data: Dict[str, Any]
+    ) -> Optional[GeneratedPrompt]:
+        """Генерує промпт для endpoint без звернень до мережі (None - ресурс не визначено)."""
+        return self._generate_prompt_for_endpoint(path, method, method_data, swagger_data)
+
     def _generate_prompt_for_endpoint(
         self, path: str, method: str, method_data: Dict[str, Any], swagger_data: Dict[str, Any]
     ) -> Optional[GeneratedPrompt]:
@@ -377,7 +415,7 @@ ENDPOINT: {method.upper()} {path}
 
         return list(set(tags))  # Видаляємо дублікати
 
-    def _generate_resource_prompts(self, swagger_data: Dict[str, Any]) -> List[GeneratedPrompt]:
+    def generate_resource_prompts(self, swagger_data: Dict[str, Any]) -> List[GeneratedPrompt]:
         """Генерує загальні промпти для ресурсів."""
         prompts = []
 
@@ -0,0 +1,107 @@
+"""
+Потокове читання Swagger/OpenAPI специфікацій з файлу-спулу.
+
+Підтримує JSON та YAML, обидва опціонально стиснуті gzip. Специфікація
+розбирається з потоку один раз: отриманий словник зберігається як
+original_data, а записи endpoints будуються з нього без повторного читання.
+"""
+
+import gzip
+import io
+import logging
+from typing import Any, BinaryIO, Dict, Iterator, Optional
+
+import yaml
+
+from src.enhanced_swagger_parser import EnhancedSwaggerParser
+from src.serialization import loads
+
+logger = logging.getLogger(__name__)
+
+GZIP_MAGIC = b"\x1f\x8b"
+JSON_EXTENSIONS = (".json",)
+YAML_EXTENSIONS = (".yaml", ".yml")
+
+# Швидкий C-завантажувач YAML, якщо libyaml доступна
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class SpecFormatError(ValueError):
+    """Непідтримуваний або пошкоджений файл специфікації."""
+
+
+def _strip_gz(filename: str) -> str:
+    name = (filename or "").lower()
+    return name[:-3] if name.endswith(".gz") else name
+
+
+def is_supported_filename(filename: str) -> bool:
+    """Перевіряє розширення: .json, .yaml, .yml та їх .gz варіанти."""
+    return _strip_gz(filename).endswith(JSON_EXTENSIONS + YAML_EXTENSIONS)
+
+
+def open_spec(spool: BinaryIO) -> BinaryIO:
+    """Повертає потік з початку спулу, прозоро розпаковуючи gzip."""
+    spool.seek(0)
+    head = spool.read(2)
+    spool.seek(0)
+    if head == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=spool, mode="rb")
+    return spool
+
+
+def detect_format(filename: str, spool: BinaryIO) -> str:
+    """
+    Визначає формат специфікації: "json" або "yaml".
+
+    Спочатку за розширенням, інакше за першим непробільним символом.
+    """
+    name = _strip_gz(filename)
+    if name.endswith(JSON_EXTENSIONS):
+        return "json"
+    if name.endswith(YAML_EXTENSIONS):
+        return "yaml"
+
+    stream = open_spec(spool)
+    head = stream.read(64).lstrip()
+    return "json" if head[:1] in (b"{", b"[") else "yaml"
+
+
+def _read_limited(stream: BinaryIO, max_bytes: Optional[int]) -> bytes:
+    """Читає потік, обмежуючи розмір розпакованих даних (захист від gzip-бомб)."""
+    if max_bytes is None:
+        return stream.read()
+    data = stream.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise SpecFormatError(f"Специфікація перевищує {max_bytes} байт після розпакування")
+    return data
+
+
+def load_spec(spool: BinaryIO, fmt: str, max_bytes: Optional[int] = None) -> Dict[str, Any]:
+    """Завантажує повну специфікацію як словник."""
+    try:
+        data = _read_limited(open_spec(spool), max_bytes)
+        if fmt == "json":
+            spec = loads(data)
+        else:
+            spec = yaml.load(io.BytesIO(data), Loader=_YamlLoader)
+    except SpecFormatError:
+        raise
+    except Exception as e:
+        raise SpecFormatError(f"Не вдалося розпарсити {fmt.upper()} специфікацію: {e}") from e
+
+    if not isinstance(spec, dict):
+        raise SpecFormatError("Специфікація повинна бути об'єктом")
+    return spec
+
+
+def iter_endpoint_records(
+    spec: Dict[str, Any], parser: Optional[EnhancedSwaggerParser] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Генерує записи endpoints у форматі EnhancedSwaggerParser.get_endpoints().
+
+    Працює з уже завантаженим spec, тому спул не розбирається вдруге.
+    """
+    parser = parser or EnhancedSwaggerParser()
+    yield from parser.iter_path_endpoints((spec.get("paths") or {}).items())
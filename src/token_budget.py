@@ -0,0 +1,256 @@
+"""
+Бюджети токенів для payload у промптах LLM.
+
+Токени рахуються через tiktoken (енкодинг моделі, за замовчуванням
+cl100k_base); якщо енкодинг недоступний (немає мережі для завантаження
+BPE файлів), використовується оцінка ~3 символи на токен.
+
+Payload, більший за бюджет етапу, скорочується поступово: списки замінюються
+вибіркою перших елементів та описом пропущених (кількість і схема полів),
+довгі рядки обрізаються. Якщо й цього замало, серіалізований payload
+обрізається за токенами. Транспортні поля відповіді API (headers, text -
+дублікат data) прибираються до підрахунку.
+"""
+
+import json
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from src.config import Config
+from src.metrics import record_payload_tokens
+
+logger = logging.getLogger(__name__)
+
+# Поля відповіді/запиту API, що не потрібні LLM (text дублює data, headers - шум і токени)
+TRANSPORT_FIELDS = ("headers", "text")
+# Кроки скорочення: (розмір вибірки списків, максимальна довжина рядка)
+SHRINK_STEPS = ((None, 500), (3, 200), (1, 80), (0, 40))
+
+_encodings: Dict[str, Any] = {}
+_encodings_lock = threading.Lock()
+
+
+def _encoding(model: Optional[str]):
+    key = model or ""
+    with _encodings_lock:
+        if key in _encodings:
+            return _encodings[key]
+
+    try:
+        import tiktoken
+
+        try:
+            encoding = tiktoken.encoding_for_model(model) if model else None
+        except KeyError:
+            encoding = None
+        encoding = encoding or tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"⚠️ tiktoken недоступний, токени оцінюються за довжиною тексту: {e}")
+        encoding = None
+
+    with _encodings_lock:
+        _encodings[key] = encoding
+    return encoding
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Кількість токенів тексту для моделі."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 3 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_text(
+    text: str, max_tokens: int, model: Optional[str] = None, keep: str = "head"
+) -> str:
+    """Обрізає текст до max_tokens, зберігаючи початок (head) або кінець (tail)."""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+
+    encoding = _encoding(model)
+    if encoding is None:
+        limit = max(max_tokens * 3, 0)
+        kept = text[:limit] if keep == "head" else text[len(text) - limit :]
+    else:
+        tokens = encoding.encode(text, disallowed_special=())
+        part = tokens[:max_tokens] if keep == "head" else tokens[len(tokens) - max_tokens :]
+        kept = encoding.decode(part)
+
+    marker = f"… [скорочено, {len(text) - len(kept)} символів]"
+    return f"{kept}{marker}" if keep == "head" else f"{marker}{kept}"
+
+
+def strip_transport_fields(payload: Any) -> Any:
+    """Копія відповіді/запиту API без headers та text."""
+    if not isinstance(payload, dict):
+        return payload
+    return {key: value for key, value in payload.items() if key not in TRANSPORT_FIELDS}
+
+
+def _type_name(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, list):
+        return "array"
+    if isinstance(value, dict):
+        return "object"
+    return type(value).__name__
+
+
+def describe_items(items: Iterable[Any], max_fields: int = 50) -> Any:
+    """Схема елементів списку: поля об'єктів з типами або типи скалярів."""
+    fields: Dict[str, set] = {}
+    scalar_types: set = set()
+    for item in items:
+        if isinstance(item, dict):
+            for key, value in item.items():
+                if key in fields or len(fields) < max_fields:
+                    fields.setdefault(key, set()).add(_type_name(value))
+        else:
+            scalar_types.add(_type_name(item))
+
+    schema: Any = {key: "|".join(sorted(types)) for key, types in fields.items()}
+    if scalar_types:
+        scalar = "|".join(sorted(scalar_types))
+        return {**schema, "_scalar": scalar} if schema else scalar
+    return schema
+
+
+def shrink_payload(value: Any, sample_size: int, max_chars: int) -> Any:
+    """Вибірка елементів списків (з описом пропущених) та обрізання довгих рядків."""
+    if isinstance(value, dict):
+        return {key: shrink_payload(item, sample_size, max_chars) for key, item in value.items()}
+    if isinstance(value, list):
+        kept = [shrink_payload(item, sample_size, max_chars) for item in value[:sample_size]]
+        if len(value) > sample_size:
+            elided = value[sample_size:]
+            kept.append({"_elided_items": len(elided), "_item_schema": describe_items(elided)})
+        return kept
+    if isinstance(value, str) and len(value) > max_chars:
+        return f"{value[:max_chars]}… (+{len(value) - max_chars} символів)"
+    return value
+
+
+def _dumps(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+class TokenBudgetManager:
+    """Бюджети токенів payload за етапами та облік надісланих/заощаджених токенів."""
+
+    def __init__(
+        self,
+        budgets: Optional[Dict[str, int]] = None,
+        model: Optional[str] = None,
+        sample_size: Optional[int] = None,
+        enabled: Optional[bool] = None,
+    ):
+        """
+        Args:
+            budgets: Бюджет токенів payload для етапу (етап без бюджету не скорочується)
+            model: Модель для вибору енкодингу tiktoken
+            sample_size: Скільки елементів списку залишати на першому кроці скорочення
+            enabled: Чи застосовувати бюджети (за замовчуванням TOKEN_BUDGET_ENABLED)
+        """
+        self.budgets = (
+            budgets
+            if budgets is not None
+            else {
+                "response_formatting": Config.TOKEN_BUDGET_RESPONSE_FORMATTING,
+                "retry_fix": Config.TOKEN_BUDGET_RETRY_FIX,
+                "context": Config.TOKEN_BUDGET_CONTEXT,
+            }
+        )
+        self.model = model if model is not None else Config.OPENAI_MODEL
+        self.sample_size = Config.TOKEN_BUDGET_LIST_SAMPLE if sample_size is None else sample_size
+        self.enabled = Config.TOKEN_BUDGET_ENABLED if enabled is None else enabled
+
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def budget(self, stage: str) -> Optional[int]:
+        """Бюджет етапу або None (без обмеження)."""
+        if not self.enabled:
+            return None
+        budget = self.budgets.get(stage)
+        return budget if budget and budget > 0 else None
+
+    def fit_payload(self, stage: str, value: Any, budget: Optional[int] = None) -> Any:
+        """
+        Скорочує payload до бюджету етапу.
+
+        Returns:
+            Той самий payload, скорочена копія або (в крайньому разі) обрізаний JSON рядок
+        """
+        budget = budget or self.budget(stage)
+        if budget is None:
+            return value
+
+        before = count_tokens(_dumps(value), self.model)
+        if before <= budget:
+            self._record(stage, before, before)
+            return value
+
+        shrunk = value
+        for sample_size, max_chars in SHRINK_STEPS:
+            size = self.sample_size if sample_size is None else min(sample_size, self.sample_size)
+            shrunk = shrink_payload(value, size, max_chars)
+            after = count_tokens(_dumps(shrunk), self.model)
+            if after <= budget:
+                self._record(stage, before, after)
+                return shrunk
+
+        text = truncate_text(_dumps(shrunk), budget, self.model)
+        self._record(stage, before, count_tokens(text, self.model))
+        return text
+
+    def fit_text(
+        self, stage: str, text: str, budget: Optional[int] = None, keep: str = "head"
+    ) -> str:
+        """Обрізає текст до бюджету етапу (keep="tail" - зберігає кінець)."""
+        budget = budget or self.budget(stage)
+        if budget is None or not text:
+            return text
+
+        before = count_tokens(text, self.model)
+        if before <= budget:
+            self._record(stage, before, before)
+            return text
+        truncated = truncate_text(text, budget, self.model, keep=keep)
+        self._record(stage, before, count_tokens(truncated, self.model))
+        return truncated
+
+    def _record(self, stage: str, before: int, after: int):
+        saved = max(before - after, 0)
+        with self._lock:
+            stats = self._stats.setdefault(
+                stage, {"payloads": 0, "truncated": 0, "tokens_sent": 0, "tokens_saved": 0}
+            )
+            stats["payloads"] += 1
+            stats["truncated"] += 1 if saved else 0
+            stats["tokens_sent"] += after
+            stats["tokens_saved"] += saved
+        record_payload_tokens(stage, after, saved)
+
+    def stats(self) -> Dict[str, Any]:
+        """Бюджети та надіслані/заощаджені токени за етапами."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "budgets": dict(self.budgets),
+                "stages": {stage: dict(stats) for stage, stats in self._stats.items()},
+            }
+
+
+# Глобальний менеджер бюджетів токенів
+token_budget = TokenBudgetManager()
@@ -0,0 +1,365 @@
+"""
+Трасування запитів через конвеєр агента без зовнішнього колектора.
+
+Спани мають ту ж модель, що й OpenTelemetry (trace_id/span_id/parent_span_id,
+атрибути, події, статус, час у наносекундах), тому їх можна згодом віддати
+OTLP експортеру. Локально спани пишуться в кільцевий буфер (переглядається в
+адмін панелі) та опціонально в JSONL файл.
+
+Рішення про семплінг приймається на кореневому спані (head sampling) за
+trace_id, дочірні спани успадковують його. Коли трасування вимкнене
+(ENABLE_TRACING=false), `start_span` повертає спільний no-op спан.
+"""
+
+import functools
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+
+from src.config import Config
+from src.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+STATUS_UNSET = "UNSET"
+STATUS_OK = "OK"
+STATUS_ERROR = "ERROR"
+
+_ATTRIBUTE_TYPES = (str, bool, int, float)
+_MAX_ATTRIBUTE_LENGTH = 1024
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("tracing_span", default=None)
+
+
+def _clean_attribute(value: Any) -> Any:
+    """Приводить значення атрибута до примітивних типів OpenTelemetry."""
+    if isinstance(value, _ATTRIBUTE_TYPES):
+        if isinstance(value, str) and len(value) > _MAX_ATTRIBUTE_LENGTH:
+            return value[:_MAX_ATTRIBUTE_LENGTH] + "…"
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_clean_attribute(v) for v in value]
+    return _clean_attribute(str(value))
+
+
+class Span:
+    """Спан, що записується."""
+
+    is_recording = True
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        trace_id: str,
+        parent_span_id: Optional[str] = None,
+        kind: str = "INTERNAL",
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self._tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.attributes: Dict[str, Any] = {}
+        self.events: List[Dict[str, Any]] = []
+        self.status = STATUS_UNSET
+        self.status_message: Optional[str] = None
+        self.start_time = time.time_ns()
+        self.end_time: Optional[int] = None
+        if attributes:
+            self.set_attributes(attributes)
+
+    def set_attribute(self, key: str, value: Any):
+        if value is not None:
+            self.attributes[key] = _clean_attribute(value)
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def add_event(self, name: str, **attributes: Any):
+        self.events.append(
+            {
+                "name": name,
+                "time_unix_nano": time.time_ns(),
+                "attributes": {k: _clean_attribute(v) for k, v in attributes.items()},
+            }
+        )
+
+    def set_status(self, status: str, message: Optional[str] = None):
+        self.status = status
+        self.status_message = message
+
+    def record_exception(self, exc: BaseException):
+        self.add_event(
+            "exception",
+            **{"exception.type": type(exc).__name__, "exception.message": str(exc)},
+        )
+        self.set_status(STATUS_ERROR, str(exc))
+
+    def end(self):
+        if self.end_time is not None:
+            return
+        self.end_time = time.time_ns()
+        self._tracer._export(self)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_time or time.time_ns()
+        return round((end - self.start_time) / 1e6, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Представлення спану у форматі, близькому до OTLP JSON."""
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time_unix_nano": self.start_time,
+            "end_time_unix_nano": self.end_time,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "events": self.events,
+            "status": {"code": self.status, "message": self.status_message},
+        }
+
+
+class _NonRecordingSpan:
+    """Спан, що нічого не записує (трасування вимкнене або трейс не відібрано)."""
+
+    is_recording = False
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        pass
+
+    def add_event(self, name: str, **attributes: Any):
+        pass
+
+    def set_status(self, status: str, message: Optional[str] = None):
+        pass
+
+    def record_exception(self, exc: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+NON_RECORDING_SPAN = _NonRecordingSpan()
+
+
+class _SpanContext:
+    """Контекст-менеджер активного спану."""
+
+    __slots__ = ("span", "_token")
+
+    def __init__(self, span):
+        self.span = span
+
+    def __enter__(self):
+        self._token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc is not None:
+                self.span.record_exception(exc)
+            self.span.end()
+        finally:
+            _current_span.reset(self._token)
+        return False
+
+
+class _NoopSpanContext:
+    """Спільний контекст для вимкненого трасування."""
+
+    def __enter__(self):
+        return NON_RECORDING_SPAN
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_CONTEXT = _NoopSpanContext()
+
+
+class RingBufferExporter:
+    """Зберігає останні спани в пам'яті, згрупованими за trace_id."""
+
+    def __init__(self, max_spans: int = 2000):
+        self.max_spans = max_spans
+        self._spans: Deque[Dict[str, Any]] = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def export(self, span: Dict[str, Any]):
+        with self._lock:
+            self._spans.append(span)
+
+    def get_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """Спани одного трейсу у порядку початку."""
+        with self._lock:
+            spans = [s for s in self._spans if s["trace_id"] == trace_id]
+        return sorted(spans, key=lambda s: s["start_time_unix_nano"])
+
+    def list_traces(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Короткий опис останніх трейсів, найновіші першими."""
+        with self._lock:
+            spans = list(self._spans)
+
+        traces: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        for span in spans:
+            summary = traces.setdefault(
+                span["trace_id"],
+                {
+                    "trace_id": span["trace_id"],
+                    "root": None,
+                    "start_time_unix_nano": span["start_time_unix_nano"],
+                    "duration_ms": 0.0,
+                    "span_count": 0,
+                    "error": False,
+                },
+            )
+            summary["span_count"] += 1
+            summary["start_time_unix_nano"] = min(
+                summary["start_time_unix_nano"], span["start_time_unix_nano"]
+            )
+            summary["error"] = summary["error"] or span["status"]["code"] == STATUS_ERROR
+            if span["parent_span_id"] is None:
+                summary["root"] = span["name"]
+                summary["duration_ms"] = span["duration_ms"]
+
+        result = sorted(traces.values(), key=lambda t: t["start_time_unix_nano"], reverse=True)
+        return result[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+
+class JsonlExporter:
+    """Дописує кожен завершений спан рядком JSON у файл."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, span: Dict[str, Any]):
+        line = dumps(span) + b"\n"
+        with self._lock:
+            with open(self.path, "ab") as f:
+                f.write(line)
+
+
+class Tracer:
+    """Створює спани, приймає рішення про семплінг та передає їх експортерам."""
+
+    def __init__(self, enabled: bool = False, sample_ratio: float = 1.0, exporters=None):
+        self.enabled = enabled
+        self.sample_ratio = sample_ratio
+        self.exporters = list(exporters or [])
+        self.started_traces = 0
+        self.sampled_traces = 0
+
+    def _should_sample(self, trace_id: str) -> bool:
+        """Детерміноване рішення за молодшими 64 бітами trace_id (як TraceIdRatioBased)."""
+        if self.sample_ratio >= 1:
+            return True
+        if self.sample_ratio <= 0:
+            return False
+        return int(trace_id[16:], 16) < int(self.sample_ratio * (1 << 64))
+
+    def start_span(self, name: str, kind: str = "INTERNAL", **attributes: Any):
+        """
+        Контекст-менеджер нового спану, дочірнього до поточного.
+
+        Usage:
+            with tracer.start_span("llm.invoke", stage="intent") as span:
+                span.set_attribute("llm.completion_tokens", 42)
+        """
+        if not self.enabled:
+            return _NOOP_CONTEXT
+
+        parent = _current_span.get()
+        if parent is None:
+            trace_id = secrets.token_hex(16)
+            self.started_traces += 1
+            if not self._should_sample(trace_id):
+                # Не відібраний трейс: дочірні спани теж не записуються
+                return _SpanContext(NON_RECORDING_SPAN)
+            self.sampled_traces += 1
+            span = Span(self, name, trace_id, None, kind, attributes)
+        elif not parent.is_recording:
+            return _NOOP_CONTEXT
+        else:
+            span = Span(self, name, parent.trace_id, parent.span_id, kind, attributes)
+        return _SpanContext(span)
+
+    def _export(self, span: Span):
+        data = span.to_dict()
+        for exporter in self.exporters:
+            try:
+                exporter.export(data)
+            except Exception as e:
+                logger.warning(f"⚠️ Не вдалося експортувати спан {span.name}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "sample_ratio": self.sample_ratio,
+            "started_traces": self.started_traces,
+            "sampled_traces": self.sampled_traces,
+        }
+
+
+def current_span():
+    """Активний спан або no-op спан."""
+    return _current_span.get() or NON_RECORDING_SPAN
+
+
+def start_span(name: str, kind: str = "INTERNAL", **attributes: Any):
+    """Новий спан глобального трасувальника."""
+    return tracer.start_span(name, kind, **attributes)
+
+
+def traced(name: str, kind: str = "INTERNAL"):
+    """Декоратор: виконує функцію всередині спану `name`."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.start_span(name, kind):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def _build_tracer() -> Tracer:
+    exporters = [RingBufferExporter(Config.TRACE_BUFFER_SPANS)]
+    if Config.TRACE_EXPORT_PATH:
+        exporters.append(JsonlExporter(Config.TRACE_EXPORT_PATH))
+    return Tracer(Config.ENABLE_TRACING, Config.TRACE_SAMPLE_RATIO, exporters)
+
+
+# Глобальний трасувальник процесу; перший експортер - буфер для адмін панелі
+tracer = _build_tracer()
+trace_buffer: RingBufferExporter = tracer.exporters[0]
@@ -0,0 +1,382 @@
+"""
+Кеш контейнера, що переживає виклики AWS Lambda.
+
+Теплий контейнер Lambda зберігає глобальні змінні модулів та вміст /tmp
+між викликами. Кеш має два рівні: пам'ять процесу (LRU за кількістю записів
+у кожному просторі імен) та файли у /tmp (LRU за сумарним розміром; за
+замовчуванням лише в Lambda). Кожен запис зберігається з версією (наприклад,
+SwaggerSpec.updated_at): якщо версія не збігається з очікуваною, запис
+вважається застарілим і видаляється.
+
+Файли не містять виконуваних даних: запис - це .npz архів (np.savez) з JSON
+описом значення та масивами NumPy, що читається з allow_pickle=False. Значення
+інших типів зберігаються лише в пам'яті. Каталог кешу створюється з правами
+0700, файли іншого власника або доступні на запис іншим користувачам
+ігноруються.
+
+Простори імен:
+    spec            - Swagger специфікації (original_data для EnhancedSwaggerParser)
+    prompts         - дані prompts/base_prompts.yaml
+    query_embedding - ембедінги повторюваних запитів
+    vectors         - знімки embeddings специфікації для пошуку в пам'яті
+    intent_examples - ембедінги розмічених прикладів локального класифікатора наміру
+"""
+
+import hashlib
+import io
+import logging
+import os
+import stat
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import numpy as np
+
+from src.config import Config
+from src.serialization import dumps, loads
+from src.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+FILE_SUFFIX = ".npz"
+_META_KEY = "meta"
+
+
+class _NotPersistable(TypeError):
+    """Значення не можна зберегти у файлі кешу без pickle."""
+
+
+def _encode(value: Any, arrays: Dict[str, np.ndarray]) -> Any:
+    """JSON-сумісне представлення значення; масиви виносяться в arrays."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_encode(item, arrays) for item in value]
+    if isinstance(value, dict):
+        if not all(isinstance(key, str) for key in value):
+            raise _NotPersistable("ключі словника мають бути рядками")
+        if "__type__" in value:
+            raise _NotPersistable("зарезервований ключ __type__")
+        return {key: _encode(item, arrays) for key, item in value.items()}
+    if isinstance(value, datetime):
+        return {"__type__": "datetime", "value": value.isoformat()}
+    if isinstance(value, (bytes, bytearray)):
+        name = f"a{len(arrays)}"
+        arrays[name] = np.frombuffer(bytes(value), dtype=np.uint8)
+        return {"__type__": "bytes", "array": name}
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            raise _NotPersistable("масиви dtype=object не зберігаються")
+        name = f"a{len(arrays)}"
+        arrays[name] = value
+        return {"__type__": "ndarray", "array": name}
+    raise _NotPersistable(type(value).__name__)
+
+
+def _decode(value: Any, arrays: Any) -> Any:
+    if isinstance(value, list):
+        return [_decode(item, arrays) for item in value]
+    if isinstance(value, dict):
+        kind = value.get("__type__")
+        if kind == "datetime":
+            return datetime.fromisoformat(value["value"])
+        if kind == "bytes":
+            return arrays[value["array"]].tobytes()
+        if kind == "ndarray":
+            return arrays[value["array"]]
+        return {key: _decode(item, arrays) for key, item in value.items()}
+    return value
+
+
+def serialize_entry(version: Optional[str], value: Any) -> bytes:
+    """Запис кешу у форматі .npz (JSON опис + масиви NumPy), без pickle."""
+    arrays: Dict[str, np.ndarray] = {}
+    meta = dumps({"version": version, "value": _encode(value, arrays)})
+    buffer = io.BytesIO()
+    np.savez(buffer, **{_META_KEY: np.frombuffer(meta, dtype=np.uint8)}, **arrays)
+    return buffer.getvalue()
+
+
+def deserialize_entry(data: Any) -> Any:
+    """(версія, значення) з файлу або bytes запису; pickle заборонено."""
+    with np.load(data, allow_pickle=False) as archive:
+        arrays = {name: archive[name] for name in archive.files}
+    meta = loads(arrays.pop(_META_KEY).tobytes())
+    return meta["version"], _decode(meta["value"], arrays)
+
+
+def cache_version(*parts: Any) -> str:
+    """Рядок версії з частин (datetime перетворюється в ISO формат)."""
+    return "|".join(p.isoformat() if isinstance(p, datetime) else str(p) for p in parts)
+
+
+class WarmCache:
+    """Двохрівневий кеш (пам'ять + /tmp) з перевіркою версій."""
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_entries: int = 256,
+        max_disk_bytes: int = 256 * 1024 * 1024,
+        namespace_limits: Optional[Dict[str, int]] = None,
+        enabled: bool = True,
+    ):
+        """
+        Ініціалізація кешу.
+
+        Args:
+            directory: Каталог для файлів кешу (None - лише пам'ять)
+            max_entries: Максимум записів у пам'яті для одного простору імен
+            max_disk_bytes: Максимальний сумарний розмір файлів кешу
+            namespace_limits: Окремі ліміти записів у пам'яті для просторів імен
+            enabled: Вимкнений кеш завжди викликає factory
+        """
+        self.directory = self._prepare_directory(Path(directory)) if directory else None
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.namespace_limits = namespace_limits or {}
+        self.enabled = enabled
+
+        self._memory: Dict[str, TTLCache] = {}
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_bytes: Optional[int] = None
+        self.disk_hits = 0
+        self.disk_writes = 0
+        self.stale = 0
+
+    @staticmethod
+    def _prepare_directory(directory: Path) -> Optional[Path]:
+        """
+        Створює каталог кешу з правами 0700.
+
+        Каталог іншого власника (наприклад, заздалегідь створений у спільному /tmp)
+        не використовується - кеш працює лише в пам'яті.
+        """
+        try:
+            directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+            info = directory.stat()
+            if hasattr(os, "getuid"):
+                if info.st_uid != os.getuid():
+                    logger.warning(f"⚠️ Каталог warm кешу {directory} належить іншому користувачу")
+                    return None
+                if stat.S_IMODE(info.st_mode) & 0o077:
+                    directory.chmod(0o700)
+        except OSError as e:
+            logger.warning(f"⚠️ Каталог warm кешу {directory} недоступний: {e}")
+            return None
+        return directory
+
+    @staticmethod
+    def _trusted(info: os.stat_result) -> bool:
+        """Файл кешу належить поточному користувачу і не доступний на запис іншим."""
+        if not hasattr(os, "getuid"):
+            return True
+        return info.st_uid == os.getuid() and not stat.S_IMODE(info.st_mode) & 0o022
+
+    def _namespace(self, namespace: str) -> TTLCache:
+        cache = self._memory.get(namespace)
+        if cache is None:
+            with self._lock:
+                cache = self._memory.get(namespace)
+                if cache is None:
+                    limit = self.namespace_limits.get(namespace, self.max_entries)
+                    cache = TTLCache(max_size=limit, ttl_seconds=0, name=f"warm_{namespace}")
+                    self._memory[namespace] = cache
+        return cache
+
+    def _path(self, namespace: str, key: Hashable) -> Path:
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+        return self.directory / namespace / f"{digest}{FILE_SUFFIX}"
+
+    def get(self, namespace: str, key: Hashable, version: Optional[str] = None) -> Any:
+        """Повертає значення або None, якщо запису немає чи його версія застаріла."""
+        value = self._get(namespace, key, version)
+        return None if value is _MISSING else value
+
+    def _get(self, namespace: str, key: Hashable, version: Optional[str]) -> Any:
+        if not self.enabled:
+            return _MISSING
+
+        memory = self._namespace(namespace)
+        entry = memory.get(key)
+        if entry is not None:
+            if entry[0] == version:
+                return entry[1]
+            memory.pop(key)
+            self.stale += 1
+
+        if self.directory is None:
+            return _MISSING
+
+        path = self._path(namespace, key)
+        try:
+            with open(path, "rb") as f:
+                if not self._trusted(os.fstat(f.fileno())):
+                    logger.warning(f"⚠️ Запис warm кешу {path.name} має чужого власника або права")
+                    return _MISSING
+                stored_version, value = deserialize_entry(f)
+        except FileNotFoundError:
+            return _MISSING
+        except Exception as e:
+            logger.warning(f"⚠️ Пошкоджений запис warm кешу {path.name}: {e}")
+            self._remove_file(path)
+            return _MISSING
+
+        if stored_version != version:
+            self.stale += 1
+            self._remove_file(path)
+            return _MISSING
+
+        # Оновлюємо час доступу для LRU витіснення на диску
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.disk_hits += 1
+        memory.set(key, (version, value))
+        return value
+
+    def set(
+        self,
+        namespace: str,
+        key: Hashable,
+        value: Any,
+        version: Optional[str] = None,
+        persist: bool = True,
+    ):
+        """Зберігає значення в пам'яті та (якщо persist) у /tmp."""
+        if not self.enabled:
+            return
+        self._namespace(namespace).set(key, (version, value))
+        if persist and self.directory is not None:
+            self._write_file(self._path(namespace, key), version, value)
+
+    def get_or_create(
+        self,
+        namespace: str,
+        key: Hashable,
+        factory: Callable[[], Any],
+        version: Optional[str] = None,
+        persist: bool = True,
+    ) -> Any:
+        """Повертає кешоване значення або створює його через factory."""
+        value = self._get(namespace, key, version)
+        if value is not _MISSING:
+            return value
+        value = factory()
+        if value is not None:
+            self.set(namespace, key, value, version=version, persist=persist)
+        return value
+
+    def invalidate(self, namespace: str, key: Hashable):
+        """Видаляє запис з обох рівнів."""
+        self._namespace(namespace).pop(key)
+        if self.directory is not None:
+            self._remove_file(self._path(namespace, key))
+
+    def clear(self):
+        """Очищає пам'ять та файли кешу."""
+        with self._lock:
+            for cache in self._memory.values():
+                cache.clear()
+        if self.directory is not None and self.directory.exists():
+            for path in self.directory.glob(f"*/*{FILE_SUFFIX}"):
+                self._remove_file(path)
+
+    def _scan_disk_bytes(self) -> int:
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(
+                p.stat().st_size for p in self.directory.glob(f"*/*{FILE_SUFFIX}")
+            )
+        return self._disk_bytes
+
+    def _write_file(self, path: Path, version: Optional[str], value: Any):
+        try:
+            data = serialize_entry(version, value)
+        except Exception as e:
+            # Значення без безпечного представлення лишається тільки в пам'яті
+            logger.debug(f"Запис не серіалізується для warm кешу: {e}")
+            return
+
+        # Один запис не може займати більше чверті дискового ліміту
+        if len(data) > self.max_disk_bytes // 4:
+            return
+
+        with self._disk_lock:
+            try:
+                path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+                previous = path.stat().st_size if path.exists() else 0
+                fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"⚠️ Не вдалося записати warm кеш у {path.parent}: {e}")
+                return
+
+            self._disk_bytes = self._scan_disk_bytes() - previous + len(data)
+            self.disk_writes += 1
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self):
+        """Видаляє найдавніше використані файли, доки розмір не впишеться в ліміт."""
+        files = []
+        for path in self.directory.glob(f"*/*{FILE_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+        self._disk_bytes = total
+
+    def _remove_file(self, path: Path):
+        with self._disk_lock:
+            try:
+                size = path.stat().st_size
+                path.unlink()
+            except OSError:
+                return
+            if self._disk_bytes is not None:
+                self._disk_bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика кешу за просторами імен."""
+        with self._lock:
+            namespaces = {name: cache.stats() for name, cache in self._memory.items()}
+        return {
+            "enabled": self.enabled,
+            "directory": str(self.directory) if self.directory else None,
+            "disk_bytes": self._disk_bytes,
+            "max_disk_bytes": self.max_disk_bytes,
+            "disk_hits": self.disk_hits,
+            "disk_writes": self.disk_writes,
+            "stale": self.stale,
+            "namespaces": namespaces,
+        }
+
+
+# Глобальний кеш контейнера
+warm_cache = WarmCache(
+    directory=Config.WARM_CACHE_DIR or None,
+    max_entries=Config.WARM_CACHE_MAX_ENTRIES,
+    max_disk_bytes=Config.WARM_CACHE_MAX_DISK_MB * 1024 * 1024,
+    namespace_limits={"spec": 32, "vectors": 32},
+    enabled=Config.WARM_CACHE_ENABLED,
+)
@@ -3,6 +3,7 @@
 Завантажує базові промпти з YAML файлу та дозволяє додавати кастомні промпти через API
 """
 
+import copy
 import json
 import os
 import uuid
@@ -13,6 +14,8 @@ from typing import Any, Dict, List, Optional, Union
 
 import yaml
 
+from src.warm_cache import cache_version, warm_cache
+
 
 class PromptCategory(str, Enum):
     """Категорії промптів."""
@@ -96,8 +99,7 @@ class YAMLPromptManager:
             return
 
         try:
-            with open(self.yaml_path, "r", encoding="utf-8") as f:
-                data = yaml.safe_load(f)
+            data = self._read_yaml()
 
             # Завантажуємо налаштування
             if "settings" in data:
@@ -138,6 +140,23 @@ class YAMLPromptManager:
         except Exception as e:
             print(f"❌ Помилка завантаження YAML промптів: {e}")
 
+    def _read_yaml(self) -> Dict[str, Any]:
+        """Читає YAML файл; розібрані дані кешуються до зміни файлу (mtime, розмір)."""
+        stat = os.stat(self.yaml_path)
+
+        def load() -> Dict[str, Any]:
+            with open(self.yaml_path, "r", encoding="utf-8") as f:
+                return yaml.safe_load(f)
+
+        data = warm_cache.get_or_create(
+            "prompts",
+            os.path.abspath(self.yaml_path),
+            load,
+            version=cache_version(stat.st_mtime_ns, stat.st_size),
+        )
+        # Копія, щоб зміни налаштувань екземпляра не потрапили в кеш
+        return copy.deepcopy(data)
+
     def get_prompt(self, prompt_id: str) -> Optional[PromptTemplate]:
         """Отримує промпт за ID."""
         return self.prompts.get(prompt_id)
@@ -177,11 +177,15 @@ def get_chat_history() -> List[Dict[str, Any]]:
     """Отримує історію чату через API."""
     try:
         response = requests.get(
-            f"{API_BASE_URL}/chat-history", headers=get_auth_headers(), timeout=10
+            f"{API_BASE_URL}/v2/chat-history",
+            headers=get_auth_headers(),
+            params={"order": "desc", "limit": 100},
+            timeout=10,
         )
 
         if response.status_code == 200:
-            return response.json()
+            # Остання сторінка приходить від найновіших, показуємо хронологічно
+            return list(reversed(response.json().get("messages", [])))
         else:
             return []
     except Exception as e:
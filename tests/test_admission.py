@@ -0,0 +1,122 @@
+"""
+Тести admission control та бюджету LLM викликів
+"""
+
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+from api.admission import AdmissionController, AdmissionRejected
+
+from src.llm_budget import BudgetedLLM, LLMBudgetExceeded, TokenBucket
+
+
+class FakeClock:
+    """Керований годинник; sleep просуває час"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_per_user_limit_does_not_block_other_users():
+    """Користувач понад свій ліміт чекає, інші користувачі проходять одразу"""
+
+    async def scenario():
+        controller = AdmissionController(
+            max_concurrent=4, max_per_user=1, max_queue=10, max_queue_per_user=2, queue_timeout=5
+        )
+        await controller.acquire("abuser")
+
+        waiting = asyncio.ensure_future(controller.acquire("abuser"))
+        await asyncio.sleep(0)
+        assert controller.stats()["waiting"] == 1
+
+        # Інший користувач не стоїть у черзі за abuser
+        await asyncio.wait_for(controller.acquire("polite"), timeout=0.1)
+
+        controller.release("abuser")
+        await asyncio.wait_for(waiting, timeout=0.1)
+        return controller.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["active"] == 2
+    assert stats["waiting"] == 0
+    assert stats["admitted"] == 3
+
+
+def test_queue_full_rejects_with_retry_after():
+    """Переповнена черга користувача дає негайну відмову з Retry-After"""
+
+    async def scenario():
+        controller = AdmissionController(
+            max_concurrent=4, max_per_user=1, max_queue=10, max_queue_per_user=1, queue_timeout=5
+        )
+        await controller.acquire("abuser")
+        waiting = asyncio.ensure_future(controller.acquire("abuser"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as exc_info:
+            await controller.acquire("abuser")
+
+        waiting.cancel()
+        return controller, exc_info.value
+
+    controller, error = asyncio.run(scenario())
+    assert error.retry_after >= 1
+    assert controller.stats()["rejected_queue_full"] == 1
+    assert controller.stats()["waiting"] == 0
+
+
+def test_queue_deadline():
+    """Запит, що не дочекався слоту, відхиляється і звільняє місце в черзі"""
+
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_per_user=1, queue_timeout=0.01)
+        async with controller.admit("user-1"):
+            with pytest.raises(AdmissionRejected):
+                await controller.acquire("user-2")
+        return controller.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected_timeout"] == 1
+    assert stats["active"] == 0
+    assert stats["waiting"] == 0
+
+
+def test_token_bucket_waits_and_rejects():
+    """Bucket видає burst одразу, далі чекає на поповнення або відмовляє"""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock, sleep=clock.sleep)
+
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+    assert bucket.acquire(timeout=1)
+    assert clock.now == pytest.approx(0.5)
+    assert not bucket.acquire(timeout=0.1)
+    assert bucket.stats()["rejected"] == 1
+
+    assert TokenBucket(rate=0, capacity=1).acquire(timeout=0)
+
+
+def test_budgeted_llm_shares_bucket():
+    """Усі виклики LLM списуються з одного bucket"""
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=1, clock=clock, sleep=clock.sleep)
+    llm = MagicMock()
+    budgeted = BudgetedLLM(llm, bucket, wait_timeout=0)
+
+    budgeted.invoke(["message"])
+    with pytest.raises(LLMBudgetExceeded):
+        budgeted(["message"])
+
+    llm.invoke.assert_called_once()
+    llm.assert_not_called()
+    assert budgeted.model_name == llm.model_name
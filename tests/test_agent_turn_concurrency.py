@@ -0,0 +1,119 @@
+"""
+Тести паралельного виконання незалежних етапів ходу агента
+"""
+
+import threading
+from unittest.mock import MagicMock, patch
+
+from src.intent_classifier import EXAMPLE_QUERIES, LocalIntentClassifier
+from src.interactive_api_agent import InteractiveSwaggerAgent
+
+ENDPOINTS = [
+    {"endpoint_path": f"https://shop.example.com/api/{name}", "metadata": {"path": f"/api/{name}"}}
+    for name in ("products", "categories", "orders", "users", "brands")
+]
+
+
+def make_agent():
+    agent = InteractiveSwaggerAgent.__new__(InteractiveSwaggerAgent)
+    agent.conversation_history = MagicMock()
+    agent.conversation_history.get_recent_context.return_value = ""
+    agent.rag_engine = MagicMock()
+    agent.rag_engine.embed_query.return_value = [0.1, 0.2]
+    agent.intent_classifier = None
+    return agent
+
+
+def test_retrieval_runs_concurrently_with_intent():
+    """Пошук endpoints іде паралельно з аналізом наміру, а не після нього"""
+    agent = make_agent()
+    intent_started, search_started = threading.Event(), threading.Event()
+    overlapped = {}
+
+    # При послідовному виконанні одне з очікувань завершиться таймаутом
+    def search(query, limit, query_embedding):
+        search_started.set()
+        overlapped["search"] = intent_started.wait(5)
+        return ENDPOINTS[:limit]
+
+    def analyze(user_query, context, embedding_fn=None):
+        intent_started.set()
+        overlapped["intent"] = search_started.wait(5)
+        overlapped["embedding"] = embedding_fn()
+        return {"is_informational": True, "operation": "INFO"}
+
+    agent.rag_engine.search_similar_endpoints.side_effect = search
+
+    with patch("src.config.Config.AGENT_TURN_MODE", "classic"), patch.object(
+        agent, "_analyze_user_intent", side_effect=analyze
+    ), patch.object(
+        agent, "_handle_informational_request", return_value="endpoints"
+    ) as informational:
+        result = agent.process_interactive_query("покажи доступні endpoints")
+
+    assert result["status"] == "informational"
+    assert overlapped == {"search": True, "intent": True, "embedding": [0.1, 0.2]}
+    # Ембедінг обчислюється один раз і передається у векторний пошук
+    agent.rag_engine.embed_query.assert_called_once_with("покажи доступні endpoints")
+    agent.rag_engine.search_similar_endpoints.assert_called_once_with(
+        "покажи доступні endpoints", limit=3, query_embedding=[0.1, 0.2]
+    )
+    # Інформаційний запит використовує результат фонового пошуку
+    informational.assert_called_once_with("покажи доступні endpoints", ENDPOINTS[:3])
+
+
+def test_sequential_mode_and_search_errors():
+    """AGENT_PARALLEL_STAGES=false - послідовний пошук; помилка ембедінгу - без endpoints"""
+    agent = make_agent()
+    agent.rag_engine.search_similar_endpoints.return_value = ENDPOINTS
+
+    with patch("src.config.Config.AGENT_PARALLEL_STAGES", False):
+        assert agent._start_retrieval("товари") is None
+
+    with patch("src.config.Config.AGENT_TURN_MODE", "structured"):
+        retrieval = agent._start_retrieval("товари")
+    assert retrieval.endpoints(3) == ENDPOINTS[:3]
+    assert agent.rag_engine.search_similar_endpoints.call_args.kwargs["limit"] == 5
+
+    agent.rag_engine.embed_query.side_effect = RuntimeError("embeddings down")
+    failed = agent._start_retrieval("товари")
+    assert failed.endpoints() == []
+
+
+def test_local_classifier_reuses_background_embedding():
+    """kNN класифікатора бере ембедінг фонового пошуку, а не обчислює його вдруге"""
+    agent = make_agent()
+    agent.rag_engine.embed_query.return_value = [1.0, 0.0]
+    agent.rag_engine.search_similar_endpoints.return_value = ENDPOINTS
+    agent.intent_classifier = LocalIntentClassifier(
+        embed_fn=agent.rag_engine.embed_query,
+        embed_many_fn=lambda queries: [
+            [1.0, 0.0] if label == "GET" else [0.0, 1.0] for _, label in EXAMPLE_QUERIES
+        ],
+        embedding_model="test-background-embedding",
+    )
+
+    retrieval = agent._start_retrieval("покажи всі товари")
+    intent = agent._analyze_user_intent("покажи всі товари", "", retrieval.embedding_fn)
+
+    assert intent["operation"] == "GET"
+    assert intent["resource"] == "products"
+    agent.rag_engine.embed_query.assert_called_once_with("покажи всі товари")
+
+    with patch("src.config.Config.AGENT_TURN_MODE", "structured"):
+        agent.request_planner = MagicMock()
+        assert agent._plan_turn("покажи всі товари", "", retrieval) is None
+    agent.rag_engine.embed_query.assert_called_once()
+    agent.request_planner.request.assert_not_called()
+
+
+def test_chat_handler_leaves_retrieval_to_agent():
+    """Обробник чату не шукає endpoints до агента: повідомлення передається без змін"""
+    from api.main import run_chat_agent
+
+    with patch("src.interactive_api_agent.InteractiveSwaggerAgent") as agent_class:
+        agent_class.return_value.process_interactive_query.return_value = {"response": "ok"}
+        result = run_chat_agent("покажи товари", "user-1", "spec-1", MagicMock(), None, None)
+
+    assert result == {"response": "ok"}
+    agent_class.return_value.process_interactive_query.assert_called_once_with("покажи товари")
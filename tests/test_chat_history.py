@@ -0,0 +1,112 @@
+"""
+Тести keyset пагінації та NDJSON експорту історії чату
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from api.chat_history import (
+    decode_cursor,
+    encode_cursor,
+    fetch_history,
+    fetch_history_page,
+    iter_history_ndjson,
+)
+from api.models import Base, ChatMessage, ChatSession, User
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+START = datetime(2025, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def session_factory():
+    """In-memory SQLite з сесією на 7 повідомлень (два з однаковим часом)"""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+
+    db = factory()
+    db.add(User(id="user-1", email="u@example.com", username="u", hashed_password="hash"))
+    db.add(ChatSession(id="chat-1", user_id="user-1"))
+    for i in range(6):
+        db.add(
+            ChatMessage(
+                id=f"msg-{i}",
+                chat_session_id="chat-1",
+                role="user" if i % 2 == 0 else "assistant",
+                content=f"message {i}",
+                created_at=START + timedelta(seconds=i),
+            )
+        )
+    # Повідомлення з тим самим created_at, що й msg-5 - порядок визначає id
+    db.add(
+        ChatMessage(
+            id="msg-6",
+            chat_session_id="chat-1",
+            role="assistant",
+            content="message 6",
+            created_at=START + timedelta(seconds=5),
+        )
+    )
+    db.commit()
+    db.close()
+
+    yield factory
+    engine.dispose()
+
+
+def test_cursor_roundtrip():
+    """Курсор кодується та декодується без втрат"""
+    cursor = encode_cursor(START, "msg-1")
+    assert decode_cursor(cursor) == (START, "msg-1")
+
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_pages_cover_history_without_gaps(session_factory):
+    """Послідовні сторінки повертають усі повідомлення рівно один раз"""
+    db = session_factory()
+    ids, cursor = [], None
+
+    while True:
+        page = fetch_history_page(db, "chat-1", limit=3, cursor=cursor)
+        ids.extend(message["id"] for message in page["messages"])
+        if not page["has_more"]:
+            assert page["next_cursor"] is None
+            break
+        cursor = page["next_cursor"]
+
+    assert ids == [f"msg-{i}" for i in range(7)]
+    # Формат /chat-history без пагінації - вся історія списком
+    assert [message["id"] for message in fetch_history(db, "chat-1")] == ids
+    db.close()
+
+
+def test_descending_and_since(session_factory):
+    """order=desc починає з найновіших, since повертає тільки нові"""
+    db = session_factory()
+
+    latest = fetch_history_page(db, "chat-1", limit=2, descending=True)
+    assert [m["id"] for m in latest["messages"]] == ["msg-6", "msg-5"]
+    older = fetch_history_page(db, "chat-1", limit=2, cursor=latest["next_cursor"], descending=True)
+    assert [m["id"] for m in older["messages"]] == ["msg-4", "msg-3"]
+
+    fresh = fetch_history_page(db, "chat-1", since=START + timedelta(seconds=3))
+    assert [m["id"] for m in fresh["messages"]] == ["msg-4", "msg-5", "msg-6"]
+    assert fresh["has_more"] is False
+    db.close()
+
+
+def test_ndjson_export_in_batches(session_factory):
+    """NDJSON експорт віддає кожне повідомлення окремим рядком"""
+    lines = list(iter_history_ndjson(session_factory, "chat-1", batch_size=2))
+
+    records = [json.loads(line) for line in lines]
+    assert [r["id"] for r in records] == [f"msg-{i}" for i in range(7)]
+    assert all(line.endswith(b"\n") for line in lines)
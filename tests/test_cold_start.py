@@ -0,0 +1,66 @@
+"""
+Тести cold start: ліниві імпорти та відсутність роботи з БД при імпорті
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+CHECK_IMPORT = """
+import json, sys
+import sqlalchemy
+import api.main
+from api.database import engine
+print(json.dumps({
+    "modules": sorted(m for m in sys.modules if m.split(".")[0] in
+        ("langchain", "langchain_openai", "openai", "sqladmin", "passlib")
+        or m in ("src.interactive_api_agent", "src.rag_engine")),
+    "tables": sqlalchemy.inspect(engine).get_table_names(),
+    "admin": api.main.admin is not None,
+}))
+"""
+
+
+def run_import(tmp_path, **extra_env):
+    env = {k: v for k, v in os.environ.items() if k not in ("TESTING", "ENABLE_ADMIN_PANEL")}
+    env.update(
+        {
+            "PYTHONPATH": str(PROJECT_ROOT),
+            "OPENAI_API_KEY": "sk-test",
+            "DATABASE_URL": f"sqlite:///{tmp_path / 'cold_start.db'}",
+        }
+    )
+    env.update(extra_env)
+    result = subprocess.run(
+        [sys.executable, "-c", CHECK_IMPORT],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_lambda_import_is_lazy(tmp_path):
+    """У Lambda режимі імпорт API не тягне LangChain/OpenAI/sqladmin і не створює таблиці"""
+    state = run_import(tmp_path, AWS_LAMBDA_FUNCTION_NAME="ai-swagger-bot-test")
+
+    assert state["modules"] == []
+    assert state["tables"] == []
+    assert state["admin"] is False
+
+
+def test_admin_panel_mounted_outside_lambda(tmp_path):
+    """На звичайному сервері адмін панель підключається, LLM модулі все одно ліниві"""
+    state = run_import(tmp_path)
+
+    assert state["admin"] is True
+    assert "sqladmin" in state["modules"]
+    assert "langchain_openai" not in state["modules"]
+    assert "src.rag_engine" not in state["modules"]
@@ -0,0 +1,174 @@
+"""
+Тести спільного кешу генерації промптів через GPT
+"""
+
+import copy
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from api.models import Base, GPTPromptCacheEntry
+from src.gpt_prompt_cache import GPTPromptCache, prompt_fingerprint
+from src.gpt_prompt_generator import GPTPromptGenerator
+
+SPEC = {
+    "info": {"title": "Clickone Shop API", "version": "1.0"},
+    "paths": {
+        "/products": {
+            "get": {"summary": "List products"},
+            "post": {
+                "summary": "Create product",
+                "requestBody": {
+                    "content": {
+                        "application/json": {"schema": {"$ref": "#/components/schemas/Product"}}
+                    }
+                },
+            },
+        },
+        "/categories": {"get": {"summary": "List categories"}},
+    },
+    "components": {
+        "schemas": {"Product": {"type": "object", "properties": {"name": {"type": "string"}}}}
+    },
+}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    # Файлова БД: ресурсні промпти генеруються паралельно, кожен потік - своє з'єднання
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'cache.db'}", connect_args={"check_same_thread": False}
+    )
+    Base.metadata.create_all(bind=engine, tables=[GPTPromptCacheEntry.__table__])
+    return GPTPromptCache(sessionmaker(bind=engine))
+
+
+def make_generator(cache) -> GPTPromptGenerator:
+    generator = GPTPromptGenerator(api_key="sk-test", batch_size=1, prompt_cache=cache)
+    generator.client = MagicMock()
+
+    def create(**kwargs):
+        line = kwargs["messages"][1]["content"].strip().splitlines()[0]
+        reply = MagicMock()
+        reply.choices[0].message.content = json.dumps({"name": line, "template": "{user_query}"})
+        reply.usage.prompt_tokens = 10
+        reply.usage.completion_tokens = 5
+        return reply
+
+    generator.client.chat.completions.create.side_effect = create
+    return generator
+
+
+def test_second_tenant_gets_prompts_without_gpt_calls(cache):
+    """Той самий API іншого користувача генерується з кешу, змінений endpoint - через GPT"""
+    first = make_generator(cache)
+    prompts = first.generate_prompts_from_swagger(SPEC)
+    assert first.client.chat.completions.create.call_count == 5  # 3 endpoints + 2 ресурси
+
+    second = make_generator(cache)
+    progress = []
+    cached = second.generate_prompts_from_swagger(
+        copy.deepcopy(SPEC), progress_callback=lambda done, total: progress.append((done, total))
+    )
+    assert second.client.chat.completions.create.call_count == 0
+    assert [(p.name, p.endpoint_path, p.http_method) for p in cached] == [
+        (p.name, p.endpoint_path, p.http_method) for p in prompts
+    ]
+    assert max(progress) == (5, 5)
+
+    # Зміна розгорнутої схеми змінює відбиток лише POST /products
+    changed = copy.deepcopy(SPEC)
+    changed["components"]["schemas"]["Product"]["properties"]["price"] = {"type": "number"}
+    third = make_generator(cache)
+    third.generate_prompts_from_swagger(changed)
+    assert third.client.chat.completions.create.call_count == 1
+
+    db = cache._session()
+    try:
+        entries = {e.fingerprint: e for e in db.query(GPTPromptCacheEntry).all()}
+    finally:
+        db.close()
+    assert len(entries) == 6
+    assert sum(e.hit_count for e in entries.values()) == 9
+
+
+def test_endpoint_cache_is_keyed_by_api_metadata(cache):
+    """Промпти endpoints не беруться з кешу для API з іншою назвою чи base URL"""
+    first = make_generator(cache)
+    first.generate_prompts_for_operations(
+        [(path, "get", SPEC["paths"][path]["get"], SPEC) for path in SPEC["paths"]], SPEC
+    )
+    assert first.client.chat.completions.create.call_count == 2
+
+    other = copy.deepcopy(SPEC)
+    other["info"]["title"] = "Tenant B Internal API"
+    other["servers"] = [{"url": "https://tenant-b.internal"}]
+    second = make_generator(cache)
+    second.generate_prompts_for_operations(
+        [(path, "get", other["paths"][path]["get"], other) for path in other["paths"]], other
+    )
+    assert second.client.chat.completions.create.call_count == 2
+    prompt = second.client.chat.completions.create.call_args.kwargs["messages"][1]["content"]
+    assert "https://tenant-b.internal" in prompt
+
+
+def test_fingerprint_depends_on_model_and_prompt_version():
+    """Відбиток не залежить від порядку ключів, але змінюється з моделлю та версією промпту"""
+    payload = {"path": "/products", "method": "GET", "parameters": []}
+    reordered = {"parameters": [], "method": "GET", "path": "/products"}
+
+    base = prompt_fingerprint("endpoint", payload, "gpt-4", "1")
+    assert base == prompt_fingerprint("endpoint", reordered, "gpt-4", "1")
+    assert base != prompt_fingerprint("endpoint", payload, "gpt-4o-mini", "1")
+    assert base != prompt_fingerprint("endpoint", payload, "gpt-4", "2")
+    assert base != prompt_fingerprint("resource", payload, "gpt-4", "1")
+
+
+def test_fallback_answer_is_cached_under_answering_model(cache):
+    """Відповідь резервної моделі зберігається під її ключем, а не під основною моделлю"""
+    generator = make_generator(cache)
+    generator.models, generator.model = ["gpt-4", "gpt-4o-mini"], "gpt-4"
+    answer = generator.client.chat.completions.create.side_effect
+
+    def create(**kwargs):
+        if kwargs["model"] == "gpt-4":
+            raise RuntimeError("model overloaded")
+        return answer(**kwargs)
+
+    generator.client.chat.completions.create.side_effect = create
+    prompts = generator.generate_prompts_from_swagger(SPEC)
+    assert {p.model for p in prompts} == {"gpt-4o-mini"}
+
+    db = cache._session()
+    try:
+        models = {e.model for e in db.query(GPTPromptCacheEntry).all()}
+    finally:
+        db.close()
+    assert models == {"gpt-4o-mini"}
+
+    # Основна модель не отримує промптів резервної з кешу
+    primary = make_generator(cache)
+    primary.models, primary.model = ["gpt-4"], "gpt-4"
+    primary.generate_prompts_from_swagger(SPEC)
+    assert primary.client.chat.completions.create.call_count == 5
+
+
+def test_put_many_keeps_existing_fingerprints(cache):
+    """Вже записаний відбиток не перезаписується і не ламає пакет; hit_count зберігається"""
+    assert cache.put_many({"a" * 64: {"name": "перший"}}, "endpoint", "gpt-4", "1") == 1
+    assert cache.get_many(["a" * 64]) == {"a" * 64: {"name": "перший"}}
+
+    entries = {"a" * 64: {"name": "другий"}, "b" * 64: {"name": "новий"}}
+    assert cache.put_many(entries, "endpoint", "gpt-4", "1") == 2
+
+    db = cache._session()
+    try:
+        stored = {e.fingerprint: e for e in db.query(GPTPromptCacheEntry).all()}
+    finally:
+        db.close()
+    assert stored["a" * 64].response == {"name": "перший"}
+    assert stored["a" * 64].hit_count == 1
+    assert stored["b" * 64].response == {"name": "новий"}
@@ -0,0 +1,206 @@
+"""
+Тести паралельної генерації промптів через GPT
+"""
+
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+
+import httpx
+import openai
+
+from src.gpt_prompt_generator import GPTPromptGenerator, endpoint_output_stats
+
+
+def make_generator(**kwargs) -> GPTPromptGenerator:
+    """Генератор без спільного кешу промптів у БД та без вимірів довжини відповідей"""
+    endpoint_output_stats.clear()
+    generator = GPTPromptGenerator(api_key="sk-test", **kwargs)
+    generator.prompt_cache = None
+    return generator
+
+
+SPEC = {
+    "info": {"title": "Shop API", "version": "1.0"},
+    "servers": [{"url": "https://shop.example.com"}],
+    "paths": {
+        f"/products/{i}": {"get": {"summary": f"Product {i}"}, "delete": {"summary": "Remove"}}
+        for i in range(5)
+    },
+}
+
+
+def gpt_reply(content: str) -> MagicMock:
+    reply = MagicMock()
+    reply.choices[0].message.content = content
+    reply.usage.prompt_tokens = 10
+    reply.usage.completion_tokens = 5
+    return reply
+
+
+def endpoint_reply(messages) -> MagicMock:
+    """Відповідь GPT з назвою, що містить endpoint із запиту"""
+    user_prompt = messages[1]["content"]
+    endpoint = next(
+        line
+        for line in user_prompt.splitlines()
+        if line.startswith(("ENDPOINT", "Створи загальний"))
+    )
+    return gpt_reply(json.dumps({"name": endpoint, "template": "{user_query}"}))
+
+
+def rate_limit_error(retry_after: str) -> openai.RateLimitError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, headers={"retry-after": retry_after}, request=request)
+    return openai.RateLimitError("Rate limit reached", response=response, body=None)
+
+
+def test_concurrent_generation_is_bounded_and_ordered():
+    """Не більше max_concurrency викликів одночасно, порядок промптів як у специфікації"""
+    generator = make_generator(max_concurrency=3, batch_size=1)
+    lock = threading.Lock()
+    state = {"in_flight": 0, "peak": 0}
+
+    def create(**kwargs):
+        with lock:
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+        time.sleep(0.02)
+        with lock:
+            state["in_flight"] -= 1
+        assert kwargs["timeout"] == generator.request_timeout
+        return endpoint_reply(kwargs["messages"])
+
+    generator.client = MagicMock()
+    generator.client.chat.completions.create.side_effect = create
+    progress = []
+
+    prompts = generator.generate_prompts_from_swagger(
+        SPEC, progress_callback=lambda done, total: progress.append((done, total))
+    )
+
+    assert 1 < state["peak"] <= 3
+    assert [(p.http_method, p.endpoint_path) for p in prompts[:-1]] == [
+        (method, f"/products/{i}") for i in range(5) for method in ("GET", "DELETE")
+    ]
+    assert prompts[0].name == "ENDPOINT: GET /products/0"
+    assert prompts[-1].resource_type == "products"
+    assert sorted(progress) == [(done, 11) for done in range(1, 12)]
+
+
+def test_rate_limit_backoff_and_non_retryable_errors():
+    """429 повторюється після Retry-After, помилки клієнта не повторюються"""
+    generator = make_generator(max_concurrency=1, max_retries=2)
+    sleeps = []
+    generator._sleep = sleeps.append
+    generator.client = MagicMock()
+    generator.client.chat.completions.create.side_effect = [
+        rate_limit_error("0.2"),
+        gpt_reply('{"name": "ok"}'),
+    ]
+
+    assert generator._chat_completion([{"role": "user", "content": "hi"}], 0.7, 100) == (
+        '{"name": "ok"}'
+    )
+    assert len(sleeps) == 1 and 0 < sleeps[0] <= 0.2
+
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    bad_request = openai.BadRequestError(
+        "context too long", response=httpx.Response(400, request=request), body=None
+    )
+    generator.client.chat.completions.create.side_effect = [bad_request]
+    prompt = generator._generate_prompt_for_endpoint("/products", "get", {}, SPEC)
+    assert prompt is None
+    assert generator.client.chat.completions.create.call_count == 3
+
+
+def batch_reply(messages, drop=()) -> MagicMock:
+    """Відповідь на пакетний запит: об'єкт для кожного ### заголовка, крім drop"""
+    keys = [line[4:] for line in messages[1]["content"].splitlines() if line.startswith("### ")]
+    items = [{"key": key, "name": f"batch {key}"} for key in keys if key not in drop]
+    return gpt_reply("```json\n" + json.dumps(items) + "\n```")
+
+
+def test_batched_generation_splits_partial_failures():
+    """Endpoints пакуються в запити, пропущені GPT повторюються меншими пакетами"""
+    generator = make_generator(max_concurrency=1, batch_size=4, batch_max_completion_tokens=8000)
+    requests = []
+
+    def create(**kwargs):
+        messages = kwargs["messages"]
+        user_prompt = messages[1]["content"]
+        requests.append(user_prompt)
+        if "### " not in user_prompt:
+            return endpoint_reply(messages)
+        if len(requests) == 1:
+            # Перший пакет: відповідь без двох endpoints
+            return batch_reply(messages, drop=("DELETE /products/0", "GET /products/1"))
+        if len(requests) in (2, 5):
+            return gpt_reply("не JSON")
+        return batch_reply(messages)
+
+    generator.client = MagicMock()
+    generator.client.chat.completions.create.side_effect = create
+
+    prompts = generator.generate_prompts_from_swagger(SPEC)
+
+    endpoint_prompts = prompts[:-1]
+    assert [(p.http_method, p.endpoint_path) for p in endpoint_prompts] == [
+        (method, f"/products/{i}") for i in range(5) for method in ("GET", "DELETE")
+    ]
+    # Пакети 4+4+2; два пропущені endpoints - окремими пакетами, невдалий пакет з одного
+    # endpoint - звичайним запитом, невдалий пакет з 4 - двома пакетами по 2
+    batch_requests = [r for r in requests if "### " in r]
+    assert len(batch_requests) == 7
+    assert all(r.count("API ІНФОРМАЦІЯ") == 1 for r in batch_requests)
+    assert endpoint_prompts[0].name == "batch GET /products/0"
+    assert endpoint_prompts[1].name == "ENDPOINT: DELETE /products/0"
+    assert prompts[-1].resource_type == "products"
+    assert len(requests) == 9
+
+
+def test_batches_respect_token_budget():
+    """Пакет закривається при досягненні batch_size, ліміту токенів описів або відповіді"""
+    generator = make_generator(
+        batch_size=3, batch_max_tokens=10_000, batch_max_completion_tokens=10_000
+    )
+    endpoints = [
+        (f"GET /p{i}", generator._prepare_endpoint_info(f"/p{i}", "get", {}, SPEC))
+        for i in range(7)
+    ]
+    assert [len(b) for b in generator._plan_batches(endpoints)] == [3, 3, 1]
+
+    # Відповідь пакета вміщує по endpoint_output_tokens на кожен endpoint (до вимірів)
+    generator.batch_max_completion_tokens = 2 * generator.endpoint_output_tokens
+    assert [len(b) for b in generator._plan_batches(endpoints)] == [2, 2, 2, 1]
+
+    generator.batch_max_tokens = 1
+    assert [len(b) for b in generator._plan_batches(endpoints)] == [1] * 7
+
+
+def test_batch_size_follows_measured_output_length():
+    """Пакети плануються за виміряною довжиною відповіді на endpoint із запасом"""
+    generator = make_generator(
+        batch_size=10,
+        batch_max_tokens=100_000,
+        batch_max_completion_tokens=4500,
+        endpoint_output_tokens=450,
+    )
+    endpoints = [
+        (f"GET /p{i}", generator._prepare_endpoint_info(f"/p{i}", "get", {}, SPEC))
+        for i in range(20)
+    ]
+    assert [len(b) for b in generator._plan_batches(endpoints)] == [10, 10]
+
+    # Пакет з 4 endpoints відповів 2400 токенами - 600 на endpoint, ліміт 780 із запасом
+    items = [{"key": key, "name": key} for key, _ in endpoints[:4]]
+    reply = gpt_reply(json.dumps(items))
+    reply.usage.completion_tokens = 2400
+    generator.client = MagicMock()
+    generator.client.chat.completions.create.return_value = reply
+
+    assert len(generator._call_gpt_for_prompt_batch(endpoints[:4], SPEC)) == 4
+    assert generator.client.chat.completions.create.call_args.kwargs["max_tokens"] == 1800
+    assert generator._endpoint_output_budget() == 780
+    assert [len(b) for b in generator._plan_batches(endpoints)] == [5, 5, 5, 5]
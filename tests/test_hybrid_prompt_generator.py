@@ -0,0 +1,100 @@
+"""
+Тести гібридної генерації промптів: шаблони спочатку, GPT лише для прогалин
+"""
+
+from unittest.mock import MagicMock
+
+from src.gpt_prompt_generator import GPTGeneratedPrompt
+from src.hybrid_prompt_generator import HybridPromptGenerator
+from src.swagger_prompt_generator import SwaggerPromptGenerator
+
+PRODUCT = {"type": "object", "properties": {"name": {"type": "string"}}}
+JSON_PRODUCT = {"content": {"application/json": {"schema": PRODUCT}}}
+
+SPEC = {
+    "info": {"title": "Shop API", "version": "1.0"},
+    "paths": {
+        "/products": {
+            "get": {
+                "summary": "List products",
+                "parameters": [{"name": "page", "in": "query", "description": "Сторінка"}],
+                "responses": {"200": JSON_PRODUCT},
+            },
+            "post": {
+                "summary": "Create product",
+                "requestBody": JSON_PRODUCT,
+                "responses": {"201": JSON_PRODUCT},
+            },
+        },
+        "/products/{id}": {
+            "delete": {"summary": "Delete product"},
+            # Немає опису, параметр без опису, немає схеми запиту
+            "put": {"parameters": [{"name": "id", "in": "path"}]},
+        },
+        "/health": {"get": {"summary": "Health check", "responses": {"200": JSON_PRODUCT}}},
+    },
+}
+
+
+def operations():
+    return [
+        (path, method, method_data, SPEC)
+        for path, methods in SPEC["paths"].items()
+        for method, method_data in methods.items()
+    ]
+
+
+def test_completeness_score():
+    """Оцінка враховує опис, параметри, схеми та відомий тип ресурсу"""
+    generator = SwaggerPromptGenerator()
+    paths = SPEC["paths"]
+    assert generator.completeness_score("/products", "get", paths["/products"]["get"], SPEC) == 1.0
+    assert (
+        generator.completeness_score(
+            "/products/{id}", "delete", paths["/products/{id}"]["delete"], SPEC
+        )
+        == 1.0
+    )
+    assert (
+        generator.completeness_score("/products/{id}", "put", paths["/products/{id}"]["put"], SPEC)
+        == 0.0
+    )
+    assert generator.completeness_score("/health", "get", paths["/health"]["get"], SPEC) == 0.0
+
+
+def test_only_low_scoring_endpoints_go_to_gpt():
+    """Повні CRUD endpoints отримують шаблонні промпти, GPT - лише неповні та невідомі"""
+    gpt = MagicMock()
+    gpt.generate_prompts_for_operations.side_effect = lambda ops, swagger_data: [
+        GPTGeneratedPrompt(
+            id=f"gpt {method} {path}",
+            name="GPT",
+            description="",
+            template="{user_query}",
+            category="general",
+            tags=[],
+            resource_type="custom",
+            endpoint_path=path,
+            http_method=method.upper(),
+        )
+        for path, method, _, _ in ops
+    ]
+    generator = HybridPromptGenerator(gpt, min_score=0.75)
+
+    prompts = generator.generate_prompts_for_operations(operations(), SPEC)
+
+    sent = gpt.generate_prompts_for_operations.call_args.args[0]
+    assert [(path, method) for path, method, _, _ in sent] == [
+        ("/products/{id}", "put"),
+        ("/health", "get"),
+    ]
+    assert [p.source for p in prompts] == ["swagger_generated"] * 3 + ["gpt_generated"] * 2
+    assert [p.http_method for p in prompts] == ["GET", "POST", "DELETE", "PUT", "GET"]
+
+    report = generator.report()
+    assert report["endpoints"] == 5
+    assert report["template"] == 3
+    assert report["gpt"] == 2
+    assert report["gpt_failed"] == 0
+    assert report["estimated_seconds_saved"] is not None
+    assert [p.source for p in generator.generate_resource_prompts(SPEC)] == ["swagger_generated"]
@@ -0,0 +1,161 @@
+"""
+Тести конвеєра індексації parse → enhance → embed → write
+"""
+
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from src.gpt_prompt_generator import GPTGeneratedPrompt
+from src.ingestion_pipeline import PipelineStage, StagedPipeline, batched
+
+SPEC = {
+    "openapi": "3.0.0",
+    "info": {"title": "Shop API", "version": "1.0"},
+    "servers": [{"url": "https://shop.example.com"}],
+    "paths": {
+        f"/products/{i}": {"get": {"summary": f"Product {i}"}, "delete": {"summary": "Remove"}}
+        for i in range(5)
+    },
+}
+
+
+def test_stages_overlap_and_report_throughput():
+    """Етапи обробляють різні пакети одночасно, звіт містить статистику кожного етапу"""
+    lock = threading.Lock()
+    busy = set()
+    overlaps = []
+
+    def stage(name):
+        def run(batch):
+            with lock:
+                busy.add(name)
+                overlaps.append(len(busy))
+            time.sleep(0.02)
+            with lock:
+                busy.discard(name)
+            if name == "embed" and batch[0] == 4:
+                raise RuntimeError("embedding недоступний")
+            return batch
+
+        return run
+
+    written = []
+    pipeline = StagedPipeline(
+        [PipelineStage(name, stage(name)) for name in ("enhance", "embed", "write")],
+        queue_size=1,
+        source_name="parse",
+        on_item_done=written.append,
+    )
+
+    report = pipeline.run(batched(range(12), 2))
+
+    # Послідовно: 6 пакетів x 3 етапи x 0.02с; з перекриттям - приблизно (6 + 2) x 0.02с
+    assert max(overlaps) > 1
+    assert report["total_seconds"] < 6 * 3 * 0.02
+    assert sum(written) == 10
+    assert list(report["stages"]) == ["parse", "enhance", "embed", "write"]
+    assert report["items"] == 12
+    assert report["stages"]["embed"]["errors"] == 1
+    assert report["stages"]["write"]["items"] == 10
+    assert report["stages"]["write"]["items_per_second"] > 0
+
+
+def test_failing_item_callback_stops_pipeline():
+    """Помилка on_item_done зупиняє всі етапи, run() піднімає її замість зависання"""
+    done = []
+
+    def on_item_done(count):
+        done.append(count)
+        raise RuntimeError("lease втрачено")
+
+    pipeline = StagedPipeline(
+        [PipelineStage(name, lambda batch: batch, workers=2) for name in ("embed", "write")],
+        queue_size=1,
+        on_item_done=on_item_done,
+    )
+    outcome = {}
+
+    def run():
+        try:
+            pipeline.run(batched(range(40), 2))
+        except RuntimeError as e:
+            outcome["error"] = str(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert outcome == {"error": "lease втрачено"}
+    # Після першої помилки нові пакети до callback не доходять (лише ті, що вже були в роботі)
+    assert len(done) <= 2
+
+
+def test_rag_engine_indexes_base_chunks_before_gpt_enhancement():
+    """Базові embeddings записуються до GPT, покращені chunks потім замінюють свої рядки"""
+    with patch("src.rag_engine.PostgresVectorManager") as vector_manager, patch(
+        "src.rag_engine.OpenAIEmbeddings"
+    ) as embeddings, patch("src.gpt_prompt_generator.GPTPromptGenerator") as generator:
+        embeddings.return_value.embed_documents.side_effect = lambda texts: [[0.1] * 3] * len(texts)
+        writes_before_gpt = []
+
+        def generate(operations, swagger_data):
+            writes_before_gpt.append(vector_manager.return_value.add_embedding.call_count)
+            # GET /products/0 GPT не покращив - його рядок лишається базовим
+            return [
+                GPTGeneratedPrompt(
+                    id=f"p{path}",
+                    name="prompt",
+                    description="GPT опис",
+                    template="{user_query}",
+                    category="general",
+                    endpoint_path=path,
+                    http_method=method.upper(),
+                    resource_type="products",
+                    tags=[],
+                )
+                for path, method, _, _ in operations
+                if (path, method) != ("/products/0", "get")
+            ]
+
+        generator.return_value.generate_prompts_for_operations.side_effect = generate
+        generator.return_value.generate_resource_prompts.return_value = []
+
+        from src.rag_engine import PostgresRAGEngine
+
+        engine = PostgresRAGEngine(user_id="user-1", swagger_spec_id="spec-1")
+        engine._save_gpt_prompts = MagicMock(return_value=True)
+        progress = []
+        phases = []
+
+        with patch("src.rag_engine.Config.INGEST_BATCH_SIZE", 4), patch(
+            "src.rag_engine.Config.PROMPT_GENERATION_MODE", "gpt"
+        ):
+            assert engine.create_vectorstore_from_swagger_data(
+                SPEC, progress_callback=progress.append, phase_callback=phases.append
+            )
+
+    assert phases == ["base", "enhancing"]
+    assert min(writes_before_gpt) == 10
+
+    calls = vector_manager.return_value.add_embedding.call_args_list
+    base, enhanced = calls[:10], calls[10:]
+    assert not any("GPT опис" in call.kwargs["description"] for call in base)
+    assert len(enhanced) == 9
+    assert all("GPT опис" in call.kwargs["description"] for call in enhanced)
+    assert ("/products/0", "GET") not in [
+        (call.kwargs["metadata"]["path"], call.kwargs["method"]) for call in enhanced
+    ]
+    # Пакети по 4: три запити embeddings у кожній фазі
+    assert embeddings.return_value.embed_documents.call_count == 6
+    assert len(engine._save_gpt_prompts.call_args.args[0]) == 9
+
+    report = engine.last_ingestion_report
+    assert list(report["base"]["stages"]) == ["parse", "embed", "write"]
+    assert list(report["enhanced"]["stages"]) == ["chunks", "enhance", "embed", "write"]
+    assert report["base"]["written"] == 10
+    assert report["enhanced"]["written"] == 9
+    assert report["gpt_prompts"] == 9
+    assert progress == sorted(progress) and progress[-1] == 100
+    assert 50 in progress
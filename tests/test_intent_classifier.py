@@ -0,0 +1,123 @@
+"""
+Тести локального класифікатора наміру (швидкий шлях без LLM)
+"""
+
+import src.intent_classifier as classifier_module
+from src.intent_classifier import CALIBRATION_QUERIES, EXAMPLE_QUERIES, LocalIntentClassifier
+from src.warm_cache import WarmCache
+
+PATHS = [
+    "/api/categories",
+    "/api/categories/{categoryId}",
+    "/api/products",
+    "/api/products/{id}",
+    "/api/orders",
+]
+
+
+def test_common_queries_resolved_without_llm():
+    """Список, отримання за id, створення з полями та endpoints визначаються правилами"""
+    classifier = LocalIntentClassifier(paths=PATHS, min_confidence=0.85)
+
+    listing = classifier.resolve("Покажи всі категорії")
+    assert listing.intent["operation"] == "GET"
+    assert listing.intent["resource"] == "categories"
+    assert "всі" in listing.intent["intent"]
+
+    by_id = classifier.resolve("покажи категорію 12")
+    assert by_id.intent["parameters"] == {"categoryId": "12"}
+
+    created = classifier.resolve('Створи товар назва: Телефон, ціна: 100, опис: "Новинка"')
+    assert created.intent["operation"] == "POST"
+    assert created.intent["data"] == {"name": "Телефон", "price": "100", "description": "Новинка"}
+
+    info = classifier.resolve("які endpoints є для замовлень")
+    assert info.intent["is_informational"] is True
+    assert info.intent["resource"] == "orders"
+
+    # Фільтри, кілька ресурсів, зміна/видалення та створення без полів - через LLM
+    assert classifier.resolve("покажи товари дешевше 100") is None
+    assert classifier.resolve("покажи категорії і товари") is None
+    assert classifier.resolve("видали товар 5") is None
+    assert classifier.resolve("створи категорію") is None
+    assert classifier.stats() == {
+        "resolved": 4,
+        "fallbacks": 4,
+        "resolved_ratio": 0.5,
+        "min_confidence": 0.85,
+    }
+
+
+def test_knn_disagreement_and_calibration(tmp_path, monkeypatch):
+    """Незгода kNN з правилом знижує впевненість; калібрування обирає поріг за точністю"""
+    monkeypatch.setattr(classifier_module, "warm_cache", WarmCache(directory=str(tmp_path)))
+    labels = sorted({label for _, label in EXAMPLE_QUERIES})
+
+    def embed(text):
+        # Ембедінг, що кодує операцію прикладу; невідомі запити схожі на DELETE
+        label = dict(EXAMPLE_QUERIES).get(text, "DELETE")
+        return [1.0 if label == name else 0.0 for name in labels]
+
+    calls = []
+
+    def embed_many(texts):
+        calls.append(len(texts))
+        return [embed(text) for text in texts]
+
+    classifier = LocalIntentClassifier(
+        paths=PATHS,
+        embed_fn=embed,
+        embed_many_fn=embed_many,
+        embedding_model="test",
+        min_confidence=0.85,
+        k=3,
+    )
+    agreed = classifier.classify("покажи всі категорії")
+    assert agreed.confidence == 0.95
+
+    disagreed = classifier.classify("покажи всі замовлення")
+    assert disagreed.confidence == 0.45
+    assert disagreed.rule == "list+knn:DELETE"
+    assert calls == [len(EXAMPLE_QUERIES)]
+
+    threshold = classifier.calibrate(
+        [
+            ("покажи всі категорії", "GET"),
+            ("покажи всі замовлення", None),
+            ("категорії", "GET"),
+        ],
+        target_precision=1.0,
+    )
+    assert threshold == 0.95
+    assert classifier.resolve("покажи всі категорії").intent["resource"] == "categories"
+    assert classifier.resolve("категорії") is None
+
+
+def test_default_calibration_on_labelled_set(tmp_path, monkeypatch):
+    """Без samples поріг підбирається на вбудованому наборі; ембедінги - одним кешованим викликом"""
+    monkeypatch.setattr(classifier_module, "warm_cache", WarmCache(directory=str(tmp_path)))
+    labels = dict(EXAMPLE_QUERIES + CALIBRATION_QUERIES)
+    operations = sorted({label for _, label in EXAMPLE_QUERIES})
+    calls = []
+
+    def embed(text):
+        # Запити, що мають іти в LLM, схожі на DELETE
+        label = labels.get(text) or "DELETE"
+        return [1.0 if label == name else 0.0 for name in operations]
+
+    def embed_many(texts):
+        calls.append(len(texts))
+        return [embed(text) for text in texts]
+
+    classifier = LocalIntentClassifier(
+        embed_fn=embed, embed_many_fn=embed_many, embedding_model="test", min_confidence=0.5
+    )
+    assert classifier.calibrate(target_precision=1.0) == 0.95
+    assert classifier.calibrate(target_precision=0.95) == 0.95
+    assert calls == [len(EXAMPLE_QUERIES) + len(CALIBRATION_QUERIES), len(EXAMPLE_QUERIES)]
+
+    rules_only = LocalIntentClassifier(min_confidence=0.5)
+    assert rules_only.calibrate() == 0.9
+    assert rules_only.resolve("покажи товари дешевше 100") is None
+    assert rules_only.resolve("створи категорію") is None
+    assert rules_only.resolve("покажи всі бренди").intent["resource"] == "brands"
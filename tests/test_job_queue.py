@@ -0,0 +1,163 @@
+"""
+Тести черги завдань у базі даних (таблиця jobs)
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.job_queue import JobQueue, PermanentJobError
+from api.models import Base, Job
+from src.ingestion_pipeline import PipelineStage, StagedPipeline, batched
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine, tables=[Job.__table__])
+    return sessionmaker(bind=engine)
+
+
+def make_queue(session_factory, **kwargs):
+    options = {"num_workers": 0, "lease_seconds": 60, "max_attempts": 2}
+    options.update(kwargs)
+    return JobQueue(session_factory, **options)
+
+
+def set_job(session_factory, job_id, **values):
+    db = session_factory()
+    db.query(Job).filter(Job.id == job_id).update(values)
+    db.commit()
+    db.close()
+
+
+def test_claim_uses_skip_locked():
+    """Вибірка наступного завдання блокує рядок і пропускає зайняті іншими workers"""
+    sql = str(JobQueue._claim_statement(datetime.utcnow()).compile(dialect=postgresql.dialect()))
+    assert "FOR UPDATE SKIP LOCKED" in sql
+
+
+def test_job_is_claimed_once_and_visible_from_any_node(session_factory):
+    """Завдання отримує один worker, статус доступний з іншого екземпляра черги"""
+    node_a = make_queue(session_factory)
+    node_b = make_queue(session_factory)
+    processed = []
+    node_a.handlers["embeddings"] = lambda job, progress: processed.append(job["id"])
+
+    task_id = node_b.add_task("user-1", "spec-1", enable_gpt_enhancement=False)
+    assert node_a.pending_count() == 1
+
+    job = node_a.claim("a:0")
+    assert job["payload"] == {"enable_gpt_enhancement": False}
+    assert node_b.claim("b:0") is None
+    assert node_b.get_task_status(task_id)["status"] == "processing"
+
+    # Heartbeat і завершення дозволені лише власнику lease
+    assert not node_b.heartbeat(task_id, "b:0")
+    assert node_a.heartbeat(task_id, "a:0", progress=50, phase="enhancing")
+    assert node_b.get_task_status(task_id)["phase"] == "enhancing"
+    assert node_a.complete(task_id, "a:0")
+    assert node_b.get_task_status(task_id)["status"] == "completed"
+    assert node_b.get_task_status(task_id)["phase"] == "done"
+
+    other_id = node_b.add_task("user-1", "spec-2")
+    assert node_a.process_one("a:0")
+    assert processed == [other_id]
+    assert [t["swagger_spec_id"] for t in node_b.get_user_tasks("user-1")] == ["spec-1", "spec-2"]
+
+
+def test_retry_backoff_and_dead_letter(session_factory):
+    """Невдала спроба повторюється пізніше, після max_attempts завдання стає dead"""
+    queue = make_queue(session_factory, retry_base_seconds=30)
+
+    def broken(job, progress):
+        raise RuntimeError("OpenAI недоступний")
+
+    queue.handlers["embeddings"] = broken
+    task_id = queue.add_task("user-1", "spec-1")
+
+    assert queue.process_one("w:0")
+    status = queue.get_task_status(task_id)
+    assert status["status"] == "pending"
+    assert status["attempts"] == 1
+    assert status["error_message"] == "OpenAI недоступний"
+    # Повтор запланований у майбутньому - зараз завдання не видається
+    assert queue.claim("w:0") is None
+
+    set_job(session_factory, task_id, run_at=datetime.utcnow() - timedelta(seconds=1))
+    assert queue.process_one("w:0")
+    assert queue.get_task_status(task_id)["status"] == "dead"
+
+    assert queue.requeue(task_id)
+    queue.handlers["embeddings"] = lambda job, progress: progress(80) or {"written": 3}
+    assert queue.process_one("w:0")
+    assert queue.get_task_status(task_id)["status"] == "completed"
+    assert queue.get_task_status(task_id)["report"] == {"written": 3}
+
+    queue.handlers["embeddings"] = lambda job, progress: (_ for _ in ()).throw(
+        PermanentJobError("spec видалено")
+    )
+    permanent_id = queue.add_task("user-1", "spec-2")
+    queue.process_one("w:0")
+    assert queue.get_task_status(permanent_id)["attempts"] == 1
+    assert queue.get_task_status(permanent_id)["status"] == "dead"
+
+
+def test_expired_lease_is_reclaimed(session_factory):
+    """Завдання зниклого worker'а забирає інший після закінчення lease"""
+    queue = make_queue(session_factory)
+    task_id = queue.add_task("user-1", "spec-1")
+
+    assert queue.claim("crashed:0")["attempts"] == 1
+    assert queue.claim("alive:0") is None
+
+    set_job(session_factory, task_id, lease_expires_at=datetime.utcnow() - timedelta(seconds=1))
+    job = queue.claim("alive:0")
+    assert job["attempts"] == 2
+    # Старий worker втратив lease і не може завершити завдання
+    assert not queue.complete(task_id, "crashed:0")
+
+    set_job(session_factory, task_id, lease_expires_at=datetime.utcnow() - timedelta(seconds=1))
+    assert queue.claim("late:0") is None
+    assert queue.get_task_status(task_id)["status"] == "dead"
+
+
+def test_lost_lease_cancels_pipeline_without_raising_in_workers(session_factory):
+    """Втрата lease у callback прогресу зупиняє конвеєр; завдання не завершується і не падає"""
+    queue = make_queue(session_factory)
+    task_id = queue.add_task("user-1", "spec-1")
+    outcome = {}
+
+    def handler(job, progress):
+        def on_item_done(count):
+            # Інший worker перехопив завдання після першого пакета
+            set_job(session_factory, job["id"], locked_by="other:0")
+            progress(50)
+
+        pipeline = StagedPipeline(
+            [PipelineStage("write", lambda batch: batch)],
+            queue_size=1,
+            on_item_done=on_item_done,
+            cancel_event=progress.lease_lost,
+        )
+        outcome["report"] = pipeline.run(batched(range(40), 2))
+        return {"written": 40}
+
+    queue.handlers["embeddings"] = handler
+    worker = threading.Thread(target=queue.process_one, args=("w:0",), daemon=True)
+    worker.start()
+    worker.join(5)
+
+    assert not worker.is_alive()
+    assert outcome["report"]["cancelled"] is True
+    assert outcome["report"]["stages"]["write"]["items"] < 40
+    status = queue.get_task_status(task_id)
+    assert status["status"] == "processing"
+    assert status["report"] is None
@@ -0,0 +1,125 @@
+"""
+Тести кешу відповідей LLM для аналізу наміру
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from api.models import Base, LLMResponseCacheEntry
+from src.llm_cache import LLMResponseCache
+
+INTENT = {"is_informational": True, "operation": "INFO", "resource": "categories"}
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine, tables=[LLMResponseCacheEntry.__table__])
+    return sessionmaker(bind=engine)
+
+
+def test_exact_hit_from_memory_and_database(session_factory):
+    """Нормалізований запит влучає в кеш; інший вузол читає з БД, інша специфікація - промах"""
+    cache = LLMResponseCache(session_factory=session_factory, semantic_threshold=0)
+    assert cache.get("spec-1", "Покажи всі категорії", "", "gpt-4", "1") is None
+    cache.set("spec-1", "Покажи всі категорії", "", "gpt-4", "1", INTENT)
+
+    assert cache.get("spec-1", "  покажи   всі категорії?! ", "", "gpt-4", "1") == INTENT
+    assert cache.get("spec-2", "Покажи всі категорії", "", "gpt-4", "1") is None
+    assert cache.get("spec-1", "Покажи всі категорії", "інший контекст", "gpt-4", "1") is None
+    assert cache.get("spec-1", "Покажи всі категорії", "", "gpt-4", "2") is None
+
+    other_node = LLMResponseCache(session_factory=session_factory, semantic_threshold=0)
+    assert other_node.get("spec-1", "покажи всі категорії", "", "gpt-4", "1") == INTENT
+    stats = other_node.stats()
+    assert stats["db_hits"] == 1
+    assert stats["hit_ratio"] == 1.0
+
+    stats = cache.stats()
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 4
+
+    # Прострочений запис не повертається і видаляється при очищенні
+    db = session_factory()
+    db.query(LLMResponseCacheEntry).update(
+        {LLMResponseCacheEntry.expires_at: datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db.commit()
+    db.close()
+    fresh = LLMResponseCache(session_factory=session_factory, semantic_threshold=0)
+    assert fresh.get("spec-1", "покажи всі категорії", "", "gpt-4", "1") is None
+    assert fresh.purge_expired() == 1
+
+
+def test_concurrent_writers_upsert_without_select(session_factory):
+    """Запис ключа - одна вставка ON CONFLICT: без SELECT, повторний запис оновлює відповідь"""
+    first = LLMResponseCache(session_factory=session_factory, semantic_threshold=0)
+    second = LLMResponseCache(session_factory=session_factory, semantic_threshold=0)
+    first.set("spec-1", "покажи всі категорії", "", "gpt-4", "1", INTENT)
+
+    statements = []
+    engine = session_factory.kw["bind"]
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        updated = {**INTENT, "resource": "products"}
+        second.set("spec-1", "покажи всі категорії", "", "gpt-4", "1", updated)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    writes = [s for s in statements if "llm_response_cache" in s]
+    assert len(writes) == 1
+    assert writes[0].startswith("INSERT") and "ON CONFLICT" in writes[0]
+
+    db = session_factory()
+    try:
+        rows = db.query(LLMResponseCacheEntry).all()
+    finally:
+        db.close()
+    assert [row.response for row in rows] == [updated]
+
+
+def test_semantic_hit_requires_similar_embedding_and_same_literals(session_factory):
+    """Перефразований запит влучає за схожістю ембедінга, але не з іншим числом у запиті"""
+    cache = LLMResponseCache(session_factory=session_factory, semantic_threshold=0.95)
+    cache.set("spec-1", "Покажи всі категорії", "", "gpt-4", "1", INTENT, [1.0, 0.0, 0.1])
+    cache.set("spec-1", "Покажи товар 5", "", "gpt-4", "1", {"resource": "5"}, [0.0, 1.0, 0.0])
+    cache.clear_memory()
+
+    assert cache.get("spec-1", "Які є категорії", "", "gpt-4", "1", lambda: [0.99, 0.0, 0.1]) == (
+        INTENT
+    )
+    assert cache.get("spec-1", "Покажи товар 6", "", "gpt-4", "1", lambda: [0.0, 1.0, 0.0]) is None
+    assert cache.get("spec-1", "Видали товар", "", "gpt-4", "1", lambda: [0.0, 0.2, 1.0]) is None
+    assert cache.get("spec-2", "Які є категорії", "", "gpt-4", "1", lambda: [1.0, 0.0, 0.1]) is None
+
+    stats = cache.stats()
+    assert stats["semantic_hits"] == 1
+    assert stats["misses"] == 3
+
+
+def test_semantic_hit_skips_responses_with_parameters(session_factory):
+    """Відповідь з заповненими параметрами повертається лише за точним ключем"""
+    cache = LLMResponseCache(session_factory=session_factory, semantic_threshold=0.95)
+    delete = {"operation": "DELETE", "resource": "categories", "parameters": {"name": "Одяг"}}
+    cache.set("spec-1", "Видали категорію Одяг", "", "gpt-4", "1", delete, [0.0, 1.0, 0.0])
+    cache.clear_memory()
+
+    def similar():
+        return [0.0, 0.99, 0.01]
+
+    assert cache.get("spec-1", "Видали категорію Взуття", "", "gpt-4", "1", similar) is None
+    assert cache.get("spec-1", "видали категорію одяг", "", "gpt-4", "1", similar) == delete
+
+    db = session_factory()
+    assert db.query(LLMResponseCacheEntry.embedding).scalar() is None
+    db.close()
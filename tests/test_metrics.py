@@ -0,0 +1,106 @@
+"""
+Тести метрик Prometheus
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+from api.main import app
+from fastapi.testclient import TestClient
+
+from src import metrics
+from src.llm_budget import BudgetedLLM, TokenBucket
+from src.metrics import MetricsRegistry, stage_timer, timed_stage
+from src.ttl_cache import TTLCache
+
+
+@pytest.fixture
+def enabled_metrics():
+    previous = metrics.metrics_enabled()
+    metrics.set_metrics_enabled(True)
+    yield
+    metrics.set_metrics_enabled(previous)
+
+
+def sample(name: str, **labels) -> float:
+    """Значення семплу з тексту /metrics."""
+    label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    prefix = f"{name}{{{label_text}}} " if labels else f"{name} "
+    for line in metrics.render_metrics().splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix) :])
+    return 0.0
+
+
+def test_registry_text_format():
+    """Гістограма рендериться кумулятивними кошиками, лічильник - з суфіксом _total"""
+    registry = MetricsRegistry()
+    histogram = registry.histogram("demo_seconds", "Demo", ["stage"], buckets=[0.1, 1])
+    histogram.labels("intent").observe(0.05)
+    histogram.labels("intent").observe(0.5)
+    histogram.labels("intent").observe(3)
+    registry.counter("demo_retries", "Retries", ["kind"]).labels(kind="api_call").inc()
+
+    text = registry.render()
+    assert "# TYPE demo_seconds histogram" in text
+    assert 'demo_seconds_bucket{stage="intent",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{stage="intent",le="1"} 2' in text
+    assert 'demo_seconds_bucket{stage="intent",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{stage="intent"} 3' in text
+    assert 'demo_retries_total{kind="api_call"} 1' in text
+
+
+def test_disabled_metrics_are_noop():
+    """Вимкнені метрики не вимірюють етапи і не змінюють лічильники"""
+    metrics.set_metrics_enabled(False)
+    before = sample("ai_swagger_bot_stage_duration_seconds_count", stage="noop_stage")
+
+    with stage_timer("noop_stage") as timer:
+        assert metrics.current_stage() is None
+    assert timer is stage_timer("other")
+
+    assert sample("ai_swagger_bot_stage_duration_seconds_count", stage="noop_stage") == before
+
+
+def test_stage_timer_attributes_llm_tokens(enabled_metrics):
+    """Токени LLM записуються на етап, всередині якого відбувся виклик"""
+    llm = MagicMock()
+    llm.get_num_tokens_from_messages.return_value = 12
+    llm.get_num_tokens.return_value = 5
+    llm.invoke.return_value = MagicMock(content="ok")
+    budgeted = BudgetedLLM(llm, TokenBucket(rate=0, capacity=1))
+
+    @timed_stage("test_intent")
+    def analyze():
+        assert metrics.current_stage() == "test_intent"
+        return budgeted.invoke(["message"])
+
+    analyze()
+
+    assert sample("ai_swagger_bot_stage_duration_seconds_count", stage="test_intent") == 1
+    assert sample("ai_swagger_bot_llm_tokens_total", stage="test_intent", kind="prompt") == 12
+    assert sample("ai_swagger_bot_llm_tokens_total", stage="test_intent", kind="completion") == 5
+
+    metrics.observe_upstream_call(404, 0.2)
+    metrics.observe_upstream_call(None, 1.0)
+    assert sample("ai_swagger_bot_upstream_api_duration_seconds_count", status_class="4xx") >= 1
+    assert sample("ai_swagger_bot_upstream_api_duration_seconds_count", status_class="error") >= 1
+
+
+def test_metrics_endpoint(enabled_metrics):
+    """/metrics віддає текстовий формат з кешами та gauge черги"""
+    cache = TTLCache(max_size=10, ttl_seconds=0, name="test_cache")
+    cache.set("key", 1)
+    cache.get("key")
+    cache.get("missing")
+
+    client = TestClient(app)
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'ai_swagger_bot_cache_lookups_total{cache="test_cache",result="hit"} 1' in response.text
+    assert 'ai_swagger_bot_cache_lookups_total{cache="test_cache",result="miss"} 1' in response.text
+    assert 'ai_swagger_bot_queue_depth{queue="embeddings"}' in response.text
+
+    metrics.set_metrics_enabled(False)
+    assert client.get("/metrics").status_code == 404
@@ -0,0 +1,112 @@
+"""
+Тести маршрутизації моделей LLM за етапами
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.llm_budget import BudgetedLLM, LLMBudgetExceeded, TokenBucket
+from src.model_router import (
+    ModelRouter,
+    RoutedChatModel,
+    StageRoute,
+    langchain_usage,
+    load_routes,
+)
+
+
+def test_load_routes_overrides_and_disabled():
+    """MODEL_ROUTES перевизначає етап, None - модель за замовчуванням, без дублікатів"""
+    routes = load_routes(
+        {"intent": {"models": ["fast", None, "fast"], "max_tokens": 100, "timeout": 5}},
+        default_model="big",
+        enabled=True,
+    )
+    assert routes["intent"].models == ["fast", "big"]
+    assert routes["intent"].max_tokens == 100
+    assert routes["intent"].timeout == 5
+    assert routes["default"].models == ["big"]
+    assert routes["retry_fix"].primary == "big"
+
+    legacy = load_routes({"intent": {"models": ["fast"]}}, default_model="big", enabled=False)
+    assert legacy["intent"].models == ["big"]
+    assert legacy["intent"].max_tokens is None
+
+    router = ModelRouter(routes=routes)
+    assert router.route("unknown").models == ["big"]
+    assert router.chain("intent", "other") == ["other", "fast", "big"]
+
+
+def test_fallback_chain_records_latency_and_cost():
+    """Помилка моделі - виклик наступною моделлю ланцюжка; бюджет LLM не обходиться"""
+    router = ModelRouter(
+        routes={
+            "intent": StageRoute("intent", ["fast", "big"]),
+            "default": StageRoute("default", ["big"]),
+        },
+        prices={"big": (0.01, 0.02)},
+    )
+    calls = []
+
+    def invoke(model, route):
+        calls.append(model)
+        if model == "fast":
+            raise TimeoutError("timeout")
+        return f"answer from {model}"
+
+    result = router.call("intent", invoke, usage=lambda response, model: (1000, 500))
+
+    assert result == "answer from big"
+    assert calls == ["fast", "big"]
+    stats = router.stats()["stages"]["intent"]
+    assert stats["calls"] == 2
+    assert stats["errors"] == 1
+    assert stats["fallbacks"] == 1
+    assert stats["models"] == {"fast": 1, "big": 1}
+    assert stats["cost_usd"] == pytest.approx(0.02)
+    assert router.cost("big-2024-01-01", 1000, 0) == pytest.approx(0.01)
+
+    def over_budget(model, route):
+        calls.append(model)
+        raise LLMBudgetExceeded("limit")
+
+    calls.clear()
+    with pytest.raises(LLMBudgetExceeded):
+        router.call("intent", over_budget)
+    assert calls == ["fast"]
+
+    with pytest.raises(TimeoutError):
+        router.call("default", lambda model, route: invoke("fast", route))
+
+
+def test_routed_model_cost_uses_api_usage():
+    """Вартість рахується з usage відповіді API; без нього - з урахуванням схеми tools"""
+    router = ModelRouter(
+        routes={
+            "intent": StageRoute("intent", ["fast"]),
+            "default": StageRoute("default", ["fast"]),
+        },
+        prices={"fast": (1.0, 2.0)},
+    )
+    llm = MagicMock()
+    llm.invoke.return_value = MagicMock(
+        content="{}",
+        response_metadata={"token_usage": {"prompt_tokens": 1000, "completion_tokens": 500}},
+    )
+    chat = RoutedChatModel(router, "intent")
+    chat._clients["fast"] = BudgetedLLM(llm, TokenBucket(rate=0, capacity=1))
+
+    chat.invoke([MagicMock(content="видали товар")], tools=[{"type": "function"}])
+
+    stats = router.stats()["stages"]["intent"]
+    assert (stats["prompt_tokens"], stats["completion_tokens"]) == (1000, 500)
+    assert stats["cost_usd"] == pytest.approx(2.0)
+    llm.get_num_tokens_from_messages.assert_not_called()
+
+    tools = [{"type": "function", "function": {"name": "plan", "parameters": {"type": "object"}}}]
+    reply = MagicMock(content="{}", additional_kwargs={}, usage_metadata=None, response_metadata={})
+    plain = langchain_usage(["видали товар"], reply, "gpt-4")
+    with_tools = langchain_usage(["видали товар"], reply, "gpt-4", tools)
+    assert with_tools[0] > plain[0]
+    assert with_tools[1] == plain[1]
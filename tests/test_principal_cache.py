@@ -0,0 +1,165 @@
+"""
+Тести кешу авторизованих користувачів
+"""
+
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+from api import auth
+from api.models import User
+from api.principal_cache import PrincipalCache
+from fastapi import HTTPException
+from jose import jwt
+
+from src.ttl_cache import TTLCache
+
+
+class FakeClock:
+    """Керований годинник для перевірки TTL"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_user(user_id="user-1", is_active=True):
+    return User(
+        id=user_id,
+        email=f"{user_id}@example.com",
+        username=user_id,
+        hashed_password="hash",
+        is_active=is_active,
+        created_at=datetime(2025, 1, 1),
+        updated_at=datetime(2025, 1, 1),
+    )
+
+
+def make_db(user):
+    """Мок сесії, що рахує запити до users"""
+    db = MagicMock()
+    db.query.return_value.filter.return_value.first.return_value = user
+    return db
+
+
+def test_ttl_cache_expiry_and_lru():
+    """TTLCache видаляє застарілі та найстаріші записи"""
+    clock = FakeClock()
+    cache = TTLCache(max_size=2, ttl_seconds=10, clock=clock)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # витісняє "b" - найдавніше використаний
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    clock.now = 11
+    assert cache.get("a") is None
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 2
+
+
+def test_principal_cache_roundtrip_and_invalidate():
+    """Кеш повертає transient копію та очищується при інвалідації"""
+    cache = PrincipalCache(max_size=10, ttl_seconds=30)
+    cache.put(make_user())
+
+    cached = cache.get("user-1")
+    assert cached.username == "user-1"
+    assert cached.is_active is True
+
+    cache.invalidate("user-1")
+    assert cache.get("user-1") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_inactive_user_not_cached():
+    """Неактивні користувачі не потрапляють у кеш"""
+    cache = PrincipalCache()
+    cache.put(make_user(is_active=False))
+    assert cache.get("user-1") is None
+
+
+def test_get_current_user_queries_db_once():
+    """Повторна авторизація не звертається до БД"""
+    user = make_user()
+    db = make_db(user)
+
+    with patch.object(auth, "principal_cache", PrincipalCache()) as cache:
+        first = auth.get_current_user(payload={"sub": "user-1"}, db=db)
+        second = auth.get_current_user(payload={"sub": "user-1"}, db=db)
+
+        assert first.id == second.id == "user-1"
+        assert db.query.call_count == 1
+        assert cache.stats()["hit_ratio"] == 0.5
+
+
+def test_get_current_user_inactive_rejected():
+    """Неактивний користувач отримує 400"""
+    db = make_db(make_user(is_active=False))
+
+    with patch.object(auth, "principal_cache", PrincipalCache()):
+        with pytest.raises(HTTPException) as exc_info:
+            auth.get_current_user(payload={"sub": "user-1"}, db=db)
+
+    assert exc_info.value.status_code == 400
+
+
+def test_token_claims_allow_zero_query_auth():
+    """З AUTH_TRUST_TOKEN_CLAIMS користувач береться з токена, стан з БД - раз на TTL"""
+    token = auth.create_user_token("user-1", user_email="user-1@example.com", user=make_user())
+    payload = jwt.decode(token, auth.config.JWT_SECRET_KEY, algorithms=["HS256"])
+    db = make_db(make_user())
+
+    with patch.object(auth, "principal_cache", PrincipalCache()) as cache, patch.object(
+        auth.config, "AUTH_TRUST_TOKEN_CLAIMS", True
+    ):
+        user = auth.get_current_user(payload=payload, db=db)
+        assert auth.get_current_user(payload=payload, db=db).username == user.username == "user-1"
+        assert db.query.call_count == 1
+        assert cache.stats()["claims_hits"] == 2
+
+        # Після інвалідації стан перечитується з БД: старий токен відхиляється
+        cache.invalidate("user-1")
+        db = make_db(None)
+        with pytest.raises(HTTPException):
+            auth.get_current_user(payload=payload, db=db)
+
+        # Новий токен, виданий після оновлення, знову приймається з claims
+        updated = make_user()
+        updated.updated_at = datetime(2025, 6, 1)
+        cache.invalidate("user-1")
+        fresh = {**payload, "iat": payload["iat"] + 1}
+        db = make_db(updated)
+        assert auth.get_current_user(payload=fresh, db=db).username == "user-1"
+        assert cache.stats()["claims_hits"] == 3
+
+
+def test_token_claims_revoked_on_other_worker():
+    """Деактивація на іншому worker: стан у БД новіший за токен, claims не приймаються"""
+    token = auth.create_user_token("user-1", user_email="user-1@example.com", user=make_user())
+    payload = jwt.decode(token, auth.config.JWT_SECRET_KEY, algorithms=["HS256"])
+    deactivated = make_user(is_active=False)
+    deactivated.updated_at = datetime.utcnow()
+
+    with patch.object(auth, "principal_cache", PrincipalCache()) as cache, patch.object(
+        auth.config, "AUTH_TRUST_TOKEN_CLAIMS", True
+    ):
+        with pytest.raises(HTTPException) as exc_info:
+            auth.get_current_user(payload=payload, db=make_db(deactivated))
+        assert exc_info.value.status_code == 400
+        assert cache.stats()["claims_hits"] == 0
+
+    # Змінений після видачі токена користувач читається з БД, а не з claims
+    updated = make_user()
+    updated.username = "renamed"
+    updated.updated_at = datetime(2100, 1, 1)
+    cache = PrincipalCache()
+    assert cache.from_claims(payload, lambda user_id: updated) is None
+    assert cache.from_claims({**payload, "iat": None}, lambda user_id: make_user()) is None
@@ -0,0 +1,76 @@
+"""
+Тести черги створення embeddings
+"""
+
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from api.queue_manager import QueueManager
+
+
+def complete(task):
+    task.status = "completed"
+    task.progress = 100
+
+
+def test_workers_process_tasks_in_parallel():
+    """Пул workers обробляє завдання паралельно, без опитування черги"""
+    manager = QueueManager(num_workers=2)
+    barrier = threading.Barrier(2, timeout=5)
+
+    def process(task):
+        barrier.wait()
+        complete(task)
+
+    with patch.object(manager, "_process_task", side_effect=process):
+        first = manager.add_task("user-1", "spec-1")
+        second = manager.add_task("user-1", "spec-2")
+        assert manager.shutdown(timeout=10)
+
+    assert manager.get_task_status(first)["status"] == "completed"
+    assert manager.get_task_status(second)["status"] == "completed"
+    assert manager.pending_count() == 0
+    assert manager.tasks == {}
+
+
+def test_shutdown_drains_queue():
+    """Зупинка дочікується всіх поставлених завдань і відхиляє нові"""
+    manager = QueueManager(num_workers=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def process(task):
+        started.set()
+        release.wait(5)
+        complete(task)
+
+    with patch.object(manager, "_process_task", side_effect=process):
+        task_ids = [manager.add_task("user-1", f"spec-{i}") for i in range(4)]
+        assert started.wait(5)
+        assert manager.pending_count() == 3
+
+        threading.Timer(0.05, release.set).start()
+        assert manager.shutdown(timeout=10)
+
+    assert [manager.get_task_status(t)["status"] for t in task_ids] == ["completed"] * 4
+    with pytest.raises(RuntimeError):
+        manager.add_task("user-1", "spec-5")
+
+
+def test_history_is_bounded():
+    """Завершені завдання переходять в обмежену історію"""
+    manager = QueueManager(num_workers=1, max_history=2)
+
+    with patch.object(manager, "_process_task", side_effect=complete):
+        task_ids = [manager.add_task("user-1", f"spec-{i}") for i in range(3)]
+        manager.add_task("user-2", "spec-x")
+        assert manager.shutdown(timeout=10)
+
+    assert manager.get_task_status(task_ids[0]) is None
+    assert len(manager.history) == 2
+    assert [t["swagger_spec_id"] for t in manager.get_user_tasks("user-1")] == ["spec-2"]
+
+    manager.cleanup_old_tasks(max_age_hours=0)
+    assert manager.history == {}
@@ -0,0 +1,186 @@
+"""
+Тести планування API запиту одним структурованим викликом LLM
+"""
+
+import json
+from unittest.mock import MagicMock, patch
+
+from langchain.schema import AIMessage
+
+from src.interactive_api_agent import InteractiveSwaggerAgent
+from src.request_planner import (
+    PLAN_FUNCTION_NAME,
+    PLAN_SCHEMA,
+    EndpointCandidate,
+    RequestPlanner,
+    validate_schema,
+)
+
+SPEC = {
+    "paths": {
+        "/api/products": {
+            "get": {
+                "summary": "List products",
+                "parameters": [{"name": "page", "in": "query", "schema": {"type": "integer"}}],
+            },
+            "post": {
+                "summary": "Create product",
+                "requestBody": {
+                    "content": {
+                        "application/json": {"schema": {"$ref": "#/components/schemas/Product"}}
+                    }
+                },
+            },
+        },
+        "/api/products/{id}": {"get": {"summary": "Get product"}},
+    },
+    "components": {
+        "schemas": {
+            "Product": {
+                "type": "object",
+                "required": ["name", "price"],
+                "properties": {"name": {"type": "string"}, "price": {"type": "number"}},
+            }
+        }
+    },
+}
+BASE = "https://shop.example.com"
+
+
+def candidates():
+    return [
+        EndpointCandidate.from_spec(method, path, BASE + path, "", SPEC)
+        for method, path in [
+            ("GET", "/api/products"),
+            ("POST", "/api/products"),
+            ("GET", "/api/products/{id}"),
+        ]
+    ]
+
+
+def tool_call(arguments):
+    return AIMessage(
+        content="",
+        additional_kwargs={
+            "tool_calls": [
+                {
+                    "id": "call_1",
+                    "type": "function",
+                    "function": {"name": PLAN_FUNCTION_NAME, "arguments": json.dumps(arguments)},
+                }
+            ]
+        },
+    )
+
+
+def plan(**overrides):
+    data = {
+        "is_informational": False,
+        "operation": "GET",
+        "resource": "products",
+        "intent": "отримати товар",
+        "endpoint_id": 2,
+        "path_params": {"id": "a/1"},
+        "query_params": {},
+    }
+    data.update(overrides)
+    return data
+
+
+def test_candidate_compact_schema():
+    """Кандидат містить path/query параметри та поля тіла з розгорнутих $ref"""
+    listing, create, item = candidates()
+    assert listing.compact(0) == {
+        "endpoint_id": 0,
+        "method": "GET",
+        "path": "/api/products",
+        "query_params": {"page": "integer"},
+    }
+    assert create.body_fields == {"name": "string", "price": "number"}
+    assert create.required_body == ["name", "price"]
+    assert item.path_params == {"id": "string"}
+
+
+def test_plan_validation():
+    """Схема плану, кандидат, метод та path параметри перевіряються на нашому боці"""
+    planner = RequestPlanner(MagicMock())
+    options = candidates()
+
+    item = planner.validate(plan(), options)
+    assert item.url == f"{BASE}/api/products/a%2F1"
+    assert item.intent["parameters"] == {"id": "a/1"}
+    assert item.body is None
+
+    created = planner.validate(
+        plan(
+            operation="POST",
+            endpoint_id=1,
+            path_params={},
+            body={"name": "Телефон", "color": "red"},
+        ),
+        options,
+    )
+    assert created.body == {"name": "Телефон"}
+    assert created.missing_fields == ["price"]
+
+    info = planner.validate(plan(is_informational=True, operation="INFO", endpoint_id=None), [])
+    assert info.intent["is_informational"] is True
+
+    assert planner.validate(plan(endpoint_id=7), options) is None
+    assert planner.validate(plan(operation="DELETE"), options) is None
+    assert planner.validate(plan(path_params={}), options) is None
+    assert planner.validate(plan(query_params={"sort": "name"}), options) is None
+    assert planner.validate(plan(extra=1), options) is None
+    assert validate_schema(plan(endpoint_id=True), PLAN_SCHEMA) == [
+        "$.endpoint_id: очікується integer|null"
+    ]
+
+
+def test_structured_turn_uses_single_llm_call():
+    """Один виклик LLM з обов'язковою функцією дає намір, endpoint та готовий API запит"""
+    agent = InteractiveSwaggerAgent.__new__(InteractiveSwaggerAgent)
+    agent.llm = MagicMock()
+    agent.llm.invoke.return_value = tool_call(plan(endpoint_id=1, path_params={"id": "42"}))
+    agent.request_planner = RequestPlanner(agent.llm)
+    agent.intent_classifier = None
+    agent.parser = MagicMock(swagger_data=SPEC)
+    agent.parser.get_endpoints.return_value = []
+    agent.rag_engine = MagicMock()
+    agent.rag_engine.search_similar_endpoints.return_value = [
+        {
+            "endpoint_path": BASE + path,
+            "metadata": {"method": method, "path": path, "summary": ""},
+        }
+        for method, path in [("GET", "/api/products"), ("GET", "/api/products/{id}")]
+    ]
+    agent.base_url = BASE
+    agent.swagger_spec_id = "spec-1"
+    agent.model = "gpt-4"
+    agent.jwt_token = None
+
+    with patch("src.config.Config.AGENT_TURN_MODE", "structured"), patch(
+        "src.config.Config.INTENT_CACHE_ENABLED", False
+    ), patch.object(agent, "_get_jwt_token_from_db", return_value=None):
+        intent, endpoints, api_request = agent._plan_turn("покажи товар 42", "")
+
+    assert agent.llm.invoke.call_count == 1
+    kwargs = agent.llm.invoke.call_args.kwargs
+    assert kwargs["tool_choice"]["function"]["name"] == PLAN_FUNCTION_NAME
+    assert intent["operation"] == "GET"
+    assert len(endpoints) == 2
+    assert api_request["url"] == f"{BASE}/api/products/42"
+    assert api_request["method"] == "GET"
+    assert api_request["data"] is None
+
+    # План кешується лише за точним ключем: без ембедінга для семантичного пошуку
+    cache = MagicMock()
+    cache.get.return_value = None
+    with patch("src.config.Config.AGENT_TURN_MODE", "structured"), patch(
+        "src.interactive_api_agent.intent_cache", cache
+    ), patch.object(agent, "_get_jwt_token_from_db", return_value=None):
+        agent._plan_turn("покажи товар 42", "")
+
+    assert len(cache.get.call_args.args) == 5
+    assert "embedding_fn" not in cache.get.call_args.kwargs
+    assert len(cache.set.call_args.args) == 6
+    agent.rag_engine.embed_query.assert_not_called()
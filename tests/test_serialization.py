@@ -0,0 +1,65 @@
+"""
+Тести шару серіалізації на основі orjson
+"""
+
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from src.serialization import dumps, dumps_str, loads
+
+
+def test_native_types_roundtrip():
+    """datetime, NumPy та Decimal серіалізуються без попереднього перетворення"""
+    payload = {
+        "created_at": datetime(2025, 1, 1, 12, 30),
+        "embedding": np.array([0.5, -1.0], dtype=np.float32),
+        "price": Decimal("9.99"),
+        "tags": {"a"},
+        1: "non-str key",
+    }
+
+    data = loads(dumps(payload))
+
+    assert data["created_at"] == "2025-01-01T12:30:00"
+    assert data["embedding"] == [0.5, -1.0]
+    assert data["price"] == 9.99
+    assert data["tags"] == ["a"]
+    assert data["1"] == "non-str key"
+
+
+def test_dumps_str_is_vector_literal():
+    """dumps_str дає текстовий літерал, придатний для pgvector"""
+    assert dumps_str([0.1, 0.2]) == "[0.1,0.2]"
+    assert loads("[0.1,0.2]") == [0.1, 0.2]
+
+    with pytest.raises(TypeError):
+        dumps(object())
+
+
+def test_api_uses_orjson_and_gzip():
+    """Відповіді API формуються ORJSONResponse та стискаються понад поріг"""
+    from api.main import app
+    from fastapi.responses import ORJSONResponse
+    from fastapi.testclient import TestClient
+
+    assert app.router.default_response_class is ORJSONResponse
+
+    client = TestClient(app)
+    small = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert small.headers.get("content-encoding") is None
+
+    @app.get("/__test_large_payload")
+    async def large_payload():
+        return {"items": ["x" * 100] * 100}
+
+    try:
+        response = client.get("/__test_large_payload", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert len(response.json()["items"]) == 100
+    finally:
+        app.router.routes = [
+            route for route in app.router.routes if route.path != "/__test_large_payload"
+        ]
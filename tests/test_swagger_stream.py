@@ -0,0 +1,100 @@
+"""
+Тести потокового завантаження Swagger специфікацій
+"""
+
+import gzip
+import io
+import json
+from unittest.mock import ANY, MagicMock, patch
+
+import pytest
+import yaml
+from api.queue_manager import QueueManager
+
+from src.enhanced_swagger_parser import EnhancedSwaggerParser
+from src.swagger_stream import (
+    SpecFormatError,
+    detect_format,
+    is_supported_filename,
+    iter_endpoint_records,
+    load_spec,
+)
+
+SPEC = {
+    "openapi": "3.0.0",
+    "info": {"title": "Shop", "version": "1.0"},
+    "servers": [{"url": "https://shop.example.com/api"}],
+    "paths": {
+        "/products": {
+            "get": {"summary": "List products", "tags": ["products"]},
+            "post": {
+                "summary": "Create product",
+                "parameters": [{"name": "price", "in": "query", "schema": {"minimum": 0.5}}],
+            },
+        },
+        "/products/{id}": {"delete": {"summary": "Delete product"}, "parameters": []},
+    },
+}
+
+
+def make_spool(data: bytes, compress: bool = False) -> io.BytesIO:
+    return io.BytesIO(gzip.compress(data) if compress else data)
+
+
+@pytest.mark.parametrize("compress", [False, True])
+@pytest.mark.parametrize("fmt", ["json", "yaml"])
+def test_endpoint_records_match_parser(fmt, compress):
+    """Потоковий розбір дає ті самі endpoints, що й EnhancedSwaggerParser"""
+    raw = json.dumps(SPEC).encode() if fmt == "json" else yaml.safe_dump(SPEC).encode()
+    spool = make_spool(raw, compress)
+    filename = f"spec.{fmt}" + (".gz" if compress else "")
+
+    assert detect_format(filename, spool) == fmt
+    spec = load_spec(spool, fmt)
+    records = list(iter_endpoint_records(spec))
+
+    parser = EnhancedSwaggerParser()
+    parser.swagger_data = SPEC
+    assert spec == SPEC
+    assert records == parser.get_endpoints()
+    assert [r["method"] for r in records] == ["GET", "POST", "DELETE"]
+
+
+def test_format_detection_and_limits():
+    """Формат визначається за вмістом, розпакування обмежене за розміром"""
+    assert is_supported_filename("api.yml.gz")
+    assert not is_supported_filename("api.xml")
+    assert detect_format("upload", make_spool(b'  {"paths": {}}')) == "json"
+    assert detect_format("upload", make_spool(b"openapi: 3.0.0\n")) == "yaml"
+
+    bomb = make_spool(b'{"paths": {}, "x": "' + b"a" * 10_000 + b'"}', compress=True)
+    with pytest.raises(SpecFormatError):
+        load_spec(bomb, "json", max_bytes=1000)
+
+    with pytest.raises(SpecFormatError):
+        load_spec(make_spool(b'{"paths": {"/a": '), "json")
+
+
+def test_task_rereads_spec_by_id():
+    """Завдання зберігає лише ID специфікації і завантажує її під час обробки"""
+    manager = QueueManager()
+    with patch.object(manager, "_start_worker"):
+        task_id = manager.add_task("user-1", "spec-1")
+
+    task = manager.tasks[task_id]
+    assert task.swagger_data is None
+
+    rag_engine = MagicMock()
+    rag_engine.create_vectorstore_from_swagger_data.return_value = True
+    with patch.object(manager, "_load_swagger_data", return_value=SPEC) as load, patch(
+        "src.rag_engine.PostgresRAGEngine", return_value=rag_engine
+    ):
+        manager._process_task(task)
+
+    load.assert_called_once_with("spec-1")
+    rag_engine.create_vectorstore_from_swagger_data.assert_called_once_with(
+        SPEC, enable_gpt_enhancement=True, progress_callback=ANY, phase_callback=ANY
+    )
+    assert task.status == "completed"
+    assert task.phase == "done"
+    assert task.swagger_data is None
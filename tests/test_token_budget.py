@@ -0,0 +1,50 @@
+"""
+Тести бюджетів токенів payload у промптах LLM
+"""
+
+import json
+
+from src.token_budget import TokenBudgetManager, count_tokens, strip_transport_fields
+
+
+def test_large_response_fits_budget():
+    """Великий список скорочується до бюджету з описом пропущених елементів"""
+    items = [{"id": i, "name": f"Товар {i}", "price": i * 1.5} for i in range(2000)]
+    api_response = {
+        "status_code": 200,
+        "data": {"items": items, "total": 2000},
+        "text": json.dumps(items),
+        "headers": {"Authorization": "Bearer secret"},
+    }
+    manager = TokenBudgetManager(budgets={"response_formatting": 300}, model="gpt-4")
+
+    fitted = manager.fit_payload("response_formatting", strip_transport_fields(api_response))
+
+    assert isinstance(fitted, dict)
+    assert "headers" not in fitted and "text" not in fitted
+    assert count_tokens(json.dumps(fitted, ensure_ascii=False), "gpt-4") <= 300
+    assert fitted["data"]["total"] == 2000
+    elided = fitted["data"]["items"][-1]
+    assert elided["_elided_items"] >= 1995
+    assert elided["_item_schema"] == {"id": "number", "name": "string", "price": "number"}
+
+    stats = manager.stats()["stages"]["response_formatting"]
+    assert stats["truncated"] == 1
+    assert stats["tokens_saved"] > stats["tokens_sent"]
+
+
+def test_fit_text_keeps_tail_and_skips_small_payloads():
+    """Контекст зберігає останні повідомлення; малий payload не змінюється"""
+    manager = TokenBudgetManager(budgets={"context": 50, "retry_fix": 50}, model="gpt-4")
+    context = "\n".join(f"Користувач: запит номер {i}" for i in range(200))
+
+    fitted = manager.fit_text("context", context, keep="tail")
+    assert fitted.endswith("запит номер 199")
+    assert "запит номер 0\n" not in fitted
+
+    request = {"url": "https://api.example.com/items", "method": "GET"}
+    assert manager.fit_payload("retry_fix", request) is request
+    assert manager.stats()["stages"]["retry_fix"]["tokens_saved"] == 0
+
+    disabled = TokenBudgetManager(budgets={"context": 50}, enabled=False)
+    assert disabled.fit_text("context", context) == context
@@ -0,0 +1,145 @@
+"""
+Тести трасування запитів
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+from api.main import app
+from fastapi.testclient import TestClient
+
+from src import tracing
+from src.llm_budget import BudgetedLLM, TokenBucket
+from src.serialization import loads
+from src.tracing import JsonlExporter, RingBufferExporter, Tracer, current_span
+
+
+@pytest.fixture
+def global_tracer():
+    """Вмикає глобальний трасувальник з чистим буфером"""
+    previous = (tracing.tracer.enabled, tracing.tracer.sample_ratio)
+    tracing.tracer.enabled, tracing.tracer.sample_ratio = True, 1.0
+    tracing.trace_buffer.clear()
+    yield tracing.tracer
+    tracing.tracer.enabled, tracing.tracer.sample_ratio = previous
+    tracing.trace_buffer.clear()
+
+
+def test_nested_spans_and_errors(tmp_path):
+    """Дочірні спани належать трейсу кореня, виняток позначає спан помилкою"""
+    buffer = RingBufferExporter(max_spans=100)
+    path = tmp_path / "traces" / "spans.jsonl"
+    tracer = Tracer(enabled=True, exporters=[buffer, JsonlExporter(str(path))])
+
+    with tracer.start_span("agent.process_interactive_query") as root:
+        with tracer.start_span("api.call", kind="CLIENT", **{"http.status_code": 422}):
+            pass
+        with pytest.raises(ValueError):
+            with tracer.start_span("agent.retry_fix", **{"retry.attempt": 2}):
+                raise ValueError("bad slug")
+
+    spans = buffer.get_trace(root.trace_id)
+    assert [s["name"] for s in spans] == [
+        "agent.process_interactive_query",
+        "api.call",
+        "agent.retry_fix",
+    ]
+    assert all(s["parent_span_id"] == root.span_id for s in spans[1:])
+    assert spans[1]["attributes"]["http.status_code"] == 422
+    assert spans[2]["status"] == {"code": "ERROR", "message": "bad slug"}
+    assert spans[2]["events"][0]["attributes"]["exception.type"] == "ValueError"
+
+    summary = buffer.list_traces()[0]
+    assert summary["root"] == "agent.process_interactive_query"
+    assert summary["span_count"] == 3
+    assert summary["error"] is True
+
+    lines = path.read_bytes().splitlines()
+    assert [loads(line)["name"] for line in lines][-1] == "agent.process_interactive_query"
+
+
+def test_head_sampling_drops_whole_trace():
+    """Невідібраний кореневий спан вимикає запис усіх дочірніх"""
+    buffer = RingBufferExporter()
+    tracer = Tracer(enabled=True, sample_ratio=0.0, exporters=[buffer])
+
+    with tracer.start_span("root") as root:
+        assert not root.is_recording
+        with tracer.start_span("child") as child:
+            assert not child.is_recording
+
+    assert buffer.list_traces() == []
+    assert tracer.stats()["started_traces"] == 1
+    assert tracer.stats()["sampled_traces"] == 0
+
+    disabled = Tracer(enabled=False, exporters=[buffer])
+    with disabled.start_span("root"):
+        assert current_span() is tracing.NON_RECORDING_SPAN
+
+
+def test_llm_span_records_tokens(global_tracer):
+    """Виклик LLM створює CLIENT спан з кількістю токенів"""
+    llm = MagicMock(model_name="gpt-4")
+    llm.get_num_tokens_from_messages.return_value = 30
+    llm.get_num_tokens.return_value = 7
+    llm.invoke.return_value = MagicMock(content="{}")
+    budgeted = BudgetedLLM(llm, TokenBucket(rate=0, capacity=1))
+
+    with tracing.start_span("agent.intent") as parent:
+        budgeted.invoke([MagicMock(content="hello")])
+
+    llm_span = tracing.trace_buffer.get_trace(parent.trace_id)[1]
+    assert llm_span["name"] == "llm.call"
+    assert llm_span["kind"] == "CLIENT"
+    assert llm_span["attributes"]["llm.model"] == "gpt-4"
+    assert llm_span["attributes"]["llm.usage.prompt_tokens"] == 30
+    assert llm_span["attributes"]["llm.usage.completion_tokens"] == 7
+    assert llm_span["attributes"]["llm.prompt_chars"] == 5
+
+
+def test_llm_tokens_come_from_api_usage(global_tracer):
+    """Токени беруться з usage відповіді API; токенізатор - лише якщо usage немає"""
+    from langchain.schema import HumanMessage
+    from langchain_openai import ChatOpenAI
+
+    chat = ChatOpenAI(model="gpt-4", openai_api_key="sk-test")
+    client = MagicMock()
+    client.create.return_value = {
+        "choices": [{"message": {"role": "assistant", "content": "{}"}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 41, "completion_tokens": 9, "total_tokens": 50},
+    }
+    object.__setattr__(chat, "client", client)
+    budgeted = BudgetedLLM(chat, TokenBucket(rate=0, capacity=1))
+
+    with tracing.start_span("agent.intent") as parent:
+        budgeted.invoke([HumanMessage(content="hello")], tools=[{"type": "function"}])
+
+    attributes = tracing.trace_buffer.get_trace(parent.trace_id)[1]["attributes"]
+    assert attributes["llm.usage.prompt_tokens"] == 41
+    assert attributes["llm.usage.completion_tokens"] == 9
+    assert budgeted.last_usage() == (41, 9)
+
+    llm = MagicMock(model_name="gpt-4")
+    llm.invoke.return_value = MagicMock(
+        content="{}",
+        response_metadata={"token_usage": {"prompt_tokens": 3, "completion_tokens": 2}},
+    )
+    budgeted = BudgetedLLM(llm, TokenBucket(rate=0, capacity=1))
+    budgeted.invoke([MagicMock(content="hi")])
+    assert budgeted.last_usage() == (3, 2)
+    llm.get_num_tokens_from_messages.assert_not_called()
+
+
+def test_admin_trace_routes(global_tracer):
+    """Трейси доступні через адмін панель"""
+    with tracing.start_span("agent.process_interactive_query") as root:
+        pass
+
+    client = TestClient(app)
+    response = client.get("/admin/traces")
+    assert response.status_code == 200
+    assert response.json()["traces"][0]["trace_id"] == root.trace_id
+
+    detail = client.get(f"/admin/traces/{root.trace_id}")
+    assert detail.json()["spans"][0]["name"] == "agent.process_interactive_query"
+    assert client.get("/admin/traces/missing").status_code == 404
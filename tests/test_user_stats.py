@@ -0,0 +1,167 @@
+"""
+Тести інкрементальних лічильників статистики та health probe
+"""
+
+from unittest.mock import patch
+
+import pytest
+from api import database
+from api.models import Base, ChatMessage, ChatSession, SwaggerSpec, User, UserStats
+from api.user_stats import apply_user_stats_delta, get_user_stats, reset_user_stats
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+
+@pytest.fixture
+def db():
+    """Окрема in-memory база SQLite"""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    session.add(
+        User(
+            id="user-1",
+            email="user-1@example.com",
+            username="user-1",
+            hashed_password="hash",
+            is_active=True,
+        )
+    )
+    session.add(
+        SwaggerSpec(
+            id="spec-1",
+            user_id="user-1",
+            filename="api.json",
+            original_data={},
+            parsed_data={},
+            jwt_token="token",
+            is_active=True,
+        )
+    )
+    session.add(ChatSession(id="chat-1", user_id="user-1", session_name="chat"))
+    session.add(ChatMessage(id="msg-1", chat_session_id="chat-1", role="user", content="hi"))
+    session.commit()
+
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def test_lazy_backfill_on_first_read(db):
+    """Перше читання перераховує лічильники та зберігає рядок"""
+    stats = get_user_stats(db, "user-1")
+
+    assert stats == {
+        "swagger_specs_count": 1,
+        "embeddings_count": 0,
+        "messages_count": 1,
+        "jwt_tokens_count": 1,
+    }
+    assert db.get(UserStats, "user-1") is not None
+
+
+def test_delta_applied_in_transaction(db):
+    """Зміни лічильників фіксуються разом з транзакцією і відкочуються з нею"""
+    get_user_stats(db, "user-1")
+
+    apply_user_stats_delta(db, "user-1", messages_count=2, swagger_specs_count=1)
+    db.commit()
+    apply_user_stats_delta(db, "user-1", messages_count=5)
+    db.rollback()
+
+    db.expire_all()
+    stats = get_user_stats(db, "user-1")
+    assert stats["messages_count"] == 3
+    assert stats["swagger_specs_count"] == 2
+
+
+def test_delta_without_row_and_reset(db):
+    """Без рядка delta ігнорується, після reset лічильники перераховуються"""
+    apply_user_stats_delta(db, "user-1", messages_count=10)
+    db.commit()
+    assert db.get(UserStats, "user-1") is None
+
+    get_user_stats(db, "user-1")
+    apply_user_stats_delta(db, "user-1", messages_count=10)
+    reset_user_stats(db, "user-1")
+    db.commit()
+
+    assert get_user_stats(db, "user-1")["messages_count"] == 1
+
+    with pytest.raises(ValueError):
+        apply_user_stats_delta(db, "user-1", unknown_count=1)
+
+
+def test_readiness_check_is_cached():
+    """Readiness перевірка кешує результат на заданий час"""
+    with patch.dict(database._readiness_state, {"checked_at": None}):
+        first = database.check_database_ready(max_age_seconds=60)
+        second = database.check_database_ready(max_age_seconds=60)
+
+    assert first["ready"] is True
+    assert first["cached"] is False
+    assert second["cached"] is True
+
+
+def test_health_endpoints():
+    """Liveness не звертається до БД, readiness повертає 503 при недоступній БД"""
+    from api.main import app
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app)
+
+    with patch.object(database, "SessionLocal") as session_factory:
+        response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "healthy"
+    session_factory.assert_not_called()
+
+    failed = {
+        "ready": False,
+        "error": "connection refused",
+        "checked_at": 1.0,
+        "latency_ms": 1.0,
+        "cached": False,
+        "age_seconds": 0.0,
+    }
+    with patch("api.main.check_database_ready", return_value=failed):
+        response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "unavailable"
+
+
+def test_cleanup_duplicates_resets_only_owners():
+    """Видалення дублікатів embeddings скидає лічильники лише їхніх власників"""
+    from sqlalchemy import text
+
+    from src.postgres_vector_manager import PostgresVectorManager
+
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine, tables=[UserStats.__table__])
+    with engine.begin() as conn:
+        # Таблиця без унікального обмеження, як у базах до його появи
+        conn.execute(
+            text(
+                "CREATE TABLE api_embeddings (id TEXT, user_id TEXT, swagger_spec_id TEXT, "
+                "endpoint_path TEXT, method TEXT, created_at TEXT)"
+            )
+        )
+        for i, (user_id, path) in enumerate([("user-1", "/a"), ("user-1", "/a"), ("user-2", "/b")]):
+            conn.execute(
+                text("INSERT INTO api_embeddings VALUES (:id, :user_id, 's', :path, 'GET', :id)"),
+                {"id": str(i), "user_id": user_id, "path": path},
+            )
+        for user_id in ("user-1", "user-2"):
+            conn.execute(UserStats.__table__.insert().values(user_id=user_id, embeddings_count=1))
+
+    manager = PostgresVectorManager.__new__(PostgresVectorManager)
+    manager.engine = engine
+    assert manager.cleanup_duplicates() == 1
+
+    with engine.connect() as conn:
+        remaining = conn.execute(text("SELECT user_id FROM user_stats")).fetchall()
+    assert remaining == [("user-2",)]
@@ -0,0 +1,155 @@
+"""
+Тести кешу контейнера (пам'ять + /tmp)
+"""
+
+import os
+import pickle
+from datetime import datetime
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+import yaml
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+import src.postgres_vector_manager as vector_module
+import src.yaml_prompt_manager as yaml_module
+from src.postgres_vector_manager import PostgresVectorManager
+from src.warm_cache import FILE_SUFFIX, WarmCache, cache_version
+from src.yaml_prompt_manager import YAMLPromptManager
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return WarmCache(directory=str(tmp_path / "warm"), max_entries=8)
+
+
+def test_disk_tier_survives_new_process_state(cache, tmp_path):
+    """Запис з /tmp доступний новому екземпляру кешу, застаріла версія видаляється"""
+    version = cache_version(datetime(2025, 1, 1))
+    cache.set("spec", "spec-1", {"paths": {}}, version=version)
+
+    # Новий екземпляр з тим самим каталогом - як новий процес у теплому контейнері
+    fresh = WarmCache(directory=str(tmp_path / "warm"))
+    assert fresh.get("spec", "spec-1", version=version) == {"paths": {}}
+    assert fresh.disk_hits == 1
+
+    newer = cache_version(datetime(2025, 1, 2))
+    assert fresh.get("spec", "spec-1", version=newer) is None
+    assert WarmCache(directory=str(tmp_path / "warm")).get("spec", "spec-1", version) is None
+
+    calls = []
+    value = fresh.get_or_create("spec", "spec-1", lambda: calls.append(1) or "v2", version=newer)
+    assert value == "v2"
+    assert fresh.get_or_create("spec", "spec-1", lambda: calls.append(1), version=newer) == "v2"
+    assert calls == [1]
+
+
+def test_disk_tier_rejects_pickle_and_foreign_files(cache, tmp_path):
+    """Файли кешу без pickle: масиви через np.savez, чужі та змінені файли ігноруються"""
+    snapshot = {
+        "records": [{"id": "e1", "created_at": datetime(2025, 1, 1)}],
+        "matrix": np.eye(2, dtype=np.float32),
+    }
+    cache.set("vectors", "spec-1", snapshot)
+    loaded = WarmCache(directory=str(tmp_path / "warm")).get("vectors", "spec-1")
+    assert loaded["records"] == snapshot["records"]
+    assert np.array_equal(loaded["matrix"], snapshot["matrix"])
+    assert (tmp_path / "warm").stat().st_mode & 0o777 == 0o700
+
+    # Підкладений pickle не виконується, а вважається пошкодженим записом
+    path = cache._path("query_embedding", "q")
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(pickle.dumps(("v", [1.0])))
+    assert WarmCache(directory=str(tmp_path / "warm")).get("query_embedding", "q", "v") is None
+    assert not path.exists()
+
+    # Файл, доступний на запис іншим користувачам, не читається
+    cache.set("query_embedding", "q", [1.0], version="v")
+    os.chmod(path, 0o666)
+    assert WarmCache(directory=str(tmp_path / "warm")).get("query_embedding", "q", "v") is None
+
+    # Об'єкти без безпечного представлення лишаються тільки в пам'яті
+    cache.set("spec", "parser", object())
+    assert not cache._path("spec", "parser").exists()
+
+
+def test_disk_size_limit_evicts_oldest(tmp_path):
+    """Перевищення дискового ліміту витісняє найдавніше використані файли"""
+    cache = WarmCache(directory=str(tmp_path), max_disk_bytes=20_000)
+    for i in range(6):
+        cache.set("query_embedding", f"q{i}", b"x" * 4000)
+        os.utime(cache._path("query_embedding", f"q{i}"), (i, i))
+
+    files = list(tmp_path.glob(f"*/*{FILE_SUFFIX}"))
+    assert sum(p.stat().st_size for p in files) <= 20_000
+    assert not cache._path("query_embedding", "q0").exists()
+    assert cache._path("query_embedding", "q5").exists()
+
+    # Занадто великий запис лишається тільки в пам'яті
+    cache.set("vectors", "big", b"x" * 10_000)
+    assert not cache._path("vectors", "big").exists()
+    assert cache.get("vectors", "big") == b"x" * 10_000
+
+
+def test_prompts_yaml_parsed_once(tmp_path, monkeypatch, cache):
+    """base_prompts.yaml розбирається повторно лише після зміни файлу"""
+    monkeypatch.setattr(yaml_module, "warm_cache", cache)
+    path = tmp_path / "prompts.yaml"
+    path.write_text(yaml.safe_dump({"settings": {"lang": "uk"}, "prompts": {}}))
+
+    with patch.object(yaml_module.yaml, "safe_load", wraps=yaml.safe_load) as safe_load:
+        first = YAMLPromptManager(str(path))
+        first.settings["lang"] = "en"
+        second = YAMLPromptManager(str(path))
+        assert safe_load.call_count == 1
+        assert second.settings == {"lang": "uk"}
+
+        path.write_text(yaml.safe_dump({"settings": {"lang": "pl"}, "prompts": {}}))
+        os.utime(path, ns=(1, 1))
+        assert YAMLPromptManager(str(path)).settings == {"lang": "pl"}
+        assert safe_load.call_count == 2
+
+
+def test_vector_snapshot_search(monkeypatch, cache):
+    """Пошук у знімку embeddings перезавантажує знімок лише при зміні версії"""
+    monkeypatch.setattr(vector_module, "warm_cache", cache)
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE swagger_specs (id TEXT, updated_at TEXT)"))
+        conn.execute(
+            text(
+                "CREATE TABLE api_embeddings (id TEXT, user_id TEXT, swagger_spec_id TEXT, "
+                "endpoint_path TEXT, method TEXT, description TEXT, embedding TEXT, "
+                "embedding_metadata TEXT, created_at TEXT)"
+            )
+        )
+        conn.execute(text("INSERT INTO swagger_specs VALUES ('spec-1', '2025-01-01')"))
+        for i, vector in enumerate(["[1, 0, 0]", "[0, 1, 0]", "[0.7, 0.7, 0]"]):
+            conn.execute(
+                text(
+                    "INSERT INTO api_embeddings VALUES "
+                    "(:id, 'user-1', 'spec-1', :path, 'GET', 'd', :vector, NULL, '2025-01-01')"
+                ),
+                {"id": f"e{i}", "path": f"/p{i}", "vector": vector},
+            )
+
+    vector_module._schema_checked_engines.add(engine)
+    manager = PostgresVectorManager(engine)
+
+    with patch.object(manager, "_load_snapshot", wraps=manager._load_snapshot) as load:
+        results = manager.search_similar([1, 0.1, 0], "user-1", "spec-1", limit=2)
+        assert [r["endpoint_path"] for r in results] == ["/p0", "/p2"]
+        assert results[0]["similarity"] == pytest.approx(0.995, abs=1e-3)
+        assert results[0]["embedding"] == [1.0, 0.0, 0.0]
+
+        manager.search_similar([0, 1, 0], "user-1", "spec-1", limit=1)
+        assert load.call_count == 1
+
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE swagger_specs SET updated_at = '2025-02-01'"))
+        assert manager.search_similar([0, 1, 0], "user-1", "spec-1", limit=1)[0]["id"] == "e1"
+        assert load.call_count == 2